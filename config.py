@@ -24,6 +24,19 @@ class Config:
     DB_PASSWORD: str = os.getenv("DB_PASSWORD", "password")
     DB_NAME: str = os.getenv("DB_NAME", "dbname")
     
+    # Connection pool settings (database/pool.py)
+    DB_POOL_MIN_SIZE: int = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+    DB_POOL_MAX_SIZE: int = int(os.getenv("DB_POOL_MAX_SIZE", "20"))
+    DB_COMMAND_TIMEOUT: float = float(os.getenv("DB_COMMAND_TIMEOUT", "30"))  # seconds, 0 = none
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "1024"))  # 0 behind pgbouncer
+    DB_MAX_INACTIVE_CONNECTION_LIFETIME: float = float(os.getenv("DB_MAX_INACTIVE_CONNECTION_LIFETIME", "300"))
+    DB_STATEMENT_TIMEOUT_MS: int = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))  # 0 = server default
+    DB_TIMEZONE: str = os.getenv("DB_TIMEZONE", "")  # empty = server default
+    DB_APPLICATION_NAME: str = os.getenv("DB_APPLICATION_NAME", "alfaconnect-bot")
+    DB_JSONB_CODEC: bool = os.getenv("DB_JSONB_CODEC", "true").lower() == "true"
+    DB_JSON_LIBRARY: str = os.getenv("DB_JSON_LIBRARY", "auto").lower()  # auto | orjson | json
+    DB_SLOW_QUERY_MS: float = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+    
     # Admin settings
     ADMIN_IDS: List[int] = field(default_factory=lambda: [
         int(x.strip()) for x in os.getenv("ADMIN_IDS", "").split(",") 
@@ -53,6 +66,50 @@ class Config:
     # Cache settings
     CACHE_TTL: int = int(os.getenv('CACHE_TTL', '300'))  # 5 minutes
     
+    # Access audit sink settings
+    AUDIT_QUEUE_SIZE: int = int(os.getenv('AUDIT_QUEUE_SIZE', '10000'))
+    AUDIT_BATCH_SIZE: int = int(os.getenv('AUDIT_BATCH_SIZE', '500'))
+    AUDIT_FLUSH_INTERVAL_MS: int = int(os.getenv('AUDIT_FLUSH_INTERVAL_MS', '500'))
+    
+    # Telegram fan-out settings (Bot API limits: ~30 msg/s overall, ~1 msg/s per chat)
+    TELEGRAM_GLOBAL_RATE: float = float(os.getenv('TELEGRAM_GLOBAL_RATE', '30'))
+    TELEGRAM_PER_CHAT_INTERVAL: float = float(os.getenv('TELEGRAM_PER_CHAT_INTERVAL', '1.0'))
+    TELEGRAM_FANOUT_CONCURRENCY: int = int(os.getenv('TELEGRAM_FANOUT_CONCURRENCY', '8'))
+    TELEGRAM_SEND_RETRIES: int = int(os.getenv('TELEGRAM_SEND_RETRIES', '3'))
+    
+    # Notification outbox (notification_queue) worker settings
+    OUTBOX_WORKERS: int = int(os.getenv('OUTBOX_WORKERS', '2'))
+    OUTBOX_BATCH_SIZE: int = int(os.getenv('OUTBOX_BATCH_SIZE', '50'))
+    OUTBOX_POLL_INTERVAL_MS: int = int(os.getenv('OUTBOX_POLL_INTERVAL_MS', '1000'))
+    OUTBOX_LEASE_SECONDS: int = int(os.getenv('OUTBOX_LEASE_SECONDS', '120'))
+    OUTBOX_MAX_ATTEMPTS: int = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '5'))
+    OUTBOX_RETRY_BASE_SECONDS: float = float(os.getenv('OUTBOX_RETRY_BASE_SECONDS', '5'))
+    OUTBOX_RETRY_MAX_SECONDS: float = float(os.getenv('OUTBOX_RETRY_MAX_SECONDS', '900'))
+    
+    # Inbox listing: prefetched next pages and role totals are reused for page flips
+    INBOX_PAGE_CACHE_TTL: int = int(os.getenv('INBOX_PAGE_CACHE_TTL', '30'))
+    INBOX_PAGE_CACHE_ENTRIES: int = int(os.getenv('INBOX_PAGE_CACHE_ENTRIES', '2000'))
+    
+    # Hourly application rollups: refresh period, and how far behind the
+    # watermark a refresh re-counts to pick up rows of late commits
+    ROLLUP_INTERVAL_SECONDS: int = int(os.getenv('ROLLUP_INTERVAL_SECONDS', '60'))
+    ROLLUP_SETTLE_SECONDS: int = int(os.getenv('ROLLUP_SETTLE_SECONDS', '300'))
+    
+    # In-memory client typeahead index for call-centre search (off by default;
+    # searches go to the database until it has been built) and its full rebuild period
+    CLIENT_INDEX_ENABLED: bool = os.getenv("CLIENT_INDEX_ENABLED", "false").lower() == "true"
+    CLIENT_INDEX_REFRESH_SECONDS: int = int(os.getenv('CLIENT_INDEX_REFRESH_SECONDS', '900'))
+    
+    # Stock reservations: how long a hold lasts unless consumed or cancelled,
+    # and how often expired holds are released
+    STOCK_RESERVATION_TTL_SECONDS: int = int(os.getenv('STOCK_RESERVATION_TTL_SECONDS', '86400'))
+    STOCK_RESERVATION_SWEEP_SECONDS: int = int(os.getenv('STOCK_RESERVATION_SWEEP_SECONDS', '60'))
+    
+    # Low-stock alerts: how often warehouse users are notified of threshold
+    # crossings, and how long a crossing must hold before it is announced
+    STOCK_ALERT_INTERVAL_SECONDS: int = int(os.getenv('STOCK_ALERT_INTERVAL_SECONDS', '60'))
+    STOCK_ALERT_DEBOUNCE_SECONDS: int = int(os.getenv('STOCK_ALERT_DEBOUNCE_SECONDS', '300'))
+    
     # Logging settings
     LOG_LEVEL: str = os.getenv('LOG_LEVEL', 'INFO')
     LOGS_DIR: Path = Path(os.getenv("LOGS_DIR", "logs"))
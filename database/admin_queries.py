@@ -5,6 +5,9 @@ import json
 import logging
 from config import config
 from loader import bot
+from database import application_rollups
+from utils.identity_context import mark_user_stale
+from utils.notification_templates import template_registry
 
 # Setup logger
 logger = logging.getLogger(__name__)
@@ -25,44 +28,19 @@ async def get_admin_dashboard_stats() -> Dict:
             """
             users_stats = await conn.fetch(users_query)
             
-            # Total orders by status
-            orders_query = """
-            SELECT status, COUNT(*) as count
-            FROM zayavki
-            GROUP BY status
-            ORDER BY count DESC
-            """
-            orders_stats = await conn.fetch(orders_query)
-            
-            # Today's statistics
-            today_query = """
-            SELECT 
-                COUNT(CASE WHEN DATE(created_at) = CURRENT_DATE THEN 1 END) as today_orders,
-                COUNT(CASE WHEN DATE(created_at) = CURRENT_DATE AND status = 'completed' THEN 1 END) as today_completed,
-                COUNT(CASE WHEN status IN ('new', 'pending') THEN 1 END) as pending_orders
-            FROM zayavki
-            """
-            today_stats = await conn.fetchrow(today_query)
-            
-            # System health
-            system_query = """
-            SELECT 
-                COUNT(*) as total_users,
-                COUNT(DISTINCT user_id) as total_orders,
-                COUNT(DISTINCT assigned_to) as active_technicians
-            FROM zayavki
-            """
-            system_stats = await conn.fetchrow(system_query)
+            # Order counts come from the hourly rollups instead of scanning zayavki
+            overview = await application_rollups.fetch_zayavka_overview(conn)
+            orders_stats = overview['by_status']
             
             return {
                 'users_by_role': [dict(row) for row in users_stats],
-                'orders_by_status': [dict(row) for row in orders_stats],
-                'today_orders': today_stats['today_orders'] if today_stats else 0,
-                'today_completed': today_stats['today_completed'] if today_stats else 0,
-                'pending_orders': today_stats['pending_orders'] if today_stats else 0,
-                'total_users': system_stats['total_users'] if system_stats else 0,
-                'total_orders': system_stats['total_orders'] if system_stats else 0,
-                'active_technicians': system_stats['active_technicians'] if system_stats else 0
+                'orders_by_status': [{'status': row['status'], 'count': row['count']} for row in orders_stats],
+                'today_orders': sum(row['today'] for row in orders_stats),
+                'today_completed': sum(row['today'] for row in orders_stats if row['status'] == 'completed'),
+                'pending_orders': sum(row['count'] for row in orders_stats if row['status'] in ('new', 'pending')),
+                'total_users': sum(row['count'] for row in orders_stats),
+                'total_orders': overview['customers'],
+                'active_technicians': overview['technicians']
             }
         except Exception as e:
             logger.error(f"Error getting admin dashboard stats: {e}")
@@ -233,6 +211,7 @@ async def update_user_role(telegram_id: int, new_role: str, updated_by: int) ->
                 new_role,
                 telegram_id
             )
+            mark_user_stale(telegram_id=telegram_id, role=new_role)
             
             # Log role change
             await conn.execute(
@@ -269,6 +248,7 @@ async def block_unblock_user(telegram_id: int, action: str, admin_id: int) -> bo
                     'UPDATE users SET is_active = false, updated_at = CURRENT_TIMESTAMP WHERE telegram_id = $1',
                     telegram_id
                 )
+                mark_user_stale(telegram_id=telegram_id, is_active=False)
                 status = 'blocked'
             else:  # unblock
                 # Restore previous role when unblocking
@@ -276,6 +256,7 @@ async def block_unblock_user(telegram_id: int, action: str, admin_id: int) -> bo
                     'UPDATE users SET is_active = true, updated_at = CURRENT_TIMESTAMP WHERE telegram_id = $1',
                     telegram_id
                 )
+                mark_user_stale(telegram_id=telegram_id, is_active=True)
                 status = 'unblocked'
             
             # Log action
@@ -444,30 +425,31 @@ async def get_filtered_orders(filters: Dict) -> List[Dict]:
             return []
         finally:
             pass
+
+BULK_ASSIGN_QUERY = """
+WITH assigned AS (
+    UPDATE zayavki z
+    SET assigned_to = $2, status = 'assigned',
+        assigned_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+    FROM unnest($1::int[]) AS o(id)
+    WHERE z.id = o.id
+    RETURNING z.id
+)
+INSERT INTO assignment_logs (order_id, technician_id, assigned_by, assigned_at)
+SELECT id, $2, $3, CURRENT_TIMESTAMP FROM assigned
+"""
+
 async def bulk_assign_orders(order_ids: List[int], technician_id: int, admin_id: int) -> bool:
-    """Bulk assign orders to technician"""
+    """Bulk assign orders to technician; none are assigned unless all of them exist"""
+    order_ids = list(dict.fromkeys(order_ids))
     async with bot.db.acquire() as conn:
         try:
             async with conn.transaction():
-                for order_id in order_ids:
-                    await conn.execute(
-                        """
-                        UPDATE zayavki 
-                        SET assigned_to = $1, status = 'assigned', 
-                            assigned_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
-                        WHERE id = $2
-                        """,
-                        technician_id, order_id
-                    )
-                    
-                    # Log assignment
-                    await conn.execute(
-                        """
-                        INSERT INTO assignment_logs (order_id, technician_id, assigned_by, assigned_at)
-                        VALUES ($1, $2, $3, CURRENT_TIMESTAMP)
-                        """,
-                        order_id, technician_id, admin_id
-                    )
+                # One statement updates every order and logs every assignment
+                result = await conn.execute(BULK_ASSIGN_QUERY, order_ids, technician_id, admin_id)
+                assigned = int(result.split()[-1])
+                if assigned != len(order_ids):
+                    raise ValueError(f"{len(order_ids) - assigned} of {len(order_ids)} orders not found")
                 return True
         except Exception as e:
             logger.error(f"Error bulk assigning orders: {e}")
@@ -536,14 +518,18 @@ async def update_notification_template(template_id: int, content: str, admin_id:
     """Update notification template"""
     async with bot.db.acquire() as conn:
         try:
-            await conn.execute(
+            row = await conn.fetchrow(
                 """
                 UPDATE notification_templates 
                 SET content = $1, updated_by = $2, updated_at = CURRENT_TIMESTAMP
                 WHERE id = $3
+                RETURNING template_type, language, content
                 """,
                 content, admin_id, template_id
             )
+            if row:
+                # Recompile now so the next notification uses the edited text
+                template_registry.set(row['template_type'], row['language'], row['content'])
             return True
         except Exception as e:
             logger.error(f"Error updating notification template: {e}")
@@ -691,9 +677,8 @@ async def export_admin_data(export_type: str, filters: Dict = None) -> Optional[
 async def is_admin(telegram_id: int) -> bool:
     """Check if user is admin"""
     try:
-        conn = await asyncpg.connect(config.DATABASE_URL)
-        result = await conn.fetchval("SELECT role FROM users WHERE telegram_id = $1", telegram_id)
-        await conn.close()
+        async with bot.db.acquire() as conn:
+            result = await conn.fetchval("SELECT role FROM users WHERE telegram_id = $1", telegram_id)
         return result == 'admin'
     except Exception as e:
         logger.error(f"Error checking admin status: {e}")
@@ -0,0 +1,226 @@
+"""
+Hourly application rollups (``application_rollup_hourly``).
+
+Dashboards, reports and alerts count applications from hourly buckets
+instead of scanning ``service_requests``, ``zayavki`` and
+``staff_application_audit``. ``refresh`` brings one source table's buckets
+up to date: it re-counts only the hours from the kind's watermark (minus
+the settle interval) onwards plus the hours triggers marked dirty because
+an older row changed, and replaces those buckets in one transaction. The
+readers below are sums over buckets, so their cost grows with the number
+of hours in the window, not with the number of applications.
+
+``conn`` is anything with asyncpg's ``fetch``/``fetchrow`` (a connection,
+the pool or ``db_manager``); ``refresh`` needs a connection.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+ROLLUP_KINDS = ('service_request', 'zayavka', 'staff_audit')
+
+# kind -> (table, timestamp column, role, source, status, workflow type, counters)
+# The counters are notified, workflow initiated, successful (both) and
+# complete audit data; they only exist for staff_application_audit.
+_SOURCES = {
+    'service_request': (
+        'service_requests', 'created_at',
+        "COALESCE(t.creation_source, 'client')",
+        "CASE WHEN t.created_by_staff THEN 'staff' ELSE 'client' END",
+        "COALESCE(t.current_status, '')",
+        "COALESCE(t.workflow_type, '')",
+        "0, 0, 0, 0",
+    ),
+    'zayavka': (
+        'zayavki', 'created_at',
+        "COALESCE(t.created_by_role, 'client')",
+        "CASE WHEN COALESCE(t.created_by_role, 'client') = 'client' THEN 'client' ELSE 'staff' END",
+        "COALESCE(t.status, '')",
+        "COALESCE(t.zayavka_type, '')",
+        "0, 0, 0, 0",
+    ),
+    'staff_audit': (
+        'staff_application_audit', 'creation_timestamp',
+        "COALESCE(t.creator_role, '')",
+        "'staff'",
+        "COALESCE(t.metadata->>'event_type', '')",
+        "COALESCE(t.application_type, '')",
+        """COUNT(*) FILTER (WHERE t.client_notified),
+           COUNT(*) FILTER (WHERE t.workflow_initiated),
+           COUNT(*) FILTER (WHERE t.client_notified AND t.workflow_initiated),
+           COUNT(*) FILTER (WHERE t.application_id IS NOT NULL AND t.creator_id IS NOT NULL
+                              AND t.creator_role IS NOT NULL AND t.client_id IS NOT NULL
+                              AND t.application_type IS NOT NULL)""",
+    ),
+}
+
+LOCK_WATERMARK_QUERY = """
+SELECT date_trunc('hour', COALESCE(processed_until, '-infinity') - make_interval(secs => $2)) AS recount_from,
+       now() AS refreshed_at
+FROM application_rollup_watermarks
+WHERE kind = $1
+FOR UPDATE
+"""
+
+CLAIM_DIRTY_HOURS_QUERY = """
+DELETE FROM application_rollup_dirty_hours
+WHERE kind = $1
+RETURNING bucket_start
+"""
+
+DELETE_BUCKETS_QUERY = """
+DELETE FROM application_rollup_hourly
+WHERE kind = $1 AND (bucket_start >= $2 OR bucket_start = ANY($3::timestamptz[]))
+"""
+
+# $1 = first hour re-counted in full, $2 = dirty hours before it
+INSERT_BUCKETS_QUERIES = {
+    kind: f"""
+WITH ranges (lo, hi) AS (
+    SELECT d, d + INTERVAL '1 hour' FROM unnest($2::timestamptz[]) AS d WHERE d < $1
+    UNION ALL
+    SELECT $1::timestamptz, 'infinity'::timestamptz
+)
+INSERT INTO application_rollup_hourly (
+    bucket_start, kind, role, source, status, workflow_type,
+    total_count, notified_count, workflow_count, success_count, complete_count
+)
+SELECT date_trunc('hour', t.{column}), '{kind}', {role}, {source}, {status}, {workflow_type},
+       COUNT(*), {counters}
+FROM ranges r
+JOIN {table} t ON t.{column} >= r.lo AND t.{column} < r.hi
+GROUP BY 1, 3, 4, 5, 6
+"""
+    for kind, (table, column, role, source, status, workflow_type, counters) in _SOURCES.items()
+}
+
+ADVANCE_WATERMARK_QUERY = """
+UPDATE application_rollup_watermarks
+SET processed_until = $2, refreshed_at = now()
+WHERE kind = $1
+"""
+
+AUDIT_METRICS_QUERY = """
+SELECT
+    CASE GROUPING(role, hour)
+        WHEN 3 THEN 'total'
+        WHEN 1 THEN 'role'
+        WHEN 2 THEN 'hour'
+        ELSE 'role_hour'
+    END AS breakdown,
+    role, hour,
+    SUM(total_count) AS total,
+    SUM(notified_count) AS notified,
+    SUM(workflow_count) AS workflow,
+    SUM(success_count) AS successful,
+    COALESCE(SUM(total_count) FILTER (WHERE status = 'error_occurred'), 0) AS errors,
+    SUM(complete_count) AS complete
+FROM (
+    SELECT role, status, total_count, notified_count, workflow_count, success_count, complete_count,
+           EXTRACT(HOUR FROM bucket_start)::int AS hour
+    FROM application_rollup_hourly
+    WHERE kind = 'staff_audit' AND bucket_start >= $1
+) b
+GROUP BY GROUPING SETS ((), (role), (hour), (role, hour))
+"""
+
+PERIOD_TOTALS_QUERY = """
+SELECT date_trunc($2, bucket_start) AS period,
+       SUM(total_count) AS total,
+       COALESCE(SUM(total_count) FILTER (WHERE source = 'staff'), 0) AS staff,
+       COALESCE(SUM(total_count) FILTER (WHERE status = 'completed'), 0) AS completed,
+       SUM(success_count) AS successful
+FROM application_rollup_hourly
+WHERE kind = $1 AND bucket_start >= $3
+GROUP BY 1
+ORDER BY 1
+"""
+
+ZAYAVKA_STATUS_QUERY = """
+SELECT status,
+       SUM(total_count) AS count,
+       COALESCE(SUM(total_count) FILTER (WHERE bucket_start >= CURRENT_DATE), 0) AS today
+FROM application_rollup_hourly
+WHERE kind = 'zayavka'
+GROUP BY status
+ORDER BY count DESC
+"""
+
+# Distinct counts cannot be summed from buckets; one index probe per user instead
+ZAYAVKA_PEOPLE_QUERY = """
+SELECT
+    (SELECT COUNT(*) FROM users u WHERE EXISTS (SELECT 1 FROM zayavki z WHERE z.user_id = u.id)) AS customers,
+    (SELECT COUNT(*) FROM users u WHERE EXISTS (SELECT 1 FROM zayavki z WHERE z.assigned_to = u.id)) AS technicians
+"""
+
+
+async def refresh(conn, kind: str, settle_seconds: float) -> int:
+    """
+    Bring the buckets of one kind up to date; returns the number of buckets written.
+
+    Concurrent refreshes of the same kind are serialised by the watermark row lock.
+    """
+    async with conn.transaction():
+        watermark = await conn.fetchrow(LOCK_WATERMARK_QUERY, kind, float(settle_seconds))
+        if watermark is None:
+            raise ValueError(f"Unknown rollup kind: {kind}")
+        recount_from = watermark['recount_from']
+        dirty = [row['bucket_start'] for row in await conn.fetch(CLAIM_DIRTY_HOURS_QUERY, kind)]
+        await conn.execute(DELETE_BUCKETS_QUERY, kind, recount_from, dirty)
+        status = await conn.execute(INSERT_BUCKETS_QUERIES[kind], recount_from, dirty)
+        await conn.execute(ADVANCE_WATERMARK_QUERY, kind, watermark['refreshed_at'])
+    return int(status.split()[-1])
+
+
+def _audit_counters() -> Dict[str, Any]:
+    return {'total': 0, 'notified': 0, 'workflow': 0, 'successful': 0, 'errors': 0, 'complete': 0,
+            'hourly': [0] * 24}
+
+
+async def fetch_audit_metrics(conn, start: datetime) -> Dict[Optional[str], Dict[str, Any]]:
+    """
+    Staff application audit counters since start.
+
+    Keys are creator roles, plus None for all roles together; values hold
+    total, notified, workflow, successful, errors and complete counts and a
+    24-slot hour-of-day histogram.
+    """
+    metrics = {None: _audit_counters()}
+    for row in await conn.fetch(AUDIT_METRICS_QUERY, start):
+        breakdown = row['breakdown']
+        counters = metrics.setdefault(row['role'] if breakdown in ('role', 'role_hour') else None,
+                                      _audit_counters())
+        if breakdown in ('hour', 'role_hour'):
+            counters['hourly'][row['hour']] = row['total'] or 0
+        else:
+            for name in ('total', 'notified', 'workflow', 'successful', 'errors', 'complete'):
+                counters[name] = row[name] or 0
+    return metrics
+
+
+async def fetch_period_totals(conn, kind: str, start: datetime, granularity: str = 'day') -> List[Dict[str, Any]]:
+    """Totals per day or hour since start: period, total, staff, completed and successful"""
+    if granularity not in ('day', 'hour'):
+        raise ValueError(f"Unsupported granularity: {granularity}")
+    return [dict(row) for row in await conn.fetch(PERIOD_TOTALS_QUERY, kind, granularity, start)]
+
+
+async def fetch_zayavka_overview(conn) -> Dict[str, Any]:
+    """Zayavka counts by status (all time and created today) and distinct customers/technicians"""
+    statuses = await conn.fetch(ZAYAVKA_STATUS_QUERY)
+    people = await conn.fetchrow(ZAYAVKA_PEOPLE_QUERY)
+    return {
+        'by_status': [{'status': row['status'] or None, 'count': row['count'], 'today': row['today']}
+                      for row in statuses],
+        'customers': people['customers'] if people else 0,
+        'technicians': people['technicians'] if people else 0,
+    }
+
+
+__all__ = [
+    'ROLLUP_KINDS',
+    'refresh',
+    'fetch_audit_metrics',
+    'fetch_period_totals',
+    'fetch_zayavka_overview',
+]
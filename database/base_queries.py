@@ -3,6 +3,10 @@ from typing import List, Dict, Any, Optional, Union
 from datetime import datetime, date, timedelta
 import json
 from utils.logger import setup_module_logger
+from utils.identity_context import get_identity, lookup_identity_user, mark_user_stale, user_lookup_counter
+from utils.cache_manager import cached, statistics_cache_key
+from utils.validators import normalize_phone_e164
+from database import client_search, stock_alerts
 logger = setup_module_logger("base_queries")
 from database.models import User, Zayavka, Material, Feedback, Equipment, ChatMessage, HelpRequest, ServiceRequest, StateTransition
 
@@ -27,6 +31,7 @@ async def create_user_if_not_exists(
     try:
         async with pool.acquire() as conn:
             await conn.execute(query, telegram_id, username)
+            mark_user_stale(telegram_id=telegram_id)
             return True
     except Exception as e:
         logger.error(f"Error creating user: {str(e)}", exc_info=True)
@@ -34,23 +39,9 @@ async def create_user_if_not_exists(
 
 async def get_user_lang(telegram_id: int, pool: asyncpg.Pool = None) -> str:
     """Get user's language preference"""
-    if not pool:
-        from loader import bot
-        pool = bot.db
-    
-    query = """
-        SELECT language 
-        FROM users 
-        WHERE telegram_id = $1
-    """
-    
-    try:
-        async with pool.acquire() as conn:
-            result = await conn.fetchval(query, telegram_id)
-            return result or "uz"  # Default to 'uz' if no language is set
-    except Exception as e:
-        logger.error(f"Error getting user language: {str(e)}", exc_info=True)
-        return "uz"  # Default to 'uz' on error
+    # Per-update context / identity cache, database only on a cold miss
+    identity = await get_identity(telegram_id, pool)
+    return (identity or {}).get('language') or "uz"  # Default to 'uz' if no language is set
 
 async def get_zayavka_by_id(zayavka_id: int, pool: asyncpg.Pool = None) -> Optional[Dict[str, Any]]:
     """Get detailed information about a zayavka by its ID"""
@@ -220,15 +211,9 @@ class DatabaseManager:
         self.pool = None
 
     async def init_pool(self):
-        import asyncpg
-        from config import config
-        self.pool = await asyncpg.create_pool(
-            host=config.DB_HOST,
-            port=config.DB_PORT,
-            user=config.DB_USER,
-            password=config.DB_PASSWORD,
-            database=config.DB_NAME
-        )
+        """Attach to the process-wide pool (created on first use)"""
+        from database.pool import get_shared_pool
+        self.pool = await get_shared_pool()
 
     def get_pool(self):
         if not self.pool:
@@ -447,8 +432,8 @@ async def get_unresolved_issues(pool: asyncpg.Pool = None) -> List[Dict[str, Any
         return []
 
 # User management functions
-async def get_user_by_telegram_id(telegram_id: int, pool: asyncpg.Pool = None) -> Optional[Dict[str, Any]]:
-    """Get user by telegram ID"""
+async def fetch_user_by_telegram_id(telegram_id: int, pool: asyncpg.Pool = None) -> Optional[Dict[str, Any]]:
+    """Load user by telegram ID straight from the database (raises on errors)"""
     if not pool:
         from loader import bot
         pool = bot.db
@@ -461,10 +446,19 @@ async def get_user_by_telegram_id(telegram_id: int, pool: asyncpg.Pool = None) -
         WHERE telegram_id = $1
     """
     
+    user_lookup_counter.increment()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow(query, telegram_id)
+        return dict(row) if row else None
+
+async def get_user_by_telegram_id(telegram_id: int, pool: asyncpg.Pool = None) -> Optional[Dict[str, Any]]:
+    """Get user by telegram ID (served from the per-update identity context when possible)"""
+    found, user = await lookup_identity_user(telegram_id)
+    if found:
+        return user
+    
     try:
-        async with pool.acquire() as conn:
-            row = await conn.fetchrow(query, telegram_id)
-            return dict(row) if row else None
+        return await fetch_user_by_telegram_id(telegram_id, pool)
     except Exception as e:
         logger.error(f"Error getting user by telegram_id {telegram_id}: {str(e)}")
         return None
@@ -567,6 +561,7 @@ async def update_technician_status(technician_id: int, is_active: bool, pool: as
     try:
         async with pool.acquire() as conn:
             result = await conn.fetchval(query, is_active, technician_id)
+            mark_user_stale(user_id=technician_id, is_active=is_active)
             return result is not None
     except Exception as e:
         logger.error(f"Error updating technician status: {str(e)}", exc_info=True)
@@ -755,7 +750,9 @@ async def update_client_info(client_id: int, update_data: dict, pool: asyncpg.Po
         from loader import bot
         pool = bot.db
 
-    allowed_fields = ['full_name', 'phone_number', 'address', 'language']
+    allowed_fields = ['full_name', 'phone_number', 'phone_e164', 'address', 'language']
+    if 'phone_number' in update_data:
+        update_data = {**update_data, 'phone_e164': normalize_phone_e164(update_data['phone_number'])}
     fields = []
     values = []
     param_count = 1
@@ -781,6 +778,8 @@ async def update_client_info(client_id: int, update_data: dict, pool: asyncpg.Po
     try:
         async with pool.acquire() as conn:
             await conn.execute(query, *values)
+            mark_user_stale(user_id=client_id)
+            client_search.index_user(client_id, update_data.get('full_name'), update_data.get('phone_number'))
             return True
     except Exception as e:
         logger.error(f"Error updating client info for user_id {client_id}: {str(e)}")
@@ -795,14 +794,17 @@ async def create_user(telegram_id: int, full_name: str = None, username: str = N
         pool = bot.db
     
     query = """
-        INSERT INTO users (telegram_id, full_name, username, phone_number, role, language)
-        VALUES ($1, $2, $3, $4, $5, $6)
+        INSERT INTO users (telegram_id, full_name, username, phone_number, phone_e164, role, language)
+        VALUES ($1, $2, $3, $4, $5, $6, $7)
         RETURNING id
     """
     
     try:
         async with pool.acquire() as conn:
-            user_id = await conn.fetchval(query, telegram_id, full_name, username, phone_number, role, language)
+            user_id = await conn.fetchval(query, telegram_id, full_name, username, phone_number,
+                                          normalize_phone_e164(phone_number), role, language)
+            mark_user_stale(telegram_id=telegram_id)
+            client_search.index_user(user_id, full_name or '', phone_number or '', role)
             logger.info(f"Created user {user_id} with telegram_id {telegram_id}")
             return user_id
     except Exception as e:
@@ -824,6 +826,7 @@ async def update_user_language(telegram_id: int, language: str, pool: asyncpg.Po
     try:
         async with pool.acquire() as conn:
             await conn.execute(query, telegram_id, language)
+            mark_user_stale(telegram_id=telegram_id, language=language)
             logger.info(f"Updated language for user {telegram_id} to {language}")
             return True
     except Exception as e:
@@ -845,6 +848,7 @@ async def update_user_full_name(telegram_id: int, full_name: str, pool: asyncpg.
     try:
         async with pool.acquire() as conn:
             await conn.execute(query, telegram_id, full_name)
+            mark_user_stale(telegram_id=telegram_id, full_name=full_name)
             logger.info(f"Updated full name for user {telegram_id} to {full_name}")
             return True
     except Exception as e:
@@ -859,13 +863,14 @@ async def update_user_phone(telegram_id: int, phone_number: str, pool: asyncpg.P
     
     query = """
         UPDATE users 
-        SET phone_number = $2, updated_at = CURRENT_TIMESTAMP
+        SET phone_number = $2, phone_e164 = $3, updated_at = CURRENT_TIMESTAMP
         WHERE telegram_id = $1
     """
     
     try:
         async with pool.acquire() as conn:
-            await conn.execute(query, telegram_id, phone_number)
+            await conn.execute(query, telegram_id, phone_number, normalize_phone_e164(phone_number))
+            mark_user_stale(telegram_id=telegram_id)
             logger.info(f"Updated phone for user {telegram_id} to {phone_number}")
             return True
     except Exception as e:
@@ -887,6 +892,7 @@ async def update_user_address(telegram_id: int, address: str, pool: asyncpg.Pool
     try:
         async with pool.acquire() as conn:
             await conn.execute(query, telegram_id, address)
+            mark_user_stale(telegram_id=telegram_id)
             logger.info(f"Updated address for user {telegram_id} to {address}")
             return True
     except Exception as e:
@@ -1094,57 +1100,67 @@ async def update_material_quantity(material_id: int, quantity: int, updated_by:
         return False
 
 # Statistics functions
-async def get_user_statistics(pool: asyncpg.Pool = None) -> Dict[str, Any]:
-    """Get user statistics"""
+# Statistics screens are opened by many managers at once: loads are coalesced
+# and served stale for a while during a background refresh. Failures are not cached.
+@cached(ttl=60, stale_ttl=300, key_func=lambda pool=None: statistics_cache_key("users"))
+async def _load_user_statistics(pool: asyncpg.Pool = None) -> Dict[str, Any]:
     if not pool:
         from loader import bot
         pool = bot.db
     
+    async with pool.acquire() as conn:
+        total_users = await conn.fetchval("SELECT COUNT(*) FROM users WHERE is_active = true")
+        
+        role_stats = await conn.fetch("""
+            SELECT role, COUNT(*) as count 
+            FROM users 
+            WHERE is_active = true 
+            GROUP BY role
+        """)
+        
+        return {
+            'total_users': total_users,
+            'role_distribution': {row['role']: row['count'] for row in role_stats}
+        }
+
+async def get_user_statistics(pool: asyncpg.Pool = None) -> Dict[str, Any]:
+    """Get user statistics"""
     try:
-        async with pool.acquire() as conn:
-            total_users = await conn.fetchval("SELECT COUNT(*) FROM users WHERE is_active = true")
-            
-            role_stats = await conn.fetch("""
-                SELECT role, COUNT(*) as count 
-                FROM users 
-                WHERE is_active = true 
-                GROUP BY role
-            """)
-            
-            return {
-                'total_users': total_users,
-                'role_distribution': {row['role']: row['count'] for row in role_stats}
-            }
+        return await _load_user_statistics(pool)
     except Exception as e:
         logger.error(f"Error getting user statistics: {str(e)}")
         return {'total_users': 0, 'role_distribution': {}}
 
-async def get_zayavka_statistics(pool: asyncpg.Pool = None) -> Dict[str, Any]:
-    """Get zayavka statistics"""
+@cached(ttl=60, stale_ttl=300, key_func=lambda pool=None: statistics_cache_key("zayavkas"))
+async def _load_zayavka_statistics(pool: asyncpg.Pool = None) -> Dict[str, Any]:
     if not pool:
         from loader import bot
         pool = bot.db
     
+    async with pool.acquire() as conn:
+        total_zayavkas = await conn.fetchval("SELECT COUNT(*) FROM zayavki")
+        
+        status_stats = await conn.fetch("""
+            SELECT status, COUNT(*) as count 
+            FROM zayavki 
+            GROUP BY status
+        """)
+        
+        today_zayavkas = await conn.fetchval("""
+            SELECT COUNT(*) FROM zayavki 
+            WHERE DATE(created_at) = CURRENT_DATE
+        """)
+        
+        return {
+            'total_zayavkas': total_zayavkas,
+            'today_zayavkas': today_zayavkas,
+            'status_distribution': {row['status']: row['count'] for row in status_stats}
+        }
+
+async def get_zayavka_statistics(pool: asyncpg.Pool = None) -> Dict[str, Any]:
+    """Get zayavka statistics"""
     try:
-        async with pool.acquire() as conn:
-            total_zayavkas = await conn.fetchval("SELECT COUNT(*) FROM zayavki")
-            
-            status_stats = await conn.fetch("""
-                SELECT status, COUNT(*) as count 
-                FROM zayavki 
-                GROUP BY status
-            """)
-            
-            today_zayavkas = await conn.fetchval("""
-                SELECT COUNT(*) FROM zayavki 
-                WHERE DATE(created_at) = CURRENT_DATE
-            """)
-            
-            return {
-                'total_zayavkas': total_zayavkas,
-                'today_zayavkas': today_zayavkas,
-                'status_distribution': {row['status']: row['count'] for row in status_stats}
-            }
+        return await _load_zayavka_statistics(pool)
     except Exception as e:
         logger.error(f"Error getting zayavka statistics: {str(e)}")
         return {'total_zayavkas': 0, 'today_zayavkas': 0, 'status_distribution': {}}
@@ -1544,22 +1560,22 @@ async def get_users_by_role(role: str, pool: asyncpg.Pool = None) -> List[Dict[s
         return []
 
 async def get_materials_with_low_stock(pool: asyncpg.Pool = None) -> List[Dict[str, Any]]:
-    """Get materials with low stock levels"""
+    """Get materials with low stock levels from the maintained low-stock set"""
     if not pool:
         from loader import bot
         pool = bot.db
     
-    query = """
-        SELECT id, name, category, quantity_in_stock, min_quantity, unit, location
-        FROM materials 
-        WHERE is_active = true AND quantity_in_stock <= min_quantity
-        ORDER BY (quantity_in_stock::float / NULLIF(min_quantity, 0)::float) ASC
-    """
-    
     try:
         async with pool.acquire() as conn:
-            rows = await conn.fetch(query)
-            return [dict(row) for row in rows]
+            rows = await stock_alerts.low_stock(conn)
+            return [
+                {
+                    'id': row['id'], 'name': row['name'], 'category': row['category'],
+                    'quantity_in_stock': row['quantity'], 'min_quantity': row['min_quantity'],
+                    'unit': row['unit'], 'location': row.get('location')
+                }
+                for row in rows
+            ]
     except Exception as e:
         logger.error(f"Error getting materials with low stock: {e}", exc_info=True)
         return []
@@ -5,6 +5,9 @@ import json
 import logging
 from config import config
 from loader import bot
+from utils.identity_context import mark_user_stale
+from utils.validators import normalize_phone_e164
+from database import client_search
 
 logger = logging.getLogger(__name__)
 
@@ -145,14 +148,7 @@ async def search_customers(query: str) -> List[Dict]:
     """Search customers by name, phone or abonent_id"""
     conn = await bot.db.acquire()
     try:
-        search_query = """
-        SELECT * FROM users
-        WHERE (full_name ILIKE $1 OR phone_number ILIKE $1) 
-        AND role = 'client'
-        LIMIT 10
-        """
-        results = await conn.fetch(search_query, f"%{query}%")
-        return [dict(row) for row in results]
+        return await client_search.search_users(conn, query, role='client')
     except Exception as e:
         logging.error(f"Error searching clients: {e}")
         return []
@@ -177,8 +173,8 @@ async def create_client(client_data: Dict) -> Optional[int]:
     conn = await bot.db.acquire()
     try:
         query = """
-        INSERT INTO users (telegram_id, full_name, phone_number, address, role, language, is_active)
-        VALUES ($1, $2, $3, $4, 'client', $5, true)
+        INSERT INTO users (telegram_id, full_name, phone_number, phone_e164, address, role, language, is_active)
+        VALUES ($1, $2, $3, $6, $4, 'client', $5, true)
         RETURNING id
         """
         result = await conn.fetchrow(
@@ -187,8 +183,11 @@ async def create_client(client_data: Dict) -> Optional[int]:
             client_data['full_name'],
             client_data['phone_number'],
             client_data.get('address', ''),
-            client_data.get('language', 'uz')
+            client_data.get('language', 'uz'),
+            normalize_phone_e164(client_data['phone_number'])
         )
+        if result:
+            client_search.index_user(result['id'], client_data['full_name'], client_data['phone_number'], 'client')
         return result['id'] if result else None
     except Exception as e:
         logging.error(f"Error creating client: {e}")
@@ -338,15 +337,9 @@ async def search_clients(query: str) -> List[Dict]:
     async with pool.acquire() as conn:
         try:
             # Parse query
-            if query.startswith('name:'):
-                search_term = query[5:]
-                query = "SELECT * FROM users WHERE role = 'client' AND full_name ILIKE $1"
-                results = await conn.fetch(query, f"%{search_term}%")
-            elif query.startswith('phone:'):
-                search_term = query[6:]
-                # Handle phone number as string and allow partial matches
-                query = "SELECT * FROM users WHERE role = 'client' AND phone_number = $1"
-                results = await conn.fetch(query, search_term)
+            if query.startswith('name:') or query.startswith('phone:'):
+                # Ranked phone (exact, then prefix) or trigram name lookup
+                return await client_search.search_users(conn, query.split(':', 1)[1], role='client')
             elif query.startswith('id:'):
                 try:
                     client_id = int(query[3:])
@@ -625,9 +618,11 @@ async def update_client_info(client_id: int, update_data: Dict) -> bool:
         fields = []
         values = []
         param_count = 1
+        if 'phone_number' in update_data:
+            update_data = {**update_data, 'phone_e164': normalize_phone_e164(update_data['phone_number'])}
         
         for field, value in update_data.items():
-            if field in ['full_name', 'phone_number', 'address', 'language']:
+            if field in ['full_name', 'phone_number', 'phone_e164', 'address', 'language']:
                 fields.append(f"{field} = ${param_count}")
                 values.append(value)
                 param_count += 1
@@ -643,6 +638,8 @@ async def update_client_info(client_id: int, update_data: Dict) -> bool:
         values.append(client_id)
         
         await conn.execute(query, *values)
+        mark_user_stale(user_id=client_id)
+        client_search.index_user(client_id, update_data.get('full_name'), update_data.get('phone_number'))
         return True
     except Exception as e:
         logging.error(f"Error updating client info: {e}")
@@ -10,6 +10,9 @@ import asyncpg
 
 from loader import bot
 from database.models import User, ServiceRequest
+from database import client_search
+from utils.identity_context import mark_user_stale
+from utils.validators import normalize_phone_e164
 
 logger = logging.getLogger(__name__)
 
@@ -101,29 +104,8 @@ async def search_clients_by_phone(phone: str, exact_match: bool = True) -> List[
     """
     try:
         async with bot.db.acquire() as conn:
-            if exact_match:
-                query = """
-                    SELECT id, telegram_id, full_name, phone_number, role, language,
-                           is_active, address, created_at, updated_at, last_activity
-                    FROM users 
-                    WHERE phone_number = $1 OR phone_number = $2
-                    ORDER BY created_at DESC
-                """
-                # Try both with and without + prefix
-                phone_variants = [phone, phone.lstrip('+') if phone.startswith('+') else '+' + phone]
-                results = await conn.fetch(query, phone_variants[0], phone_variants[1])
-            else:
-                query = """
-                    SELECT id, telegram_id, full_name, phone_number, role, language,
-                           is_active, address, created_at, updated_at, last_activity
-                    FROM users 
-                    WHERE phone_number ILIKE $1
-                    ORDER BY created_at DESC
-                    LIMIT 10
-                """
-                results = await conn.fetch(query, f"%{phone}%")
-            
-            return [dict(row) for row in results]
+            # Canonical E.164 match, optionally widened to numbers starting with phone
+            return await client_search.search_users(conn, phone, role=None, phone_prefix=not exact_match)
             
     except Exception as e:
         logger.error(f"Error searching clients by phone: {e}")
@@ -143,23 +125,8 @@ async def search_clients_by_name(name: str, limit: int = 10) -> List[Dict[str, A
     """
     try:
         async with bot.db.acquire() as conn:
-            query = """
-                SELECT id, telegram_id, full_name, phone_number, role, language,
-                       is_active, address, created_at, updated_at, last_activity
-                FROM users 
-                WHERE full_name ILIKE $1
-                ORDER BY 
-                    CASE WHEN full_name ILIKE $2 THEN 1 ELSE 2 END,
-                    created_at DESC
-                LIMIT $3
-            """
-            
-            # Search patterns: exact match gets priority, then partial
-            exact_pattern = name
-            partial_pattern = f"%{name}%"
-            
-            results = await conn.fetch(query, partial_pattern, exact_pattern, limit)
-            return [dict(row) for row in results]
+            # Trigram similarity, best match first
+            return await client_search.search_users(conn, name, role=None, limit=limit)
             
     except Exception as e:
         logger.error(f"Error searching clients by name: {e}")
@@ -208,9 +175,9 @@ async def create_new_client(client_data: Dict[str, Any]) -> Optional[int]:
             query = """
                 INSERT INTO users (
                     full_name, phone_number, role, language, 
-                    is_active, address, created_at, updated_at
+                    is_active, address, created_at, updated_at, phone_e164
                 ) VALUES (
-                    $1, $2, $3, $4, $5, $6, $7, $7
+                    $1, $2, $3, $4, $5, $6, $7, $7, $8
                 ) RETURNING id
             """
             
@@ -223,9 +190,12 @@ async def create_new_client(client_data: Dict[str, Any]) -> Optional[int]:
                 client_data.get('language', 'uz'),
                 client_data.get('is_active', True),
                 client_data.get('address'),
-                now
+                now,
+                normalize_phone_e164(client_data.get('phone_number'))
             )
             
+            client_search.index_user(client_id, client_data.get('full_name') or '',
+                                     client_data.get('phone_number') or '', client_data.get('role', 'client'))
             logger.info(f"Created new client with ID: {client_id}")
             return client_id
             
@@ -254,9 +224,11 @@ async def update_client_info(client_id: int, update_data: Dict[str, Any]) -> boo
             set_clauses = []
             params = []
             param_count = 0
+            if 'phone_number' in update_data:
+                update_data = {**update_data, 'phone_e164': normalize_phone_e164(update_data['phone_number'])}
             
             for field, value in update_data.items():
-                if field in ['full_name', 'phone_number', 'language', 'address', 'is_active']:
+                if field in ['full_name', 'phone_number', 'phone_e164', 'language', 'address', 'is_active']:
                     param_count += 1
                     set_clauses.append(f"{field} = ${param_count}")
                     params.append(value)
@@ -280,6 +252,8 @@ async def update_client_info(client_id: int, update_data: Dict[str, Any]) -> boo
             """
             
             result = await conn.execute(query, *params)
+            mark_user_stale(user_id=client_id)
+            client_search.index_user(client_id, update_data.get('full_name'), update_data.get('phone_number'))
             
             # Check if any rows were updated
             rows_affected = int(result.split()[-1])
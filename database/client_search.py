@@ -0,0 +1,187 @@
+"""
+Ranked client lookup over ``users`` (migration 025).
+
+Every client search path goes through ``search_users``: a term is matched
+as a phone number against ``phone_e164`` (exact, then prefix) and as a
+name against ``full_name`` by trigram similarity. Each branch is an index
+scan (``idx_users_phone_e164``, ``idx_users_full_name_trgm``), so a lookup
+no longer reads the whole table.
+
+``phone_e164`` is ``utils.validators.normalize_phone_e164(phone_number)``;
+writers store both columns and ``backfill_phone_e164`` fills rows written
+before the column existed (or by a writer that does not set it).
+
+With ``CLIENT_INDEX_ENABLED`` the ranking comes from the in-process index
+in ``utils.client_index`` once it is built, and only the ranked rows are
+read here.
+
+``conn`` is anything with asyncpg's ``fetch``/``execute``.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.validators import normalize_phone_e164
+
+# match_rank values, best first
+EXACT_PHONE = 0
+PHONE_PREFIX = 1
+NAME_SIMILARITY = 2
+
+# Fewer digits than this are not looked up as a phone number prefix
+MIN_PHONE_PREFIX_DIGITS = 3
+
+# $1 exact E.164, [$2, $3) prefix range, $4 name, $5 name ILIKE pattern,
+# $6 role (NULL for any), $7 limit. Absent keys are NULL and match nothing.
+SEARCH_QUERY = """
+WITH matches AS (
+    (SELECT id, 0 AS rank, 1.0::real AS score
+     FROM users
+     WHERE phone_e164 = $1 AND ($6::text IS NULL OR role = $6))
+    UNION ALL
+    (SELECT id, 1, 1.0::real
+     FROM users
+     WHERE phone_e164 ~>=~ $2 AND phone_e164 ~<~ $3 AND ($6::text IS NULL OR role = $6)
+     ORDER BY phone_e164
+     LIMIT $7)
+    UNION ALL
+    (SELECT id, 2, similarity(full_name, $4)
+     FROM users
+     WHERE (full_name % $4 OR full_name ILIKE $5) AND ($6::text IS NULL OR role = $6)
+     ORDER BY 3 DESC
+     LIMIT $7)
+)
+SELECT u.*, m.rank AS match_rank, m.score AS match_score
+FROM (
+    SELECT DISTINCT ON (id) id, rank, score
+    FROM matches
+    ORDER BY id, rank, score DESC
+) m
+JOIN users u ON u.id = m.id
+ORDER BY m.rank, m.score DESC, u.created_at DESC
+LIMIT $7
+"""
+
+USERS_BY_ID_QUERY = """
+SELECT * FROM users WHERE id = ANY($1::bigint[])
+"""
+
+PENDING_PHONES_QUERY = """
+SELECT id, phone_number
+FROM users
+WHERE phone_e164 IS NULL AND phone_number IS NOT NULL AND id > $1
+ORDER BY id
+LIMIT $2
+"""
+
+SET_PHONES_QUERY = """
+UPDATE users u
+SET phone_e164 = v.phone_e164
+FROM unnest($1::bigint[], $2::text[]) AS v(id, phone_e164)
+WHERE u.id = v.id
+"""
+
+
+def _client_index():
+    # Imported late: the index module builds on this one
+    from utils.client_index import client_index
+    return client_index
+
+
+def index_user(user_id: int, full_name: Optional[str] = None, phone_number: Optional[str] = None,
+               role: Optional[str] = None) -> None:
+    """Tell the in-process search index about a created or changed user (None keeps a field)"""
+    _client_index().upsert(user_id, full_name, phone_number, role)
+
+
+def phone_prefix_range(term: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    [low, high) range of phone_e164 values starting with the typed digits.
+
+    Digits without a country code are taken as an Uzbek number, like
+    normalize_phone_e164. Returns (None, None) for too few digits.
+    """
+    digits = re.sub(r'\D', '', term)
+    if len(digits) < MIN_PHONE_PREFIX_DIGITS:
+        return None, None
+    if not term.lstrip().startswith('+') and not digits.startswith('998'):
+        digits = '998' + digits
+    low = '+' + digits[:15]
+    return low, low[:-1] + chr(ord(low[-1]) + 1)
+
+
+def search_keys(term: str, phone_prefix: bool = True) -> Tuple[Optional[str], Optional[str], Optional[str],
+                                                                 Optional[str], Optional[str]]:
+    """Exact phone, prefix range, name and ILIKE pattern SEARCH_QUERY looks a term up by"""
+    term = (term or '').strip()
+    if not term:
+        return None, None, None, None, None
+
+    if not any(char.isalpha() for char in term):
+        low, high = phone_prefix_range(term) if phone_prefix else (None, None)
+        return normalize_phone_e164(term), low, high, None, None
+
+    if len(term) < 2:
+        return None, None, None, None, None
+    pattern = '%' + re.sub(r'([\\%_])', r'\\\1', term) + '%'
+    return None, None, None, term, pattern
+
+
+async def search_users(conn, term: str, role: Optional[str] = 'client', limit: int = 10,
+                       phone_prefix: bool = True) -> List[Dict[str, Any]]:
+    """
+    Users matching term, best match first.
+
+    A term without letters is a phone number (exact match, plus numbers
+    starting with it unless phone_prefix is False), anything else a name.
+    Rows are the users columns plus match_rank (EXACT_PHONE, PHONE_PREFIX or
+    NAME_SIMILARITY) and match_score (trigram similarity for names).
+    """
+    ranked = _client_index().search(term, role, limit, phone_prefix)
+    if ranked is not None:
+        return await fetch_ranked_users(conn, ranked)
+
+    keys = search_keys(term, phone_prefix)
+    if not any(keys):
+        return []
+    rows = await conn.fetch(SEARCH_QUERY, *keys, role, limit)
+    return [dict(row) for row in rows]
+
+
+async def fetch_ranked_users(conn, ranked: List[Tuple[int, int, float]]) -> List[Dict[str, Any]]:
+    """users rows for (id, match_rank, match_score) triples, in that order; ids no longer present are skipped"""
+    if not ranked:
+        return []
+    rows = {row['id']: row for row in await conn.fetch(USERS_BY_ID_QUERY, [user_id for user_id, _, _ in ranked])}
+    return [dict(rows[user_id], match_rank=rank, match_score=score)
+            for user_id, rank, score in ranked if user_id in rows]
+
+
+async def backfill_phone_e164(conn, batch_size: int = 1000) -> int:
+    """Fill phone_e164 of rows that have none; returns the number of rows set"""
+    filled = 0
+    last_id = 0
+    while True:
+        rows = await conn.fetch(PENDING_PHONES_QUERY, last_id, batch_size)
+        if not rows:
+            return filled
+        last_id = rows[-1]['id']
+        pairs = [(row['id'], normalize_phone_e164(row['phone_number'])) for row in rows]
+        pairs = [(user_id, phone) for user_id, phone in pairs if phone]
+        if pairs:
+            ids, phones = zip(*pairs)
+            await conn.execute(SET_PHONES_QUERY, list(ids), list(phones))
+            filled += len(pairs)
+
+
+__all__ = [
+    'EXACT_PHONE',
+    'PHONE_PREFIX',
+    'NAME_SIMILARITY',
+    'search_users',
+    'fetch_ranked_users',
+    'index_user',
+    'search_keys',
+    'phone_prefix_range',
+    'backfill_phone_e164',
+]
@@ -4,7 +4,8 @@ Database queries for inbox system
 
 import asyncpg
 from typing import List, Dict, Any, Optional, Tuple
-from datetime import datetime
+from datetime import datetime, timedelta
+from database import role_inbox
 from database.inbox_models import (
     InboxMessage, ApplicationTransfer, InboxRole, ApplicationType,
     MessageType, MessagePriority
@@ -54,7 +55,7 @@ class InboxQueries:
             
             query = """
                 UPDATE service_requests 
-                SET role_current = $1, updated_at = CURRENT_TIMESTAMP
+                SET role_current = $1, updated_at = CURRENT_TIMESTAMP, version = version + 1
                 WHERE id = $2
             """
             
@@ -254,29 +255,19 @@ class InboxQueries:
             pool = bot.db
         
         try:
-            query = """
-                INSERT INTO inbox_messages (
-                    application_id, application_type, assigned_role, message_type,
-                    title, description, priority, is_read, created_at
-                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
-                RETURNING id
-            """
-            
             async with pool.acquire() as conn:
-                row = await conn.fetchrow(
-                    query,
+                return await role_inbox.create_message(
+                    conn,
                     message.application_id,
                     message.application_type,
                     message.assigned_role,
-                    message.message_type,
                     message.title,
                     message.description,
+                    message.message_type,
                     message.priority,
                     message.is_read,
                     message.created_at or datetime.now()
                 )
-                
-                return row['id'] if row else None
             
         except Exception as e:
             print(f"Error creating inbox message: {e}")
@@ -290,15 +281,8 @@ class InboxQueries:
             pool = bot.db
         
         try:
-            query = """
-                UPDATE inbox_messages 
-                SET is_read = true, updated_at = CURRENT_TIMESTAMP
-                WHERE id = $1
-            """
-            
             async with pool.acquire() as conn:
-                result = await conn.execute(query, message_id)
-                return result == "UPDATE 1"
+                return await role_inbox.mark_message_read(conn, message_id) is not None
             
         except Exception as e:
             print(f"Error marking message as read: {e}")
@@ -334,7 +318,7 @@ class InboxQueries:
                     elif application_type == ApplicationType.SERVICE_REQUEST.value:
                         update_query = """
                             UPDATE service_requests 
-                            SET role_current = $1, updated_at = CURRENT_TIMESTAMP
+                            SET role_current = $1, updated_at = CURRENT_TIMESTAMP, version = version + 1
                             WHERE id = $2
                         """
                     else:
@@ -372,6 +356,7 @@ class InboxQueries:
                     """
                     
                     await conn.execute(message_update_query, to_role, application_id, application_type)
+                    await role_inbox.rebuild_application(conn, application_id, application_type)
                 
                     # Create transfer notification message
                     transfer_message = InboxMessage(
@@ -385,21 +370,14 @@ class InboxQueries:
                         created_at=datetime.now()
                     )
                     
-                    notification_query = """
-                        INSERT INTO inbox_messages (
-                            application_id, application_type, assigned_role, message_type,
-                            title, description, priority, is_read, created_at
-                        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
-                    """
-                    
-                    await conn.execute(
-                        notification_query,
+                    await role_inbox.create_message(
+                        conn,
                         transfer_message.application_id,
                         transfer_message.application_type,
                         transfer_message.assigned_role,
-                        transfer_message.message_type,
                         transfer_message.title,
                         transfer_message.description,
+                        transfer_message.message_type,
                         transfer_message.priority,
                         transfer_message.is_read,
                         transfer_message.created_at
@@ -542,18 +520,10 @@ class InboxQueries:
             pool = bot.db
         
         try:
-            query = """
-                DELETE FROM inbox_messages 
-                WHERE is_read = true 
-                AND created_at < CURRENT_TIMESTAMP - INTERVAL '%s days'
-            """
-            
             async with pool.acquire() as conn:
-                result = await conn.execute(query % days_old)
-                
-                # Extract number of deleted rows from result string like "DELETE 5"
-                deleted_count = int(result.split()[-1]) if result.startswith("DELETE") else 0
-                return deleted_count
+                return await role_inbox.delete_read_messages(
+                    conn, datetime.now() - timedelta(days=days_old), age_column='created_at'
+                )
             
         except Exception as e:
             print(f"Error cleaning up old messages: {e}")
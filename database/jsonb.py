@@ -0,0 +1,139 @@
+"""
+JSON/JSONB conversion shared by the connection init hook and row readers.
+
+The pool registers ``encode_jsonb``/``decode_jsonb`` as the json and jsonb
+type codecs on every connection, so those columns arrive as Python objects
+and parameters may be passed either as objects or as already-serialised
+JSON text (the style most queries still use).
+
+orjson is used when it is installed (``DB_JSON_LIBRARY=auto``), otherwise
+the standard library ``json`` module.
+
+``LazyJSONAttribute`` keeps a column as JSON text until it is first read,
+for listings that load many rows but only show summary fields.
+"""
+
+import json
+from typing import Any, Callable
+
+from config import config
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+
+def _use_orjson() -> bool:
+    library = config.DB_JSON_LIBRARY
+    if library == 'json':
+        return False
+    if library == 'orjson' and orjson is None:
+        raise ImportError("DB_JSON_LIBRARY=orjson but orjson is not installed")
+    return orjson is not None
+
+
+JSON_LIBRARY = 'orjson' if _use_orjson() else 'json'
+
+
+def _json_dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+if JSON_LIBRARY == 'orjson':
+    def dumps(value: Any) -> str:
+        """Serialise a value to JSON text"""
+        try:
+            return orjson.dumps(value, default=str, option=_ORJSON_OPTIONS).decode()
+        except TypeError:
+            # e.g. integers beyond 64 bits, which the json module handles
+            return _json_dumps(value)
+
+    def loads(text) -> Any:
+        """Parse JSON text"""
+        return orjson.loads(text)
+else:
+    dumps = _json_dumps
+
+    def loads(text) -> Any:
+        """Parse JSON text"""
+        return json.loads(text)
+
+
+def encode_jsonb(value: Any) -> str:
+    """json/jsonb codec encoder: JSON text passes through, objects are serialised"""
+    if isinstance(value, str):
+        return value
+    return dumps(value)
+
+
+def decode_jsonb(text: str) -> Any:
+    """json/jsonb codec decoder"""
+    return loads(text)
+
+
+def load_json(value: Any, default: Any = None) -> Any:
+    """
+    Read a json/jsonb value that may already be decoded by the codec.
+
+    Returns ``default`` for NULL/empty values and for text that is not JSON.
+    """
+    if value is None or value == '':
+        return default
+    if isinstance(value, (str, bytes, bytearray)):
+        try:
+            return loads(value)
+        except ValueError:
+            return default
+    return value
+
+
+class LazyJSONAttribute:
+    """
+    Attribute that stores assigned JSON text and decodes it on first read.
+
+    Assigning anything other than ``str``/``bytes`` stores the value as is.
+    NULL or invalid JSON reads as ``default_factory()``.
+    """
+
+    def __init__(self, default_factory: Callable[[], Any] = dict):
+        self.default_factory = default_factory
+        self.name = None
+
+    def __set_name__(self, owner, name: str):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        state = instance.__dict__
+        try:
+            return state[self.name]
+        except KeyError:
+            pass
+        value = load_json(state.pop(f'_{self.name}_json', None), None)
+        if value is None:
+            value = self.default_factory()
+        state[self.name] = value
+        return value
+
+    def __set__(self, instance, value):
+        state = instance.__dict__
+        if value is None or isinstance(value, (str, bytes, bytearray)):
+            state.pop(self.name, None)
+            state[f'_{self.name}_json'] = value
+        else:
+            state.pop(f'_{self.name}_json', None)
+            state[self.name] = value
+
+    def is_loaded(self, instance) -> bool:
+        """Whether the value has been decoded (or was assigned decoded)"""
+        return self.name in instance.__dict__
+
+
+__all__ = [
+    'JSON_LIBRARY', 'dumps', 'loads', 'encode_jsonb', 'decode_jsonb', 'load_json',
+    'LazyJSONAttribute'
+]
@@ -0,0 +1,32 @@
+-- 020_service_requests_keyset_pagination.sql
+-- Keyset pagination of role request lists on (priority rank, created_at, id)
+
+-- 1. Numeric priority rank, so 'urgent' sorts before 'high' instead of alphabetically
+ALTER TABLE service_requests
+ADD COLUMN IF NOT EXISTS priority_rank SMALLINT GENERATED ALWAYS AS (
+    CASE priority
+        WHEN 'urgent' THEN 4
+        WHEN 'high' THEN 3
+        WHEN 'medium' THEN 2
+        WHEN 'low' THEN 1
+        ELSE 0
+    END
+) STORED;
+
+-- 2. created_at is part of the cursor: a NULL would make rows unreachable
+UPDATE service_requests
+SET created_at = COALESCE(updated_at, CURRENT_TIMESTAMP)
+WHERE created_at IS NULL;
+
+ALTER TABLE service_requests ALTER COLUMN created_at SET NOT NULL;
+
+-- 3. Composite indexes matching ORDER BY priority_rank DESC, created_at DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_service_requests_role_keyset
+ON service_requests(role_current, priority_rank DESC, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_service_requests_role_status_keyset
+ON service_requests(role_current, current_status, priority_rank DESC, created_at DESC, id DESC);
+
+COMMENT ON COLUMN service_requests.priority_rank IS 'Sort rank of priority: urgent=4, high=3, medium=2, low=1';
+COMMENT ON INDEX idx_service_requests_role_keyset IS 'Keyset pagination of requests by role';
+COMMENT ON INDEX idx_service_requests_role_status_keyset IS 'Keyset pagination of requests by role and status';
@@ -0,0 +1,49 @@
+-- 021_notification_outbox.sql
+-- Turn notification_queue into a durable outbox of rendered Telegram messages
+
+-- 1. Delivery state of each queued message
+ALTER TABLE notification_queue
+    ADD COLUMN IF NOT EXISTS chat_id BIGINT,
+    ADD COLUMN IF NOT EXISTS request_id VARCHAR(36),
+    ADD COLUMN IF NOT EXISTS reply_markup JSONB,
+    ADD COLUMN IF NOT EXISTS parse_mode VARCHAR(20) DEFAULT 'HTML',
+    ADD COLUMN IF NOT EXISTS status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS max_attempts INTEGER NOT NULL DEFAULT 5,
+    ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS locked_until TIMESTAMP WITH TIME ZONE,
+    ADD COLUMN IF NOT EXISTS last_error TEXT,
+    ADD COLUMN IF NOT EXISTS sent_at TIMESTAMP WITH TIME ZONE,
+    ADD COLUMN IF NOT EXISTS message_id BIGINT;
+
+DO $$
+BEGIN
+    ALTER TABLE notification_queue
+        ADD CONSTRAINT notification_queue_status_check
+        CHECK (status IN ('pending', 'sending', 'sent', 'failed'));
+EXCEPTION WHEN duplicate_object THEN NULL;
+END $$;
+
+-- 2. Existing rows: resolve the chat and carry over the old sent flag
+UPDATE notification_queue q
+SET chat_id = u.telegram_id
+FROM users u
+WHERE q.user_id = u.id AND q.chat_id IS NULL;
+
+UPDATE notification_queue SET status = 'sent' WHERE sent = TRUE AND status = 'pending';
+UPDATE notification_queue SET status = 'failed', last_error = 'No Telegram chat'
+WHERE status = 'pending' AND chat_id IS NULL;
+
+-- 3. Claiming due rows (FOR UPDATE SKIP LOCKED) and reclaiming expired leases
+CREATE INDEX IF NOT EXISTS idx_notification_queue_due
+ON notification_queue(next_attempt_at, id) WHERE status = 'pending';
+
+CREATE INDEX IF NOT EXISTS idx_notification_queue_leased
+ON notification_queue(locked_until) WHERE status = 'sending';
+
+-- 4. Due role-level retries in notification_retry_queue
+CREATE INDEX IF NOT EXISTS idx_notification_retry_queue_due
+ON notification_retry_queue(next_retry_at) WHERE status = 'pending';
+
+COMMENT ON COLUMN notification_queue.status IS 'pending -> sending (leased by a worker) -> sent | failed';
+COMMENT ON COLUMN notification_queue.locked_until IS 'Lease of the worker sending the row; expired leases are reclaimed';
@@ -0,0 +1,7 @@
+-- 022_service_requests_version.sql
+-- Optimistic concurrency for workflow transitions
+
+-- Every write to a request bumps its version; a transition only applies
+-- when the version it read is still current (UPDATE ... WHERE id = $1 AND version = $2)
+ALTER TABLE service_requests
+    ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,128 @@
+-- 023_role_inbox.sql
+-- Materialised per-role inbox with counters maintained on write
+
+-- 1. One row per application per role, written in the same transaction as
+--    the inbox_messages change that produced it
+CREATE TABLE IF NOT EXISTS role_inbox (
+    assigned_role VARCHAR(50) NOT NULL CHECK (assigned_role IN (
+        'manager', 'junior_manager', 'technician', 'warehouse',
+        'call_center', 'call_center_supervisor', 'controller'
+    )),
+    application_type VARCHAR(50) NOT NULL CHECK (application_type IN ('zayavka', 'service_request')),
+    application_id VARCHAR(255) NOT NULL,
+    priority VARCHAR(20) NOT NULL DEFAULT 'medium' CHECK (priority IN ('low', 'medium', 'high', 'urgent')),
+    is_read BOOLEAN NOT NULL DEFAULT FALSE,
+    title VARCHAR(255),
+    application_details JSONB,
+    last_message_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (assigned_role, application_type, application_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_role_inbox_listing
+ON role_inbox(assigned_role, last_message_at DESC, application_id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_role_inbox_unread_listing
+ON role_inbox(assigned_role, last_message_at DESC, application_id DESC) WHERE NOT is_read;
+
+CREATE INDEX IF NOT EXISTS idx_role_inbox_application
+ON role_inbox(application_id, application_type);
+
+-- 2. Badge counters per (role, application type, priority); any filter
+--    combination of the inbox screen is a sum over at most 8 rows
+CREATE TABLE IF NOT EXISTS role_inbox_counters (
+    assigned_role VARCHAR(50) NOT NULL,
+    application_type VARCHAR(50) NOT NULL,
+    priority VARCHAR(20) NOT NULL,
+    total_count INTEGER NOT NULL DEFAULT 0,
+    unread_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (assigned_role, application_type, priority)
+);
+
+-- 3. Backfill from existing messages (latest message wins for priority and title)
+INSERT INTO role_inbox (
+    assigned_role, application_type, application_id, priority, is_read,
+    title, last_message_at, updated_at
+)
+SELECT DISTINCT ON (assigned_role, application_type, application_id)
+    assigned_role, application_type, application_id, COALESCE(priority, 'medium'),
+    NOT bool_or(NOT COALESCE(is_read, FALSE)) OVER w,
+    title, COALESCE(created_at, CURRENT_TIMESTAMP), COALESCE(updated_at, CURRENT_TIMESTAMP)
+FROM inbox_messages
+WINDOW w AS (PARTITION BY assigned_role, application_type, application_id)
+ORDER BY assigned_role, application_type, application_id, created_at DESC, id DESC
+ON CONFLICT DO NOTHING;
+
+UPDATE role_inbox ri
+SET application_details = CASE ri.application_type
+    WHEN 'zayavka' THEN (
+        SELECT jsonb_build_object(
+            'id', z.id, 'description', z.description, 'address', z.address, 'phone', z.phone,
+            'status', z.status, 'app_priority', z.priority,
+            'created_at', z.created_at, 'updated_at', z.updated_at,
+            'client_name', u.full_name, 'client_phone', u.phone_number, 'client_language', u.language
+        )
+        FROM zayavki z LEFT JOIN users u ON z.user_id = u.id
+        WHERE z.id = ri.application_id::integer
+    )
+    ELSE (
+        SELECT jsonb_build_object(
+            'id', sr.id, 'workflow_type', sr.workflow_type, 'current_status', sr.current_status,
+            'app_priority', sr.priority, 'description', sr.description, 'location', sr.location,
+            'contact_info', sr.contact_info, 'created_at', sr.created_at, 'updated_at', sr.updated_at,
+            'client_name', u.full_name, 'client_phone', u.phone_number, 'client_language', u.language
+        )
+        FROM service_requests sr LEFT JOIN users u ON sr.client_id = u.id
+        WHERE sr.id = ri.application_id
+    )
+END
+WHERE ri.application_details IS NULL;
+
+INSERT INTO role_inbox_counters (assigned_role, application_type, priority, total_count, unread_count)
+SELECT assigned_role, application_type, priority, COUNT(*), COUNT(*) FILTER (WHERE NOT is_read)
+FROM role_inbox
+GROUP BY assigned_role, application_type, priority
+ON CONFLICT (assigned_role, application_type, priority) DO UPDATE
+SET total_count = EXCLUDED.total_count, unread_count = EXCLUDED.unread_count;
+
+-- 4. Counters follow every role_inbox write in the writer's transaction
+CREATE OR REPLACE FUNCTION role_inbox_count()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO role_inbox_counters AS c (assigned_role, application_type, priority, total_count, unread_count)
+        VALUES (OLD.assigned_role, OLD.application_type, OLD.priority, -1, CASE WHEN OLD.is_read THEN 0 ELSE -1 END)
+        ON CONFLICT (assigned_role, application_type, priority) DO UPDATE
+        SET total_count = c.total_count + EXCLUDED.total_count,
+            unread_count = c.unread_count + EXCLUDED.unread_count;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO role_inbox_counters AS c (assigned_role, application_type, priority, total_count, unread_count)
+        VALUES (NEW.assigned_role, NEW.application_type, NEW.priority, 1, CASE WHEN NEW.is_read THEN 0 ELSE 1 END)
+        ON CONFLICT (assigned_role, application_type, priority) DO UPDATE
+        SET total_count = c.total_count + EXCLUDED.total_count,
+            unread_count = c.unread_count + EXCLUDED.unread_count;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_role_inbox_count ON role_inbox;
+CREATE TRIGGER trigger_role_inbox_count
+    AFTER INSERT OR DELETE ON role_inbox
+    FOR EACH ROW
+    EXECUTE FUNCTION role_inbox_count();
+
+-- Touching a row without moving it between buckets leaves the counters alone
+DROP TRIGGER IF EXISTS trigger_role_inbox_recount ON role_inbox;
+CREATE TRIGGER trigger_role_inbox_recount
+    AFTER UPDATE ON role_inbox
+    FOR EACH ROW
+    WHEN ((OLD.assigned_role, OLD.application_type, OLD.priority, OLD.is_read)
+          IS DISTINCT FROM (NEW.assigned_role, NEW.application_type, NEW.priority, NEW.is_read))
+    EXECUTE FUNCTION role_inbox_count();
+
+COMMENT ON TABLE role_inbox IS 'Inbox projection: one row per application per role, maintained with inbox_messages';
+COMMENT ON COLUMN role_inbox.is_read IS 'FALSE while any inbox message of the application for this role is unread';
+COMMENT ON COLUMN role_inbox.application_details IS 'Summary of the application taken when its last message was written';
+COMMENT ON TABLE role_inbox_counters IS 'Row and unread counts of role_inbox per role, application type and priority';
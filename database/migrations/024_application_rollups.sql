@@ -0,0 +1,121 @@
+-- 024_application_rollups.sql
+-- Hourly application rollups read by admin dashboards, reports and alerts
+
+-- 1. One row per (hour, kind, role, source, status, workflow type).
+--    kind is the table the bucket was counted from:
+--      service_request  service_requests      role = creation_source
+--      zayavka          zayavki               role = created_by_role
+--      staff_audit      staff_application_audit  role = creator_role,
+--                                             status = metadata->>'event_type'
+--    Missing dimensions are stored as '' so they can be part of the key.
+CREATE TABLE IF NOT EXISTS application_rollup_hourly (
+    bucket_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    kind VARCHAR(20) NOT NULL CHECK (kind IN ('service_request', 'zayavka', 'staff_audit')),
+    role VARCHAR(50) NOT NULL DEFAULT '',
+    source VARCHAR(10) NOT NULL DEFAULT '' CHECK (source IN ('client', 'staff', '')),
+    status VARCHAR(50) NOT NULL DEFAULT '',
+    workflow_type VARCHAR(50) NOT NULL DEFAULT '',
+    total_count INTEGER NOT NULL DEFAULT 0,
+    notified_count INTEGER NOT NULL DEFAULT 0,
+    workflow_count INTEGER NOT NULL DEFAULT 0,
+    success_count INTEGER NOT NULL DEFAULT 0,
+    complete_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (kind, bucket_start, role, source, status, workflow_type)
+);
+
+-- 2. Everything before processed_until has been rolled up; a refresh
+--    re-counts whole hours from the hour holding processed_until minus the
+--    settle interval, so rows of transactions that committed late are not lost
+CREATE TABLE IF NOT EXISTS application_rollup_watermarks (
+    kind VARCHAR(20) PRIMARY KEY,
+    processed_until TIMESTAMP WITH TIME ZONE,
+    refreshed_at TIMESTAMP WITH TIME ZONE
+);
+
+INSERT INTO application_rollup_watermarks (kind)
+VALUES ('service_request'), ('zayavka'), ('staff_audit')
+ON CONFLICT DO NOTHING;
+
+-- 3. Hours behind the watermark whose rows changed a rolled-up dimension
+--    (or were deleted); the next refresh re-counts them
+CREATE TABLE IF NOT EXISTS application_rollup_dirty_hours (
+    kind VARCHAR(20) NOT NULL,
+    bucket_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (kind, bucket_start)
+);
+
+CREATE OR REPLACE FUNCTION application_rollup_mark_dirty()
+RETURNS TRIGGER AS $$
+DECLARE
+    happened_at TIMESTAMP WITH TIME ZONE;
+BEGIN
+    IF TG_TABLE_NAME = 'staff_application_audit' THEN
+        happened_at := OLD.creation_timestamp;
+    ELSE
+        happened_at := OLD.created_at;
+    END IF;
+    IF happened_at IS NOT NULL THEN
+        INSERT INTO application_rollup_dirty_hours (kind, bucket_start)
+        VALUES (TG_ARGV[0], date_trunc('hour', happened_at))
+        ON CONFLICT DO NOTHING;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_rollup_service_requests_update ON service_requests;
+CREATE TRIGGER trigger_rollup_service_requests_update
+    AFTER UPDATE ON service_requests
+    FOR EACH ROW
+    WHEN ((OLD.created_at, OLD.current_status, OLD.created_by_staff, OLD.creation_source, OLD.workflow_type)
+          IS DISTINCT FROM
+          (NEW.created_at, NEW.current_status, NEW.created_by_staff, NEW.creation_source, NEW.workflow_type))
+    EXECUTE FUNCTION application_rollup_mark_dirty('service_request');
+
+DROP TRIGGER IF EXISTS trigger_rollup_service_requests_delete ON service_requests;
+CREATE TRIGGER trigger_rollup_service_requests_delete
+    AFTER DELETE ON service_requests
+    FOR EACH ROW EXECUTE FUNCTION application_rollup_mark_dirty('service_request');
+
+DROP TRIGGER IF EXISTS trigger_rollup_zayavki_update ON zayavki;
+CREATE TRIGGER trigger_rollup_zayavki_update
+    AFTER UPDATE ON zayavki
+    FOR EACH ROW
+    WHEN ((OLD.created_at, OLD.status, OLD.created_by_role, OLD.zayavka_type)
+          IS DISTINCT FROM
+          (NEW.created_at, NEW.status, NEW.created_by_role, NEW.zayavka_type))
+    EXECUTE FUNCTION application_rollup_mark_dirty('zayavka');
+
+DROP TRIGGER IF EXISTS trigger_rollup_zayavki_delete ON zayavki;
+CREATE TRIGGER trigger_rollup_zayavki_delete
+    AFTER DELETE ON zayavki
+    FOR EACH ROW EXECUTE FUNCTION application_rollup_mark_dirty('zayavka');
+
+DROP TRIGGER IF EXISTS trigger_rollup_staff_audit_update ON staff_application_audit;
+CREATE TRIGGER trigger_rollup_staff_audit_update
+    AFTER UPDATE ON staff_application_audit
+    FOR EACH ROW
+    WHEN ((OLD.creation_timestamp, OLD.creator_role, OLD.application_type, OLD.client_notified,
+           OLD.workflow_initiated, OLD.metadata->>'event_type', OLD.application_id, OLD.client_id)
+          IS DISTINCT FROM
+          (NEW.creation_timestamp, NEW.creator_role, NEW.application_type, NEW.client_notified,
+           NEW.workflow_initiated, NEW.metadata->>'event_type', NEW.application_id, NEW.client_id))
+    EXECUTE FUNCTION application_rollup_mark_dirty('staff_audit');
+
+DROP TRIGGER IF EXISTS trigger_rollup_staff_audit_delete ON staff_application_audit;
+CREATE TRIGGER trigger_rollup_staff_audit_delete
+    AFTER DELETE ON staff_application_audit
+    FOR EACH ROW EXECUTE FUNCTION application_rollup_mark_dirty('staff_audit');
+
+-- 4. Range reads of new rows by the refresh, and the EXISTS probes of the
+--    distinct customer/technician counts on the admin dashboard
+CREATE INDEX IF NOT EXISTS idx_service_requests_created_at ON service_requests(created_at);
+CREATE INDEX IF NOT EXISTS idx_zayavki_created_at ON zayavki(created_at);
+CREATE INDEX IF NOT EXISTS idx_staff_application_audit_creation_timestamp
+ON staff_application_audit(creation_timestamp);
+CREATE INDEX IF NOT EXISTS idx_zayavki_user_id ON zayavki(user_id);
+CREATE INDEX IF NOT EXISTS idx_zayavki_assigned_to ON zayavki(assigned_to);
+
+COMMENT ON TABLE application_rollup_hourly IS 'Hourly application counts maintained by utils/rollup_job.py';
+COMMENT ON TABLE application_rollup_watermarks IS 'Rollup progress per source table';
+COMMENT ON TABLE application_rollup_dirty_hours IS 'Rolled-up hours whose source rows changed since';
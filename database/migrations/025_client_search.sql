@@ -0,0 +1,43 @@
+-- 025_client_search.sql
+-- Indexed client lookup: canonical E.164 phone column and trigram name index
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- 1. users.phone_e164 holds utils.validators.normalize_phone_e164(phone_number).
+--    Writers set both columns; existing rows are filled by
+--    database.client_search.backfill_phone_e164 at startup.
+ALTER TABLE users ADD COLUMN IF NOT EXISTS phone_e164 VARCHAR(20);
+
+-- A writer that changes phone_number without phone_e164 must not leave the
+-- old canonical number behind: a phone_e164 whose subscriber digits (the
+-- last nine) differ from the new phone_number is cleared, and the row is
+-- picked up by the next backfill
+CREATE OR REPLACE FUNCTION users_clear_stale_phone_e164()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.phone_e164 IS NOT NULL
+       AND right(NEW.phone_e164, 9) IS DISTINCT FROM right(regexp_replace(NEW.phone_number, '\D', '', 'g'), 9) THEN
+        NEW.phone_e164 := NULL;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trigger_users_clear_stale_phone_e164 ON users;
+CREATE TRIGGER trigger_users_clear_stale_phone_e164
+    BEFORE UPDATE OF phone_number ON users
+    FOR EACH ROW EXECUTE FUNCTION users_clear_stale_phone_e164();
+
+-- 2. Exact and prefix phone lookups (~>=~ / ~<~ range scans)
+CREATE INDEX IF NOT EXISTS idx_users_phone_e164
+ON users(phone_e164 text_pattern_ops) WHERE phone_e164 IS NOT NULL;
+
+-- 3. Trigram similarity and ILIKE '%...%' name lookups
+CREATE INDEX IF NOT EXISTS idx_users_full_name_trgm
+ON users USING GIN (full_name gin_trgm_ops);
+
+-- 4. Rows still waiting for the backfill
+CREATE INDEX IF NOT EXISTS idx_users_phone_e164_pending
+ON users(id) WHERE phone_e164 IS NULL AND phone_number IS NOT NULL;
+
+COMMENT ON COLUMN users.phone_e164 IS 'phone_number in canonical E.164 form, NULL if it is not a possible number';
@@ -0,0 +1,35 @@
+-- 026_stock_reservations.sql
+-- Stock reservation ledger: held quantities per material and expiring holds per request
+
+-- 1. materials.reserved_quantity is the sum of the live holds on a material.
+--    It only changes together with stock_reservations rows (see
+--    database.stock_reservations), in UPDATEs guarded by
+--    quantity_in_stock - reserved_quantity >= the quantity asked for, so two
+--    requests cannot hold the same last unit. Available to promise is
+--    quantity_in_stock - reserved_quantity, read from the material row itself.
+ALTER TABLE materials ADD COLUMN IF NOT EXISTS reserved_quantity INTEGER NOT NULL DEFAULT 0;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'materials_reserved_quantity_check') THEN
+        ALTER TABLE materials ADD CONSTRAINT materials_reserved_quantity_check CHECK (reserved_quantity >= 0);
+    END IF;
+END $$;
+
+-- 2. One row per held equipment line. Holds not consumed or cancelled by
+--    expires_at are released by the reservation sweeper.
+CREATE TABLE IF NOT EXISTS stock_reservations (
+    id SERIAL PRIMARY KEY,
+    request_id VARCHAR(64) NOT NULL,
+    material_id INTEGER NOT NULL REFERENCES materials(id),
+    quantity INTEGER NOT NULL CHECK (quantity > 0),
+    performed_by INTEGER,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_stock_reservations_request ON stock_reservations(request_id);
+CREATE INDEX IF NOT EXISTS idx_stock_reservations_expires ON stock_reservations(expires_at);
+
+COMMENT ON COLUMN materials.reserved_quantity IS 'Quantity held by stock_reservations rows';
+COMMENT ON TABLE stock_reservations IS 'Expiring equipment holds of service requests';
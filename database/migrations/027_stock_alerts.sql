@@ -0,0 +1,101 @@
+-- 027_stock_alerts.sql
+-- Maintained low-stock set: stock changes record threshold crossings as they happen
+
+-- 1. One row per active material at or below its min_quantity, with the
+--    level it is at (severity 1 = low, 2 = critical, 3 = out of stock, the
+--    same thresholds as utils.inventory_manager.InventoryItem.stock_level).
+--    crossed_at is when the material entered its current level; the stock
+--    alert notifier sends a crossing once it has held for the debounce
+--    period and records it in notified_severity.
+CREATE TABLE IF NOT EXISTS material_stock_alerts (
+    material_id INTEGER PRIMARY KEY REFERENCES materials(id) ON DELETE CASCADE,
+    severity SMALLINT NOT NULL CHECK (severity BETWEEN 1 AND 3),
+    quantity INTEGER NOT NULL,
+    min_quantity INTEGER NOT NULL,
+    crossed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    notified_severity SMALLINT NOT NULL DEFAULT 0,
+    notified_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS idx_material_stock_alerts_pending
+    ON material_stock_alerts(crossed_at) WHERE severity > notified_severity;
+
+CREATE OR REPLACE FUNCTION material_stock_severity(stock INTEGER, minimum INTEGER, active BOOLEAN)
+RETURNS SMALLINT AS $$
+    SELECT (CASE
+        WHEN NOT COALESCE(active, true) THEN 0
+        WHEN COALESCE(stock, 0) <= 0 THEN 3
+        WHEN stock <= COALESCE(minimum, 0) * 0.5 THEN 2
+        WHEN stock <= COALESCE(minimum, 0) THEN 1
+        ELSE 0
+    END)::SMALLINT
+$$ LANGUAGE SQL IMMUTABLE;
+
+-- 2. Every writer of materials (consumption, issue to technicians, receipts,
+--    manual corrections) goes through this trigger, so the set is current
+--    without anyone scanning materials. The inventory manager keeps stock in
+--    quantity_in_stock and the warehouse queries in quantity; the row is read
+--    as JSON so the trigger works with whichever column the table has.
+CREATE OR REPLACE FUNCTION materials_track_stock_alert() RETURNS TRIGGER AS $$
+DECLARE
+    new_row JSONB := to_jsonb(NEW);
+    old_row JSONB;
+    stock INTEGER := COALESCE((new_row->>'quantity_in_stock')::int, (new_row->>'quantity')::int, 0);
+    minimum INTEGER := COALESCE(NEW.min_quantity, 0);
+    new_severity SMALLINT := material_stock_severity(stock, minimum, NEW.is_active);
+    old_stock INTEGER;
+    old_severity SMALLINT := 0;
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        old_row := to_jsonb(OLD);
+        old_stock := COALESCE((old_row->>'quantity_in_stock')::int, (old_row->>'quantity')::int, 0);
+        old_severity := material_stock_severity(old_stock, OLD.min_quantity, OLD.is_active);
+        -- Reservations, prices, names: nothing the set holds has changed
+        IF old_stock = stock AND OLD.min_quantity IS NOT DISTINCT FROM NEW.min_quantity
+           AND old_severity = new_severity THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+
+    IF new_severity = 0 THEN
+        IF old_severity > 0 THEN
+            DELETE FROM material_stock_alerts WHERE material_id = NEW.id;
+        END IF;
+    ELSE
+        -- A move to a better level re-arms the worse levels, so dropping
+        -- back into one later is a new crossing
+        INSERT INTO material_stock_alerts (material_id, severity, quantity, min_quantity)
+        VALUES (NEW.id, new_severity, stock, minimum)
+        ON CONFLICT (material_id) DO UPDATE
+        SET quantity = EXCLUDED.quantity,
+            min_quantity = EXCLUDED.min_quantity,
+            crossed_at = CASE WHEN material_stock_alerts.severity <> EXCLUDED.severity
+                              THEN CURRENT_TIMESTAMP ELSE material_stock_alerts.crossed_at END,
+            notified_severity = LEAST(material_stock_alerts.notified_severity, EXCLUDED.severity),
+            severity = EXCLUDED.severity;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_materials_stock_alert ON materials;
+CREATE TRIGGER trg_materials_stock_alert
+    AFTER INSERT OR UPDATE ON materials
+    FOR EACH ROW EXECUTE FUNCTION materials_track_stock_alert();
+
+-- 3. Seed the set from the current stock. Items already low were alerted on
+--    by the old polling, so they count as notified at their current level.
+INSERT INTO material_stock_alerts (material_id, severity, quantity, min_quantity, notified_severity, notified_at)
+SELECT s.id, l.severity, s.stock, s.minimum, l.severity, CURRENT_TIMESTAMP
+FROM (
+    SELECT m.id,
+           COALESCE((to_jsonb(m)->>'quantity_in_stock')::int, (to_jsonb(m)->>'quantity')::int, 0) AS stock,
+           COALESCE(m.min_quantity, 0) AS minimum,
+           m.is_active
+    FROM materials m
+) s
+CROSS JOIN LATERAL (SELECT material_stock_severity(s.stock, s.minimum, s.is_active) AS severity) l
+WHERE l.severity > 0
+ON CONFLICT (material_id) DO NOTHING;
+
+COMMENT ON TABLE material_stock_alerts IS 'Materials at or below min_quantity, maintained by trg_materials_stock_alert';
@@ -0,0 +1,8 @@
+-- 028_role_inbox_live_details.sql
+-- Inbox pages read the application summary from zayavki/service_requests
+
+-- role_inbox.application_details was a snapshot taken when the last inbox
+-- message was written, so status changes made without a message never
+-- reached the inbox screen. Listings now look the summary up for the rows
+-- of the page being shown (database.role_inbox.page_query).
+ALTER TABLE role_inbox DROP COLUMN IF EXISTS application_details;
@@ -515,6 +515,9 @@ class ServiceRequest:
     creation_source: str = "client"  # "client", "manager", "junior_manager", "controller", "call_center"
     client_notified_at: Optional[datetime] = None
     
+    # Optimistic concurrency: bumped by every write, checked by transitions
+    version: int = 0
+    
     def to_dict(self) -> Dict[str, Any]:
         return {
             'id': self.id,
@@ -537,7 +540,8 @@ class ServiceRequest:
             'staff_creator_id': self.staff_creator_id,
             'staff_creator_role': self.staff_creator_role,
             'creation_source': self.creation_source,
-            'client_notified_at': self.client_notified_at
+            'client_notified_at': self.client_notified_at,
+            'version': self.version
         }
     
     @classmethod
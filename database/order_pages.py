@@ -0,0 +1,82 @@
+"""
+Keyset pages of zayavki for the staff inbox screens.
+
+The manager, controller, call centre and junior manager inboxes list
+zayavki newest first. Each page seeks past the previous page's last id
+(``z.id < $cursor ORDER BY z.id DESC LIMIT n``) instead of loading every
+matching row, so page N is the same backward primary key scan as page 1.
+Ids are serial, so id order is creation order. The cursor is the last id
+as a string.
+"""
+
+from typing import Any, Dict, Optional, Sequence
+
+from database.pagination import Page
+from utils.logger import setup_module_logger
+
+logger = setup_module_logger("order_pages")
+
+# Statuses of the inbox listings (the same sets as get_orders_by_status / get_unresolved_issues)
+NEW_STATUSES = ('new', 'pending')
+OPEN_STATUSES = ('new', 'pending', 'assigned', 'in_progress')
+
+PAGE_QUERY = """
+SELECT z.id, z.public_id, z.description, z.status, z.created_at,
+       u.full_name AS client_name
+FROM zayavki z
+LEFT JOIN users u ON z.user_id = u.id
+WHERE ($1::text[] IS NULL OR z.status = ANY($1))
+  AND ($2::text[] IS NULL OR z.status <> ALL($2))
+  AND ($3::integer IS NULL OR z.current_user_id = $3)
+  AND ($4::integer IS NULL OR z.id < $4)
+ORDER BY z.id DESC
+LIMIT $5
+"""
+
+
+async def fetch_page(conn, statuses: Optional[Sequence[str]] = None,
+                     exclude_statuses: Optional[Sequence[str]] = None,
+                     current_user_id: Optional[int] = None, limit: int = 10,
+                     cursor: Optional[str] = None) -> Page[Dict[str, Any]]:
+    """
+    One page of zayavki, newest first; ``next_cursor`` is None on the last page.
+
+    Raises ValueError for a malformed cursor and lets database errors propagate.
+    """
+    after = int(cursor) if cursor else None
+    # One extra row tells whether there is a next page
+    rows = await conn.fetch(
+        PAGE_QUERY,
+        list(statuses) if statuses else None,
+        list(exclude_statuses) if exclude_statuses else None,
+        current_user_id, after, limit + 1
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = str(rows[-1]['id'])
+    return Page(items=[dict(row) for row in rows], next_cursor=next_cursor)
+
+
+async def get_page(pool=None, **filters) -> Page[Dict[str, Any]]:
+    """Page of zayavki for the UI (see fetch_page); empty on any error"""
+    if not pool:
+        from loader import bot
+        pool = bot.db
+    try:
+        async with pool.acquire() as conn:
+            return await fetch_page(conn, **filters)
+    except ValueError:
+        logger.warning(f"Invalid order list cursor: {filters.get('cursor')!r}")
+        return Page()
+    except Exception as e:
+        logger.error(f"Error getting order page: {e}", exc_info=True)
+        return Page()
+
+
+__all__ = [
+    'NEW_STATUSES',
+    'OPEN_STATUSES',
+    'fetch_page',
+    'get_page',
+]
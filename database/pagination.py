@@ -0,0 +1,77 @@
+"""
+Keyset (seek) pagination helpers.
+
+A page is fetched with ``WHERE (sort keys) < (last row's keys) ORDER BY
+sort keys DESC LIMIT n`` instead of OFFSET, so every page costs the same
+index range scan however deep the user scrolls. The last row's keys are
+handed back to the caller as an opaque, compact cursor string.
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Generic, List, Optional, Sequence, TypeVar
+
+T = TypeVar('T')
+
+CURSOR_SEPARATOR = '.'
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_EPOCH_NAIVE = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+@dataclass
+class Page(Generic[T]):
+    """One page of a keyset-paginated listing"""
+    items: List[T] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+    @property
+    def has_more(self) -> bool:
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+
+def _to_base36(number: int) -> str:
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+    sign, number = ('-', -number) if number < 0 else ('', number)
+    encoded = ''
+    while True:
+        number, remainder = divmod(number, 36)
+        encoded = digits[remainder] + encoded
+        if not number:
+            return sign + encoded
+
+
+def encode_timestamp(value: datetime) -> str:
+    """Encode a datetime as base36 microseconds since the epoch ('z' suffix = timezone-aware)"""
+    if value.tzinfo is not None:
+        return _to_base36((value - _EPOCH_UTC) // _MICROSECOND) + 'z'
+    return _to_base36((value - _EPOCH_NAIVE) // _MICROSECOND)
+
+
+def decode_timestamp(token: str) -> datetime:
+    """Inverse of encode_timestamp"""
+    if token.endswith('z'):
+        return _EPOCH_UTC + int(token[:-1], 36) * _MICROSECOND
+    return _EPOCH_NAIVE + int(token, 36) * _MICROSECOND
+
+
+def encode_cursor(*parts) -> str:
+    """Join already-encoded key parts into a cursor; only the last part may contain the separator"""
+    return CURSOR_SEPARATOR.join(str(part) for part in parts)
+
+
+def decode_cursor(cursor: str, size: int) -> Sequence[str]:
+    """Split a cursor into ``size`` parts; raises ValueError for malformed cursors"""
+    parts = cursor.split(CURSOR_SEPARATOR, size - 1)
+    if len(parts) != size or not all(parts):
+        raise ValueError(f"Malformed cursor: {cursor!r}")
+    return parts
+
+
+__all__ = ['Page', 'encode_timestamp', 'decode_timestamp', 'encode_cursor', 'decode_cursor']
@@ -0,0 +1,288 @@
+"""
+Shared asyncpg connection pool.
+
+One pool per process, configured from ``config.Config`` and shared by
+DatabaseManager (``bot.db``), WarehouseDatabaseManager and anything else
+that needs a connection. Every new connection gets its session settings
+(timezone, statement_timeout, application_name) at startup and the json/jsonb
+codecs plus a query-timing hook in ``init``.
+
+The pool is wrapped in ``MeteredPool`` so acquire wait time, in-use/idle
+connection counts and query latency / slow-query histograms are available
+from ``get_pool_stats()`` for sizing the pool for peak hours.
+"""
+
+import asyncio
+import bisect
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import asyncpg
+
+from config import config
+from database.jsonb import JSON_LIBRARY, decode_jsonb, encode_jsonb
+from utils.logger import setup_module_logger
+
+logger = setup_module_logger("db_pool")
+
+# Histogram bucket upper bounds, in milliseconds (the last bucket is open-ended)
+ACQUIRE_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000)
+QUERY_BUCKETS_MS = (1, 5, 10, 50, 100, 250, 500, 1000, 5000)
+SLOW_QUERY_TABLE_SIZE = 100
+
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+
+    __slots__ = ('bounds', 'counts', 'total', 'sum_ms', 'max_ms')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value_ms)] += 1
+        self.total += 1
+        self.sum_ms += value_ms
+        if value_ms > self.max_ms:
+            self.max_ms = value_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [f"<={bound}ms" for bound in self.bounds] + [f">{self.bounds[-1]}ms"]
+        return {
+            'count': self.total,
+            'avg_ms': round(self.sum_ms / self.total, 3) if self.total else 0.0,
+            'max_ms': round(self.max_ms, 3),
+            'buckets': dict(zip(labels, self.counts)),
+        }
+
+
+class PoolMetrics:
+    """Acquire and query timings of the shared pool"""
+
+    def __init__(self, slow_query_ms: float = None):
+        self.slow_query_ms = config.DB_SLOW_QUERY_MS if slow_query_ms is None else slow_query_ms
+        self.acquire_wait = Histogram(ACQUIRE_BUCKETS_MS)
+        self.queries = Histogram(QUERY_BUCKETS_MS)
+        self.slow_queries = Histogram(QUERY_BUCKETS_MS)
+        self.slow_statements: Dict[str, List[float]] = {}  # query -> [count, total_ms, max_ms]
+        self.waiting = 0
+        self.max_waiting = 0
+        self.acquire_errors = 0
+        self.query_errors = 0
+
+    def observe_acquire(self, wait_ms: float) -> None:
+        self.acquire_wait.observe(wait_ms)
+
+    def observe_query(self, record) -> None:
+        """asyncpg query logger callback (LoggedQuery)"""
+        elapsed_ms = record.elapsed * 1000
+        self.queries.observe(elapsed_ms)
+        if record.exception is not None:
+            self.query_errors += 1
+        if elapsed_ms < self.slow_query_ms:
+            return
+
+        self.slow_queries.observe(elapsed_ms)
+        statement = ' '.join(record.query.split())[:200]
+        entry = self.slow_statements.get(statement)
+        if entry is None:
+            if len(self.slow_statements) >= SLOW_QUERY_TABLE_SIZE:
+                # Keep the table bounded: forget the least frequent statement
+                del self.slow_statements[min(self.slow_statements, key=lambda k: self.slow_statements[k][0])]
+            entry = self.slow_statements[statement] = [0, 0.0, 0.0]
+        entry[0] += 1
+        entry[1] += elapsed_ms
+        entry[2] = max(entry[2], elapsed_ms)
+        logger.warning(f"Slow query ({elapsed_ms:.1f} ms): {statement}")
+
+    def reset(self) -> None:
+        self.__init__(self.slow_query_ms)
+
+    def to_dict(self) -> Dict[str, Any]:
+        slowest = sorted(self.slow_statements.items(), key=lambda item: item[1][2], reverse=True)[:10]
+        return {
+            'acquire_wait': self.acquire_wait.to_dict(),
+            'waiting': self.waiting,
+            'max_waiting': self.max_waiting,
+            'acquire_errors': self.acquire_errors,
+            'queries': self.queries.to_dict(),
+            'query_errors': self.query_errors,
+            'slow_query_ms': self.slow_query_ms,
+            'slow_queries': self.slow_queries.to_dict(),
+            'slowest_statements': [
+                {'query': query, 'count': count, 'avg_ms': round(total / count, 3), 'max_ms': round(max_ms, 3)}
+                for query, (count, total, max_ms) in slowest
+            ],
+        }
+
+
+class _MeteredAcquire:
+    """``pool.acquire()`` result: usable with ``async with`` and with ``await``"""
+
+    __slots__ = ('_pool', '_timeout', '_conn')
+
+    def __init__(self, pool: 'MeteredPool', timeout: Optional[float]):
+        self._pool = pool
+        self._timeout = timeout
+        self._conn = None
+
+    async def _acquire(self):
+        metrics = self._pool.metrics
+        metrics.waiting += 1
+        metrics.max_waiting = max(metrics.max_waiting, metrics.waiting)
+        started = time.perf_counter()
+        try:
+            conn = await self._pool.pool.acquire(timeout=self._timeout)
+        except BaseException:
+            metrics.acquire_errors += 1
+            raise
+        finally:
+            metrics.waiting -= 1
+        metrics.observe_acquire((time.perf_counter() - started) * 1000)
+        return conn
+
+    def __await__(self):
+        return self._acquire().__await__()
+
+    async def __aenter__(self):
+        self._conn = await self._acquire()
+        return self._conn
+
+    async def __aexit__(self, *exc_info):
+        conn, self._conn = self._conn, None
+        await self._pool.pool.release(conn)
+
+
+class MeteredPool:
+    """asyncpg.Pool wrapper that measures acquire wait; everything else is delegated"""
+
+    def __init__(self, pool: asyncpg.Pool, metrics: PoolMetrics):
+        self.pool = pool
+        self.metrics = metrics
+
+    def acquire(self, *, timeout: Optional[float] = None) -> _MeteredAcquire:
+        return _MeteredAcquire(self, timeout)
+
+    async def execute(self, query: str, *args, timeout: Optional[float] = None) -> str:
+        async with self.acquire() as conn:
+            return await conn.execute(query, *args, timeout=timeout)
+
+    async def executemany(self, command: str, args, *, timeout: Optional[float] = None):
+        async with self.acquire() as conn:
+            return await conn.executemany(command, args, timeout=timeout)
+
+    async def fetch(self, query: str, *args, timeout: Optional[float] = None) -> list:
+        async with self.acquire() as conn:
+            return await conn.fetch(query, *args, timeout=timeout)
+
+    async def fetchrow(self, query: str, *args, timeout: Optional[float] = None):
+        async with self.acquire() as conn:
+            return await conn.fetchrow(query, *args, timeout=timeout)
+
+    async def fetchval(self, query: str, *args, column: int = 0, timeout: Optional[float] = None):
+        async with self.acquire() as conn:
+            return await conn.fetchval(query, *args, column=column, timeout=timeout)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.pool, name)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Connection counts plus acquire/query metrics"""
+        size = self.pool.get_size()
+        idle = self.pool.get_idle_size()
+        return {
+            'size': size,
+            'idle': idle,
+            'in_use': size - idle,
+            'min_size': self.pool.get_min_size(),
+            'max_size': self.pool.get_max_size(),
+            **self.metrics.to_dict(),
+        }
+
+
+def pool_settings() -> Dict[str, Any]:
+    """asyncpg.create_pool keyword arguments from config"""
+    server_settings = {'application_name': config.DB_APPLICATION_NAME}
+    if config.DB_STATEMENT_TIMEOUT_MS:
+        server_settings['statement_timeout'] = str(config.DB_STATEMENT_TIMEOUT_MS)
+    if config.DB_TIMEZONE:
+        server_settings['timezone'] = config.DB_TIMEZONE
+    return {
+        'host': config.DB_HOST,
+        'port': config.DB_PORT,
+        'user': config.DB_USER,
+        'password': config.DB_PASSWORD,
+        'database': config.DB_NAME,
+        'min_size': config.DB_POOL_MIN_SIZE,
+        'max_size': config.DB_POOL_MAX_SIZE,
+        'command_timeout': config.DB_COMMAND_TIMEOUT or None,
+        'statement_cache_size': config.DB_STATEMENT_CACHE_SIZE,
+        'max_inactive_connection_lifetime': config.DB_MAX_INACTIVE_CONNECTION_LIFETIME,
+        'server_settings': server_settings,
+    }
+
+
+def make_connection_init(metrics: PoolMetrics):
+    """Build the per-connection init hook: json/jsonb codecs and query timing"""
+    async def init_connection(conn: asyncpg.Connection) -> None:
+        if config.DB_JSONB_CODEC:
+            for type_name in ('json', 'jsonb'):
+                await conn.set_type_codec(
+                    type_name, schema='pg_catalog', encoder=encode_jsonb, decoder=decode_jsonb, format='text'
+                )
+        conn.add_query_logger(metrics.observe_query)
+    return init_connection
+
+
+async def create_pool(metrics: Optional[PoolMetrics] = None) -> MeteredPool:
+    """Create a new configured, metered pool"""
+    metrics = metrics or PoolMetrics()
+    settings = pool_settings()
+    pool = await asyncpg.create_pool(init=make_connection_init(metrics), **settings)
+    logger.info(
+        f"Database pool created: size {settings['min_size']}-{settings['max_size']}, "
+        f"command_timeout={settings['command_timeout']}, "
+        f"statement_cache_size={settings['statement_cache_size']}, json={JSON_LIBRARY}"
+    )
+    return MeteredPool(pool, metrics)
+
+
+_shared_pool: Optional[MeteredPool] = None
+_shared_pool_lock: Optional[asyncio.Lock] = None
+
+
+async def get_shared_pool() -> MeteredPool:
+    """Get the process-wide pool, creating it on first use"""
+    global _shared_pool, _shared_pool_lock
+    if _shared_pool is not None:
+        return _shared_pool
+    if _shared_pool_lock is None:
+        _shared_pool_lock = asyncio.Lock()
+    async with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = await create_pool()
+    return _shared_pool
+
+
+async def close_shared_pool() -> None:
+    """Close the process-wide pool (on shutdown)"""
+    global _shared_pool
+    pool, _shared_pool = _shared_pool, None
+    if pool is not None:
+        await pool.close()
+        logger.info("Database pool closed")
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Get stats of the process-wide pool (empty if it is not created yet)"""
+    return _shared_pool.get_stats() if _shared_pool is not None else {}
+
+
+__all__ = [
+    'MeteredPool', 'PoolMetrics', 'Histogram', 'create_pool', 'pool_settings',
+    'get_shared_pool', 'close_shared_pool', 'get_pool_stats'
+]
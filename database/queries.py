@@ -2,6 +2,7 @@ import asyncpg
 from typing import List, Dict, Any, Optional
 from datetime import datetime, date, timedelta
 from utils.logger import setup_module_logger
+from utils.identity_context import lookup_identity_user
 logger = setup_module_logger("queries")
 
 # Database manager class
@@ -398,6 +399,10 @@ class UserQueries:
     @staticmethod
     async def get_user_by_telegram_id(telegram_id: int, pool: asyncpg.Pool = None) -> Optional[Dict[str, Any]]:
         """Get user by telegram ID"""
+        found, user = await lookup_identity_user(telegram_id)
+        if found:
+            return user
+
         if not pool:
             from loader import bot
             pool = bot.pool
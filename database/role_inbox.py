@@ -0,0 +1,356 @@
+"""
+Materialised per-role inbox (``role_inbox``) and its badge counters.
+
+Every write to ``inbox_messages`` goes through this module with the
+connection of the caller's transaction and updates the projection in the
+same statement: one ``role_inbox`` row per application per role, carrying
+the latest message's priority and title and an unread flag. A trigger
+keeps ``role_inbox_counters`` in step with the projection, so inbox screens
+and badge counts are single indexed reads instead of DISTINCT scans over
+messages joined to zayavki/service_requests.
+
+The application summary (status, description, client) is not copied into
+the projection, since workflow changes do not write inbox messages; it is
+read from the live rows for the page being shown, one primary key lookup
+per row.
+"""
+
+import base64
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from database.jsonb import load_json
+from database.pagination import decode_cursor, decode_timestamp, encode_cursor, encode_timestamp
+
+# Marks an application id stored as 22 base64url characters instead of a 36-character UUID
+_COMPACT_UUID_PREFIX = '~'
+
+# Summary shown on inbox screens; ``{m}`` is the alias of a row carrying
+# application_type and application_id
+_DETAILS_SQL = """
+CASE {m}.application_type
+    WHEN 'zayavka' THEN (
+        SELECT jsonb_build_object(
+            'id', z.id, 'description', z.description, 'address', z.address, 'phone', z.phone,
+            'status', z.status, 'app_priority', z.priority,
+            'created_at', z.created_at, 'updated_at', z.updated_at,
+            'client_name', u.full_name, 'client_phone', u.phone_number, 'client_language', u.language
+        )
+        FROM zayavki z LEFT JOIN users u ON z.user_id = u.id
+        WHERE z.id = {m}.application_id::integer
+    )
+    ELSE (
+        SELECT jsonb_build_object(
+            'id', sr.id, 'workflow_type', sr.workflow_type, 'current_status', sr.current_status,
+            'app_priority', sr.priority, 'description', sr.description, 'location', sr.location,
+            'contact_info', sr.contact_info, 'created_at', sr.created_at, 'updated_at', sr.updated_at,
+            'client_name', u.full_name, 'client_phone', u.phone_number, 'client_language', u.language
+        )
+        FROM service_requests sr LEFT JOIN users u ON sr.client_id = u.id
+        WHERE sr.id = {m}.application_id
+    )
+END
+"""
+
+CREATE_MESSAGE_QUERY = f"""
+WITH message AS (
+    INSERT INTO inbox_messages (
+        application_id, application_type, assigned_role,
+        title, description, message_type, priority, is_read, created_at
+    )
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, COALESCE($9, CURRENT_TIMESTAMP))
+    RETURNING id, application_id, application_type, assigned_role, title, priority, is_read, created_at
+), projected AS (
+    INSERT INTO role_inbox AS ri (
+        assigned_role, application_type, application_id, priority, is_read,
+        title, last_message_at
+    )
+    SELECT m.assigned_role, m.application_type, m.application_id, COALESCE(m.priority, 'medium'),
+           COALESCE(m.is_read, FALSE), m.title, m.created_at
+    FROM message m
+    ON CONFLICT (assigned_role, application_type, application_id) DO UPDATE
+    SET priority = EXCLUDED.priority,
+        is_read = ri.is_read AND EXCLUDED.is_read,
+        title = EXCLUDED.title,
+        last_message_at = GREATEST(ri.last_message_at, EXCLUDED.last_message_at),
+        updated_at = CURRENT_TIMESTAMP
+)
+SELECT id FROM message
+"""
+
+MARK_MESSAGE_READ_QUERY = """
+WITH message AS (
+    UPDATE inbox_messages
+    SET is_read = TRUE, updated_at = CURRENT_TIMESTAMP
+    WHERE id = $1
+    RETURNING id, application_id, application_type, assigned_role
+), projected AS (
+    UPDATE role_inbox ri
+    SET is_read = NOT EXISTS (
+            SELECT 1 FROM inbox_messages im
+            WHERE im.application_id = m.application_id
+              AND im.application_type = m.application_type
+              AND im.assigned_role = m.assigned_role
+              AND im.is_read IS NOT TRUE
+              AND im.id <> m.id
+        ),
+        updated_at = CURRENT_TIMESTAMP
+    FROM message m
+    WHERE ri.assigned_role = m.assigned_role
+      AND ri.application_type = m.application_type
+      AND ri.application_id = m.application_id
+)
+SELECT id FROM message
+"""
+
+MARK_ROLE_READ_QUERY = """
+WITH messages AS (
+    UPDATE inbox_messages
+    SET is_read = TRUE, updated_at = CURRENT_TIMESTAMP
+    WHERE application_id = $1 AND application_type = $2 AND assigned_role = $3
+      AND is_read IS NOT TRUE
+)
+UPDATE role_inbox
+SET is_read = TRUE, updated_at = CURRENT_TIMESTAMP
+WHERE application_id = $1 AND application_type = $2 AND assigned_role = $3
+  AND NOT is_read
+"""
+
+CLEAR_APPLICATION_QUERY = """
+DELETE FROM role_inbox WHERE application_id = $1 AND application_type = $2
+"""
+
+REBUILD_APPLICATION_QUERY = """
+INSERT INTO role_inbox (
+    assigned_role, application_type, application_id, priority, is_read,
+    title, last_message_at
+)
+SELECT DISTINCT ON (m.assigned_role)
+    m.assigned_role, m.application_type, m.application_id, COALESCE(m.priority, 'medium'),
+    NOT bool_or(m.is_read IS NOT TRUE) OVER w,
+    m.title, COALESCE(m.created_at, CURRENT_TIMESTAMP)
+FROM inbox_messages m
+WHERE m.application_id = $1 AND m.application_type = $2
+WINDOW w AS (PARTITION BY m.assigned_role)
+ORDER BY m.assigned_role, m.created_at DESC, m.id DESC
+"""
+
+_DELETE_READ_MESSAGES_QUERY = """
+WITH deleted AS (
+    DELETE FROM inbox_messages
+    WHERE is_read = TRUE AND {age_column} < $1
+      AND ($2::varchar[] IS NULL OR message_type = ANY($2::varchar[]))
+    RETURNING id, application_id, application_type, assigned_role
+), emptied AS (
+    DELETE FROM role_inbox ri
+    USING (SELECT DISTINCT application_id, application_type, assigned_role FROM deleted) d
+    WHERE ri.application_id = d.application_id
+      AND ri.application_type = d.application_type
+      AND ri.assigned_role = d.assigned_role
+      AND NOT EXISTS (
+          SELECT 1 FROM inbox_messages im
+          WHERE im.application_id = d.application_id
+            AND im.application_type = d.application_type
+            AND im.assigned_role = d.assigned_role
+            AND im.id NOT IN (SELECT id FROM deleted)
+      )
+)
+SELECT COUNT(*) FROM deleted
+"""
+
+DELETE_READ_MESSAGES_QUERIES = {
+    column: _DELETE_READ_MESSAGES_QUERY.format(age_column=column)
+    for column in ('created_at', 'updated_at')
+}
+
+COUNT_QUERY = """
+SELECT COALESCE(SUM(CASE WHEN $4 THEN unread_count ELSE total_count END), 0)
+FROM role_inbox_counters
+WHERE assigned_role = $1
+  AND ($2::varchar IS NULL OR application_type = $2)
+  AND ($3::varchar IS NULL OR priority = $3)
+"""
+
+LIST_COLUMNS = """
+    application_id, application_type, assigned_role, priority, is_read, title,
+    last_message_at AS inbox_created_at, updated_at AS inbox_updated_at
+"""
+
+LIST_ORDER = "ORDER BY last_message_at DESC, application_id DESC"
+
+
+def page_query(where_clause: str, limit_clause: str) -> str:
+    """
+    Listing query: the page of role_inbox rows is picked first, then each
+    row gets the live summary of its application as ``application_details``.
+    """
+    return f"""
+        SELECT {LIST_COLUMNS}, {_DETAILS_SQL.format(m='ri')} AS application_details
+        FROM (
+            SELECT application_id, application_type, assigned_role, priority, is_read, title,
+                   last_message_at, updated_at
+            FROM role_inbox
+            WHERE {where_clause}
+            {LIST_ORDER}
+            {limit_clause}
+        ) ri
+        {LIST_ORDER}
+    """
+
+
+async def create_message(
+    conn,
+    application_id: str,
+    application_type: str,
+    assigned_role: str,
+    title: Optional[str] = None,
+    description: Optional[str] = None,
+    message_type: str = 'application',
+    priority: str = 'medium',
+    is_read: bool = False,
+    created_at: Optional[datetime] = None
+) -> Optional[int]:
+    """Insert an inbox message and fold it into the role's inbox row; returns the message id"""
+    return await conn.fetchval(
+        CREATE_MESSAGE_QUERY,
+        application_id, application_type, assigned_role,
+        title, description, message_type, priority, is_read, created_at
+    )
+
+
+async def mark_message_read(conn, message_id: int) -> Optional[int]:
+    """Mark one message read; the inbox row turns read once no unread message is left"""
+    return await conn.fetchval(MARK_MESSAGE_READ_QUERY, message_id)
+
+
+async def mark_role_read(conn, application_id: str, application_type: str, role: str) -> None:
+    """Mark every message of an application for a role read"""
+    await conn.execute(MARK_ROLE_READ_QUERY, application_id, application_type, role)
+
+
+async def rebuild_application(conn, application_id: str, application_type: str) -> None:
+    """
+    Recompute all role rows of one application from its messages.
+
+    For writes that move messages between roles in bulk; call inside the
+    writer's transaction.
+    """
+    await conn.execute(CLEAR_APPLICATION_QUERY, application_id, application_type)
+    await conn.execute(REBUILD_APPLICATION_QUERY, application_id, application_type)
+
+
+async def delete_read_messages(
+    conn,
+    older_than: datetime,
+    message_types: Optional[Sequence[str]] = None,
+    age_column: str = 'updated_at'
+) -> int:
+    """Delete read messages older than a cutoff and drop inbox rows left without messages"""
+    query = DELETE_READ_MESSAGES_QUERIES[age_column]
+    return await conn.fetchval(query, older_than, list(message_types) if message_types else None) or 0
+
+
+async def count_applications(
+    conn,
+    role: str,
+    application_type: Optional[str] = None,
+    priority: Optional[str] = None,
+    unread_only: bool = False
+) -> int:
+    """Number of inbox rows (or unread rows) of a role, from the maintained counters"""
+    return await conn.fetchval(COUNT_QUERY, role, application_type, priority, unread_only) or 0
+
+
+def list_query(
+    application_type: Optional[str] = None,
+    priority: Optional[str] = None,
+    unread_only: bool = False,
+    first_param: int = 2
+) -> Tuple[str, List[Any]]:
+    """
+    WHERE clause and parameters of a role listing after ``assigned_role = $1``.
+
+    Conditions are only added when filtering, so the unread listing matches
+    the partial ``NOT is_read`` index literally.
+    """
+    conditions = ["assigned_role = $1"]
+    params: List[Any] = []
+    if application_type:
+        params.append(application_type)
+        conditions.append(f"application_type = ${first_param + len(params) - 1}")
+    if priority:
+        params.append(priority)
+        conditions.append(f"priority = ${first_param + len(params) - 1}")
+    if unread_only:
+        conditions.append("NOT is_read")
+    return " AND ".join(conditions), params
+
+
+async def fetch_page(
+    conn,
+    role: str,
+    limit: int,
+    after: Optional[Tuple[datetime, str]] = None,
+    application_type: Optional[str] = None,
+    priority: Optional[str] = None,
+    unread_only: bool = False
+) -> list:
+    """
+    Up to ``limit`` inbox rows of a role, newest first, after the
+    (last_message_at, application_id) key of the previous page's last row.
+    """
+    where_clause, params = list_query(application_type, priority, unread_only)
+    params = [role, *params]
+    if after is not None:
+        params.extend(after)
+        where_clause += f" AND (last_message_at, application_id) < (${len(params) - 1}, ${len(params)})"
+    params.append(limit)
+    return await conn.fetch(page_query(where_clause, f"LIMIT ${len(params)}"), *params)
+
+
+def _compact_application_id(application_id: str) -> str:
+    try:
+        value = uuid.UUID(application_id)
+    except ValueError:
+        return application_id
+    if str(value) != application_id:
+        return application_id
+    return _COMPACT_UUID_PREFIX + base64.urlsafe_b64encode(value.bytes).rstrip(b'=').decode()
+
+
+def _expand_application_id(token: str) -> str:
+    if not token.startswith(_COMPACT_UUID_PREFIX):
+        return token
+    return str(uuid.UUID(bytes=base64.urlsafe_b64decode(token[1:] + '==')))
+
+
+def encode_page_cursor(row) -> str:
+    """
+    Cursor after an inbox row: base36 timestamp and the application id, with
+    UUIDs shortened to 23 characters so the cursor fits in callback_data.
+    """
+    return encode_cursor(encode_timestamp(row['inbox_created_at']), _compact_application_id(row['application_id']))
+
+
+def decode_page_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Inverse of encode_page_cursor; raises ValueError for malformed cursors"""
+    timestamp, application_id = decode_cursor(cursor, 2)
+    try:
+        return decode_timestamp(timestamp), _expand_application_id(application_id)
+    except (TypeError, ValueError, OverflowError) as e:
+        raise ValueError(f"Malformed cursor: {cursor!r}") from e
+
+
+def row_to_application(row) -> Dict[str, Any]:
+    """Listing row as the dict shape InboxService has always returned"""
+    application = dict(row)
+    application['application_details'] = load_json(application.get('application_details'), None)
+    return application
+
+
+__all__ = [
+    'create_message', 'mark_message_read', 'mark_role_read', 'rebuild_application',
+    'delete_read_messages', 'count_applications', 'list_query', 'fetch_page',
+    'page_query', 'encode_page_cursor', 'decode_page_cursor', 'row_to_application', 'LIST_COLUMNS'
+]
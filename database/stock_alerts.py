@@ -0,0 +1,68 @@
+"""
+Maintained low-stock set (migration 027).
+
+``material_stock_alerts`` holds one row per active material at or below its
+``min_quantity``. The ``trg_materials_stock_alert`` trigger keeps it current
+on every stock change (consumption, issue, receipt, manual update): a
+material entering a worse level gets a new ``crossed_at``, one back above
+its minimum is removed. Readers here look the set up instead of scanning
+``materials``, and its size is the number of items needing attention.
+
+A crossing is pending while ``severity > notified_severity``;
+``claim_crossings`` marks the crossings that have held for the debounce
+period as notified in the same statement that returns them, so run it in
+the transaction that enqueues the notifications and each is sent once.
+"""
+
+from typing import Any, Dict, List, Optional
+
+# stock_level values are those of utils.inventory_manager.StockLevel
+_LEVEL = """CASE a.severity WHEN 3 THEN 'out_of_stock' WHEN 2 THEN 'critical' ELSE 'low' END"""
+
+# Whole materials rows, as the warehouse readers returned before the set existed
+LOW_STOCK_QUERY = f"""
+SELECT m.*, {_LEVEL} AS stock_level, a.crossed_at
+FROM material_stock_alerts a
+JOIN materials m ON m.id = a.material_id
+WHERE a.severity >= $1 AND ($2::text IS NULL OR m.category = $2)
+ORDER BY a.quantity::float / NULLIF(a.min_quantity, 0)::float ASC NULLS FIRST, m.name
+"""
+
+# Oldest crossings first; concurrent notifiers skip each other's rows
+CLAIM_CROSSINGS_QUERY = f"""
+WITH due AS (
+    SELECT material_id
+    FROM material_stock_alerts
+    WHERE severity > notified_severity
+      AND crossed_at <= now() - make_interval(secs => $1)
+    ORDER BY crossed_at
+    LIMIT $2
+    FOR UPDATE SKIP LOCKED
+)
+UPDATE material_stock_alerts a
+SET notified_severity = a.severity, notified_at = now()
+FROM due, materials m
+WHERE a.material_id = due.material_id AND m.id = a.material_id
+RETURNING m.id, m.name, m.category, m.unit,
+          a.quantity, a.min_quantity, {_LEVEL} AS stock_level, a.crossed_at
+"""
+
+SEVERITY = {'low': 1, 'critical': 2, 'out_of_stock': 3}
+
+
+async def low_stock(conn, level: str = 'low', category: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Materials at ``level`` or worse, lowest stock relative to the minimum first"""
+    rows = await conn.fetch(LOW_STOCK_QUERY, SEVERITY[level], category)
+    return [dict(row) for row in rows]
+
+
+async def claim_crossings(conn, debounce_seconds: float, limit: int = 200) -> List[Dict[str, Any]]:
+    """Mark up to limit debounced crossings notified; returns them"""
+    rows = await conn.fetch(CLAIM_CROSSINGS_QUERY, float(debounce_seconds), limit)
+    return sorted((dict(row) for row in rows), key=lambda row: row['crossed_at'])
+
+
+__all__ = [
+    'low_stock',
+    'claim_crossings',
+]
@@ -0,0 +1,132 @@
+"""
+Stock reservation ledger (migration 026).
+
+A reservation is a set of ``stock_reservations`` rows (one per equipment
+line, with an expiry) plus the same quantities added to
+``materials.reserved_quantity``. Both change in one statement:
+
+* ``hold`` raises ``reserved_quantity`` only where
+  ``quantity_in_stock - reserved_quantity`` still covers the line, so the
+  row lock taken by that UPDATE serialises requests competing for the same
+  material and the last unit is held once;
+* ``release_request`` and ``release_expired`` delete holds and lower
+  ``reserved_quantity`` by what they deleted.
+
+Available to promise is ``quantity_in_stock - reserved_quantity`` of the
+material row, so ``available_to_promise`` is a primary key lookup however
+many holds exist.
+
+``conn`` is a connection; ``hold`` and the releases must run inside the
+caller's transaction so a failed line undoes the others.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, List
+
+# Lines for the same material are summed so each material row is updated once
+HOLD_QUERY = """
+UPDATE materials m
+SET reserved_quantity = m.reserved_quantity + l.quantity,
+    updated_at = CURRENT_TIMESTAMP
+FROM (
+    SELECT material_id, SUM(quantity)::int AS quantity
+    FROM unnest($1::int[], $2::int[]) AS l(material_id, quantity)
+    GROUP BY material_id
+) l
+WHERE m.id = l.material_id AND m.is_active = true
+  AND m.quantity_in_stock - m.reserved_quantity >= l.quantity
+RETURNING m.id
+"""
+
+INSERT_HOLDS_QUERY = """
+INSERT INTO stock_reservations (request_id, material_id, quantity, performed_by, expires_at)
+SELECT $1, l.material_id, l.quantity, l.performed_by, $5
+FROM unnest($2::int[], $3::int[], $4::int[]) AS l(material_id, quantity, performed_by)
+"""
+
+_RELEASE_QUERY = """
+WITH released AS (
+    DELETE FROM stock_reservations
+    WHERE {condition}
+    RETURNING request_id, material_id, quantity, performed_by
+), unheld AS (
+    UPDATE materials m
+    SET reserved_quantity = GREATEST(m.reserved_quantity - r.quantity, 0),
+        updated_at = CURRENT_TIMESTAMP
+    FROM (SELECT material_id, SUM(quantity)::int AS quantity FROM released GROUP BY material_id) r
+    WHERE m.id = r.material_id
+)
+SELECT request_id, material_id, quantity, performed_by FROM released
+"""
+
+RELEASE_REQUEST_QUERY = _RELEASE_QUERY.format(condition="request_id = $1")
+
+# Concurrent sweepers skip each other's rows
+RELEASE_EXPIRED_QUERY = _RELEASE_QUERY.format(condition="""id IN (
+        SELECT id FROM stock_reservations
+        WHERE expires_at <= now()
+        ORDER BY expires_at
+        LIMIT $1
+        FOR UPDATE SKIP LOCKED
+    )""")
+
+RESERVED_LINES_QUERY = """
+SELECT material_id, quantity, performed_by, expires_at
+FROM stock_reservations
+WHERE request_id = $1
+ORDER BY id
+"""
+
+AVAILABLE_QUERY = """
+SELECT id, quantity_in_stock, reserved_quantity,
+       quantity_in_stock - reserved_quantity AS available_quantity
+FROM materials
+WHERE id = ANY($1::int[])
+"""
+
+
+async def hold(conn, request_id: str, lines: List[Dict[str, Any]], expires_at: datetime) -> List[int]:
+    """
+    Hold the stock of equipment lines ('material_id', 'quantity', 'performed_by') for a request.
+
+    Returns the material ids that could not be held (unknown, inactive or
+    not enough available); when any are returned the caller must roll back.
+    """
+    material_ids = [line.get('material_id') for line in lines]
+    quantities = [line.get('quantity', 1) for line in lines]
+    held = {row['id'] for row in await conn.fetch(HOLD_QUERY, material_ids, quantities)}
+    missing = sorted(set(material_ids) - held)
+    if not missing:
+        await conn.execute(INSERT_HOLDS_QUERY, str(request_id), material_ids, quantities,
+                           [line.get('performed_by') for line in lines], expires_at)
+    return missing
+
+
+async def release_request(conn, request_id: str) -> List[Dict[str, Any]]:
+    """Release every hold of a request; returns the released lines"""
+    return [dict(row) for row in await conn.fetch(RELEASE_REQUEST_QUERY, str(request_id))]
+
+
+async def release_expired(conn, limit: int = 500) -> List[Dict[str, Any]]:
+    """Release up to limit expired holds, oldest first; returns the released lines"""
+    return [dict(row) for row in await conn.fetch(RELEASE_EXPIRED_QUERY, limit)]
+
+
+async def reserved_lines(conn, request_id: str) -> List[Dict[str, Any]]:
+    """Live holds of a request"""
+    return [dict(row) for row in await conn.fetch(RESERVED_LINES_QUERY, str(request_id))]
+
+
+async def available_to_promise(conn, material_ids: Iterable[int]) -> Dict[int, int]:
+    """material id -> quantity that can still be reserved or consumed"""
+    rows = await conn.fetch(AVAILABLE_QUERY, list(material_ids))
+    return {row['id']: row['available_quantity'] for row in rows}
+
+
+__all__ = [
+    'hold',
+    'release_request',
+    'release_expired',
+    'reserved_lines',
+    'available_to_promise',
+]
@@ -2,6 +2,8 @@ import asyncpg
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 from utils.logger import setup_logger
+from utils.identity_context import lookup_identity_user, mark_user_stale
+from utils.validators import normalize_phone_e164
 
 logger = setup_logger('database.technician_queries')
 
@@ -327,9 +329,10 @@ async def update_technician_phone(telegram_id: int, phone_number: str) -> bool:
         pool = bot.db
         async with pool.acquire() as conn:
             await conn.execute(
-                "UPDATE users SET phone_number = $1 WHERE telegram_id = $2",
-                phone_number, str(telegram_id)
+                "UPDATE users SET phone_number = $1, phone_e164 = $3 WHERE telegram_id = $2",
+                phone_number, str(telegram_id), normalize_phone_e164(phone_number)
             )
+            mark_user_stale(telegram_id=int(telegram_id))
             return True
     except Exception as e:
         logger.error(f"Error updating technician phone: {str(e)}", exc_info=True)
@@ -345,6 +348,7 @@ async def update_technician_language(telegram_id: int, language: str) -> bool:
                 "UPDATE users SET language = $1 WHERE telegram_id = $2",
                 language, str(telegram_id)
             )
+            mark_user_stale(telegram_id=int(telegram_id), language=language)
             return True
     except Exception as e:
         logger.error(f"Error updating technician language: {str(e)}", exc_info=True)
@@ -352,6 +356,10 @@ async def update_technician_language(telegram_id: int, language: str) -> bool:
 
 async def get_technician_by_telegram_id(telegram_id: int) -> Optional[Dict[str, Any]]:
     """Get technician by telegram ID"""
+    found, user = await lookup_identity_user(telegram_id)
+    if found:
+        return user if user and user.get('role') == 'technician' else None
+
     try:
         from loader import bot
         pool = bot.db
@@ -3,6 +3,9 @@ from typing import Dict, List, Optional, Any
 from datetime import datetime, timedelta
 import logging
 from config import config
+from utils.identity_context import lookup_identity_user
+from database.pool import get_shared_pool
+from database import stock_alerts
 
 # Database connection pool
 _pool = None
@@ -12,18 +15,10 @@ class WarehouseDatabaseManager:
         self.pool = None
     
     async def init_pool(self):
-        """Initialize connection pool"""
+        """Attach to the shared connection pool"""
         try:
-            self.pool = await asyncpg.create_pool(
-                host=config.DB_HOST,
-                port=config.DB_PORT,
-                user=config.DB_USER,
-                password=config.DB_PASSWORD,
-                database=config.DB_NAME,
-                min_size=1,
-                max_size=10
-            )
-            logging.info("Warehouse database pool initialized successfully")
+            self.pool = await get_shared_pool()
+            logging.info("Warehouse database manager attached to shared pool")
         except Exception as e:
             logging.error(f"Failed to initialize warehouse database pool: {e}")
             raise
@@ -35,9 +30,8 @@ class WarehouseDatabaseManager:
         return await self.pool.acquire()
     
     async def close_pool(self):
-        """Close connection pool"""
-        if self.pool:
-            await self.pool.close()
+        """Detach from the shared pool (it is closed once, on shutdown)"""
+        self.pool = None
 
 # Global warehouse database manager instance
 warehouse_db_manager = WarehouseDatabaseManager()
@@ -163,16 +157,10 @@ async def search_inventory_items(search_query: str) -> List[Dict]:
         await warehouse_db_manager.pool.release(conn)
 
 async def get_low_stock_inventory_items() -> List[Dict]:
-    """Get items with low stock"""
+    """Get items at or below their minimum, from the maintained low-stock set"""
     conn = await warehouse_db_manager.get_connection()
     try:
-        query = """
-        SELECT * FROM materials
-        WHERE is_active = true AND quantity <= min_quantity
-        ORDER BY (quantity::float / min_quantity::float) ASC
-        """
-        results = await conn.fetch(query)
-        return [dict(row) for row in results]
+        return await stock_alerts.low_stock(conn)
     except Exception as e:
         logging.error(f"Error getting low stock items: {e}")
         return []
@@ -180,16 +168,10 @@ async def get_low_stock_inventory_items() -> List[Dict]:
         await warehouse_db_manager.pool.release(conn)
 
 async def get_out_of_stock_items() -> List[Dict]:
-    """Get items that are out of stock"""
+    """Get items that are out of stock, from the maintained low-stock set"""
     conn = await warehouse_db_manager.get_connection()
     try:
-        query = """
-        SELECT * FROM materials
-        WHERE is_active = true AND quantity = 0
-        ORDER BY name
-        """
-        results = await conn.fetch(query)
-        return [dict(row) for row in results]
+        return await stock_alerts.low_stock(conn, 'out_of_stock')
     except Exception as e:
         logging.error(f"Error getting out of stock items: {e}")
         return []
@@ -688,6 +670,10 @@ async def close_warehouse_database():
 
 async def get_warehouse_user_by_telegram_id(telegram_id: int) -> Optional[Dict]:
     """Get warehouse user by telegram ID"""
+    found, user = await lookup_identity_user(telegram_id)
+    if found:
+        return user if user and user.get('role') == 'warehouse' else None
+
     conn = await warehouse_db_manager.get_connection()
     try:
         query = "SELECT * FROM users WHERE telegram_id = $1 AND role = 'warehouse'"
@@ -10,7 +10,7 @@ from handlers.controller import get_controller_router
 from handlers.warehouse import get_warehouse_router
 from handlers.junior_manager import get_junior_manager_router
 from handlers.global_navigation import get_global_navigation_router
-from handlers.universal_inbox import get_universal_inbox_router
+from handlers.universal_inbox import get_universal_inbox_router, get_inbox_pages_router
 from handlers.universal_notifications import get_universal_notifications_router
 from handlers.connection_workflow import get_connection_workflow_router
 from handlers.client_rating import get_client_rating_router
@@ -38,6 +38,7 @@ def setup_handlers(dp):
         dp.include_router(get_warehouse_router())
         dp.include_router(get_junior_manager_router())
         dp.include_router(get_universal_inbox_router())
+        dp.include_router(get_inbox_pages_router())
         dp.include_router(get_universal_notifications_router())
         
         # Include shared staff application flow handler
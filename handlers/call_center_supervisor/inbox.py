@@ -2,7 +2,8 @@ from aiogram import F
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 from utils.role_router import get_role_router
-from database.base_queries import get_user_by_telegram_id, get_orders_by_status, get_unresolved_issues
+from handlers.universal_inbox import answer_order_list, answer_role_inbox
+from database.base_queries import get_user_by_telegram_id
 from states.call_center_supervisor_states import CallCenterSupervisorInboxStates
 
 def get_call_center_supervisor_inbox_router():
@@ -16,26 +17,12 @@ def get_call_center_supervisor_inbox_router():
 
         lang = user.get('language', 'uz')
         await state.set_state(CallCenterSupervisorInboxStates.inbox)
-        new_orders = await get_orders_by_status(['new', 'pending'])
-        issues = await get_unresolved_issues()
+        shown = [await answer_role_inbox(message, 'call_center_supervisor', lang)]
+        shown.append(await answer_order_list(message, 'n', lang))
+        shown.append(await answer_order_list(message, 'i', lang))
 
-        if not new_orders and not issues:
+        if not any(shown):
             text = "📭 Inbox bo'sh." if lang == 'uz' else "📭 Inbox пустой."
             await message.answer(text)
-            return
-
-        if new_orders:
-            text = "🔎 <b>Inbox buyurtmalar:</b>\n\n" if lang == 'uz' else "🔎 <b>Заказы в Inbox:</b>\n\n"
-            for order in new_orders[:10]:
-                desc = order.get('description', '')[:50] + "..." if len(order.get('description', '')) > 50 else order.get('description', '')
-                text += f"🔹 <b>#{order['id']}</b> - {desc}\n"
-            await message.answer(text, parse_mode='HTML')
-
-        if issues:
-            text = "🔴 <b>Muammoli buyurtmalar:</b>\n\n" if lang == 'uz' else "🔴 <b>Проблемные заказы:</b>\n\n"
-            for issue in issues[:10]:
-                desc = issue.get('description', '')[:50] + "..." if len(issue.get('description', '')) > 50 else issue.get('description', '')
-                text += f"🔴 <b>#{issue['id']}</b> - {desc}\n"
-            await message.answer(text, parse_mode='HTML')
 
     return router 
\ No newline at end of file
@@ -1,11 +1,18 @@
+from html import escape
+
 from aiogram import Router, F
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from loader import bot
-from database.utils_inbox import get_user_tasks
+from database import order_pages
 from database.base_queries import get_user_by_telegram_id
+from handlers.universal_inbox import INBOX_PAGE_SIZE, answer_role_inbox
+from keyboards.inbox_buttons import OrderPageCallback, get_order_page_keyboard
 from keyboards.junior_manager_buttons import get_junior_manager_inbox_actions
 import random
 
+# Junior manager's own open zayavki (code 'j' of OrderPageCallback)
+OPEN_TASKS = {'exclude_statuses': ('closed', 'cancelled')}
+
 def get_junior_manager_inbox_router():
     router = Router()
 
@@ -16,21 +23,41 @@ def get_junior_manager_inbox_router():
             await message.answer("Foydalanuvchi topilmadi.")
             return
 
-        pool = bot.db
-        items = await get_user_tasks(user['id'])
-        if not items:
+        shown = await answer_role_inbox(message, 'junior_manager', user.get('language', 'uz'))
+        if not await send_task_page(message, user) and not shown:
             await message.answer("📭 Inbox bo‘sh.")
+
+    @router.callback_query(OrderPageCallback.filter(F.k == 'j'))
+    async def junior_manager_inbox_page(callback: CallbackQuery, callback_data: OrderPageCallback):
+        user = await get_user_by_telegram_id(callback.from_user.id)
+        if not user:
+            await callback.answer("Foydalanuvchi topilmadi.", show_alert=True)
             return
+        # The next page follows as new messages; drop the button that asked for it
+        await callback.message.delete()
+        await send_task_page(callback.message, user, callback_data.c)
+        await callback.answer()
 
-        for item in items:
-            text = render_inbox_item(item)
-            keyboard = get_junior_manager_inbox_actions(item['id'])
-            await message.answer(text, reply_markup=keyboard, parse_mode='HTML')
+    async def send_task_page(message: Message, user, cursor=None) -> bool:
+        """Send one page of the user's zayavki, each with its actions; False if there are none"""
+        page = await order_pages.get_page(
+            current_user_id=user['id'], cursor=cursor, limit=INBOX_PAGE_SIZE, **OPEN_TASKS
+        )
+        for item in page.items:
+            await message.answer(
+                render_inbox_item(item),
+                reply_markup=get_junior_manager_inbox_actions(item['id']),
+                parse_mode='HTML'
+            )
+        if page.has_more:
+            await message.answer(
+                "⬇️ Yana zayavkalar bor.",
+                reply_markup=get_order_page_keyboard(OrderPageCallback(k='j'), page.next_cursor)
+            )
+        return bool(page.items)
 
     def render_inbox_item(item):
-        if item['type'] == 'zayavka':
-            return f"📝 <b>Zayavka #{item['id']}</b>\n{item['data']}\nStatus: {item['status']}"
-        return f"{item['type'].capitalize()} #{item['id']}"
+        return f"📝 <b>Zayavka #{item['id']}</b>\n{escape(item['description'] or '')}\nStatus: {item['status']}"
 
     @router.callback_query(F.data.startswith("action_"))
     async def junior_manager_action_handler(callback: CallbackQuery):
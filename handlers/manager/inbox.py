@@ -1,7 +1,7 @@
 from aiogram.types import Message
 from loader import bot
-from database.manager_queries import get_filtered_orders
 from database.base_queries import get_user_by_telegram_id
+from handlers.universal_inbox import answer_order_list, answer_role_inbox
 import asyncpg
 
 # Eski kodlar va callback handlerlar olib tashlandi
@@ -15,6 +15,7 @@ def get_manager_inbox_router():
         user = await get_user_by_telegram_id(message.from_user.id)
         lang = user.get('language', 'uz') if user else 'uz'
         pool: asyncpg.Pool = bot.db
+        shown = await answer_role_inbox(message, 'manager', lang)
 
         # 1. Xabarlar (messages jadvalidan)
         async with pool.acquire() as conn:
@@ -27,13 +28,6 @@ def get_manager_inbox_router():
                    LIMIT 20"""
             )
 
-        # 2. Zayavkalar (status cheklanmagan)
-        zayavkalar = await get_filtered_orders('', pool)
-
-        if not messages and not zayavkalar:
-            await message.answer("📭 Inbox bo'sh.")
-            return
-
         # Xabarlarni chiqarish
         for msg in messages:
             sender = msg['sender_name'] or "Noma'lum"
@@ -45,19 +39,8 @@ def get_manager_inbox_router():
                 parse_mode='HTML'
             )
 
-        # Zayavkalarni chiqarish
-        for z in zayavkalar:
-            desc = z['description'][:50] + ('...' if len(z['description']) > 50 else '')
-            created = z['created_at'].strftime('%d.%m %H:%M') if z['created_at'] else '-'
-            client = z.get('client_name', "Noma'lum")
-            status = z.get('status', '-')
-            await message.answer(
-                f"📝 <b>ID:</b> {z['id']}\n"
-                f"<b>Kimdan:</b> {client}\n"
-                f"<b>Ta'rif:</b> {desc}\n"
-                f"<b>Status:</b> {status}\n"
-                f"<b>Sana:</b> {created}",
-                parse_mode='HTML'
-            )
+        # 2. Zayavkalar (status cheklanmagan), sahifalab
+        if not await answer_order_list(message, 'm', lang) and not messages and not shown:
+            await message.answer("📭 Inbox bo'sh.")
 
     return router
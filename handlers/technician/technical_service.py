@@ -146,14 +146,14 @@ def get_technician_technical_service_router():
                 'diagnostics_notes': 'Technical diagnostics started'
             }
             
-            success = await workflow_engine.transition_workflow(
+            result = await workflow_engine.execute_transition(
                 request_id,
                 WorkflowAction.START_DIAGNOSTICS.value,
                 UserRole.TECHNICIAN.value,
                 transition_data
             )
             
-            if success:
+            if result:
                 if lang == 'uz':
                     text = (
                         "🔍 <b>Diagnostika boshlandi</b>\n\n"
@@ -188,6 +188,8 @@ def get_technician_technical_service_router():
                 await callback.message.edit_text(text, parse_mode='HTML', reply_markup=keyboard)
                 
                 logger.info(f"Technical diagnostics started for request {request_id} by technician {user['id']}")
+            elif result.conflict:
+                await callback.answer(result.error_text(lang))
             else:
                 error_text = "Diagnostikani boshlashda xatolik!" if lang == 'uz' else "Ошибка при начале диагностики!"
                 await callback.answer(error_text)
@@ -231,14 +233,14 @@ def get_technician_technical_service_router():
                 'warehouse_decision_at': str(datetime.now())
             }
             
-            success = await workflow_engine.transition_workflow(
+            result = await workflow_engine.execute_transition(
                 request_id,
                 WorkflowAction.DECIDE_WAREHOUSE_INVOLVEMENT.value,
                 UserRole.TECHNICIAN.value,
                 transition_data
             )
             
-            if success:
+            if result:
                 if lang == 'uz':
                     text = (
                         "✅ <b>Omborsiz hal qilish</b>\n\n"
@@ -265,6 +267,8 @@ def get_technician_technical_service_router():
                 await callback.message.edit_text(text, parse_mode='HTML', reply_markup=keyboard)
                 
                 logger.info(f"Warehouse involvement decision made for request {request_id}: {warehouse_needed}")
+            elif result.conflict:
+                await callback.answer(result.error_text(lang))
             else:
                 error_text = "Qaror qabul qilishda xatolik!" if lang == 'uz' else "Ошибка при принятии решения!"
                 await callback.answer(error_text)
@@ -329,14 +333,14 @@ def get_technician_technical_service_router():
                 'warehouse_involved': False
             }
             
-            success = await workflow_engine.transition_workflow(
+            result = await workflow_engine.execute_transition(
                 request_id,
                 WorkflowAction.COMPLETE_TECHNICAL_SERVICE.value,
                 UserRole.TECHNICIAN.value,
                 transition_data
             )
             
-            if success:
+            if result:
                 if lang == 'uz':
                     success_text = (
                         f"✅ <b>Texnik xizmat yakunlandi!</b>\n\n"
@@ -353,6 +357,8 @@ def get_technician_technical_service_router():
                 await message.answer(success_text, parse_mode='HTML')
                 
                 logger.info(f"Technical service request {request_id} completed by technician {user['id']}")
+            elif result.conflict:
+                await message.answer(result.error_text(lang))
             else:
                 error_text = "Yakunlashda xatolik!" if lang == 'uz' else "Ошибка при завершении!"
                 await message.answer(error_text)
@@ -1,9 +1,131 @@
-from aiogram import F
+from html import escape
+
+from aiogram import F, Router
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from utils.role_router import get_role_router
+from database import order_pages
+from database.base_queries import get_user_by_telegram_id
+from database.pagination import Page
 from database.utils_inbox import get_user_tasks
+from keyboards.inbox_buttons import (
+    InboxPageCallback, OrderPageCallback, get_inbox_page_keyboard, get_order_page_keyboard
+)
 from keyboards.task_buttons import get_task_keyboard
+from utils.inbox_service import InboxService
+from utils.logger import setup_module_logger
+
+logger = setup_module_logger("universal_inbox")
+
+inbox_service = InboxService()
+
+INBOX_PAGE_SIZE = 10
+
+_ORDER_DESK_ROLES = frozenset({'controller', 'call_center', 'call_center_supervisor'})
+
+# Zayavka lists of the staff inbox screens: code -> (roles that see it, order_pages filters)
+ORDER_LISTINGS = {
+    'n': (_ORDER_DESK_ROLES, {'statuses': order_pages.NEW_STATUSES}),
+    'i': (_ORDER_DESK_ROLES, {'statuses': order_pages.OPEN_STATUSES}),
+    'm': (frozenset({'manager'}), {'exclude_statuses': ('deleted',)}),
+}
+
+_ORDER_LIST_HEADERS = {
+    'n': ("🔹", "🔎 <b>Inbox buyurtmalar:</b>", "🔎 <b>Заказы в Inbox:</b>"),
+    'i': ("🔴", "🔴 <b>Muammoli buyurtmalar:</b>", "🔴 <b>Проблемные заказы:</b>"),
+}
+
+
+def render_inbox_page(page: Page, total: int, lang: str = 'uz') -> str:
+    """Text of one role inbox page; unread applications are marked 🆕"""
+    if not page.items:
+        return "📭 Inbox bo'sh." if lang == 'uz' else "📭 Inbox пустой."
+
+    header = "📬 <b>Rol inboxi</b>" if lang == 'uz' else "📬 <b>Входящие роли</b>"
+    lines = [f"{header} ({total})", ""]
+    for application in page.items:
+        details = application.get('application_details') or {}
+        marker = "🆕" if not application.get('is_read') else "🔹"
+        status = details.get('status') or details.get('current_status') or '-'
+        description = details.get('description') or application.get('title') or ''
+        if len(description) > 50:
+            description = description[:50] + "..."
+        client = details.get('client_name') or "-"
+        lines.append(
+            f"{marker} <b>#{escape(str(application['application_id'])[:8])}</b> "
+            f"[{escape(status)}] {escape(client)}\n    {escape(description)}"
+        )
+    return "\n".join(lines)
+
+
+def _short(text: str, length: int = 50) -> str:
+    text = text or ''
+    return escape(text[:length] + "..." if len(text) > length else text)
+
+
+def render_order_page(kind: str, page: Page, lang: str = 'uz') -> str:
+    """Text of one page of an inbox zayavka list"""
+    if not page.items:
+        return "📭 Inbox bo'sh." if lang == 'uz' else "📭 Inbox пустой."
+
+    if kind == 'm':
+        blocks = []
+        for order in page.items:
+            created = order['created_at'].strftime('%d.%m %H:%M') if order['created_at'] else '-'
+            client = order.get('client_name') or "Noma'lum"
+            blocks.append(
+                f"📝 <b>ID:</b> {order['id']}\n"
+                f"<b>Kimdan:</b> {escape(client)}\n"
+                f"<b>Ta'rif:</b> {_short(order['description'])}\n"
+                f"<b>Status:</b> {escape(order.get('status') or '-')}\n"
+                f"<b>Sana:</b> {created}"
+            )
+        return "\n\n".join(blocks)
+
+    marker, header_uz, header_ru = _ORDER_LIST_HEADERS[kind]
+    lines = [header_uz if lang == 'uz' else header_ru, ""]
+    lines.extend(f"{marker} <b>#{order['id']}</b> - {_short(order['description'])}" for order in page.items)
+    return "\n".join(lines)
+
+
+async def answer_order_list(message: Message, kind: str, lang: str = 'uz') -> bool:
+    """Send the first page of an inbox zayavka list; returns False (and sends nothing) if it is empty"""
+    _, filters = ORDER_LISTINGS[kind]
+    page = await order_pages.get_page(limit=INBOX_PAGE_SIZE, **filters)
+    if not page.items:
+        return False
+    await message.answer(
+        render_order_page(kind, page, lang),
+        reply_markup=get_order_page_keyboard(OrderPageCallback(k=kind), page.next_cursor, lang),
+        parse_mode='HTML'
+    )
+    return True
+
+
+async def answer_role_inbox(message: Message, role: str, lang: str = 'uz') -> bool:
+    """
+    Send the first page of a role's inbox with paging buttons.
+
+    Returns False (and sends nothing) when the role has no inbox or it is empty.
+    """
+    if role not in InboxService.VALID_ROLES:
+        return False
+    callback = InboxPageCallback.for_filters()
+    try:
+        page = await inbox_service.get_role_applications_page(role, message.from_user.id, page_size=INBOX_PAGE_SIZE)
+    except Exception as e:
+        logger.error(f"Error loading inbox for role {role}: {e}", exc_info=True)
+        return False
+    if not page.items:
+        return False
+    total = await inbox_service.get_role_application_total(role)
+    await message.answer(
+        render_inbox_page(page, total, lang),
+        reply_markup=get_inbox_page_keyboard(callback, page.next_cursor, lang),
+        parse_mode='HTML'
+    )
+    return True
+
 
 def get_universal_inbox_router():
     router = get_role_router(None) # Universal router for all roles
@@ -23,4 +145,57 @@ def get_universal_inbox_router():
             keyboard = await get_task_keyboard(task['id'])
             await message.answer(text, reply_markup=keyboard)
 
-    return router
\ No newline at end of file
+    return router
+
+
+def get_inbox_pages_router():
+    """
+    Page flips of the role inbox and the inbox zayavka lists, for every
+    inbox role; the role is checked in the handler, so this router carries
+    no RoleFilter.
+    """
+    router = Router(name="inbox_pages_router")
+
+    @router.callback_query(InboxPageCallback.filter())
+    async def flip_inbox_page(callback: CallbackQuery, callback_data: InboxPageCallback):
+        user = await get_user_by_telegram_id(callback.from_user.id)
+        role = user.get('role') if user else None
+        lang = user.get('language', 'uz') if user else 'uz'
+        if role not in InboxService.VALID_ROLES:
+            await callback.answer("Access denied", show_alert=True)
+            return
+
+        filters = dict(
+            application_type=callback_data.application_type,
+            priority=callback_data.priority,
+            include_read=callback_data.include_read
+        )
+        page = await inbox_service.get_role_applications_page(
+            role, callback.from_user.id, cursor=callback_data.c, page_size=INBOX_PAGE_SIZE, **filters
+        )
+        total = await inbox_service.get_role_application_total(role, **filters)
+        await callback.message.edit_text(
+            render_inbox_page(page, total, lang),
+            reply_markup=get_inbox_page_keyboard(callback_data, page.next_cursor, lang),
+            parse_mode='HTML'
+        )
+        await callback.answer()
+
+    @router.callback_query(OrderPageCallback.filter(F.k.in_(ORDER_LISTINGS)))
+    async def flip_order_page(callback: CallbackQuery, callback_data: OrderPageCallback):
+        user = await get_user_by_telegram_id(callback.from_user.id)
+        lang = user.get('language', 'uz') if user else 'uz'
+        roles, filters = ORDER_LISTINGS[callback_data.k]
+        if not user or user.get('role') not in roles:
+            await callback.answer("Access denied", show_alert=True)
+            return
+
+        page = await order_pages.get_page(cursor=callback_data.c, limit=INBOX_PAGE_SIZE, **filters)
+        await callback.message.edit_text(
+            render_order_page(callback_data.k, page, lang),
+            reply_markup=get_order_page_keyboard(callback_data, page.next_cursor, lang),
+            parse_mode='HTML'
+        )
+        await callback.answer()
+
+    return router
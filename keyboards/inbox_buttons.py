@@ -0,0 +1,110 @@
+"""
+Role inbox and order list paging keyboards.
+
+Callback data carries the listing filters and the keyset cursor of the
+next page, so a page flip needs no FSM state and costs the same as the
+first page. Everything fits in Telegram's 64-byte callback_data limit.
+"""
+
+from typing import Optional
+
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+# Single-character codes keep the filters short in callback_data
+APPLICATION_TYPE_CODES = {None: 'a', 'zayavka': 'z', 'service_request': 's'}
+PRIORITY_CODES = {None: 'a', 'low': 'l', 'medium': 'm', 'high': 'h', 'urgent': 'u'}
+
+
+class InboxPageCallback(CallbackData, prefix="ibx"):
+    """Page of the user's role inbox: t = application type, p = priority, u = unread only, c = cursor"""
+    t: str = 'a'
+    p: str = 'a'
+    u: int = 0
+    c: Optional[str] = None
+
+    @classmethod
+    def for_filters(cls, application_type: Optional[str] = None, priority: Optional[str] = None,
+                    include_read: bool = True, cursor: Optional[str] = None) -> 'InboxPageCallback':
+        return cls(
+            t=APPLICATION_TYPE_CODES[application_type],
+            p=PRIORITY_CODES[priority],
+            u=0 if include_read else 1,
+            c=cursor
+        )
+
+    @property
+    def application_type(self) -> Optional[str]:
+        return _decode(APPLICATION_TYPE_CODES, self.t)
+
+    @property
+    def priority(self) -> Optional[str]:
+        return _decode(PRIORITY_CODES, self.p)
+
+    @property
+    def include_read(self) -> bool:
+        return not self.u
+
+
+def _decode(codes: dict, code: str) -> Optional[str]:
+    for value, value_code in codes.items():
+        if value_code == code:
+            return value
+    return None
+
+
+def get_inbox_page_keyboard(callback: InboxPageCallback, next_cursor: Optional[str],
+                            lang: str = 'uz') -> InlineKeyboardMarkup:
+    """
+    Navigation for an inbox page: next page (when there is one), back to the
+    first page (when not on it) and an unread-only toggle.
+    """
+    next_text, first_text = ("➡️ Keyingi", "⏮ Boshiga") if lang == 'uz' else ("➡️ Далее", "⏮ В начало")
+    if callback.include_read:
+        toggle_text = "🆕 Faqat o'qilmagan" if lang == 'uz' else "🆕 Только непрочитанные"
+    else:
+        toggle_text = "📋 Hammasi" if lang == 'uz' else "📋 Все"
+
+    navigation = []
+    if callback.c:
+        navigation.append(InlineKeyboardButton(
+            text=first_text, callback_data=callback.model_copy(update={'c': None}).pack()
+        ))
+    if next_cursor:
+        try:
+            data = callback.model_copy(update={'c': next_cursor}).pack()
+        except ValueError:
+            # Longer than ConfigConstants.MAX_CALLBACK_DATA_LENGTH; only possible
+            # for application ids that are neither numbers nor UUIDs
+            data = None
+        if data:
+            navigation.append(InlineKeyboardButton(text=next_text, callback_data=data))
+
+    rows = [navigation] if navigation else []
+    rows.append([InlineKeyboardButton(
+        text=toggle_text,
+        callback_data=callback.model_copy(update={'u': 1 - callback.u, 'c': None}).pack()
+    )])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+class OrderPageCallback(CallbackData, prefix="zpg"):
+    """Page of an inbox order list: k = listing code (see handlers.universal_inbox.ORDER_LISTINGS), c = cursor"""
+    k: str
+    c: Optional[str] = None
+
+
+def get_order_page_keyboard(callback: OrderPageCallback, next_cursor: Optional[str],
+                            lang: str = 'uz') -> Optional[InlineKeyboardMarkup]:
+    """Back to the first page (when not on it) and next page (when there is one); None if neither"""
+    next_text, first_text = ("➡️ Keyingi", "⏮ Boshiga") if lang == 'uz' else ("➡️ Далее", "⏮ В начало")
+    navigation = []
+    if callback.c:
+        navigation.append(InlineKeyboardButton(
+            text=first_text, callback_data=callback.model_copy(update={'c': None}).pack()
+        ))
+    if next_cursor:
+        navigation.append(InlineKeyboardButton(
+            text=next_text, callback_data=callback.model_copy(update={'c': next_cursor}).pack()
+        ))
+    return InlineKeyboardMarkup(inline_keyboard=[navigation]) if navigation else None
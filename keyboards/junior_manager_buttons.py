@@ -79,11 +79,11 @@ def get_assign_order_keyboard(order_id, technicians, lang='uz'):
     return InlineKeyboardMarkup(inline_keyboard=keyboard) 
 
 def get_junior_manager_inbox_actions(order_id):
-    keyboard = InlineKeyboardMarkup()
-    keyboard.add(InlineKeyboardButton("Texnikka biriktirish", callback_data=f"action_assign_technician_zayavka_{order_id}"))
-    keyboard.add(InlineKeyboardButton("Izoh qo'shish", callback_data=f"action_comment_zayavka_{order_id}"))
-    keyboard.add(InlineKeyboardButton("Yakunlash", callback_data=f"action_complete_zayavka_{order_id}"))
-    return keyboard
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="Texnikka biriktirish", callback_data=f"action_assign_technician_zayavka_{order_id}")],
+        [InlineKeyboardButton(text="Izoh qo'shish", callback_data=f"action_comment_zayavka_{order_id}")],
+        [InlineKeyboardButton(text="Yakunlash", callback_data=f"action_complete_zayavka_{order_id}")]
+    ])
 
 def get_application_keyboard(application_id):
     keyboard = InlineKeyboardMarkup(
@@ -11,10 +11,19 @@ from utils.inline_cleanup import InlineMessageManager
 from config import ZAYAVKA_GROUP_ID
 from utils.role_dispatcher import RoleAwareDispatcher, set_global_role_dispatcher
 from database.base_queries import DatabaseManager
+from database.pool import close_shared_pool
+from database import client_search
 from utils.workflow_engine import WorkflowEngineFactory
 from utils.state_manager import StateManagerFactory
 from utils.notification_system import NotificationSystemFactory
 from utils.inventory_manager import InventoryManagerFactory
+from utils.audit_sink import access_log_sink
+from utils.notification_outbox import notification_outbox
+from utils.rollup_job import application_rollup_job
+from utils.client_index import client_index
+from utils.reservation_sweeper import stock_reservation_sweeper
+from utils.stock_alert_notifier import stock_alert_notifier
+from utils.notification_templates import template_registry
 
 # Load environment variables
 load_dotenv()
@@ -84,6 +93,16 @@ async def initialize_database():
         logger.error(f"Database initialization failed: {str(e)}", exc_info=True)
         raise
 
+async def backfill_client_phones():
+    """Fill users.phone_e164 (migration 025) for rows written without it"""
+    try:
+        async with bot.db.acquire() as conn:
+            filled = await client_search.backfill_phone_e164(conn)
+        if filled:
+            logger.info(f"Normalised {filled} client phone numbers for search")
+    except Exception as e:
+        logger.warning(f"Client phone backfill skipped: {str(e)}")
+
 async def create_basic_tables(conn):
     """Create basic tables if migration file is not available"""
     basic_schema = """
@@ -170,6 +189,9 @@ async def initialize_workflow_system():
         notification_system = NotificationSystemFactory.create_notification_system()
         inventory_manager = InventoryManagerFactory.create_inventory_manager()
         
+        # Compile notification templates edited by admins over the built-in ones
+        await template_registry.load(bot.db)
+        
         # Create workflow engine
         workflow_engine = WorkflowEngineFactory.create_workflow_engine(
             state_manager, notification_system, inventory_manager
@@ -200,9 +222,27 @@ async def on_startup():
         # Initialize database tables
         await initialize_database()
         
+        # Canonical phone numbers behind client search
+        await backfill_client_phones()
+        
         # Initialize workflow system
         await initialize_workflow_system()
         
+        # Start draining the notification outbox
+        notification_outbox.start()
+        
+        # Keep the hourly application rollups behind reports and alerts current
+        application_rollup_job.start()
+        
+        # Build the call-centre client search index in the background (if enabled)
+        client_index.start()
+        
+        # Release stock reservations nobody consumed or cancelled in time
+        stock_reservation_sweeper.start()
+        
+        # Tell the warehouse about stock level crossings, once each
+        stock_alert_notifier.start()
+        
         # Get bot info
         bot_info = await bot.get_me()
         logger.info(f"Bot started successfully: @{bot_info.username}")
@@ -217,9 +257,16 @@ async def on_shutdown():
         logger.info("Bot shutdown initiated...")
         if inline_message_manager:
             await inline_message_manager.stop_auto_cleanup()
+        # Stop outbox workers and the rollup job, and flush queued audit rows while the pool is still open
+        await notification_outbox.stop()
+        await application_rollup_job.stop()
+        await client_index.stop()
+        await stock_reservation_sweeper.stop()
+        await stock_alert_notifier.stop()
+        await access_log_sink.stop()
         if hasattr(bot, 'pool') and bot.pool:
-            await bot.pool.close()
-            logger.info("Database pool closed")
+            # bot.pool/bot.db is the shared pool used by every query module
+            await close_shared_pool()
         if 'cache' in globals() and cache:
             await cache.close()
             logger.info("Cache closed")
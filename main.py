@@ -9,6 +9,8 @@ from utils.rate_limiter import cleanup_expired_limits
 from middlewares.logger_middleware import LoggerMiddleware
 from middlewares.error_handler import ErrorHandlerMiddleware
 from middlewares.enhanced_role_filter import EnhancedRoleFilterMiddleware
+from middlewares.identity_middleware import IdentityContextMiddleware
+from middlewares.role_routing_middleware import role_routing_middleware
 
 # Yagona logger (bot, INFO)
 logger = setup_logger("bot")
@@ -20,6 +22,12 @@ logging.getLogger("aiohttp.connector").setLevel(logging.CRITICAL)
 logging.getLogger("asyncio").setLevel(logging.CRITICAL)
 
 def setup_middlewares(dp: Dispatcher):
+    # Resolve the sender once per update, before any router filters run
+    dp.update.outer_middleware(IdentityContextMiddleware())
+    # Send static texts/callbacks straight to the sender's role router (needs handlers included)
+    role_routing_middleware.compile(dp)
+    dp.message.outer_middleware(role_routing_middleware)
+    dp.callback_query.outer_middleware(role_routing_middleware)
     dp.message.middleware(LoggerMiddleware())
     dp.message.middleware(ErrorHandlerMiddleware())
     dp.message.middleware(EnhancedRoleFilterMiddleware())
@@ -4,6 +4,10 @@ from typing import Callable, Dict, Any, Union
 import logging
 from utils.get_role import get_user_role
 from utils.workflow_access_control import WorkflowAccessControl
+from utils.audit_sink import access_log_sink
+from utils.capabilities import (
+    RoleCapabilities, build_capability_maps, get_role_capabilities, get_user_capabilities
+)
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +19,8 @@ class EnhancedRoleFilterMiddleware(BaseMiddleware):
     
     def __init__(self):
         self.access_control = WorkflowAccessControl()
+        # Capabilities depend only on role: build them once, hand them out by reference
+        self.capability_maps = build_capability_maps()
     
     async def __call__(
         self,
@@ -33,11 +39,11 @@ class EnhancedRoleFilterMiddleware(BaseMiddleware):
             # Add comprehensive role information to handler data
             data['user_id'] = user.id
             data['user_role'] = user_role
-            data['user_capabilities'] = await self._get_user_capabilities(user.id, user_role)
+            data['user_capabilities'] = self._get_user_capabilities(user.id, user_role)
             data['access_control'] = self.access_control
             
-            # Log user activity for audit trail
-            await self._log_user_activity(user.id, user_role, event)
+            # Queue user activity for the audit trail (written in the background)
+            self._log_user_activity(user.id, user_role, event)
             
             # Continue with handler execution
             return await handler(event, data)
@@ -46,48 +52,16 @@ class EnhancedRoleFilterMiddleware(BaseMiddleware):
             logger.error(f"Enhanced role filter middleware error: {str(e)}")
             return await handler(event, data)
     
-    async def _get_user_capabilities(self, user_id: int, role: str) -> dict:
-        """Get comprehensive user capabilities including workflow permissions"""
+    def _get_user_capabilities(self, user_id: int, role: str) -> RoleCapabilities:
+        """Get precomputed, frozen capabilities (shared by reference, per-user overrides cached)"""
         try:
-            # Get workflow-based permissions
-            workflow_permissions = await self.access_control.get_user_permissions(user_id, role)
-            
-            # Get legacy permissions for backward compatibility
-            legacy_permissions = await self._get_legacy_capabilities(role)
-            
-            return {
-                **legacy_permissions,
-                'workflow_permissions': workflow_permissions,
-                'user_id': user_id,
-                'role': role
-            }
-            
+            return get_user_capabilities(user_id, role)
         except Exception as e:
             logger.error(f"Error getting user capabilities: {e}")
-            return {'role': role, 'error': str(e)}
-    
-    async def _get_legacy_capabilities(self, role: str) -> dict:
-        """Get legacy capabilities for backward compatibility"""
-        try:
-            from utils.get_role import ROLE_PERMISSIONS, get_role_level
-            
-            permissions = ROLE_PERMISSIONS.get(role, [])
-            
-            return {
-                'role': role,
-                'level': get_role_level(role),
-                'permissions': permissions,
-                'can_manage_users': 'manage_users' in permissions,
-                'can_view_all_zayavkas': 'view_all_zayavkas' in permissions,
-                'can_assign_tasks': 'assign_tasks' in permissions,
-                'can_manage_materials': 'manage_materials' in permissions
-            }
-        except Exception as e:
-            logger.error(f"Error getting legacy capabilities: {e}")
-            return {'role': role}
+            return get_role_capabilities('blocked')
     
-    async def _log_user_activity(self, user_id: int, user_role: str, event: Union[Message, CallbackQuery]):
-        """Log user activity for audit purposes"""
+    def _log_user_activity(self, user_id: int, user_role: str, event: Union[Message, CallbackQuery]):
+        """Queue user activity for audit purposes"""
         try:
             if isinstance(event, Message):
                 activity_type = "message"
@@ -99,8 +73,8 @@ class EnhancedRoleFilterMiddleware(BaseMiddleware):
                 activity_type = "unknown"
                 activity_detail = str(type(event))
             
-            # Log to access control system
-            await self.access_control.log_access_attempt(
+            # Batched write to access_control_logs, off the handler path
+            access_log_sink.record(
                 user_id=user_id,
                 action=f"user_activity_{activity_type}",
                 resource=activity_detail,
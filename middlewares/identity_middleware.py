@@ -0,0 +1,40 @@
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from typing import Callable, Dict, Any, Awaitable
+import logging
+
+from utils.identity_context import IdentityContext, set_current_identity, reset_current_identity
+
+logger = logging.getLogger(__name__)
+
+class IdentityContextMiddleware(BaseMiddleware):
+    """
+    Outer update middleware that loads the sender's users row once per update.
+
+    The row is exposed to handlers as ``data['identity']`` and, through a
+    ContextVar, to RoleFilter, get_user_role/get_user_lang and the
+    *_by_telegram_id query helpers, so none of them query users again.
+    """
+
+    def __init__(self, pool=None):
+        self.pool = pool
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get('event_from_user') or getattr(event, 'from_user', None)
+        if not user:
+            return await handler(event, data)
+
+        identity = IdentityContext(telegram_id=user.id)
+        await identity.load(self.pool)
+        data['identity'] = identity
+
+        token = set_current_identity(identity)
+        try:
+            return await handler(event, data)
+        finally:
+            reset_current_identity(token)
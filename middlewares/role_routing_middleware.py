@@ -1,156 +1,92 @@
 from aiogram import BaseMiddleware, Router
+from aiogram.dispatcher.event.bases import UNHANDLED
 from aiogram.types import Message, CallbackQuery, TelegramObject
-from typing import Callable, Dict, Any, Union, Optional, Awaitable
-import logging
+from typing import Callable, Dict, Any, Awaitable
 from utils.get_role import get_user_role
+from utils.role_dispatcher import RoleDispatchTable, DISPATCH_EVENT_KEYS
 from config import config
-from database.base_queries import get_user_by_telegram_id
 from utils.logger import setup_logger
 
 logger = setup_logger('bot.role_routing')
 
 class RoleRoutingMiddleware(BaseMiddleware):
     """
-    Middleware that routes messages to role-specific routers before normal Aiogram processing.
-    This prevents role mismatch errors when multiple roles have handlers for the same text.
+    Outer message/callback middleware that sends events straight to the sender's role router.
+
+    Role routers are compiled into a RoleDispatchTable at startup. When the
+    event's text or callback data is in the table for the sender's role, the
+    matching handlers are run directly, so neither the RoleFilters of the
+    other role routers nor the filters of unrelated handlers are probed.
+    Everything else, and any event no candidate accepts, continues through
+    normal Aiogram processing.
     """
-    
+
     def __init__(self):
-        self.role_routers: Dict[str, Router] = {}
-        self.global_router: Optional[Router] = None
-        
+        self.table = RoleDispatchTable()
+        self.fast_path_hits = 0
+        self.fallbacks = 0
+
     def register_role_router(self, role: str, router: Router):
-        """Register a role-specific router"""
-        self.role_routers[role] = router
+        """Register and compile a role-specific router"""
+        self.table.add_role_router(role, router)
         logger.info(f"Registered router for role: {role}")
-    
-    def register_global_router(self, router: Router):
-        """Register the global navigation router"""
-        self.global_router = router
-        logger.debug("Registered global navigation router")
-    
+
+    def compile(self, dispatcher: Router):
+        """Compile the dispatch table from the role routers included in the dispatcher"""
+        self.table = RoleDispatchTable.from_dispatcher(dispatcher)
+        logger.info(
+            f"Role dispatch table compiled: {len(self.table)} keys for "
+            f"{len(self.table.role_routers)} roles, {self.table.dynamic_handlers} dynamic handlers"
+        )
+
     async def __call__(
         self,
         handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
         event: TelegramObject,
         data: Dict[str, Any]
     ) -> Any:
-        # Get user info for role-based routing
-        user_id = None
-        if isinstance(event, (Message, CallbackQuery)):
-            user_id = event.from_user.id
-            
-        if user_id:
-            try:
-                user = await get_user_by_telegram_id(user_id)
-                if user:
-                    data['user_role'] = user.get('role', 'client')
-                    data['user_data'] = user
-                else:
-                    data['user_role'] = 'client'  # Default role
-                    data['user_data'] = None
-            except Exception as e:
-                logger.error(f"Error getting user role: {e}")
-                data['user_role'] = 'client'
-                data['user_data'] = None
-        
-        try:
-            # Get user info
-            user = getattr(event, "from_user", None)
-            if not user:
-                return await handler(event, data)
-            
-            user_id = user.id
-            user_role = data.get('user_role', 'client')
-            
-            if config.DEVELOPMENT:
-                event_text = getattr(event, 'text', None) or getattr(event, 'data', None)
-                logger.debug(
-                    f"[RoleRoutingMiddleware] user_id={user_id}, role={user_role}, "
-                    f"event_type={type(event).__name__}, text/data={event_text}"
-                )
-            
-            # Check if we have a role-specific router for this user's role
-            role_router = self.role_routers.get(user_role)
-            
-            if role_router:
-                # Try to handle with role-specific router first
-                try:
-                    # Create a temporary dispatcher to test if the role router can handle this event
-                    from aiogram import Dispatcher
-                    from aiogram.fsm.storage.memory import MemoryStorage
-                    
-                    temp_dp = Dispatcher(storage=MemoryStorage())
-                    temp_dp.include_router(role_router)
-                    
-                    # Check if any handler in the role router matches this event
-                    if isinstance(event, Message):
-                        handlers = role_router.message.handlers
-                    elif isinstance(event, CallbackQuery):
-                        handlers = role_router.callback_query.handlers
-                    else:
-                        handlers = []
-                    
-                    # If we have matching handlers, let the role router handle it
-                    if handlers:
-                        for handler_obj in handlers:
-                            # Check if this handler's filters match the event
-                            try:
-                                if hasattr(handler_obj, 'filters'):
-                                    # This is a simplified check - in practice, Aiogram does more complex matching
-                                    can_handle = True
-                                    for filter_obj in handler_obj.filters:
-                                        if hasattr(filter_obj, '__call__'):
-                                            try:
-                                                filter_result = await filter_obj(event)
-                                                if not filter_result:
-                                                    can_handle = False
-                                                    break
-                                            except Exception:
-                                                can_handle = False
-                                                break
-                                    
-                                    if can_handle:
-                                        if config.DEVELOPMENT:
-                                            logger.debug(f"[RoleRoutingMiddleware] Routing to {user_role} router")
-                                        # Let the normal handler processing continue
-                                        return await handler(event, data)
-                            except Exception as e:
-                                if config.DEVELOPMENT:
-                                    logger.debug(f"[RoleRoutingMiddleware] Filter check error: {e}")
-                                continue
-                
-                except Exception as e:
-                    if config.DEVELOPMENT:
-                        logger.debug(f"[RoleRoutingMiddleware] Role router check failed: {e}")
-            
-            # If global router exists, check if it should handle this
-            if self.global_router:
-                try:
-                    # Global router handles navigation commands that work for all roles
-                    if isinstance(event, Message):
-                        text = event.text
-                        if text and (text.startswith('/') or text in ['🏠 Bosh menyu', '🏠 Главное меню', '⬅️ Orqaga', '⬅️ Назад']):
-                            if config.DEVELOPMENT:
-                                logger.debug("[RoleRoutingMiddleware] Routing to global router")
-                            return await handler(event, data)
-                    elif isinstance(event, CallbackQuery):
-                        data_str = event.data
-                        if data_str and (data_str.startswith('main_menu') or data_str.startswith('back_to')):
-                            if config.DEVELOPMENT:
-                                logger.debug("[RoleRoutingMiddleware] Routing to global router")
-                            return await handler(event, data)
-                except Exception as e:
-                    if config.DEVELOPMENT:
-                        logger.debug(f"[RoleRoutingMiddleware] Global router check failed: {e}")
-            
-            # Continue with normal processing
+        user = getattr(event, "from_user", None)
+        if not user or not isinstance(event, (Message, CallbackQuery)):
             return await handler(event, data)
-            
+
+        try:
+            event_type = 'message' if isinstance(event, Message) else 'callback_query'
+            key = getattr(event, DISPATCH_EVENT_KEYS[event_type], None)
+            user_role = await get_user_role(user.id)
+            data['user_role'] = user_role
+            candidates = self.table.lookup(user_role, event_type, key)
         except Exception as e:
             logger.error(f"[RoleRoutingMiddleware] Error: {str(e)}", exc_info=True)
-            # Continue with normal processing on error
+            candidates = None
+
+        if not candidates:
+            self.fallbacks += 1
             return await handler(event, data)
 
+        if config.DEVELOPMENT:
+            logger.debug(
+                f"[RoleRoutingMiddleware] user_id={user.id}, role={user_role}, "
+                f"event_type={event_type}, text/data={key} -> {len(candidates)} candidate handlers"
+            )
+
+        response = await self.table.dispatch(candidates, event, data)
+        if response is not UNHANDLED:
+            self.fast_path_hits += 1
+            return response
+
+        # Key matched but the handler's other filters (e.g. FSM state) did not
+        self.fallbacks += 1
+        return await handler(event, data)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get dispatch statistics"""
+        return {
+            'compiled_keys': len(self.table),
+            'roles': len(self.table.role_routers),
+            'dynamic_handlers': self.table.dynamic_handlers,
+            'fast_path_hits': self.fast_path_hits,
+            'fallbacks': self.fallbacks,
+        }
+
 # Global instance
 role_routing_middleware = RoleRoutingMiddleware()
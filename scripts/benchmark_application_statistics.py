@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Dashboard application statistics over a generated service_requests table.
+
+old: AdminReportingSystem.generate_dashboard_report called
+     get_application_statistics(1), (7) and (30); each fetched every
+     service_requests row of its window and counted them in Python.
+new: ApplicationTracker.get_windowed_statistics((1, 7, 14, 30)) runs one
+     grouping-sets query with per-window FILTER counters over the hourly
+     rollup buckets (application_rollup_hourly) and assembles the few dozen
+     breakdown rows it returns.
+
+Without a database the script generates ``--rows`` rows in memory and
+reports the rows each mode ships to Python and the Python time spent on
+them (the database side of the new query is not measured). With ``--dsn``
+it loads the same distribution into a scratch schema (dropped afterwards),
+applies migration 024, times the initial rollup refresh and then both modes
+end to end.
+
+    BOT_TOKEN=1:x ADMIN_IDS=1 python scripts/benchmark_application_statistics.py
+    BOT_TOKEN=1:x ADMIN_IDS=1 python scripts/benchmark_application_statistics.py --dsn postgresql://... --rows 1000000
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database import application_rollups
+from utils.application_tracker import _statistics_query, _window_stats
+
+SCHEMA = 'bench_app_stats'
+MIGRATION = Path(__file__).parent.parent / 'database' / 'migrations' / '024_application_rollups.sql'
+OLD_WINDOWS = (1, 7, 30)
+NEW_WINDOWS = (30, 14, 7, 1)
+SOURCES = ['client', 'manager', 'junior_manager', 'controller', 'call_center']
+STATUSES = ['new', 'assigned', 'in_progress', 'completed', 'completed', 'cancelled', 'failed']
+OLD_QUERY = """
+    SELECT id, created_by_staff, creation_source, created_at, current_status, completion_rating
+    FROM service_requests
+    WHERE created_at >= $1
+    ORDER BY created_at DESC
+"""
+
+
+def old_statistics(apps, days_back):
+    """The counting get_application_statistics did on the fetched rows"""
+    total = len(apps)
+    staff = len([app for app in apps if app['created_by_staff']])
+    completed = len([app for app in apps if app['current_status'] == 'completed'])
+    failed = len([app for app in apps if app['current_status'] in ['cancelled', 'failed']])
+    hourly = defaultdict(int)
+    for app in apps:
+        if app['created_at']:
+            hourly[app['created_at'].hour] += 1
+    peak = [hour for hour, _ in sorted(hourly.items(), key=lambda x: x[1], reverse=True)[:3]]
+    return total, staff, completed, failed, total / days_back, peak
+
+
+def generate(rows, now):
+    rng = random.Random(42)
+    apps = []
+    for n in range(rows):
+        source = rng.choice(SOURCES)
+        apps.append({
+            'id': n, 'created_by_staff': source != 'client', 'creation_source': source,
+            'created_at': now - timedelta(seconds=rng.randrange(90 * 86400)),
+            'current_status': rng.choice(STATUSES), 'completion_rating': None
+        })
+    apps.sort(key=lambda app: app['created_at'], reverse=True)
+    return apps
+
+
+def grouped_rows(apps, starts):
+    """Stand-in for the database side of the new query: its result rows"""
+    counters = {}
+    for app in apps:
+        if app['created_at'] < starts[0]:
+            continue
+        staff = app['created_by_staff']
+        groups = (('total', None, None, None, None), ('staff', staff, None, None, None),
+                  ('staff_hour', staff, app['created_at'].hour, None, None),
+                  ('hour', None, app['created_at'].hour, None, None),
+                  ('source', None, None, app['creation_source'], None),
+                  ('status', None, None, None, app['current_status']))
+        flags = [app['created_at'] >= start for start in starts]
+        for group in groups:
+            counter = counters.setdefault(group, Counter())
+            for index, inside in enumerate(flags):
+                if inside:
+                    counter[f'total_{index}'] += 1
+                    counter[f'staff_{index}'] += staff
+                    counter[f'completed_{index}'] += app['current_status'] == 'completed'
+                    counter[f'failed_{index}'] += app['current_status'] in ('cancelled', 'failed')
+    rows = []
+    for (breakdown, staff, hour, source, status), counter in counters.items():
+        row = {'breakdown': breakdown, 'created_by_staff': staff, 'hour': hour,
+               'creation_source': source, 'current_status': status}
+        row.update({f'{name}_{index}': counter[f'{name}_{index}']
+                    for index in range(len(starts)) for name in ('total', 'staff', 'completed', 'failed')})
+        rows.append(row)
+    return rows
+
+
+def offline_report(rows):
+    now = datetime.utcnow()
+    print(f"generating {rows:,} rows over 90 days ...")
+    apps = generate(rows, now)
+
+    fetched = {days: [app for app in apps if app['created_at'] >= now - timedelta(days=days)] for days in OLD_WINDOWS}
+    shipped = sum(len(window) for window in fetched.values())
+    started = time.perf_counter()
+    old = {days: old_statistics(window, days) for days, window in fetched.items()}
+    old_seconds = time.perf_counter() - started
+
+    starts = [now - timedelta(days=days) for days in NEW_WINDOWS]
+    result = grouped_rows(apps, starts)
+    started = time.perf_counter()
+    windows = {days: _window_stats(result, index, days) for index, days in enumerate(NEW_WINDOWS)}
+    new_seconds = time.perf_counter() - started
+
+    print(f"old: {shipped:>10,} rows shipped to Python, {old_seconds * 1000:9.1f} ms counting (3 windows)")
+    print(f"new: {len(result):>10,} rows shipped to Python, {new_seconds * 1000:9.1f} ms assembling (4 windows)")
+    for days in OLD_WINDOWS:
+        total, staff, completed, failed, _, _ = old[days]
+        stats = windows[days].overall
+        assert (stats.total_applications, stats.staff_created) == (total, staff), f"{days}-day window differs"
+        assert round(stats.success_rate * total / 100) == completed, f"{days}-day window differs"
+        assert round(stats.error_rate * total / 100) == failed, f"{days}-day window differs"
+    print(f"30-day total {windows[30].overall.total_applications:,}, both modes agree")
+
+
+async def online_report(dsn, rows):
+    import asyncpg
+
+    conn = await asyncpg.connect(dsn)
+    try:
+        await conn.execute(f"""
+            DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+            CREATE SCHEMA {SCHEMA};
+            SET search_path TO {SCHEMA};
+            CREATE TABLE service_requests (
+                id BIGINT PRIMARY KEY,
+                created_by_staff BOOLEAN DEFAULT FALSE,
+                creation_source VARCHAR(50) DEFAULT 'client',
+                created_at TIMESTAMP NOT NULL,
+                current_status VARCHAR(50),
+                workflow_type VARCHAR(50),
+                completion_rating INTEGER
+            );
+            CREATE TABLE users (id BIGINT PRIMARY KEY);
+            CREATE TABLE zayavki (
+                id BIGINT PRIMARY KEY, user_id BIGINT, assigned_to BIGINT, created_at TIMESTAMP,
+                status VARCHAR(50), created_by_role VARCHAR(50), zayavka_type VARCHAR(50)
+            );
+            CREATE TABLE staff_application_audit (
+                id BIGINT PRIMARY KEY, application_id VARCHAR(50), creator_id BIGINT, creator_role VARCHAR(50),
+                client_id BIGINT, application_type VARCHAR(50), creation_timestamp TIMESTAMP,
+                client_notified BOOLEAN, workflow_initiated BOOLEAN, metadata JSONB
+            )
+        """)
+        await conn.execute("""
+            INSERT INTO service_requests (id, created_by_staff, creation_source, created_at, current_status)
+            SELECT n, src <> 'client', src,
+                   now() AT TIME ZONE 'UTC' - random() * INTERVAL '90 days',
+                   (ARRAY['new', 'assigned', 'in_progress', 'completed', 'completed', 'cancelled', 'failed'])
+                       [1 + floor(random() * 7)::int]
+            FROM (
+                SELECT n, (ARRAY['client', 'manager', 'junior_manager', 'controller', 'call_center'])
+                              [1 + floor(random() * 5)::int] AS src
+                FROM generate_series(1, $1) n
+            ) g
+        """, rows)
+        await conn.execute("ANALYZE service_requests")
+        await conn.execute(MIGRATION.read_text())
+
+        started = time.perf_counter()
+        buckets = await application_rollups.refresh(conn, 'service_request', 300)
+        print(f"initial rollup: {buckets:,} buckets in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        for attempt in ('cold', 'warm'):
+            now = datetime.utcnow()
+            started = time.perf_counter()
+            shipped = 0
+            for days in OLD_WINDOWS:
+                apps = await conn.fetch(OLD_QUERY, now - timedelta(days=days))
+                shipped += len(apps)
+                old_statistics(apps, days)
+            old_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            hour = now.replace(minute=0, second=0, microsecond=0)
+            starts = [hour - timedelta(days=days) for days in NEW_WINDOWS]
+            result = await conn.fetch(_statistics_query(len(NEW_WINDOWS)), *starts)
+            for index, days in enumerate(NEW_WINDOWS):
+                _window_stats(result, index, days)
+            new_seconds = time.perf_counter() - started
+
+            print(f"{attempt}: old {old_seconds * 1000:9.1f} ms ({shipped:,} rows), "
+                  f"new {new_seconds * 1000:9.1f} ms ({len(result)} rows)")
+    finally:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--dsn', help="PostgreSQL DSN for the end-to-end timing")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    offline_report(args.rows)
+    if args.dsn:
+        asyncio.run(online_report(args.dsn, args.rows))
+
+
+if __name__ == '__main__':
+    main()
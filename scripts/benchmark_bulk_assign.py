@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Admin bulk assignment of ``--orders`` orders to one technician.
+
+old: bulk_assign_orders looped over the order ids inside a transaction and
+     sent an UPDATE of zayavki and an INSERT into assignment_logs for each
+     (2 statements, 2 round trips per order).
+new: admin_queries.bulk_assign_orders sends BULK_ASSIGN_QUERY once: an
+     UPDATE ... FROM unnest($1::int[]) whose RETURNING ids feed a single
+     INSERT ... SELECT into assignment_logs.
+
+Without a database the script counts the statements each mode sends and
+times them against a connection that answers every statement after
+``--rtt`` milliseconds (a network round trip; the work done by the server
+is not modelled). With ``--dsn`` it creates zayavki and assignment_logs in
+a scratch schema (dropped afterwards) and times both modes end to end,
+including a failing call with one unknown order id.
+
+    BOT_TOKEN=1:x ADMIN_IDS=1 python scripts/benchmark_bulk_assign.py
+    BOT_TOKEN=1:x ADMIN_IDS=1 python scripts/benchmark_bulk_assign.py --dsn postgresql://... --orders 500
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database import admin_queries
+
+SCHEMA = 'bench_bulk_assign'
+TECHNICIAN_ID = 2
+ADMIN_ID = 1
+OLD_UPDATE = """
+    UPDATE zayavki
+    SET assigned_to = $1, status = 'assigned',
+        assigned_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+    WHERE id = $2
+"""
+OLD_LOG = """
+    INSERT INTO assignment_logs (order_id, technician_id, assigned_by, assigned_at)
+    VALUES ($1, $2, $3, CURRENT_TIMESTAMP)
+"""
+
+
+async def old_bulk_assign(conn, order_ids, technician_id, admin_id):
+    """The per-order loop bulk_assign_orders used to run"""
+    async with conn.transaction():
+        for order_id in order_ids:
+            await conn.execute(OLD_UPDATE, technician_id, order_id)
+            await conn.execute(OLD_LOG, order_id, technician_id, admin_id)
+    return True
+
+
+class RoundTripConnection:
+    """Answers each statement after a fixed delay and counts them"""
+
+    def __init__(self, rtt):
+        self.rtt = rtt
+        self.statements = 0
+
+    def transaction(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, query, *args):
+        self.statements += 1
+        await asyncio.sleep(self.rtt)
+        if query is admin_queries.BULK_ASSIGN_QUERY:
+            return f"INSERT 0 {len(args[0])}"
+        return "UPDATE 1"
+
+
+def bot_with(conn):
+    bot = MagicMock()
+    bot.db.acquire.return_value = conn
+    return bot
+
+
+async def offline_report(orders, rtt_ms):
+    order_ids = list(range(1, orders + 1))
+    print(f"{orders} orders, {rtt_ms} ms per round trip (no database)")
+
+    conn = RoundTripConnection(rtt_ms / 1000)
+    started = time.perf_counter()
+    await old_bulk_assign(conn, order_ids, TECHNICIAN_ID, ADMIN_ID)
+    print(f"old: {conn.statements:>5} statements {(time.perf_counter() - started) * 1000:9.1f} ms")
+
+    conn = RoundTripConnection(rtt_ms / 1000)
+    started = time.perf_counter()
+    with patch.object(admin_queries, 'bot', bot_with(conn)):
+        assert await admin_queries.bulk_assign_orders(order_ids, TECHNICIAN_ID, ADMIN_ID)
+    print(f"new: {conn.statements:>5} statements {(time.perf_counter() - started) * 1000:9.1f} ms")
+
+
+async def online_report(dsn, orders):
+    import asyncpg
+
+    pool = await asyncpg.create_pool(dsn, min_size=1, max_size=2,
+                                     server_settings={'search_path': SCHEMA})
+    try:
+        async with pool.acquire() as conn:
+            await conn.execute(f"""
+                DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+                CREATE SCHEMA {SCHEMA};
+                CREATE TABLE {SCHEMA}.zayavki (
+                    id SERIAL PRIMARY KEY, status VARCHAR(20) DEFAULT 'new', assigned_to INTEGER,
+                    assigned_at TIMESTAMP, updated_at TIMESTAMP
+                );
+                CREATE TABLE {SCHEMA}.assignment_logs (
+                    id SERIAL PRIMARY KEY, order_id INTEGER REFERENCES {SCHEMA}.zayavki(id),
+                    technician_id INTEGER, assigned_by INTEGER,
+                    assigned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, notes TEXT
+                );
+                INSERT INTO {SCHEMA}.zayavki (status) SELECT 'new' FROM generate_series(1, {orders});
+            """)
+        order_ids = list(range(1, orders + 1))
+
+        for attempt in ('cold', 'warm'):
+            async with pool.acquire() as conn:
+                started = time.perf_counter()
+                await old_bulk_assign(conn, order_ids, TECHNICIAN_ID, ADMIN_ID)
+                old_seconds = time.perf_counter() - started
+            with patch.object(admin_queries, 'bot', MagicMock(db=pool)):
+                started = time.perf_counter()
+                assert await admin_queries.bulk_assign_orders(order_ids, TECHNICIAN_ID, ADMIN_ID)
+                new_seconds = time.perf_counter() - started
+            print(f"{attempt}: old {old_seconds * 1000:8.1f} ms, new {new_seconds * 1000:8.1f} ms")
+
+        async with pool.acquire() as conn:
+            logs = await conn.fetchval(f"SELECT COUNT(*) FROM {SCHEMA}.assignment_logs")
+        with patch.object(admin_queries, 'bot', MagicMock(db=pool)):
+            assert not await admin_queries.bulk_assign_orders(order_ids + [orders + 1], TECHNICIAN_ID, ADMIN_ID)
+        async with pool.acquire() as conn:
+            assert await conn.fetchval(f"SELECT COUNT(*) FROM {SCHEMA}.assignment_logs") == logs
+        print("unknown order id: nothing assigned or logged")
+    finally:
+        async with pool.acquire() as conn:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--dsn', help="PostgreSQL DSN for the end-to-end timing")
+    parser.add_argument('--orders', type=int, default=500)
+    parser.add_argument('--rtt', type=float, default=0.5, help="offline round trip in milliseconds")
+    args = parser.parse_args()
+
+    asyncio.run(offline_report(args.orders, args.rtt))
+    if args.dsn:
+        asyncio.run(online_report(args.dsn, args.orders))
+
+
+if __name__ == '__main__':
+    main()
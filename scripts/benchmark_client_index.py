@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Call-centre client lookups over a generated client base, with and without
+the in-process typeahead index.
+
+old: every lookup is answered by scanning the clients (what
+     ``full_name ILIKE '%...%' OR phone_number ILIKE '%...%'`` does in
+     the database without a usable index); here a Python scan stands in.
+new: utils.client_index.ClientSearchIndex answers with ranked ids from
+     its sorted phone/suffix keys and folded name tokens.
+
+Without a database the script generates ``--clients`` clients (Latin and
+Cyrillic names, Uzbek numbers), reports the build time and the memory the
+index holds (tracemalloc), and times typical operator queries in both
+modes. With ``--dsn`` it also loads the clients into a scratch schema
+(dropped afterwards), applies migration 025 and times
+``client_search.search_users`` against PostgreSQL for the same queries.
+
+    BOT_TOKEN=1:x ADMIN_IDS=1 python scripts/benchmark_client_index.py
+    BOT_TOKEN=1:x ADMIN_IDS=1 python scripts/benchmark_client_index.py --dsn postgresql://... --clients 500000
+"""
+
+import argparse
+import asyncio
+import gc
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database import client_search
+from utils.client_index import ClientSearchIndex, fold_name
+
+SCHEMA = 'bench_client_index'
+MIGRATION = Path(__file__).parent.parent / 'database' / 'migrations' / '025_client_search.sql'
+FIRST_NAMES = ['Aziz', 'Oʻktam', 'Dilnoza', 'Gʻayrat', 'Shahnoza', 'Bobur', 'Nilufar', 'Jasur', 'Madina', 'Sardor',
+               'Алишер', 'Ўктам', 'Дилноза', 'Евгений', 'Ольга', 'Рустам', 'Гульнара', 'Тимур', 'Хуршид', 'Зарина']
+LAST_NAMES = ['Rahimov', 'Karimova', 'Xoʻjayev', 'Yusupov', 'Toshmatova', 'Saidov', 'Nazarova', 'Ergashev',
+              'Иванов', 'Хўжаев', 'Юсупов', 'Каримова', 'Назарова', 'Ахмедов', 'Петрова', 'Сафаров']
+# Synthetic surnames (syllable + syllable + ending) on top of the common ones above
+SYLLABLES = ['ra', 'him', 'ka', 'rim', 'tosh', 'mat', 'sa', 'id', 'na', 'zar', 'er', 'gash', 'yu', 'sup',
+             'ah', 'med', 'sa', 'far', 'qo', 'dir', 'bek', 'mur', 'od', 'ist', 'xol']
+ENDINGS = ['ov', 'ova', 'ev', 'eva']
+OPERATORS = ['90', '91', '93', '94', '95', '97', '98', '99', '33', '88']
+QUERIES = [
+    ('exact phone', '+998 90 123 45 67'),
+    ('phone prefix', '90 123'),
+    ('last digits', '4567'),
+    ('name prefix', 'dilno'),
+    ('first + last', 'oktam xojayev'),
+    ('cyrillic', 'Хўжаев'),
+    ('typo', 'rahimof'),
+]
+
+
+def generate(clients):
+    rng = random.Random(7)
+    rows = []
+    for user_id in range(1, clients + 1):
+        if rng.random() < 0.5:
+            last_name = rng.choice(LAST_NAMES)
+        else:
+            last_name = (rng.choice(SYLLABLES) + rng.choice(SYLLABLES) + rng.choice(ENDINGS)).capitalize()
+        rows.append({
+            'id': user_id,
+            'full_name': f"{rng.choice(FIRST_NAMES)} {last_name}",
+            'phone_number': f"+998{rng.choice(OPERATORS)}{rng.randrange(10 ** 7):07d}",
+            'phone_e164': None,
+            'role': 'client',
+        })
+    rows[12345 % clients]['phone_number'] = '+998901234567'
+    return rows
+
+
+def fake_pool(rows, batch_size=10000):
+    batches = [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)] + [[]]
+    conn = MagicMock()
+    conn.fetch = AsyncMock(side_effect=batches)
+    pool = MagicMock()
+    pool.acquire.return_value.__aenter__ = AsyncMock(return_value=conn)
+    pool.acquire.return_value.__aexit__ = AsyncMock(return_value=None)
+    return pool
+
+
+def scan(rows, term, limit=10):
+    """The old lookup: substring match over every client"""
+    folded = term.lower()
+    digits = ''.join(char for char in term if char.isdigit())
+    found = []
+    for row in rows:
+        if (digits and digits in row['phone_number']) or (not digits and folded in row['full_name'].lower()):
+            found.append(row['id'])
+            if len(found) >= limit:
+                break
+    return found
+
+
+def timed(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - started) / repeat, result
+
+
+def offline_report(clients):
+    print(f"generating {clients:,} clients ...")
+    rows = generate(clients)
+    index = ClientSearchIndex(pool=fake_pool(rows), enabled=True)
+
+    started = time.perf_counter()
+    asyncio.run(index.warm())
+    build_seconds = time.perf_counter() - started
+
+    # Memory is measured on a second build: tracing slows the build down
+    measured = ClientSearchIndex(pool=fake_pool(rows), enabled=True)
+    gc.collect()
+    tracemalloc.start()
+    asyncio.run(measured.warm())
+    gc.collect()
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del measured
+    gc.collect()
+    stats = index.get_stats()
+    print(f"build: {build_seconds:.1f} s, {stats['users']:,} users, {stats['name_tokens']:,} name tokens")
+    print(f"memory: {held / 2 ** 20:.0f} MiB held by the index, {peak / 2 ** 20:.0f} MiB peak while building "
+          f"({held / stats['users']:.0f} bytes per client)")
+
+    print(f"{'query':<16}{'term':<20}{'old scan':>12}{'index':>12}  hits")
+    for label, term in QUERIES:
+        old_seconds, _ = timed(lambda: scan(rows, term), 3)
+        new_seconds, ranked = timed(lambda: index.search(term), 200)
+        print(f"{label:<16}{term:<20}{old_seconds * 1e3:>9.1f} ms{new_seconds * 1e6:>9.0f} µs  {len(ranked)}")
+
+    probe = rows[100]
+    index.upsert(probe['id'], full_name='Bekzod Qodirov')
+    seconds, _ = timed(lambda: index.upsert(probe['id'], full_name='Bekzod Qodirov' if index.search('bekzod')
+                                            else probe['full_name']), 200)
+    assert fold_name('Хўжаев') == fold_name('Xoʻjayev')
+    print(f"incremental update: {seconds * 1e6:.0f} µs")
+    return index
+
+
+async def online_report(dsn, clients, index):
+    import asyncpg
+
+    conn = await asyncpg.connect(dsn)
+    try:
+        await conn.execute(f"""
+            DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+            CREATE SCHEMA {SCHEMA};
+            SET search_path TO {SCHEMA}, public;
+            CREATE TABLE users (
+                id BIGINT PRIMARY KEY, telegram_id BIGINT, full_name TEXT, phone_number TEXT,
+                role VARCHAR(20), created_at TIMESTAMP DEFAULT now()
+            )
+        """)
+        rows = generate(clients)
+        await conn.copy_records_to_table('users', records=[
+            (row['id'], None, row['full_name'], row['phone_number'], row['role']) for row in rows
+        ], columns=['id', 'telegram_id', 'full_name', 'phone_number', 'role'])
+        await conn.execute(MIGRATION.read_text())
+        await client_search.backfill_phone_e164(conn, 10000)
+        await conn.execute("ANALYZE users")
+
+        index.enabled = index.ready = False
+        for label, term in QUERIES:
+            for attempt in ('cold', 'warm'):
+                started = time.perf_counter()
+                found = await client_search.search_users(conn, term)
+                db_seconds = time.perf_counter() - started
+                index.enabled = index.ready = True
+                started = time.perf_counter()
+                await client_search.fetch_ranked_users(conn, index.search(term))
+                index_seconds = time.perf_counter() - started
+                index.enabled = index.ready = False
+            print(f"{label:<16}db {db_seconds * 1e3:8.2f} ms ({len(found)} rows), "
+                  f"index + fetch by id {index_seconds * 1e3:8.2f} ms")
+    finally:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--dsn', help="PostgreSQL DSN for the end-to-end timing")
+    parser.add_argument('--clients', type=int, default=500_000)
+    args = parser.parse_args()
+
+    index = offline_report(args.clients)
+    if args.dsn:
+        asyncio.run(online_report(args.dsn, args.clients, index))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Notification rendering micro-benchmark: 100k personalised assignment messages.
+
+Text only: the old inline rendering (per-language dictionaries and f-strings
+rebuilt for every message) against the template registry, where
+the workflow name is bound once per (template, language) and only the
+personal fields are formatted.
+
+Full assignment messages (text plus per-recipient reply keyboard) as the
+fan-out builds them: the old per-recipient rendering against
+``_build_notification_message``, which renders each request once per
+language for all of its recipients.
+
+    BOT_TOKEN=1:x ADMIN_IDS=1 python scripts/benchmark_notification_templates.py
+"""
+
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from utils.notification_system import NotificationSystem
+from utils.notification_templates import WORKFLOW_NAMES, TemplateRegistry
+
+MESSAGES = 100_000
+RECIPIENTS_PER_REQUEST = 25
+WORKFLOWS = ['connection_request', 'technical_service', 'call_center_direct']
+PRIORITIES = ['low', 'medium', 'high', 'urgent']
+
+
+def build_requests():
+    """(language, workflow_type, request_data) per recipient, RECIPIENTS_PER_REQUEST per request"""
+    rng = random.Random(42)
+    base = datetime(2025, 1, 1)
+    recipients = []
+    for n in range(MESSAGES // RECIPIENTS_PER_REQUEST):
+        workflow_type = rng.choice(WORKFLOWS)
+        request_data = {
+            'description': f"Mijoz #{n}: internet ishlamayapti, router qayta yuklandi " * rng.randint(1, 3),
+            'priority': rng.choice(PRIORITIES),
+            'created_at': base + timedelta(minutes=n),
+        }
+        recipients.extend(
+            (rng.choice(['uz', 'ru']), workflow_type, request_data) for _ in range(RECIPIENTS_PER_REQUEST)
+        )
+    return recipients
+
+
+def render_inline(lang, workflow_type, request_data):
+    """The per-message rendering NotificationSystem used before the registry"""
+    if lang == 'uz':
+        title = "🔔 Yangi topshiriq"
+        workflow_names = {
+            'connection_request': 'Ulanish so\'rovi',
+            'technical_service': 'Texnik xizmat',
+            'call_center_direct': 'Call-markaz xizmati'
+        }
+        workflow_name = workflow_names.get(workflow_type, workflow_type)
+        return (
+            f"{title}\n\n"
+            f"📋 Tur: {workflow_name}\n"
+            f"📝 Tavsif: {(request_data['description'] or '')[:100]}...\n"
+            f"⚡ Muhimlik: {request_data['priority']}\n"
+            f"📅 Yaratilgan: {request_data['created_at'].strftime('%d.%m.%Y %H:%M')}\n\n"
+            f"Barcha topshiriqlarni ko'rish uchun tugmani bosing:"
+        ), "📋 Topshiriqlarni ko'rish"
+    title = "🔔 Новое задание"
+    workflow_names = {
+        'connection_request': 'Запрос подключения',
+        'technical_service': 'Техническое обслуживание',
+        'call_center_direct': 'Сервис call-центра'
+    }
+    workflow_name = workflow_names.get(workflow_type, workflow_type)
+    return (
+        f"{title}\n\n"
+        f"📋 Тип: {workflow_name}\n"
+        f"📝 Описание: {(request_data['description'] or '')[:100]}...\n"
+        f"⚡ Приоритет: {request_data['priority']}\n"
+        f"📅 Создано: {request_data['created_at'].strftime('%d.%m.%Y %H:%M')}\n\n"
+        f"Нажмите кнопку для просмотра всех заданий:"
+    ), "📋 Просмотр заданий"
+
+
+def render_registry(registry, lang, workflow_type, request_data):
+    """What NotificationSystem._build_notification_message does now"""
+    return registry.render(
+        'assignment', lang,
+        static={'workflow_name': WORKFLOW_NAMES.get(lang, WORKFLOW_NAMES['ru']).get(workflow_type, workflow_type)},
+        description=(request_data['description'] or '')[:100],
+        priority=request_data['priority'],
+        created_at=request_data['created_at'].strftime('%d.%m.%Y %H:%M')
+    ), registry.render('assignment.button', lang)
+
+
+def run(name, render_all, requests):
+    started = time.perf_counter()
+    rendered = render_all(requests)
+    elapsed = time.perf_counter() - started
+    print(f"{name:<12} {elapsed * 1000:8.1f} ms  {len(requests) / elapsed:>12,.0f} msg/s")
+    return rendered
+
+
+def render_per_request(registry, requests):
+    """Registry rendering once per (request, language), the way the fan-out reuses texts"""
+    texts = []
+    for start in range(0, len(requests), RECIPIENTS_PER_REQUEST):
+        rendered = {}
+        for lang, workflow_type, request_data in requests[start:start + RECIPIENTS_PER_REQUEST]:
+            text = rendered.get(lang)
+            if text is None:
+                text = rendered[lang] = render_registry(registry, lang, workflow_type, request_data)
+            texts.append(text)
+    return texts
+
+
+def build_keyboard(button_text, notification_id):
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=button_text, callback_data=f"view_assignments_{notification_id}")]
+    ])
+
+
+def fanout_inline(requests):
+    """Old fan-out: every recipient's text rendered inline"""
+    messages = []
+    for n, (lang, workflow_type, request_data) in enumerate(requests):
+        text, button_text = render_inline(lang, workflow_type, request_data)
+        messages.append((text, build_keyboard(button_text, n)))
+    return messages
+
+
+def fanout_registry(system, requests):
+    """NotificationSystem._build_notification_message with one cache per request, as in the fan-out"""
+    messages = []
+    for start in range(0, len(requests), RECIPIENTS_PER_REQUEST):
+        rendered = {}
+        for n, (lang, workflow_type, request_data) in enumerate(
+                requests[start:start + RECIPIENTS_PER_REQUEST], start):
+            messages.append(system._build_notification_message(
+                {'language': lang}, 'req', workflow_type, request_data, n, rendered
+            ))
+    return messages
+
+
+def main():
+    requests = build_requests()
+    registry = TemplateRegistry()
+    system = NotificationSystem(pool=object(), templates=registry)
+
+    print(f"text only, {MESSAGES:,} messages")
+    inline = run("inline", lambda items: [render_inline(*item) for item in items], requests)
+    compiled = run("registry", lambda items: [render_registry(registry, *item) for item in items], requests)
+    per_request = run("per-request", lambda items: render_per_request(registry, items), requests)
+    assert inline == compiled == per_request, "registry output differs from the inline rendering"
+
+    print(f"text + keyboard, {RECIPIENTS_PER_REQUEST} recipients per request")
+    old = run("inline", fanout_inline, requests)
+    new = run("registry", lambda items: fanout_registry(system, items), requests)
+    assert [(text, keyboard.model_dump()) for text, keyboard in old] == \
+        [(text, keyboard.model_dump()) for text, keyboard in new], "fan-out messages differ"
+
+    print(f"outputs identical; registry stats: {registry.get_stats()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Role dispatch micro-benchmark: 1k synthetic updates through 8 role routers.
+
+Compares the old RoleRoutingMiddleware path (temporary Dispatcher per event,
+then aiogram probing every role router's RoleFilter) with plain aiogram
+propagation and with the compiled role dispatch table.
+
+    BOT_TOKEN=1:x ADMIN_IDS=1 python scripts/benchmark_role_dispatch.py
+"""
+
+import asyncio
+import logging
+import random
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aiogram import Dispatcher, F
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import CallbackQuery, Chat, Message, User
+
+from middlewares.role_routing_middleware import RoleRoutingMiddleware
+from utils.identity_context import IdentityContext, set_current_identity, reset_current_identity
+from utils.role_router import get_role_router
+
+ROLES = ['admin', 'manager', 'technician', 'client', 'call_center', 'controller', 'warehouse', 'junior_manager']
+HANDLERS_PER_ROLE = 40
+UPDATES = 1000
+
+
+def build_dispatcher():
+    dp = Dispatcher()
+
+    async def handler(event):
+        return True
+
+    for role in ROLES:
+        router = get_role_router(role)
+        for i in range(HANDLERS_PER_ROLE):
+            router.message(F.text.in_([f"{role} button {i}", f"{role} кнопка {i}"]))(handler)
+            router.callback_query(F.data.startswith(f"{role}_action_{i}_"))(handler)
+        dp.include_router(router)
+    return dp
+
+
+def build_updates():
+    rng = random.Random(42)
+    updates = []
+    for n in range(UPDATES):
+        role = rng.choice(ROLES[1:])  # admin is decided by ADMIN_IDS, not the users row
+        telegram_id = 1000 + n
+        user = User(id=telegram_id, is_bot=False, first_name="Bench")
+        i = rng.randrange(HANDLERS_PER_ROLE)
+        if n % 2:
+            event = Message(
+                message_id=n, date=datetime.now(), text=f"{role} button {i}",
+                chat=Chat(id=telegram_id, type="private"), from_user=user,
+            )
+            updates.append((role, 'message', event))
+        else:
+            event = CallbackQuery(id=str(n), chat_instance="1", data=f"{role}_action_{i}_{n}", from_user=user)
+            updates.append((role, 'callback_query', event))
+    return updates
+
+
+async def run(dp, updates, legacy=False):
+    started = time.perf_counter()
+    for role, event_type, event in updates:
+        token = set_current_identity(IdentityContext(
+            telegram_id=event.from_user.id, identity={'id': 1, 'role': role}, loaded=True
+        ))
+        try:
+            if legacy:
+                Dispatcher(storage=MemoryStorage())
+            await dp.propagate_event(event_type, event)
+        finally:
+            reset_current_identity(token)
+    return time.perf_counter() - started
+
+
+async def main():
+    logging.disable(logging.INFO)
+    updates = build_updates()
+
+    plain_dp = build_dispatcher()
+    compiled_dp = build_dispatcher()
+    middleware = RoleRoutingMiddleware()
+    middleware.compile(compiled_dp)
+    compiled_dp.message.outer_middleware(middleware)
+    compiled_dp.callback_query.outer_middleware(middleware)
+
+    # Warm up
+    await run(plain_dp, updates[:50])
+    await run(compiled_dp, updates[:50])
+
+    results = {
+        'legacy (temp Dispatcher + probing)': await run(plain_dp, updates, legacy=True),
+        'plain aiogram probing': await run(plain_dp, updates),
+        'compiled dispatch table': await run(compiled_dp, updates),
+    }
+    for name, elapsed in results.items():
+        print(f"{name:38s} {elapsed * 1000:8.1f} ms total  {elapsed / UPDATES * 1e6:8.1f} µs/update")
+    print(middleware.get_stats())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
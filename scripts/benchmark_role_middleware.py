@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+EnhancedRoleFilterMiddleware overhead per update.
+
+"before" replays the old per-update work: awaiting
+WorkflowAccessControl.get_user_permissions, rebuilding the legacy
+capability dict from ROLE_PERMISSIONS and awaiting the audit INSERT.
+"after" runs the current middleware (frozen capability maps injected by
+reference, audit row queued to the background sink). The database is a
+fake pool; it is run once answering instantly (CPU overhead only) and
+once with 0.5 ms per statement (what the handler waits on in production).
+
+    BOT_TOKEN=1:x ADMIN_IDS=1 python scripts/benchmark_role_middleware.py
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from aiogram.types import Chat, Message, User
+
+from middlewares import enhanced_role_filter
+from middlewares.enhanced_role_filter import EnhancedRoleFilterMiddleware
+from utils.audit_sink import AccessLogSink
+from utils.get_role import ROLE_PERMISSIONS, get_role_level
+from utils.identity_context import IdentityContext
+from utils.workflow_access_control import WorkflowAccessControl
+
+UPDATES = 2000
+ROLES = ['manager', 'technician', 'client', 'call_center', 'controller', 'warehouse']
+
+
+class FakeConnection:
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def execute(self, *args):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return "INSERT 0 1"
+
+    async def copy_records_to_table(self, *args, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return "COPY"
+
+
+class FakeAcquire:
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def __aenter__(self):
+        return FakeConnection(self.latency)
+
+    async def __aexit__(self, *args):
+        return False
+
+
+class FakePool:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def acquire(self):
+        return FakeAcquire(self.latency)
+
+
+async def legacy_middleware(access_control, get_user_role, handler, event, data):
+    """The per-update work the middleware did before capability maps and the audit sink"""
+    user = event.from_user
+    role = await get_user_role(user.id)
+    data['user_id'] = user.id
+    data['user_role'] = role
+    workflow_permissions = await access_control.get_user_permissions(user.id, role)
+    permissions = ROLE_PERMISSIONS.get(role, [])
+    legacy = {
+        'role': role,
+        'level': get_role_level(role),
+        'permissions': permissions,
+        'can_manage_users': 'manage_users' in permissions,
+        'can_view_all_zayavkas': 'view_all_zayavkas' in permissions,
+        'can_assign_tasks': 'assign_tasks' in permissions,
+        'can_manage_materials': 'manage_materials' in permissions
+    }
+    data['user_capabilities'] = {**legacy, 'workflow_permissions': workflow_permissions,
+                                 'user_id': user.id, 'role': role}
+    data['access_control'] = access_control
+    await access_control.log_access_attempt(
+        user_id=user.id, action="user_activity_message", resource=f"text:{event.text[:50]}...",
+        granted=True, reason=f"User {role} activity logged"
+    )
+    return await handler(event, data)
+
+
+async def run(latency, events, identities, get_user_role):
+    async def handler(event, data):
+        return data['user_capabilities']['can_assign_tasks']
+
+    access_control = WorkflowAccessControl(pool=FakePool(latency))
+    started = time.perf_counter()
+    for event in events:
+        await legacy_middleware(access_control, get_user_role, handler, event, {})
+    before = time.perf_counter() - started
+
+    enhanced_role_filter.access_log_sink = AccessLogSink(pool=FakePool(latency))
+    middleware = EnhancedRoleFilterMiddleware()
+    started = time.perf_counter()
+    for event, identity in zip(events, identities):
+        await middleware(handler, event, {'identity': identity})
+    after = time.perf_counter() - started
+    await enhanced_role_filter.access_log_sink.stop()
+
+    print(f"DB latency {latency * 1000:.1f} ms:")
+    for name, elapsed in (('before', before), ('after', after)):
+        print(f"  {name:8s} {elapsed * 1000:8.1f} ms total  {elapsed / UPDATES * 1e6:8.2f} µs/update")
+    print(f"  sink: {enhanced_role_filter.access_log_sink.get_stats()}")
+
+
+async def main():
+    logging.disable(logging.INFO)
+    events = [
+        Message(
+            message_id=i, date=datetime.now(), text=f"button {i % 40}",
+            chat=Chat(id=5000 + i, type="private"),
+            from_user=User(id=5000 + i, is_bot=False, first_name="Bench"),
+        )
+        for i in range(UPDATES)
+    ]
+    role_of = {event.from_user.id: ROLES[i % len(ROLES)] for i, event in enumerate(events)}
+    identities = [
+        IdentityContext(telegram_id=event.from_user.id, identity={'id': event.from_user.id}, loaded=True)
+        for event in events
+    ]
+
+    async def get_user_role(user_id):
+        return role_of[user_id]
+
+    enhanced_role_filter.get_user_role = get_user_role
+    await run(0.0, events, identities, get_user_role)
+    await run(0.0005, events, identities, get_user_role)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+state_data write volume of a 10-step staff-created connection request.
+
+old: every transition sends the whole merged document
+     ({**request.state_data, **enhanced_transition_data}) and stores it,
+     staff context and free-text notes included.
+new: every transition sends WorkflowEngine._state_patch(data), merged by
+     the database with ``state_data || $patch::jsonb``; notes and staff
+     context only go to state_transitions.transition_data.
+
+Without a database the script reports the JSON bytes sent per transition
+and the size of the stored document after each step; every UPDATE writes a
+new row version with the full document, so the summed document sizes are
+what the heap and WAL have to absorb. With ``--dsn`` it also replays the
+workflow for ``--requests`` requests against PostgreSQL in a scratch schema
+(dropped afterwards) and reports the WAL generated per mode.
+
+    BOT_TOKEN=1:x ADMIN_IDS=1 python scripts/benchmark_state_data_patches.py
+    BOT_TOKEN=1:x ADMIN_IDS=1 python scripts/benchmark_state_data_patches.py --dsn postgresql://... --requests 2000
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database.jsonb import dumps
+from database.models import ServiceRequest, UserRole, WorkflowAction, WorkflowType
+from utils.workflow_engine import WorkflowEngine
+
+SCHEMA = 'bench_state_patch'
+
+
+def initial_state():
+    return {
+        'created_by_staff': True,
+        'staff_creator_info': {
+            'creator_id': 17, 'creator_role': 'call_center', 'creator_name': 'Dilnoza Karimova',
+            'creator_telegram_id': 5012345678, 'created_at': '2025-03-01T09:30:00'
+        },
+        'client_info': {'full_name': 'Aziz Rahimov', 'phone': '+998901234567', 'address': 'Chilonzor 9-kvartal, 14-uy'},
+        'description': "Yangi uyga optik tolali internet ulash kerak, router mijozda yo'q",
+        'location': 'Tashkent, Chilonzor',
+    }
+
+
+def workflow_steps():
+    """(role before the step, action, data) for ten transitions"""
+    notes = "Mijoz bilan gaplashildi: kechki vaqt qulay, podyezd kodi 4512, itga ehtiyot bo'ling. " * 4
+    equipment = [
+        {'name': 'ONT Huawei HG8245', 'serial': f'HW{n:08d}', 'quantity': 1} for n in range(3)
+    ] + [{'name': 'Optik kabel', 'unit': 'm', 'quantity': 45}]
+    return [
+        (UserRole.MANAGER.value, WorkflowAction.ASSIGN_TO_JUNIOR_MANAGER.value, {'actor_id': 3, 'junior_manager_id': 8}),
+        (UserRole.JUNIOR_MANAGER.value, WorkflowAction.CALL_CLIENT.value, {'actor_id': 8, 'call_notes': notes}),
+        (UserRole.JUNIOR_MANAGER.value, WorkflowAction.FORWARD_TO_CONTROLLER.value,
+         {'actor_id': 8, 'call_notes': notes, 'additional_comments': 'Tezkor ulash so\'raldi'}),
+        (UserRole.CONTROLLER.value, WorkflowAction.ASSIGN_TO_TECHNICIAN.value, {'actor_id': 5, 'technician_id': 21}),
+        (UserRole.TECHNICIAN.value, WorkflowAction.START_INSTALLATION.value,
+         {'actor_id': 21, 'installation_notes': notes, 'equipment_used': [], 'started_at': '2025-03-02T10:00:00'}),
+        (UserRole.TECHNICIAN.value, WorkflowAction.DOCUMENT_EQUIPMENT.value,
+         {'actor_id': 21, 'installation_notes': notes, 'equipment_used': equipment}),
+        (UserRole.WAREHOUSE.value, WorkflowAction.UPDATE_INVENTORY.value,
+         {'actor_id': 30, 'inventory_updates': equipment, 'inventory_checked_at': '2025-03-02T15:00:00'}),
+        (UserRole.WAREHOUSE.value, WorkflowAction.UPDATE_INVENTORY.value,
+         {'actor_id': 30, 'inventory_updates': equipment[:1], 'inventory_checked_at': '2025-03-02T15:10:00'}),
+        (UserRole.WAREHOUSE.value, WorkflowAction.CLOSE_REQUEST.value,
+         {'actor_id': 30, 'inventory_updates': equipment, 'closed_at': '2025-03-02T16:00:00'}),
+        (UserRole.CLIENT.value, 'workflow_completed',
+         {'actor_id': 99, 'rating': 5, 'feedback': 'Tez va sifatli', 'comments': notes}),
+    ]
+
+
+def replay(engine, mode):
+    """Yield (state_data parameter, transition_data parameter, stored document) per step"""
+    state = initial_state()
+    for role, action, data in workflow_steps():
+        request = ServiceRequest(
+            id='req', workflow_type=WorkflowType.CONNECTION_REQUEST.value, role_current=role, state_data=state
+        )
+        enhanced = engine._enhance_transition_data_with_staff_context(request, data)
+        if mode == 'old':
+            state = {**state, **enhanced}
+            parameter = dumps(state)
+        else:
+            patch = engine._state_patch(data)
+            state = {**state, **patch}
+            parameter = dumps(patch)
+        yield parameter, dumps(enhanced), dumps(state)
+
+
+def offline_report(engine):
+    print(f"{'step':>4} {'old sent':>9} {'old doc':>8} {'new sent':>9} {'new doc':>8}   (bytes of JSON)")
+    totals = {'old': [0, 0, 0], 'new': [0, 0, 0]}
+    old_steps = list(replay(engine, 'old'))
+    new_steps = list(replay(engine, 'new'))
+    for n, (old, new) in enumerate(zip(old_steps, new_steps), 1):
+        print(f"{n:>4} {len(old[0]):>9,} {len(old[2]):>8,} {len(new[0]):>9,} {len(new[2]):>8,}")
+        for mode, (parameter, transition_data, document) in (('old', old), ('new', new)):
+            totals[mode][0] += len(parameter)
+            totals[mode][1] += len(transition_data)
+            totals[mode][2] += len(document)
+    final = {'old': len(old_steps[-1][2]), 'new': len(new_steps[-1][2])}
+    for mode, (sent, transition_data, written) in totals.items():
+        print(f"{mode}: state_data sent {sent:,} B, transition_data {transition_data:,} B, "
+              f"state_data row versions written {written:,} B, final document {final[mode]:,} B")
+    print(f"state_data bytes written: {totals['new'][2] / totals['old'][2]:.0%} of before")
+
+
+async def online_report(engine, dsn, requests):
+    import asyncpg
+
+    conn = await asyncpg.connect(dsn)
+    try:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+        for mode in ('old', 'new'):
+            steps = list(replay(engine, mode))
+            await conn.execute(f"""
+                CREATE TABLE {SCHEMA}.requests_{mode} (
+                    id INTEGER PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0, state_data JSONB NOT NULL
+                );
+                CREATE TABLE {SCHEMA}.transitions_{mode} (
+                    id BIGSERIAL PRIMARY KEY, request_id INTEGER, transition_data JSONB
+                )
+            """)
+            await conn.execute(
+                f"INSERT INTO {SCHEMA}.requests_{mode} (id, state_data) "
+                f"SELECT n, $1::jsonb FROM generate_series(1, $2) n",
+                dumps(initial_state()), requests
+            )
+            if mode == 'old':
+                update = f"UPDATE {SCHEMA}.requests_old SET state_data = $2::jsonb, version = version + 1 WHERE id = $1"
+            else:
+                update = (f"UPDATE {SCHEMA}.requests_new SET state_data = state_data || $2::jsonb, "
+                          f"version = version + 1 WHERE id = $1")
+            insert = f"INSERT INTO {SCHEMA}.transitions_{mode} (request_id, transition_data) VALUES ($1, $2::jsonb)"
+
+            await conn.execute("CHECKPOINT")
+            start = await conn.fetchval("SELECT pg_current_wal_lsn()")
+            for parameter, transition_data, _ in steps:
+                async with conn.transaction():
+                    await conn.executemany(update, [(n, parameter) for n in range(1, requests + 1)])
+                    await conn.executemany(insert, [(n, transition_data) for n in range(1, requests + 1)])
+            wal = await conn.fetchval("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), $1)", start)
+            size = await conn.fetchval(f"SELECT pg_total_relation_size('{SCHEMA}.requests_{mode}')")
+            print(f"{mode}: WAL {wal / 1024 / 1024:8.1f} MiB for {requests:,} requests x {len(steps)} steps, "
+                  f"requests table {size / 1024 / 1024:.1f} MiB")
+    finally:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--dsn', help="PostgreSQL DSN for the WAL measurement (needs CHECKPOINT rights)")
+    parser.add_argument('--requests', type=int, default=1000)
+    args = parser.parse_args()
+
+    engine = WorkflowEngine(state_manager=None, notification_system=None, inventory_manager=None, access_control=object())
+    offline_report(engine)
+    if args.dsn:
+        asyncio.run(online_report(engine, args.dsn, args.requests))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Tests for the hourly application rollups and the readers built on them.
+"""
+
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from database import application_rollups
+from utils.rollup_job import ApplicationRollupJob
+
+
+def make_conn(fetchrow=None, fetch=None, execute="INSERT 0 5"):
+    conn = MagicMock()
+    conn.fetchrow = AsyncMock(return_value=fetchrow)
+    conn.fetch = AsyncMock(return_value=fetch or [])
+    conn.execute = AsyncMock(return_value=execute)
+    conn.transaction.return_value.__aenter__ = AsyncMock(return_value=None)
+    conn.transaction.return_value.__aexit__ = AsyncMock(return_value=None)
+    return conn
+
+
+def make_pool(conn):
+    pool = MagicMock()
+    pool.acquire.return_value.__aenter__ = AsyncMock(return_value=conn)
+    pool.acquire.return_value.__aexit__ = AsyncMock(return_value=None)
+    return pool
+
+
+def test_insert_queries_count_each_source_table():
+    assert set(application_rollups.INSERT_BUCKETS_QUERIES) == set(application_rollups.ROLLUP_KINDS)
+
+    query = application_rollups.INSERT_BUCKETS_QUERIES['staff_audit']
+    assert "JOIN staff_application_audit t ON t.creation_timestamp >= r.lo" in query
+    assert "COUNT(*) FILTER (WHERE t.client_notified AND t.workflow_initiated)" in query
+    assert "JOIN zayavki t ON t.created_at" in application_rollups.INSERT_BUCKETS_QUERIES['zayavka']
+
+
+@pytest.mark.asyncio
+async def test_refresh_replaces_recent_and_dirty_hours_then_advances_watermark():
+    recount_from = datetime(2026, 5, 1, 10, tzinfo=timezone.utc)
+    refreshed_at = recount_from + timedelta(minutes=17)
+    dirty = datetime(2026, 4, 2, 8, tzinfo=timezone.utc)
+    conn = make_conn(fetchrow={'recount_from': recount_from, 'refreshed_at': refreshed_at},
+                     fetch=[{'bucket_start': dirty}])
+
+    written = await application_rollups.refresh(conn, 'zayavka', 300)
+
+    assert written == 5
+    conn.fetchrow.assert_awaited_once_with(application_rollups.LOCK_WATERMARK_QUERY, 'zayavka', 300.0)
+    conn.fetch.assert_awaited_once_with(application_rollups.CLAIM_DIRTY_HOURS_QUERY, 'zayavka')
+    statements = [call.args for call in conn.execute.await_args_list]
+    assert statements == [
+        (application_rollups.DELETE_BUCKETS_QUERY, 'zayavka', recount_from, [dirty]),
+        (application_rollups.INSERT_BUCKETS_QUERIES['zayavka'], recount_from, [dirty]),
+        (application_rollups.ADVANCE_WATERMARK_QUERY, 'zayavka', refreshed_at),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_refresh_unknown_kind():
+    with pytest.raises(ValueError):
+        await application_rollups.refresh(make_conn(fetchrow=None), 'nope', 0)
+
+
+@pytest.mark.asyncio
+async def test_fetch_audit_metrics_assembles_grouping_sets():
+    row = lambda breakdown, role, hour, total, **counters: {
+        'breakdown': breakdown, 'role': role, 'hour': hour, 'total': total, 'notified': 0, 'workflow': 0,
+        'successful': 0, 'errors': 0, 'complete': 0, **counters}
+    conn = make_conn(fetch=[
+        row('total', None, None, 5, errors=1),
+        row('role', 'manager', None, 3, successful=2),
+        row('hour', None, 9, 4),
+        row('hour', None, 14, 1),
+        row('role_hour', 'manager', 9, 3),
+    ])
+
+    metrics = await application_rollups.fetch_audit_metrics(conn, datetime(2026, 5, 1))
+
+    assert metrics[None]['total'] == 5 and metrics[None]['errors'] == 1
+    assert metrics[None]['hourly'][9] == 4 and metrics[None]['hourly'][14] == 1
+    assert metrics['manager']['successful'] == 2 and metrics['manager']['hourly'][9] == 3
+
+
+@pytest.mark.asyncio
+async def test_fetch_period_totals_rejects_unknown_granularity():
+    with pytest.raises(ValueError):
+        await application_rollups.fetch_period_totals(make_conn(), 'zayavka', datetime(2026, 5, 1), 'week')
+
+
+@pytest.mark.asyncio
+async def test_admin_dashboard_stats_from_rollups():
+    from database import admin_queries
+
+    conn = make_conn(
+        fetch=[{'status': 'new', 'count': 7, 'today': 2}, {'status': 'completed', 'count': 5, 'today': 1},
+               {'status': 'pending', 'count': 1, 'today': 0}],
+        fetchrow={'customers': 4, 'technicians': 2},
+    )
+    conn.fetch = AsyncMock(side_effect=[[{'role': 'client', 'count': 4}], conn.fetch.return_value])
+
+    with patch.object(admin_queries.bot, 'db', make_pool(conn), create=True):
+        stats = await admin_queries.get_admin_dashboard_stats()
+
+    assert conn.fetch.await_args_list[1].args == (application_rollups.ZAYAVKA_STATUS_QUERY,)
+    assert stats['orders_by_status'][0] == {'status': 'new', 'count': 7}
+    assert (stats['today_orders'], stats['today_completed'], stats['pending_orders']) == (3, 1, 8)
+    assert (stats['total_users'], stats['total_orders'], stats['active_technicians']) == (13, 4, 2)
+
+
+@pytest.mark.asyncio
+async def test_job_refreshes_every_kind_and_survives_failures():
+    conn = make_conn()
+    job = ApplicationRollupJob(pool=make_pool(conn), interval_seconds=1, settle_seconds=60)
+
+    async def refresh(conn, kind, settle_seconds):
+        if kind == 'zayavka':
+            raise RuntimeError("lock timeout")
+        return 3
+
+    with patch('utils.rollup_job.application_rollups.refresh', AsyncMock(side_effect=refresh)) as mock_refresh:
+        written = await job.run_once()
+
+    assert [call.args[1] for call in mock_refresh.await_args_list] == list(application_rollups.ROLLUP_KINDS)
+    assert written == 6
+    stats = job.get_stats()
+    assert (stats['runs'], stats['failed_runs'], stats['buckets_written']) == (1, 1, 6)
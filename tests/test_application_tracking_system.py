@@ -11,7 +11,7 @@ import json
 
 # Import the modules we're testing
 from utils.application_tracker import (
-    ApplicationTracker, ApplicationSource, ApplicationStats, RoleStats,
+    ApplicationTracker, ApplicationSource, ApplicationStats, ApplicationWindowStats, RoleStats,
     ComparisonReport, TrackingAlert, application_tracker
 )
 from utils.admin_reporting import (
@@ -24,6 +24,62 @@ from utils.application_alerts import (
 )
 from database.models import ServiceRequest, StaffApplicationAudit, UserRole
 
+def aggregate_rows(apps, starts):
+    """What the grouping-sets statistics query returns for these service_requests rows"""
+    apps = [app for app in apps if app['created_at'] >= starts[0]]
+    keys = {
+        'total': lambda app: (),
+        'staff': lambda app: (('created_by_staff', bool(app['created_by_staff'])),),
+        'staff_hour': lambda app: (('created_by_staff', bool(app['created_by_staff'])), ('hour', app['created_at'].hour)),
+        'hour': lambda app: (('hour', app['created_at'].hour),),
+        'source': lambda app: (('creation_source', app['creation_source'] or 'client'),),
+        'status': lambda app: (('current_status', app['current_status']),),
+    }
+    groups = {('total', ()): []}
+    for breakdown, key in keys.items():
+        for app in apps:
+            groups.setdefault((breakdown, key(app)), []).append(app)
+
+    rows = []
+    for (breakdown, group), members in groups.items():
+        row = {'breakdown': breakdown, **dict(group)}
+        for index, start in enumerate(starts):
+            window = [app for app in members if app['created_at'] >= start]
+            row[f'total_{index}'] = len(window)
+            row[f'staff_{index}'] = len([app for app in window if app['created_by_staff']])
+            row[f'completed_{index}'] = len([app for app in window if app['current_status'] == 'completed'])
+            row[f'failed_{index}'] = len([app for app in window if app['current_status'] in ('cancelled', 'failed')])
+        rows.append(row)
+    return rows
+
+def audit_metric_rows(audits):
+    """What the rollup audit metrics query returns for these staff_application_audit rows"""
+    rows = []
+    groups = {}
+    for audit in audits:
+        hour = audit.creation_timestamp.hour
+        for breakdown, role, at in (('total', None, None), ('role', audit.creator_role, None),
+                                    ('hour', None, hour), ('role_hour', audit.creator_role, hour)):
+            groups.setdefault((breakdown, role, at), []).append(audit)
+    for (breakdown, role, hour), members in groups.items():
+        rows.append({
+            'breakdown': breakdown, 'role': role, 'hour': hour, 'total': len(members),
+            'notified': sum(1 for audit in members if audit.client_notified),
+            'workflow': sum(1 for audit in members if audit.workflow_initiated),
+            'successful': sum(1 for audit in members if audit.client_notified and audit.workflow_initiated),
+            'errors': sum(1 for audit in members if audit.metadata.get('event_type') == 'error_occurred'),
+            'complete': len(members),
+        })
+    return rows
+
+def fake_fetch(apps):
+    """db_manager.fetch answering the statistics query by aggregating apps, other queries with apps"""
+    async def fetch(query, *args, **kwargs):
+        if 'GROUPING SETS' in query and "kind = 'service_request'" in query:
+            return aggregate_rows(apps, args)
+        return apps
+    return AsyncMock(side_effect=fetch)
+
 class TestApplicationTracker:
     """Test the ApplicationTracker class"""
     
@@ -64,7 +120,7 @@ class TestApplicationTracker:
     @pytest.mark.asyncio
     async def test_get_application_statistics_all_sources(self, tracker, mock_db_data):
         """Test getting application statistics for all sources"""
-        with patch('utils.application_tracker.db_manager.fetch', return_value=mock_db_data):
+        with patch('utils.application_tracker.db_manager.fetch', fake_fetch(mock_db_data)):
             stats = await tracker.get_application_statistics(7, ApplicationSource.ALL)
             
             assert stats.total_applications == 3
@@ -77,7 +133,7 @@ class TestApplicationTracker:
     @pytest.mark.asyncio
     async def test_get_application_statistics_staff_only(self, tracker, mock_db_data):
         """Test getting application statistics for staff-created only"""
-        with patch('utils.application_tracker.db_manager.fetch', return_value=mock_db_data):
+        with patch('utils.application_tracker.db_manager.fetch', fake_fetch(mock_db_data)):
             stats = await tracker.get_application_statistics(7, ApplicationSource.STAFF)
             
             assert stats.total_applications == 2  # Only staff-created
@@ -88,7 +144,7 @@ class TestApplicationTracker:
     @pytest.mark.asyncio
     async def test_get_application_statistics_client_only(self, tracker, mock_db_data):
         """Test getting application statistics for client-created only"""
-        with patch('utils.application_tracker.db_manager.fetch', return_value=mock_db_data):
+        with patch('utils.application_tracker.db_manager.fetch', fake_fetch(mock_db_data)):
             stats = await tracker.get_application_statistics(7, ApplicationSource.CLIENT)
             
             assert stats.total_applications == 1  # Only client-created
@@ -99,7 +155,7 @@ class TestApplicationTracker:
     @pytest.mark.asyncio
     async def test_get_application_statistics_empty_data(self, tracker):
         """Test getting application statistics with no data"""
-        with patch('utils.application_tracker.db_manager.fetch', return_value=[]):
+        with patch('utils.application_tracker.db_manager.fetch', fake_fetch([])):
             stats = await tracker.get_application_statistics(7, ApplicationSource.ALL)
             
             assert stats.total_applications == 0
@@ -139,10 +195,7 @@ class TestApplicationTracker:
             )
         ]
         
-        mock_result = MagicMock()
-        mock_result.audits = mock_audits
-        
-        with patch('utils.application_tracker.audit_viewer.get_audit_trail', return_value=mock_result):
+        with patch('utils.application_tracker.db_manager.fetch', return_value=audit_metric_rows(mock_audits)):
             role_stats = await tracker.get_role_statistics(7)
             
             assert 'manager' in role_stats
@@ -264,19 +317,28 @@ class TestApplicationTracker:
     @pytest.mark.asyncio
     async def test_generate_trend_report(self, tracker, mock_db_data):
         """Test generating trend report"""
-        with patch('utils.application_tracker.db_manager.fetch', return_value=mock_db_data):
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        periods = [
+            {'period': today - timedelta(days=2), 'total': 4, 'staff': 1, 'completed': 2, 'successful': 0},
+            {'period': today - timedelta(days=1), 'total': 6, 'staff': 3, 'completed': 3, 'successful': 0},
+            {'period': today, 'total': 8, 'staff': 4, 'completed': 6, 'successful': 0},
+        ]
+        with patch('utils.application_tracker.db_manager.fetch', return_value=periods) as mock_fetch:
             trend_report = await tracker.generate_trend_report(7, "daily")
             
+            assert mock_fetch.call_args.args[1:3] == ('service_request', 'day')
             assert trend_report['period_days'] == 7
             assert trend_report['granularity'] == "daily"
             assert 'data_points' in trend_report
             assert 'trends' in trend_report
             assert 'summary' in trend_report
+            assert [point['total_applications'] for point in trend_report['data_points']] == [4, 6, 8]
+            assert trend_report['trends']['total_applications'] == "increasing"
     
     @pytest.mark.asyncio
     async def test_caching_mechanism(self, tracker, mock_db_data):
         """Test that caching works correctly"""
-        with patch('utils.application_tracker.db_manager.fetch', return_value=mock_db_data) as mock_fetch:
+        with patch('utils.application_tracker.db_manager.fetch', fake_fetch(mock_db_data)) as mock_fetch:
             # First call should hit the database
             stats1 = await tracker.get_application_statistics(7, ApplicationSource.ALL)
             assert mock_fetch.call_count == 1
@@ -288,6 +350,36 @@ class TestApplicationTracker:
             # Results should be identical
             assert stats1.total_applications == stats2.total_applications
 
+    @pytest.mark.asyncio
+    async def test_windowed_statistics_single_query(self, tracker, mock_db_data):
+        """All windows, sources and breakdowns come from one aggregate query"""
+        with patch('utils.application_tracker.db_manager.fetch', fake_fetch(mock_db_data)) as mock_fetch:
+            windows = await tracker.get_windowed_statistics((1, 7, 30))
+            staff_week = await tracker.get_application_statistics(7, ApplicationSource.STAFF)
+        
+        assert mock_fetch.call_count == 1
+        query, *starts = mock_fetch.call_args.args
+        assert 'GROUPING SETS' in query and 'FILTER (WHERE bucket_start >= $3' in query
+        assert starts == sorted(starts)  # longest window first
+        
+        assert windows[30].overall.total_applications == 3
+        # Windows start at the top of the hour, so the day-old application is still inside the 1-day window
+        assert windows[1].overall.total_applications == 1
+        assert windows[7].by_source == {'client': 1, 'manager': 1, 'call_center': 1}
+        assert windows[7].by_status == {'completed': 2, 'cancelled': 1}
+        assert sum(windows[7].hourly) == 3
+        assert staff_week == windows[7].staff
+        assert staff_week.total_applications == 2 and staff_week.error_rate == 50.0
+    
+    @pytest.mark.asyncio
+    async def test_windowed_statistics_query_error(self, tracker):
+        """A failing query yields empty statistics that are not cached"""
+        with patch('utils.application_tracker.db_manager.fetch', AsyncMock(side_effect=RuntimeError("down"))):
+            stats = await tracker.get_application_statistics(7)
+        
+        assert stats.total_applications == 0 and stats.peak_hours == []
+        assert not tracker._is_cached("app_windows_7")
+
 class TestAdminReportingSystem:
     """Test the AdminReportingSystem class"""
     
@@ -315,9 +407,15 @@ class TestAdminReportingSystem:
             average_per_day=7.1,
             peak_hours=[10, 14, 16]
         )
+        mock_windows = {
+            days: ApplicationWindowStats(days, mock_app_stats, mock_app_stats, mock_app_stats,
+                                         {'client': 30, 'manager': 20}, {'completed': 42}, [2] * 24)
+            for days in (1, 7, 14, 30)
+        }
         
         with patch('utils.admin_reporting.get_admin_dashboard_stats', return_value=mock_admin_stats):
-            with patch('utils.admin_reporting.application_tracker.get_application_statistics', return_value=mock_app_stats):
+            with patch('utils.admin_reporting.application_tracker.get_windowed_statistics',
+                       return_value=mock_windows) as mock_windowed:
                 with patch('utils.admin_reporting.application_tracker.get_role_statistics', return_value={}):
                     with patch('utils.admin_reporting.application_tracker.detect_unusual_patterns', return_value=[]):
                         with patch('utils.admin_reporting.audit_viewer.get_audit_trail') as mock_audit:
@@ -329,6 +427,10 @@ class TestAdminReportingSystem:
                             assert 'system_overview' in dashboard
                             assert 'application_metrics' in dashboard
                             assert dashboard['system_overview']['total_users'] == 100
+                            mock_windowed.assert_called_once_with((1, 7, 14, 30))
+                            month = dashboard['application_metrics']['this_month']
+                            assert month['total'] == 50
+                            assert month['by_source'] == {'client': 30, 'manager': 20}
     
     @pytest.mark.asyncio
     async def test_generate_performance_report(self, reporting_system):
@@ -670,7 +772,7 @@ class TestIntegration:
         ]
         
         # Test the complete workflow
-        with patch('utils.application_tracker.db_manager.fetch', return_value=mock_service_requests):
+        with patch('utils.application_tracker.db_manager.fetch', fake_fetch(mock_service_requests)):
             with patch('utils.application_tracker.audit_viewer.get_audit_trail') as mock_audit:
                 mock_audit.return_value = MagicMock(audits=mock_audit_data)
                 
@@ -368,19 +368,18 @@ class TestAuditAnalyzer:
     @pytest.mark.asyncio
     async def test_analyze_performance_metrics(self, mock_audit_analyzer):
         """Test performance metrics analysis"""
-        with patch('utils.audit_analyzer.audit_viewer') as mock_viewer:
-            mock_result = MagicMock()
-            mock_result.audits = [
-                MagicMock(client_notified=True, workflow_initiated=True, creation_timestamp=datetime.utcnow()),
-                MagicMock(client_notified=False, workflow_initiated=True, creation_timestamp=datetime.utcnow()),
-                MagicMock(client_notified=True, workflow_initiated=False, creation_timestamp=datetime.utcnow(),
-                         metadata={'event_type': 'error_occurred'})
-            ]
-            mock_viewer.get_audit_trail.return_value = mock_result
-            
+        hour = datetime.utcnow().hour
+        rows = [
+            {'breakdown': 'total', 'role': None, 'hour': None, 'total': 3, 'notified': 2, 'workflow': 2,
+             'successful': 1, 'errors': 1, 'complete': 3},
+            {'breakdown': 'hour', 'role': None, 'hour': hour, 'total': 3, 'notified': 2, 'workflow': 2,
+             'successful': 1, 'errors': 1, 'complete': 3},
+        ]
+        with patch('utils.audit_analyzer.db_manager.fetch', AsyncMock(return_value=rows)):
             metrics = await mock_audit_analyzer.analyze_performance_metrics(days_back=7)
             
             assert metrics.total_applications == 3
+            assert metrics.peak_usage_hours == [hour]
             assert 0 <= metrics.success_rate <= 100
             assert 0 <= metrics.error_rate <= 100
             assert 0 <= metrics.notification_success_rate <= 100
@@ -388,26 +387,19 @@ class TestAuditAnalyzer:
     @pytest.mark.asyncio
     async def test_analyze_trends(self, mock_audit_analyzer):
         """Test trend analysis"""
-        with patch('utils.audit_analyzer.audit_viewer') as mock_viewer:
-            # Create mock audits with timestamps spread over several days
-            mock_audits = []
-            for i in range(10):
-                audit = MagicMock()
-                audit.creation_timestamp = datetime.utcnow() - timedelta(days=i)
-                audit.client_notified = True
-                audit.workflow_initiated = True
-                mock_audits.append(audit)
-            
-            mock_result = MagicMock()
-            mock_result.audits = mock_audits
-            mock_viewer.get_audit_trail.return_value = mock_result
-            
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        periods = [
+            {'period': today - timedelta(days=i), 'total': 10 - i, 'staff': 10 - i, 'completed': 0, 'successful': 10 - i}
+            for i in reversed(range(10))
+        ]
+        with patch('utils.audit_analyzer.db_manager.fetch', AsyncMock(return_value=periods)) as mock_fetch:
             trend_data = await mock_audit_analyzer.analyze_trends(
                 metric='application_count',
                 days_back=10,
                 granularity='daily'
             )
             
+            assert mock_fetch.call_args.args[1:3] == ('staff_audit', 'day')
             assert trend_data.period == '10_days_daily'
             assert trend_data.trend_direction in ['increasing', 'decreasing', 'stable']
             assert 0 <= trend_data.trend_strength <= 1
@@ -441,20 +433,11 @@ class TestAuditAnalyzer:
     @pytest.mark.asyncio
     async def test_analyze_compliance(self, mock_audit_analyzer):
         """Test compliance analysis"""
-        with patch('utils.audit_analyzer.audit_viewer') as mock_viewer:
-            mock_audits = [
-                MagicMock(client_notified=True, workflow_initiated=True, 
-                         application_id='app1', creator_id=123, creator_role='manager'),
-                MagicMock(client_notified=False, workflow_initiated=True,
-                         application_id='app2', creator_id=124, creator_role='call_center'),
-                MagicMock(client_notified=True, workflow_initiated=False,
-                         application_id=None, creator_id=125, creator_role='manager')  # Incomplete data
-            ]
-            
-            mock_result = MagicMock()
-            mock_result.audits = mock_audits
-            mock_viewer.get_audit_trail.return_value = mock_result
-            
+        rows = [
+            {'breakdown': 'total', 'role': None, 'hour': None, 'total': 3, 'notified': 2, 'workflow': 2,
+             'successful': 1, 'errors': 0, 'complete': 2},  # One audit with incomplete data
+        ]
+        with patch('utils.audit_analyzer.db_manager.fetch', AsyncMock(return_value=rows)):
             compliance = await mock_audit_analyzer.analyze_compliance(days_back=30)
             
             assert compliance['period_days'] == 30
@@ -0,0 +1,142 @@
+"""
+Tests for the batched access_control_logs writer.
+"""
+
+import asyncio
+import re
+from pathlib import Path
+
+import asyncpg
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from utils.audit_sink import AccessLogSink
+
+
+def make_pool(copy=None):
+    conn = MagicMock()
+    conn.copy_records_to_table = copy or AsyncMock(return_value="COPY 1")
+    acquire = MagicMock()
+    acquire.__aenter__ = AsyncMock(return_value=conn)
+    acquire.__aexit__ = AsyncMock(return_value=False)
+    pool = MagicMock()
+    pool.acquire = MagicMock(return_value=acquire)
+    return pool, conn
+
+
+def schema_columns(table):
+    """Column names of a table in the schema dump"""
+    schema = (Path(__file__).resolve().parent.parent / 'my_database.sql').read_text()
+    body = re.search(rf"CREATE TABLE public\.{table} \((.*?)\n\);", schema, re.S).group(1)
+    return {line.split()[0].strip('"') for line in body.strip().splitlines()}
+
+
+class TestAccessLogSink:
+    """Test batching, backpressure and shutdown flush"""
+
+    @pytest.mark.asyncio
+    async def test_record_does_no_io_and_batches_rows(self):
+        pool, conn = make_pool()
+        sink = AccessLogSink(pool=pool, batch_size=100, flush_interval_ms=10_000)
+
+        for i in range(250):
+            assert sink.record(i, "user_activity_message", "text:hi", True) is True
+        assert conn.copy_records_to_table.await_count == 0
+
+        assert await sink.flush() == 0
+        assert [len(call.kwargs['records']) for call in conn.copy_records_to_table.await_args_list] == [100, 100, 50]
+        assert conn.copy_records_to_table.await_args.args[0] == 'access_control_logs'
+        stats = sink.get_stats()
+        assert stats['written'] == 250 and stats['flushes'] == 3
+        await sink.stop()
+
+    def test_columns_match_the_table(self):
+        assert set(AccessLogSink.COLUMNS) <= schema_columns(AccessLogSink.TABLE)
+        assert 'timestamp' in AccessLogSink.COLUMNS
+
+    @pytest.mark.asyncio
+    async def test_full_batch_wakes_writer(self):
+        pool, conn = make_pool()
+        sink = AccessLogSink(pool=pool, batch_size=5, flush_interval_ms=10_000)
+
+        for i in range(5):
+            sink.record(i, "user_activity_callback", "data:x", True)
+        await asyncio.sleep(0.01)
+
+        assert sink.get_stats()['written'] == 5
+        await sink.stop()
+
+    @pytest.mark.asyncio
+    async def test_ring_drops_oldest_when_full(self):
+        pool, conn = make_pool()
+        sink = AccessLogSink(pool=pool, max_queue=3, batch_size=10, flush_interval_ms=10_000)
+
+        for i in range(5):
+            sink.record(i, "action", "resource", True)
+
+        assert sink.get_stats()['dropped'] == 2
+        await sink.flush()
+        records = conn.copy_records_to_table.await_args.kwargs['records']
+        assert [row[0] for row in records] == [2, 3, 4]
+        await sink.stop()
+
+    @pytest.mark.asyncio
+    async def test_failed_flush_requeues_and_retries(self):
+        copy = AsyncMock(side_effect=[ConnectionError("db down"), "COPY 2"])
+        pool, conn = make_pool(copy)
+        sink = AccessLogSink(pool=pool, batch_size=10, flush_interval_ms=10_000)
+        sink.record(1, "a", "r", True)
+        sink.record(2, "a", "r", True)
+
+        assert await sink.flush() == 2
+        assert sink.get_stats()['failed_flushes'] == 1
+        assert await sink.flush() == 0
+        assert [row[0] for row in copy.await_args.kwargs['records']] == [1, 2]
+        await sink.stop()
+
+    @pytest.mark.asyncio
+    async def test_rejected_copy_drops_only_bad_rows(self):
+        copy = AsyncMock(side_effect=asyncpg.ForeignKeyViolationError("user 2 missing"))
+        pool, conn = make_pool(copy)
+        conn.execute = AsyncMock(side_effect=["INSERT 0 1", asyncpg.ForeignKeyViolationError("user 2 missing"),
+                                              "INSERT 0 1"])
+        sink = AccessLogSink(pool=pool, batch_size=10, flush_interval_ms=10_000)
+        for user_id in (1, 2, 3):
+            sink.record(user_id, "a", "r", True)
+
+        assert await sink.flush() == 0
+        assert [call.args[1] for call in conn.execute.await_args_list] == [1, 2, 3]
+        assert conn.execute.await_args.args[0] == AccessLogSink.INSERT_QUERY
+        stats = sink.get_stats()
+        assert (stats['written'], stats['dropped'], stats['failed_flushes']) == (2, 1, 0)
+        await sink.stop()
+
+    @pytest.mark.asyncio
+    async def test_row_fallback_requeues_unwritten_rows_on_connection_loss(self):
+        copy = AsyncMock(side_effect=asyncpg.DataError("bad row"))
+        pool, conn = make_pool(copy)
+        conn.execute = AsyncMock(side_effect=["INSERT 0 1", ConnectionError("db down"), "INSERT 0 1", "INSERT 0 1"])
+        sink = AccessLogSink(pool=pool, batch_size=10, flush_interval_ms=10_000)
+        for user_id in (1, 2, 3):
+            sink.record(user_id, "a", "r", True)
+
+        # The first row was written; the rest wait for the next flush
+        assert await sink.flush() == 2
+        assert [row[0] for row in sink._queue] == [2, 3]
+        stats = sink.get_stats()
+        assert (stats['written'], stats['dropped'], stats['failed_flushes']) == (1, 0, 1)
+        await sink.stop()
+        assert sink.get_stats()['written'] == 3
+
+    @pytest.mark.asyncio
+    async def test_stop_flushes_remaining_rows_and_rejects_new_ones(self):
+        pool, conn = make_pool()
+        sink = AccessLogSink(pool=pool, batch_size=100, flush_interval_ms=10_000)
+        sink.record(1, "action", "x" * 500, False, "denied")
+
+        await sink.stop()
+
+        row = conn.copy_records_to_table.await_args.kwargs['records'][0]
+        assert len(row[2]) == 200  # resource column is VARCHAR(200)
+        assert sink.record(2, "action", "resource", True) is False
+        assert sink.get_stats()['written'] == 1
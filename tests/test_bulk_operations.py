@@ -0,0 +1,134 @@
+"""
+Tests for the set-based admin bulk assignment and inventory updates.
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from database import admin_queries, stock_reservations
+from utils.inventory_manager import (
+    AVAILABILITY_QUERY,
+    CONSUME_QUERY,
+    InventoryManager,
+    InventoryTransaction,
+    TransactionType,
+)
+
+
+def make_conn(fetch=None, execute="INSERT 0 0"):
+    conn = MagicMock()
+    conn.fetch = AsyncMock(side_effect=fetch) if isinstance(fetch, list) else AsyncMock(return_value=[])
+    conn.execute = AsyncMock(return_value=execute)
+    conn.transaction.return_value.__aenter__ = AsyncMock(return_value=None)
+    conn.transaction.return_value.__aexit__ = AsyncMock(return_value=False)
+    return conn
+
+
+def make_bot(conn):
+    bot = MagicMock()
+    bot.db.acquire.return_value.__aenter__ = AsyncMock(return_value=conn)
+    bot.db.acquire.return_value.__aexit__ = AsyncMock(return_value=None)
+    return bot
+
+
+@pytest.mark.asyncio
+async def test_bulk_assign_orders_is_one_statement():
+    conn = make_conn(execute="INSERT 0 3")
+
+    with patch.object(admin_queries, 'bot', make_bot(conn)):
+        assert await admin_queries.bulk_assign_orders([5, 6, 5, 7], 20, 1) is True
+
+    conn.execute.assert_awaited_once_with(admin_queries.BULK_ASSIGN_QUERY, [5, 6, 7], 20, 1)
+
+
+@pytest.mark.asyncio
+async def test_bulk_assign_orders_unknown_order_rolls_back():
+    conn = make_conn(execute="INSERT 0 2")
+
+    with patch.object(admin_queries, 'bot', make_bot(conn)):
+        assert await admin_queries.bulk_assign_orders([5, 6, 99], 20, 1) is False
+
+    # The error left the transaction block, so it was rolled back
+    exc_type = conn.transaction.return_value.__aexit__.await_args.args[0]
+    assert exc_type is ValueError
+
+
+@pytest.mark.asyncio
+async def test_consume_equipment_updates_and_logs_in_one_transaction():
+    conn = make_conn(fetch=[
+        [{'request_id': 'req-1', 'material_id': 1, 'quantity': 20, 'performed_by': 100}],
+        [{'id': 1, 'name': 'Cable', 'quantity_in_stock': 80}, {'id': 2, 'name': 'Router', 'quantity_in_stock': 4}],
+        [{'id': 11}, {'id': 12}, {'id': 13}],
+    ])
+    manager = InventoryManager()
+    used = [{'material_id': 1, 'quantity': 15, 'performed_by': 100},
+            {'material_id': 2, 'quantity': 1, 'performed_by': 100},
+            {'material_id': 1, 'quantity': 5, 'performed_by': 100}]
+
+    with patch('loader.bot', make_bot(conn)):
+        assert await manager.consume_equipment('req-1', used) is True
+
+    release, update, log = conn.fetch.await_args_list
+    # The request's own holds are released before the stock is taken
+    assert release.args == (stock_reservations.RELEASE_REQUEST_QUERY, 'req-1')
+    assert update.args == (CONSUME_QUERY, [1, 2, 1], [15, 1, 5])
+    query, *values = log.args
+    assert query.startswith("INSERT INTO inventory_transactions") and query.count("(") == 4
+    assert values[:4] == ['req-1', 1, TransactionType.CONSUME.value, 15] and len(values) == 21
+    assert conn.transaction.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_consume_equipment_short_line_fails_whole_call():
+    conn = make_conn(fetch=[[], [{'id': 1, 'name': 'Cable', 'quantity_in_stock': 80}]])
+    manager = InventoryManager()
+
+    with patch('loader.bot', make_bot(conn)):
+        assert await manager.consume_equipment('req-1', [{'material_id': 1, 'quantity': 1},
+                                                         {'material_id': 2, 'quantity': 9}]) is False
+
+    # Nothing was logged and the UPDATE was rolled back with the transaction
+    assert conn.fetch.await_count == 2
+    assert conn.transaction.return_value.__aexit__.await_args.args[0] is Exception
+
+
+@pytest.mark.asyncio
+async def test_reserve_equipment_holds_all_lines_at_once():
+    conn = make_conn(fetch=[[], [{'id': 1}], [{'id': 21}, {'id': 22}]])
+    manager = InventoryManager()
+    equipment = [{'material_id': 1, 'quantity': 10}, {'material_id': 1, 'quantity': 2}]
+
+    with patch('loader.bot', make_bot(conn)):
+        assert await manager.reserve_equipment('req-2', equipment) is True
+
+    _, hold, log = conn.fetch.await_args_list
+    assert hold.args == (stock_reservations.HOLD_QUERY, [1, 1], [10, 2])
+    assert conn.execute.await_args.args[:4] == (stock_reservations.INSERT_HOLDS_QUERY, 'req-2', [1, 1], [10, 2])
+    assert log.args[3] == TransactionType.RESERVE.value
+
+
+@pytest.mark.asyncio
+async def test_reserve_equipment_insufficient_or_unknown():
+    manager = InventoryManager()
+    for line in ({'material_id': 1, 'quantity': 12, 'name': 'Cable', 'available_quantity': 5},
+                 {'material_id': 1, 'quantity': 12, 'name': None, 'available_quantity': None}):
+        conn = make_conn(fetch=[[], [], [line]])
+        with patch('loader.bot', make_bot(conn)):
+            assert await manager.reserve_equipment('req-3', [{'material_id': 1, 'quantity': 12}]) is False
+        # No hold rows were written and the reason was looked up
+        conn.execute.assert_not_awaited()
+        assert conn.fetch.await_args.args[0] == AVAILABILITY_QUERY
+        assert conn.transaction.return_value.__aexit__.await_args.args[0] is Exception
+
+
+@pytest.mark.asyncio
+async def test_log_transaction_uses_callers_connection():
+    conn = make_conn(fetch=[[{'id': 7}]])
+    transaction = InventoryTransaction(request_id='req-4', material_id=3, quantity=2,
+                                       transaction_type=TransactionType.RETURN.value)
+
+    with patch('loader.bot') as bot:
+        assert await InventoryManager()._log_transaction(transaction, conn) is True
+        bot.db.acquire.assert_not_called()
+
+    assert transaction.id == 7
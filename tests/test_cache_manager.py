@@ -0,0 +1,232 @@
+"""
+Tests for the sharded MemoryCache engine and the @cached decorator in utils.cache_manager.
+"""
+
+import asyncio
+import pytest
+from unittest.mock import patch
+
+from utils import cache_manager
+from utils.cache_manager import (
+    MemoryCache, build_cache_key, cached, statistics_cache_key, invalidate_statistics_cache
+)
+
+
+class TestMemoryCache:
+    """Test LRU eviction, budgets, namespace TTLs and expiry sweeps"""
+
+    @pytest.mark.asyncio
+    async def test_set_get_delete(self):
+        cache = MemoryCache(shards=4)
+        await cache.set("zayavka:1", {"id": 1})
+
+        assert await cache.get("zayavka:1") == {"id": 1}
+        assert await cache.delete("zayavka:1") is True
+        assert await cache.get("zayavka:1") is None
+        assert await cache.delete("zayavka:1") is False
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction_respects_max_entries(self):
+        cache = MemoryCache(max_entries=3, shards=1)
+        for i in range(3):
+            await cache.set(f"zayavka:{i}", i)
+        await cache.get("zayavka:0")  # refresh, so zayavka:1 is least recently used
+        await cache.set("zayavka:3", 3)
+
+        assert await cache.get("zayavka:1") is None
+        assert await cache.get("zayavka:0") == 0
+        stats = await cache.get_stats()
+        assert stats['total_entries'] == 3
+        assert stats['evictions'] == 1
+
+    @pytest.mark.asyncio
+    async def test_max_bytes_budget_evicts(self):
+        cache = MemoryCache(max_bytes=4096, shards=1)
+        for i in range(20):
+            await cache.set(f"stats:{i}", "x" * 500)
+
+        stats = await cache.get_stats()
+        assert stats['memory_usage_kb'] <= 4
+        assert stats['evictions'] > 0
+        assert await cache.get("stats:19") == "x" * 500
+
+    @pytest.mark.asyncio
+    async def test_namespace_ttl(self):
+        cache = MemoryCache(default_ttl=300, namespace_ttls={'stats': 600, 'zayavka': 60})
+        assert cache.ttl_for("stats:users:daily") == 600
+        assert cache.ttl_for("zayavka:5") == 60
+        assert cache.ttl_for("materials:all") == 300
+
+    @pytest.mark.asyncio
+    async def test_invalidate_statistics_drops_only_stats_namespace(self):
+        cache = MemoryCache(shards=4)
+        await cache.set(statistics_cache_key("users"), {"total": 10})
+        await cache.set(statistics_cache_key("zayavkas", "weekly"), {"total": 3})
+        await cache.set("user:42", {"role": "client"})
+        await cache.set("zayavka:7", {"id": 7})
+
+        with patch.object(cache_manager, 'cache', cache):
+            await invalidate_statistics_cache()
+
+        assert await cache.get(statistics_cache_key("users")) is None
+        assert await cache.get(statistics_cache_key("zayavkas", "weekly")) is None
+        assert await cache.get("user:42") == {"role": "client"}
+        assert await cache.get("zayavka:7") == {"id": 7}
+        assert (await cache.get_stats())['namespaces'] == {'user': 1, 'zayavka': 1}
+
+    @pytest.mark.asyncio
+    async def test_cleanup_expired_sweeps_due_buckets_only(self):
+        cache = MemoryCache(shards=2)
+        clock = [1000.0]
+        with patch.object(cache_manager.time, 'monotonic', lambda: clock[0]):
+            await cache.set("zayavka:1", 1, ttl=5)
+            await cache.set("zayavka:2", 2, ttl=5)
+            await cache.set("stats:x", 3, ttl=100)
+
+            clock[0] += 10
+            assert await cache.cleanup_expired() == 2
+            assert await cache.get("stats:x") == 3
+            assert await cache.cleanup_expired() == 0
+
+    @pytest.mark.asyncio
+    async def test_overwrite_keeps_indexes_consistent(self):
+        cache = MemoryCache(shards=1)
+        clock = [1000.0]
+        with patch.object(cache_manager.time, 'monotonic', lambda: clock[0]):
+            await cache.set("zayavka:1", "old", ttl=5)
+            await cache.set("zayavka:1", "new", ttl=100)
+
+            clock[0] += 10
+            assert await cache.cleanup_expired() == 0
+            assert await cache.get("zayavka:1") == "new"
+
+    @pytest.mark.asyncio
+    async def test_clear(self):
+        cache = MemoryCache()
+        await cache.set("user:1", 1)
+        await cache.clear()
+
+        stats = await cache.get_stats()
+        assert stats['total_entries'] == 0
+        assert stats['memory_usage_kb'] == 0
+
+
+@pytest.fixture
+def fresh_cache():
+    """Isolate the module-level cache used by the @cached decorator"""
+    cache = MemoryCache()
+    with patch.object(cache_manager, 'cache', cache):
+        yield cache
+
+
+class TestCachedDecorator:
+    """Test single-flight, negative caching, stable keys and stale-while-revalidate"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_one_load(self, fresh_cache):
+        calls = []
+        release = asyncio.Event()
+
+        @cached(ttl=60)
+        async def heavy_statistics(period):
+            calls.append(period)
+            await release.wait()
+            return {'period': period, 'total': 42}
+
+        tasks = [asyncio.create_task(heavy_statistics('daily')) for _ in range(20)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*tasks)
+
+        assert calls == ['daily']
+        assert all(result == {'period': 'daily', 'total': 42} for result in results)
+        assert await heavy_statistics('daily') == {'period': 'daily', 'total': 42}
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_errors_reach_all_waiters_and_are_not_cached(self, fresh_cache):
+        calls = []
+        release = asyncio.Event()
+
+        @cached(ttl=60)
+        async def failing_loader():
+            calls.append(1)
+            await release.wait()
+            raise RuntimeError("db down")
+
+        tasks = [asyncio.create_task(failing_loader()) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        assert len(calls) == 1
+        assert all(isinstance(result, RuntimeError) for result in results)
+        with pytest.raises(RuntimeError):
+            await failing_loader()
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_none_and_empty_results_are_cached(self, fresh_cache):
+        calls = []
+
+        @cached(ttl=60)
+        async def find_client(phone):
+            calls.append(phone)
+            return None if phone == 'missing' else []
+
+        assert await find_client('missing') is None
+        assert await find_client('missing') is None
+        assert await find_client('empty') == []
+        assert await find_client('empty') == []
+        assert calls == ['missing', 'empty']
+
+    @pytest.mark.asyncio
+    async def test_negative_ttl_zero_disables_negative_caching(self, fresh_cache):
+        calls = []
+
+        @cached(ttl=60, negative_ttl=0)
+        async def find_client(phone):
+            calls.append(phone)
+            return None
+
+        await find_client('x')
+        await find_client('x')
+        assert len(calls) == 2
+
+    def test_stable_key_binds_arguments_and_skips_pool(self):
+        async def get_orders(status, limit=10, pool=None):
+            return []
+
+        key = build_cache_key(get_orders, ('new',), {}, namespace='zayavka')
+        assert key == build_cache_key(get_orders, (), {'status': 'new', 'limit': 10}, namespace='zayavka')
+        assert key == build_cache_key(get_orders, ('new',), {'pool': object()}, namespace='zayavka')
+        assert key != build_cache_key(get_orders, ('assigned',), {}, namespace='zayavka')
+        assert key.startswith('zayavka:')
+        # Dict argument order does not matter
+        assert build_cache_key(get_orders, ({'a': 1, 'b': 2},), {}) == \
+            build_cache_key(get_orders, ({'b': 2, 'a': 1},), {})
+
+    @pytest.mark.asyncio
+    async def test_stale_while_revalidate(self, fresh_cache):
+        clock = [1000.0]
+        calls = []
+
+        @cached(ttl=10, stale_ttl=100)
+        async def dashboard():
+            calls.append(clock[0])
+            return len(calls)
+
+        with patch.object(cache_manager.time, 'monotonic', lambda: clock[0]):
+            assert await dashboard() == 1
+
+            clock[0] += 20  # expired but within the stale window
+            assert await dashboard() == 1  # stale value served immediately
+            assert await dashboard() == 1  # refresh already in flight, no second one
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+
+            assert len(calls) == 2
+            assert await dashboard() == 2
+
+            clock[0] += 500  # past the stale window: regular miss
+            assert await dashboard() == 3
@@ -0,0 +1,83 @@
+"""
+Tests for the precomputed per-role capability maps.
+"""
+
+import dataclasses
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from middlewares.enhanced_role_filter import EnhancedRoleFilterMiddleware
+from utils.capabilities import (
+    build_capability_maps, clear_capability_override, get_role_capabilities,
+    get_user_capabilities, set_capability_override
+)
+from utils.get_role import ROLE_PERMISSIONS
+
+
+def test_capabilities_are_frozen_and_shared():
+    maps = build_capability_maps()
+    manager = maps['manager']
+
+    assert get_user_capabilities(1001, 'manager') is manager
+    assert get_user_capabilities(1002, 'manager') is manager
+    assert isinstance(manager.permissions, frozenset)
+    assert manager.permissions == frozenset(ROLE_PERMISSIONS['manager'])
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        manager.role = 'admin'
+    with pytest.raises(TypeError):
+        maps['manager'] = manager
+
+
+def test_legacy_dict_access():
+    caps = get_role_capabilities('admin')
+
+    assert caps['role'] == 'admin'
+    assert caps['level'] == 100
+    assert caps['can_manage_users'] is True
+    assert caps.get('can_manage_materials') is True
+    assert 'workflow_permissions' in caps
+    assert caps['workflow_permissions']['static_permissions']['can_view_all_requests'] is True
+    assert get_role_capabilities('client')['can_assign_tasks'] is False
+    assert caps.can('manage_users') and not get_role_capabilities('client').can('manage_users')
+
+
+def test_unknown_role_gets_empty_capabilities():
+    caps = get_role_capabilities('no_such_role')
+    assert caps.permissions == frozenset()
+    assert caps.level == 0
+    assert get_role_capabilities('no_such_role') is caps
+
+
+def test_per_user_override_is_a_cached_delta():
+    base = get_role_capabilities('technician')
+    set_capability_override(2001, grant=['view_reports'], revoke=['complete_tasks'])
+    try:
+        caps = get_user_capabilities(2001, 'technician')
+        assert caps is not base
+        assert caps.can('view_reports') and not caps.can('complete_tasks')
+        assert get_user_capabilities(2001, 'technician') is caps
+        # Other technicians still share the role map
+        assert get_user_capabilities(2002, 'technician') is base
+        # A role change derives the override from the new role
+        assert get_user_capabilities(2001, 'manager').role == 'manager'
+    finally:
+        clear_capability_override(2001)
+    assert get_user_capabilities(2001, 'technician') is base
+
+
+@pytest.mark.asyncio
+async def test_middleware_injects_shared_capabilities():
+    middleware = EnhancedRoleFilterMiddleware()
+    event = SimpleNamespace(from_user=SimpleNamespace(id=3001), text="x", data=None)
+    seen = []
+
+    async def handler(event, data):
+        seen.append(data['user_capabilities'])
+
+    with patch('middlewares.enhanced_role_filter.get_user_role', return_value='warehouse'):
+        await middleware(handler, event, {})
+        await middleware(handler, event, {})
+
+    assert seen[0] is seen[1] is get_role_capabilities('warehouse')
+    assert seen[0]['can_manage_materials'] is True
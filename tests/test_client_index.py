@@ -0,0 +1,164 @@
+"""
+Tests for the in-memory call-centre client search index.
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from database import client_search
+from utils.client_index import ClientSearchIndex, fold_name
+
+
+def make_pool(batches):
+    conn = MagicMock()
+    conn.fetch = AsyncMock(side_effect=batches)
+    pool = MagicMock()
+    pool.acquire.return_value.__aenter__ = AsyncMock(return_value=conn)
+    pool.acquire.return_value.__aexit__ = AsyncMock(return_value=None)
+    return pool
+
+
+def user(user_id, full_name, phone_number, role='client'):
+    return {'id': user_id, 'full_name': full_name, 'phone_number': phone_number, 'phone_e164': None, 'role': role}
+
+
+USERS = [
+    user(1, "Oʻktam Xoʻjayev", "+998 90 123 45 67"),
+    user(2, "Ўктам Хўжаев", "90 123 45 00"),
+    user(3, "Dilnoza Rahimova", "+998 93 765 43 21"),
+    user(4, "Rahim Karimov", "+998 91 555 45 67", role='technician'),
+    user(5, "Ольга Петрова", "+7 912 345 67 89"),
+]
+
+
+async def built_index(rows=USERS):
+    index = ClientSearchIndex(pool=make_pool([rows, []]), enabled=True)
+    assert await index.warm() == len(rows)
+    return index
+
+
+@pytest.mark.parametrize("latin,cyrillic", [
+    ("Oʻktam Xoʻjayev", "Ўктам Хўжаев"),
+    ("G'ayrat Qodirov", "Ғайрат Қодиров"),
+    ("Yusupov", "Юсупов"),
+    ("Xurshid", "Хуршид"),
+])
+def test_fold_name_spells_cyrillic_and_latin_alike(latin, cyrillic):
+    assert fold_name(latin) == fold_name(cyrillic)
+
+
+def test_fold_name_tokens():
+    assert fold_name("  Olga   PETROVA-Ivanova ") == "olga petrova ivanova"
+    assert fold_name(None) == ""
+
+
+@pytest.mark.asyncio
+async def test_cold_index_defers_to_database():
+    index = ClientSearchIndex(pool=make_pool([USERS, []]), enabled=True)
+
+    assert index.search("oktam") is None
+    index.upsert(1, full_name="Someone")
+    assert index.get_stats()['users'] == 0
+
+
+@pytest.mark.asyncio
+async def test_phone_exact_prefix_and_last_digits():
+    index = await built_index()
+
+    assert index.search("+998 90 123 45 67") == [(1, client_search.EXACT_PHONE, 1.0)]
+    assert index.search("90 123 45 00", phone_prefix=False) == [(2, client_search.EXACT_PHONE, 1.0)]
+    assert index.search("90 123 45", phone_prefix=False) == []
+    assert [user_id for user_id, _, _ in index.search("90 123")] == [2, 1]
+    # Last digits of a number, any role
+    assert [user_id for user_id, _, _ in index.search("4567", role=None)] == [4, 1]
+    assert index.search("12") == []
+
+
+@pytest.mark.asyncio
+async def test_name_tokens_match_across_scripts_best_first():
+    index = await built_index()
+
+    assert [user_id for user_id, _, _ in index.search("xojayev oktam")] == [2, 1]
+    assert [user_id for user_id, _, _ in index.search("Хўжаев")] == [2, 1]
+    prefix = index.search("dilno")
+    assert [user_id for user_id, _, _ in prefix] == [3]
+    assert prefix[0][1] == client_search.NAME_SIMILARITY and 0.5 < prefix[0][2] < 1.0
+    assert index.search("oktam rahimova") == []
+
+
+@pytest.mark.asyncio
+async def test_name_typo_matches_fuzzily_and_role_filters():
+    index = await built_index()
+
+    assert [user_id for user_id, _, _ in index.search("rahimof")] == [3]
+    assert sorted(user_id for user_id, _, _ in index.search("rahimof", role=None)) == [3, 4]
+    assert [user_id for user_id, _, _ in index.search("karimov", role=None)] == [4]
+    assert index.search("karimov") == []
+    assert [user_id for user_id, _, _ in index.search("olga")] == [5]
+
+
+@pytest.mark.asyncio
+async def test_limit_keeps_best_then_newest():
+    rows = [user(user_id, "Aziz Saidov", f"+99890{user_id:07d}") for user_id in range(1, 21)]
+    rows.append(user(30, "Azizbek Saidov", "+998901111111"))
+    index = await built_index(rows)
+
+    assert [user_id for user_id, _, _ in index.search("aziz", limit=3)] == [20, 19, 18]
+    assert [user_id for user_id, _, _ in index.search("azizbek saidov", limit=3)] == [30]
+
+
+@pytest.mark.asyncio
+async def test_upsert_and_remove_update_lookups():
+    index = await built_index()
+
+    index.upsert(3, full_name="Dilnoza Yusupova")
+    assert [user_id for user_id, _, _ in index.search("yusupova")] == [3]
+    assert index.search("rahimova") == []
+    index.upsert(3, phone_number="+998 99 000 00 01")
+    assert index.search("+998990000001") == [(3, client_search.EXACT_PHONE, 1.0)]
+    assert [user_id for user_id, _, _ in index.search("yusupova")] == [3]
+
+    index.upsert(6, full_name="Bekzod Qodirov", phone_number="998977777777", role='client')
+    assert [user_id for user_id, _, _ in index.search("qodirov")] == [6]
+
+    index.remove(6)
+    assert index.search("qodirov") == []
+    assert index.search("+998977777777") == []
+
+
+@pytest.mark.asyncio
+async def test_writes_during_build_are_replayed():
+    index = ClientSearchIndex(enabled=True)
+
+    async def fetch(query, last_id, batch_size):
+        if last_id:
+            return []
+        # A client is renamed while the rows are being read
+        index.upsert(3, full_name="Dilnoza Yusupova")
+        return USERS
+
+    conn = MagicMock()
+    conn.fetch = AsyncMock(side_effect=fetch)
+    index.pool = make_pool([])
+    index.pool.acquire.return_value.__aenter__ = AsyncMock(return_value=conn)
+
+    await index.warm()
+
+    assert [user_id for user_id, _, _ in index.search("yusupova")] == [3]
+    assert index.search("rahimova") == []
+
+
+@pytest.mark.asyncio
+async def test_search_users_reads_ranked_rows_by_id():
+    index = await built_index()
+    conn = MagicMock()
+    conn.fetch = AsyncMock(return_value=[{'id': 1, 'full_name': 'Oʻktam Xoʻjayev'},
+                                         {'id': 2, 'full_name': 'Ўктам Хўжаев'}])
+
+    with patch('utils.client_index.client_index', index):
+        rows = await client_search.search_users(conn, "Хўжаев")
+
+    query, ids = conn.fetch.await_args.args
+    assert query == client_search.USERS_BY_ID_QUERY and ids == [2, 1]
+    assert [(row['id'], row['match_rank']) for row in rows] == [
+        (2, client_search.NAME_SIMILARITY), (1, client_search.NAME_SIMILARITY)]
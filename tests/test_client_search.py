@@ -0,0 +1,96 @@
+"""
+Tests for the canonical phone column and the ranked client search.
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from database import client_search
+from utils.validators import normalize_phone_e164
+
+
+def make_conn(fetch=None, batches=None):
+    conn = MagicMock()
+    conn.fetch = AsyncMock(side_effect=batches) if batches else AsyncMock(return_value=fetch or [])
+    conn.execute = AsyncMock(return_value="UPDATE 1")
+    return conn
+
+
+def make_pool(conn):
+    pool = MagicMock()
+    pool.acquire.return_value.__aenter__ = AsyncMock(return_value=conn)
+    pool.acquire.return_value.__aexit__ = AsyncMock(return_value=None)
+    return pool
+
+
+@pytest.mark.parametrize("phone,expected", [
+    ("+998 90 123 45 67", "+998901234567"),
+    ("998901234567", "+998901234567"),
+    ("(90) 123-45-67", "+998901234567"),
+    ("+7 912 345 67 89", "+79123456789"),
+    ("12", None),
+    ("", None),
+    (None, None),
+])
+def test_normalize_phone_e164(phone, expected):
+    assert normalize_phone_e164(phone) == expected
+
+
+def test_search_keys_phone_term():
+    assert client_search.search_keys("90 123 45 67") == (
+        "+998901234567", "+998901234567", "+998901234568", None, None)
+    assert client_search.search_keys("+99890") == (None, "+99890", "+99891", None, None)
+    assert client_search.search_keys("9012", phone_prefix=False) == (None, None, None, None, None)
+    assert client_search.phone_prefix_range("12") == (None, None)
+
+
+def test_search_keys_name_term_escapes_like_wildcards():
+    assert client_search.search_keys(" Ali 50%_ ") == (None, None, None, "Ali 50%_", "%Ali 50\\%\\_%")
+    assert client_search.search_keys("A") == (None, None, None, None, None)
+
+
+@pytest.mark.asyncio
+async def test_search_users_single_ranked_query():
+    conn = make_conn([{'id': 1, 'full_name': 'Ali', 'match_rank': client_search.EXACT_PHONE}])
+
+    rows = await client_search.search_users(conn, "+998901234567", role='client', limit=5)
+
+    assert rows == [{'id': 1, 'full_name': 'Ali', 'match_rank': 0}]
+    query, *args = conn.fetch.await_args.args
+    assert query == client_search.SEARCH_QUERY
+    assert args == ["+998901234567", "+998901234567", "+998901234568", None, None, 'client', 5]
+
+
+@pytest.mark.asyncio
+async def test_search_users_skips_empty_terms():
+    conn = make_conn()
+
+    assert await client_search.search_users(conn, "  ") == []
+    conn.fetch.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_backfill_sets_normalised_phones_in_batches():
+    conn = make_conn(batches=[
+        [{'id': 1, 'phone_number': '901234567'}, {'id': 4, 'phone_number': 'n/a'}],
+        [{'id': 9, 'phone_number': '+998 93 765 43 21'}],
+        [],
+    ])
+
+    assert await client_search.backfill_phone_e164(conn, batch_size=2) == 2
+
+    assert [call.args[1] for call in conn.fetch.await_args_list] == [0, 4, 9]
+    assert [call.args[1:] for call in conn.execute.await_args_list] == [
+        ([1], ['+998901234567']), ([9], ['+998937654321'])]
+
+
+@pytest.mark.asyncio
+async def test_update_client_info_keeps_phone_e164_in_step():
+    from database.base_queries import update_client_info
+
+    conn = make_conn()
+    assert await update_client_info(7, {'phone_number': '90 123 45 67'}, pool=make_pool(conn))
+
+    query, *values = conn.execute.await_args.args
+    assert "phone_number = $1, phone_e164 = $2" in query
+    assert values[:2] == ['90 123 45 67', '+998901234567'] and values[-1] == 7
@@ -0,0 +1,133 @@
+"""
+Tests for the shared, metered asyncpg pool.
+"""
+
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from database import pool as db_pool
+from database.jsonb import decode_jsonb, encode_jsonb, load_json
+from database.pool import Histogram, MeteredPool, PoolMetrics, pool_settings
+
+
+def make_raw_pool(size=5, idle=3):
+    conn = MagicMock()
+    conn.fetchval = AsyncMock(return_value=1)
+    raw = MagicMock()
+    raw.acquire = AsyncMock(return_value=conn)
+    raw.release = AsyncMock()
+    raw.get_size.return_value = size
+    raw.get_idle_size.return_value = idle
+    raw.get_min_size.return_value = 2
+    raw.get_max_size.return_value = 20
+    raw.close = AsyncMock()
+    return raw, conn
+
+
+def logged_query(elapsed, query="SELECT 1", exception=None):
+    return SimpleNamespace(query=query, elapsed=elapsed, exception=exception)
+
+
+class TestMeteredPool:
+    """Test acquire metering and delegation"""
+
+    @pytest.mark.asyncio
+    async def test_acquire_context_and_await_forms(self):
+        raw, conn = make_raw_pool()
+        pool = MeteredPool(raw, PoolMetrics(slow_query_ms=100))
+
+        async with pool.acquire() as acquired:
+            assert acquired is conn
+        raw.release.assert_awaited_once_with(conn)
+
+        acquired = await pool.acquire()
+        await pool.release(acquired)  # delegated to asyncpg.Pool.release
+        assert await pool.fetchval("SELECT 1") == 1
+
+        stats = pool.get_stats()
+        assert stats['acquire_wait']['count'] == 3
+        assert stats['in_use'] == 2 and stats['idle'] == 3
+        assert stats['waiting'] == 0
+
+    @pytest.mark.asyncio
+    async def test_acquire_errors_are_counted(self):
+        raw, _ = make_raw_pool()
+        raw.acquire = AsyncMock(side_effect=asyncio.TimeoutError())
+        pool = MeteredPool(raw, PoolMetrics())
+
+        with pytest.raises(asyncio.TimeoutError):
+            async with pool.acquire(timeout=0.1):
+                pass
+        assert pool.metrics.acquire_errors == 1
+        assert pool.metrics.waiting == 0
+
+
+class TestPoolMetrics:
+    """Test query histograms and the slow statement table"""
+
+    def test_slow_query_histogram(self):
+        metrics = PoolMetrics(slow_query_ms=100)
+        metrics.observe_query(logged_query(0.002))
+        metrics.observe_query(logged_query(0.3, "SELECT *\n  FROM service_requests"))
+        metrics.observe_query(logged_query(0.6, "SELECT *\n  FROM service_requests"))
+        metrics.observe_query(logged_query(0.001, exception=Exception("boom")))
+
+        stats = metrics.to_dict()
+        assert stats['queries']['count'] == 4
+        assert stats['slow_queries']['count'] == 2
+        assert stats['query_errors'] == 1
+        slowest = stats['slowest_statements'][0]
+        assert slowest['query'] == "SELECT * FROM service_requests"
+        assert slowest['count'] == 2 and slowest['max_ms'] == 600.0
+
+    def test_histogram_buckets(self):
+        histogram = Histogram((1, 10))
+        for value in (0.5, 1, 5, 50):
+            histogram.observe(value)
+        assert histogram.to_dict()['buckets'] == {'<=1ms': 2, '<=10ms': 1, '>10ms': 1}
+
+
+class TestPoolFactory:
+    """Test configuration and the shared instance"""
+
+    def test_pool_settings_from_config(self):
+        with patch.object(db_pool.config, 'DB_TIMEZONE', 'Asia/Tashkent'), \
+                patch.object(db_pool.config, 'DB_STATEMENT_TIMEOUT_MS', 15000):
+            settings = pool_settings()
+        assert settings['server_settings']['timezone'] == 'Asia/Tashkent'
+        assert settings['server_settings']['statement_timeout'] == '15000'
+        assert settings['statement_cache_size'] == db_pool.config.DB_STATEMENT_CACHE_SIZE
+        assert settings['max_inactive_connection_lifetime'] == db_pool.config.DB_MAX_INACTIVE_CONNECTION_LIFETIME
+
+    @pytest.mark.asyncio
+    async def test_shared_pool_is_created_once(self):
+        raw, _ = make_raw_pool()
+        with patch.object(db_pool.asyncpg, 'create_pool', AsyncMock(return_value=raw)) as create:
+            first, second = await asyncio.gather(db_pool.get_shared_pool(), db_pool.get_shared_pool())
+            assert first is second
+            assert create.await_count == 1
+            assert 'init' in create.await_args.kwargs
+            await db_pool.close_shared_pool()
+        raw.close.assert_awaited_once()
+        assert db_pool.get_pool_stats() == {}
+
+    @pytest.mark.asyncio
+    async def test_init_hook_registers_jsonb_codec_and_query_logger(self):
+        metrics = PoolMetrics()
+        conn = MagicMock()
+        conn.set_type_codec = AsyncMock()
+        await db_pool.make_connection_init(metrics)(conn)
+
+        assert conn.set_type_codec.await_args.args[0] == 'jsonb'
+        conn.add_query_logger.assert_called_once_with(metrics.observe_query)
+
+
+def test_jsonb_codec_accepts_text_and_objects():
+    assert encode_jsonb('{"a": 1}') == '{"a": 1}'
+    assert decode_jsonb(encode_jsonb({'name': 'Ташкент'})) == {'name': 'Ташкент'}
+    assert load_json('{"a": 1}', {}) == {'a': 1}
+    assert load_json({'a': 1}, {}) == {'a': 1}
+    assert load_json(None, []) == []
+    assert load_json('not json', {}) == {}
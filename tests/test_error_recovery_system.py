@@ -599,6 +599,7 @@ class TestWorkflowRecoveryManager:
         )
         
         from database.models import WorkflowDefinition, WorkflowStep
+        from utils.workflow_graph import compile_workflows
         mock_step = WorkflowStep(
             role='manager',
             actions=['assign_to_junior_manager'],
@@ -613,7 +614,9 @@ class TestWorkflowRecoveryManager:
         )
         
         self.mock_state_manager.get_request = AsyncMock(return_value=mock_request)
-        self.mock_workflow_engine.get_workflow_definition = Mock(return_value=mock_workflow_def)
+        self.mock_workflow_engine.get_workflow_graph = Mock(
+            return_value=compile_workflows({WorkflowType.CONNECTION_REQUEST.value: mock_workflow_def})
+        )
         
         options = await self.recovery_manager.get_recovery_options('req-123')
         
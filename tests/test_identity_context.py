@@ -0,0 +1,226 @@
+"""
+Tests for the per-update identity context and the process-wide identity cache.
+
+One update must cost at most one users lookup no matter how many routers,
+filters, middlewares and helpers ask for the sender's role or language, and
+hot users must cost none while writes still take effect immediately.
+"""
+
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from filters.role_filter import RoleFilter
+from middlewares.identity_middleware import IdentityContextMiddleware
+from utils.identity_context import (
+    IdentityContext, get_current_identity, get_identity, mark_user_stale, user_lookup_counter
+)
+from utils.cache_manager import LRUCache, identity_cache
+from utils.get_role import get_user_role, get_user_role_by_telegram_id
+from utils.get_lang import get_user_lang
+from database import base_queries
+
+
+TELEGRAM_ID = 555000111
+
+
+@pytest.fixture(autouse=True)
+def clean_identity_cache():
+    identity_cache.clear()
+    user_lookup_counter.reset()
+    yield
+    identity_cache.clear()
+
+
+def make_pool(row):
+    """Build a fake asyncpg pool whose connection returns ``row``"""
+    conn = MagicMock()
+    conn.fetchrow = AsyncMock(return_value=row)
+    conn.execute = AsyncMock(return_value="UPDATE 1")
+    acquire = MagicMock()
+    acquire.__aenter__ = AsyncMock(return_value=conn)
+    acquire.__aexit__ = AsyncMock(return_value=False)
+    pool = MagicMock()
+    pool.acquire = MagicMock(return_value=acquire)
+    return pool, conn
+
+
+def make_event(telegram_id=TELEGRAM_ID):
+    return SimpleNamespace(from_user=SimpleNamespace(id=telegram_id), text="📥 Inbox", data=None)
+
+
+def user_row(**overrides):
+    row = {
+        'id': 7, 'telegram_id': TELEGRAM_ID, 'full_name': 'Test Technician',
+        'role': 'technician', 'language': 'ru', 'is_active': True
+    }
+    row.update(overrides)
+    return row
+
+
+@pytest.mark.asyncio
+async def test_one_update_costs_one_users_lookup():
+    pool, conn = make_pool(user_row())
+    middleware = IdentityContextMiddleware(pool=pool)
+    seen = {}
+
+    async def handler(event, data):
+        # Simulate aiogram probing every role router plus handler-level lookups
+        for role in ('admin', 'manager', 'controller', 'call_center', 'warehouse', 'technician'):
+            seen[role] = await RoleFilter(role)(event)
+        seen['role'] = await get_user_role(event.from_user.id)
+        seen['role_by_tg'] = await get_user_role_by_telegram_id(event.from_user.id)
+        seen['lang'] = await get_user_lang(event.from_user.id)
+        seen['db_lang'] = await base_queries.get_user_lang(event.from_user.id)
+        seen['user'] = await base_queries.get_user_by_telegram_id(event.from_user.id)
+        seen['identity'] = data['identity']
+        return "handled"
+
+    user_lookup_counter.reset()
+    result = await middleware(handler, make_event(), {})
+
+    assert result == "handled"
+    assert user_lookup_counter.count == 1
+    assert conn.fetchrow.await_count == 1
+    assert seen['technician'] is True
+    assert seen['manager'] is False
+    assert seen['role'] == seen['role_by_tg'] == 'technician'
+    assert seen['lang'] == seen['db_lang'] == 'ru'
+    assert seen['user']['full_name'] == 'Test Technician'
+    assert seen['identity'].lookups == 1
+    # Context does not leak past the update
+    assert get_current_identity() is None
+
+
+@pytest.mark.asyncio
+async def test_unregistered_user_is_resolved_once():
+    pool, conn = make_pool(None)
+    middleware = IdentityContextMiddleware(pool=pool)
+
+    async def handler(event, data):
+        assert await base_queries.get_user_by_telegram_id(event.from_user.id) is None
+        assert await get_user_role(event.from_user.id) == 'client'
+        return data['identity']
+
+    user_lookup_counter.reset()
+    identity = await middleware(handler, make_event(), {})
+
+    assert user_lookup_counter.count == 1
+    assert identity.exists is False
+
+
+@pytest.mark.asyncio
+async def test_write_marks_identity_stale_and_reloads_once():
+    pool, conn = make_pool(user_row(language='ru'))
+    middleware = IdentityContextMiddleware(pool=pool)
+
+    async def handler(event, data):
+        assert await base_queries.get_user_lang(event.from_user.id) == 'ru'
+        conn.fetchrow.return_value = user_row(language='uz')
+        await base_queries.update_user_language(event.from_user.id, 'uz', pool=pool)
+        assert await base_queries.get_user_lang(event.from_user.id) == 'uz'
+        assert await get_user_lang(event.from_user.id) == 'uz'
+
+    user_lookup_counter.reset()
+    await middleware(handler, make_event(), {})
+
+    # The write patched the identity cache, so the language re-read is free
+    assert user_lookup_counter.count == 1
+
+
+@pytest.mark.asyncio
+async def test_other_users_are_not_served_from_context():
+    pool, conn = make_pool(user_row())
+    middleware = IdentityContextMiddleware(pool=pool)
+
+    async def handler(event, data):
+        conn.fetchrow.return_value = user_row(telegram_id=999, role='manager')
+        other = await base_queries.get_user_by_telegram_id(999, pool=pool)
+        assert other['role'] == 'manager'
+
+    user_lookup_counter.reset()
+    await middleware(handler, make_event(), {})
+
+    assert user_lookup_counter.count == 2
+
+
+@pytest.mark.asyncio
+async def test_hot_user_costs_zero_lookups():
+    pool, conn = make_pool(user_row())
+    middleware = IdentityContextMiddleware(pool=pool)
+
+    async def handler(event, data):
+        return await RoleFilter('technician')(event)
+
+    assert await middleware(handler, make_event(), {}) is True
+    user_lookup_counter.reset()
+
+    for _ in range(5):
+        assert await middleware(handler, make_event(), {}) is True
+    assert await get_user_role(TELEGRAM_ID) == 'technician'
+
+    assert user_lookup_counter.count == 0
+    assert identity_cache.get_stats()['hits'] >= 6
+
+
+@pytest.mark.asyncio
+async def test_role_change_takes_effect_immediately():
+    pool, conn = make_pool(user_row())
+    assert (await get_identity(TELEGRAM_ID, pool))['role'] == 'technician'
+
+    mark_user_stale(telegram_id=TELEGRAM_ID, role='manager')
+
+    user_lookup_counter.reset()
+    assert await get_user_role(TELEGRAM_ID) == 'manager'
+    assert user_lookup_counter.count == 0
+
+
+@pytest.mark.asyncio
+async def test_write_by_user_id_drops_cached_identity():
+    pool, conn = make_pool(user_row())
+    await get_identity(TELEGRAM_ID, pool)
+    assert TELEGRAM_ID in identity_cache
+
+    mark_user_stale(user_id=7)
+
+    assert TELEGRAM_ID not in identity_cache
+
+
+def test_lru_cache_evicts_least_recently_used():
+    lru = LRUCache(max_entries=2, default_ttl=60)
+    lru.set(1, 'a')
+    lru.set(2, 'b')
+    assert lru.get(1) == 'a'
+    lru.set(3, 'c')
+
+    assert 2 not in lru
+    assert lru.get(1) == 'a'
+    assert lru.get(2) is None
+    stats = lru.get_stats()
+    assert stats['evictions'] == 1
+    assert stats['hits'] == 2
+    assert stats['misses'] == 1
+
+
+def test_lru_cache_expires_entries():
+    lru = LRUCache(max_entries=10, default_ttl=60)
+    lru.set('k', {'role': 'client'}, ttl=-1)
+    assert lru.get('k') is None
+    assert lru.get_stats()['expirations'] == 1
+
+
+def test_mark_user_stale_without_context_is_noop():
+    mark_user_stale(telegram_id=TELEGRAM_ID)
+    assert get_current_identity() is None
+
+
+def test_identity_properties():
+    identity = IdentityContext(telegram_id=TELEGRAM_ID, identity=user_row(), loaded=True)
+    assert identity.user_id == 7
+    assert identity.role == 'technician'
+    assert identity.language == 'ru'
+    assert identity.is_active is True
+
+    identity.invalidate()
+    assert identity.loaded is False
+    assert identity.role is None
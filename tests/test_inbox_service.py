@@ -313,12 +313,12 @@ class TestInboxService:
     async def test_cleanup_old_messages(self, inbox_service, mock_pool):
         """Test cleaning up old messages"""
         pool, conn = mock_pool
-        conn.execute.return_value = "DELETE 5"  # Mock result
+        conn.fetchval.return_value = 5  # Deleted message count
         
         result = await inbox_service.cleanup_old_messages(30)
         
         assert result == 5
-        conn.execute.assert_called_once()
+        conn.fetchval.assert_called_once()
     
     @pytest.mark.asyncio
     async def test_get_unread_count(self, inbox_service, mock_pool):
@@ -432,21 +432,30 @@ class TestInventoryManager:
             assert len(summary['categories']) == 2
             assert len(summary['recent_transactions']) == 2
     
-    def test_get_reserved_items(self, inventory_manager):
+    @pytest.mark.asyncio
+    async def test_get_reserved_items(self, inventory_manager, mock_connection):
         """Test getting reserved items for a request"""
-        # Set up reservation
-        equipment_list = [{'material_id': 1, 'quantity': 10}]
-        inventory_manager._reserved_items["req-123"] = equipment_list
-        
-        reserved = inventory_manager.get_reserved_items("req-123")
+        # Reservations live in the stock_reservations ledger
+        mock_connection.fetch.return_value = [{'material_id': 1, 'quantity': 10}]
+        with patch('loader.bot') as mock_bot:
+            mock_bot.db.acquire.return_value.__aenter__ = AsyncMock(return_value=mock_connection)
+            mock_bot.db.acquire.return_value.__aexit__ = AsyncMock(return_value=None)
+            
+            reserved = await inventory_manager.get_reserved_items("req-123")
         
         assert len(reserved) == 1
         assert reserved[0]['material_id'] == 1
         assert reserved[0]['quantity'] == 10
     
-    def test_get_reserved_items_not_found(self, inventory_manager):
+    @pytest.mark.asyncio
+    async def test_get_reserved_items_not_found(self, inventory_manager, mock_connection):
         """Test getting reserved items for non-existent request"""
-        reserved = inventory_manager.get_reserved_items("req-nonexistent")
+        mock_connection.fetch.return_value = []
+        with patch('loader.bot') as mock_bot:
+            mock_bot.db.acquire.return_value.__aenter__ = AsyncMock(return_value=mock_connection)
+            mock_bot.db.acquire.return_value.__aexit__ = AsyncMock(return_value=None)
+            
+            reserved = await inventory_manager.get_reserved_items("req-nonexistent")
         
         assert len(reserved) == 0
     
@@ -4,6 +4,7 @@ Simple integration test for InventoryManager instantiation
 
 import sys
 import os
+from unittest.mock import AsyncMock, MagicMock, patch
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from utils.inventory_manager import InventoryManager, get_inventory_manager
@@ -13,8 +14,6 @@ def test_inventory_manager_creation():
     manager = InventoryManager()
     assert manager is not None
     assert hasattr(manager, 'logger')
-    assert hasattr(manager, '_reserved_items')
-    assert len(manager._reserved_items) == 0
 
 def test_get_inventory_manager():
     """Test the global inventory manager function"""
@@ -29,20 +28,28 @@ def test_get_inventory_manager():
 
 def test_reserved_items_operations():
     """Test basic reserved items operations"""
-    manager = InventoryManager()
+    import asyncio
     
-    # Test getting reserved items for non-existent request
-    reserved = manager.get_reserved_items("req-nonexistent")
-    assert len(reserved) == 0
+    manager = InventoryManager()
+    conn = MagicMock()
+    conn.fetch = AsyncMock(side_effect=[[], [{'material_id': 1, 'quantity': 10}]])
+    bot = MagicMock()
+    bot.db.acquire.return_value.__aenter__ = AsyncMock(return_value=conn)
+    bot.db.acquire.return_value.__aexit__ = AsyncMock(return_value=None)
     
-    # Test setting reserved items
-    equipment_list = [{'material_id': 1, 'quantity': 10}]
-    manager._reserved_items["req-123"] = equipment_list
+    async def test_async():
+        with patch('loader.bot', bot):
+            # Test getting reserved items for non-existent request
+            reserved = await manager.get_reserved_items("req-nonexistent")
+            assert len(reserved) == 0
+            
+            # Reservations are read from the stock_reservations ledger
+            reserved = await manager.get_reserved_items("req-123")
+            assert len(reserved) == 1
+            assert reserved[0]['material_id'] == 1
+            assert reserved[0]['quantity'] == 10
     
-    reserved = manager.get_reserved_items("req-123")
-    assert len(reserved) == 1
-    assert reserved[0]['material_id'] == 1
-    assert reserved[0]['quantity'] == 10
+    asyncio.run(test_async())
 
 if __name__ == "__main__":
     test_inventory_manager_creation()
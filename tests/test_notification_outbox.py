@@ -0,0 +1,188 @@
+"""
+Tests for the notification_queue outbox: enqueueing, batch claiming and settling.
+"""
+
+import asyncio
+import pytest
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramNetworkError
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from utils import notification_outbox as outbox_module
+from utils.notification_outbox import (
+    CLAIM_QUERY, MARK_FAILED_QUERY, MARK_RETRY_QUERY, MARK_SENT_QUERY,
+    NotificationOutbox, OutboxMessage, _dump_markup, _load_markup, enqueue
+)
+from utils.notification_system import NotificationSystem
+from utils.telegram_fanout import TelegramFanout
+
+
+def make_pool(conn):
+    pool = MagicMock()
+    pool.acquire.return_value.__aenter__ = AsyncMock(return_value=conn)
+    pool.acquire.return_value.__aexit__ = AsyncMock(return_value=None)
+    return pool
+
+
+def make_conn():
+    conn = MagicMock()
+    conn.fetch = AsyncMock(return_value=[])
+    conn.fetchrow = AsyncMock(return_value=None)
+    conn.execute = AsyncMock()
+    conn.transaction.return_value.__aenter__ = AsyncMock(return_value=None)
+    conn.transaction.return_value.__aexit__ = AsyncMock(return_value=None)
+    return conn
+
+
+class FakeBot:
+    """``failures`` maps chat_id -> exception raised on every send to that chat"""
+
+    def __init__(self, failures=None):
+        self.failures = failures or {}
+        self.sent = []
+
+    async def send_message(self, chat_id, text, reply_markup=None, parse_mode=None):
+        if chat_id in self.failures:
+            raise self.failures[chat_id]
+        self.sent.append((chat_id, text, reply_markup))
+        return SimpleNamespace(message_id=100 + len(self.sent))
+
+
+def keyboard():
+    return InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="Open", callback_data="view_assignments_abc")
+    ]])
+
+
+def queued_row(row_id, chat_id, attempts=1, max_attempts=5, markup=None):
+    return {
+        'id': row_id, 'user_id': row_id, 'chat_id': chat_id, 'message': f"message {row_id}",
+        'reply_markup': markup, 'parse_mode': 'HTML', 'attempts': attempts, 'max_attempts': max_attempts
+    }
+
+
+def test_markup_round_trip():
+    markup = keyboard()
+
+    restored = _load_markup(_dump_markup(markup))
+
+    assert isinstance(restored, InlineKeyboardMarkup)
+    assert restored.inline_keyboard[0][0].callback_data == "view_assignments_abc"
+    assert _dump_markup(None) is None
+    assert _load_markup(None) is None
+
+
+@pytest.mark.asyncio
+async def test_enqueue_inserts_all_messages_with_one_statement():
+    conn = make_conn()
+    conn.fetch.return_value = [{'id': 1}, {'id': 2}]
+
+    ids = await enqueue(conn, [
+        OutboxMessage(user_id=10, chat_id=1010, text="a", reply_markup=keyboard(), request_id="req-1"),
+        OutboxMessage(user_id=11, chat_id=1011, text="b", notification_type='alert'),
+    ])
+
+    assert ids == [1, 2]
+    conn.fetch.assert_awaited_once()
+    query, *args = conn.fetch.call_args.args
+    assert "unnest" in query
+    assert args[0] == [10, 11]
+    assert args[1] == [1010, 1011]
+    assert args[3][0].startswith('{"inline_keyboard"') and args[3][1] is None
+    assert args[5] == ['notification', 'alert']
+
+
+@pytest.mark.asyncio
+async def test_enqueue_nothing_skips_the_database():
+    conn = make_conn()
+
+    assert await enqueue(conn, []) == []
+    conn.fetch.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_process_batch_settles_each_row():
+    conn = make_conn()
+    conn.fetch.return_value = [
+        queued_row(1, 501, markup=_dump_markup(keyboard())),
+        queued_row(2, 502),                               # network error, attempts left -> retry
+        queued_row(3, 503),                               # bot blocked -> failed
+        queued_row(4, 504, attempts=5, max_attempts=5),   # network error, no attempts left -> failed
+    ]
+    bot = FakeBot(failures={
+        502: TelegramNetworkError(method=MagicMock(), message="timeout"),
+        503: TelegramForbiddenError(method=MagicMock(), message="bot was blocked by the user"),
+        504: TelegramNetworkError(method=MagicMock(), message="timeout"),
+    })
+    fanout = TelegramFanout(bot=bot, rate=1000, per_chat_interval=0, concurrency=4, max_retries=0)
+    outbox = NotificationOutbox(pool=make_pool(conn), fanout=fanout, batch_size=10)
+
+    assert await outbox.process_batch() == 4
+
+    assert conn.fetch.call_args.args == (CLAIM_QUERY, 10, outbox.lease_seconds)
+    assert isinstance(bot.sent[0][2], InlineKeyboardMarkup)
+    calls = {call.args[0]: call.args[1:] for call in conn.execute.call_args_list}
+    assert calls[MARK_SENT_QUERY] == ([1], [101])
+    assert calls[MARK_RETRY_QUERY][0] == [2]
+    assert calls[MARK_FAILED_QUERY][0] == [3, 4]
+    assert (outbox.sent, outbox.retried, outbox.failed) == (1, 1, 2)
+
+
+@pytest.mark.asyncio
+async def test_process_batch_without_due_rows_sends_nothing():
+    conn = make_conn()
+    bot = FakeBot()
+    outbox = NotificationOutbox(pool=make_pool(conn), fanout=TelegramFanout(bot=bot, per_chat_interval=0))
+
+    assert await outbox.process_batch() == 0
+    assert bot.sent == []
+    conn.execute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_worker_wakes_up_for_new_messages():
+    outbox = NotificationOutbox(pool=MagicMock(), fanout=MagicMock(), workers=1, poll_interval_ms=60000)
+    outbox.process_batch = AsyncMock(return_value=0)
+
+    outbox.start()
+    await asyncio.sleep(0.01)
+    outbox.wake()
+    await asyncio.sleep(0.01)
+    await outbox.stop()
+
+    assert outbox.process_batch.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_send_assignment_notification_enqueues_in_a_transaction():
+    conn = make_conn()
+    users = [
+        {'id': 1, 'telegram_id': 1001, 'full_name': 'A', 'language': 'uz'},
+        {'id': 2, 'telegram_id': 1002, 'full_name': 'B', 'language': 'ru'},
+    ]
+    conn.fetch.side_effect = [users, [{'id': 7}, {'id': 8}]]
+    conn.fetchrow.return_value = {'description': 'Internet', 'priority': 'high', 'created_at': datetime.now()}
+    system = NotificationSystem(pool=make_pool(conn))
+
+    with patch.object(outbox_module.notification_outbox, 'wake') as wake:
+        assert await system.send_assignment_notification('manager', 'req-1', 'connection_request')
+
+    conn.transaction.assert_called_once()
+    wake.assert_called_once()
+    insert_query, *args = conn.fetch.call_args_list[1].args
+    assert "notification_queue" in insert_query
+    assert args[1] == [1001, 1002]
+    assert args[5] == ['assignment', 'assignment']
+    assert args[6] == ['req-1', 'req-1']
+
+
+@pytest.mark.asyncio
+async def test_send_assignment_notification_skips_excluded_roles():
+    conn = make_conn()
+    system = NotificationSystem(pool=make_pool(conn))
+
+    assert await system.send_assignment_notification('client', 'req-1', 'connection_request')
+    conn.fetch.assert_not_awaited()
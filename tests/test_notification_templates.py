@@ -0,0 +1,100 @@
+"""
+Tests for the compiled notification template registry.
+"""
+
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+from utils.inbox_service import _role_notice
+from utils.notification_system import NotificationSystem
+from utils.notification_templates import CompiledTemplate, TemplateRegistry
+
+
+def test_compiled_template_renders_and_blanks_missing_fields():
+    template = CompiledTemplate("Zayavka #{id} ({status})")
+
+    assert template.fields == frozenset({'id', 'status'})
+    assert template.render({'id': 5, 'status': 'new'}) == "Zayavka #5 (new)"
+    assert template.render({'id': 5}) == "Zayavka #5 ()"
+
+
+def test_bind_substitutes_static_fields_only():
+    template = CompiledTemplate("{title}: {name} {{literal}} {count:03d}")
+
+    bound = template.bind({'title': 'Hi {there}', 'count': 7})
+
+    assert bound.fields == frozenset({'name'})
+    assert bound.render({'name': 'Ali'}) == "Hi {there}: Ali {literal} 007"
+
+
+def test_registry_caches_static_variants_and_falls_back_to_default_language():
+    registry = TemplateRegistry()
+
+    first = registry.render('assignment', 'uz', static={'workflow_name': 'Texnik xizmat'},
+                            description='Internet', priority='high', created_at='01.01.2025 10:00')
+    registry.render('assignment', 'uz', static={'workflow_name': 'Texnik xizmat'},
+                    description='TV', priority='low', created_at='02.01.2025 10:00')
+
+    assert "📋 Tur: Texnik xizmat" in first and "Internet" in first
+    assert registry.get_stats()['cached_variants'] == 1
+    assert registry.render('assignment.button', 'en') == registry.render('assignment.button', 'ru')
+    with pytest.raises(KeyError):
+        registry.get('unknown', 'ru')
+
+
+def test_set_hot_reloads_and_drops_cached_variants():
+    registry = TemplateRegistry()
+    registry.render('assignment', 'ru', static={'workflow_name': 'X'}, description='', priority='', created_at='')
+
+    registry.set('assignment', 'ru', "Новое: {workflow_name} / {priority}")
+
+    assert registry.get_stats()['cached_variants'] == 0
+    assert registry.render('assignment', 'ru', static={'workflow_name': 'X'}, priority='high') == "Новое: X / high"
+
+
+def test_invalid_admin_template_is_used_verbatim():
+    registry = TemplateRegistry()
+
+    registry.set('zayavka_created', 'uz', "Zayavka {id yaratildi")
+
+    assert registry.render('zayavka_created', 'uz', id=1) == "Zayavka {id yaratildi"
+
+
+@pytest.mark.asyncio
+async def test_load_overrides_builtins_from_database():
+    pool = MagicMock()
+    pool.fetch = AsyncMock(return_value=[
+        {'template_type': 'zayavka_created', 'language': 'ru', 'content': 'Ваша заявка #{id} создана.'},
+        {'template_type': 'completion.button', 'language': 'ru', 'content': '⭐ Поставить оценку'},
+    ])
+    registry = TemplateRegistry(pool=pool)
+
+    assert await registry.load() == 2
+    assert registry.render('zayavka_created', 'ru', id=42) == 'Ваша заявка #42 создана.'
+    assert registry.render('completion.button', 'ru') == '⭐ Поставить оценку'
+
+
+def test_assignment_message_uses_registry():
+    system = NotificationSystem(pool=MagicMock())
+    request_data = {'description': None, 'priority': 'urgent', 'created_at': datetime(2025, 3, 1, 9, 30)}
+
+    text, keyboard = system._build_notification_message(
+        {'language': 'uz'}, 'req-1', 'connection_request', request_data, 'n-1'
+    )
+
+    assert text.startswith("🔔 Yangi topshiriq")
+    assert "Ulanish so'rovi" in text and "01.03.2025 09:30" in text
+    assert keyboard.inline_keyboard[0][0].text == "📋 Topshiriqlarni ko'rish"
+    assert keyboard.inline_keyboard[0][0].callback_data == "view_assignments_n-1"
+
+
+def test_inbox_role_notice_is_localised_per_recipient():
+    render = _role_notice('inbox.transfer', 'z-7', 'zayavka', 'junior_manager')
+
+    assert render({'language': 'uz'}) == ("📥 Ariza z-7 sizga Kichik menejer rolidan o'tkazildi", None)
+    assert render({'language': 'ru'}) == ("📥 Заявка z-7 передана вам из роли «Младший менеджер»", None)
+    assert render({'language': None})[0] == render({'language': 'ru'})[0]
+    assert _role_notice('inbox.assigned', 's-3', 'service_request')({'language': 'uz'})[0] == (
+        "📥 Sizga tayinlandi: Xizmat so'rovi s-3"
+    )
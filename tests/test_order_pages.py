@@ -0,0 +1,79 @@
+"""
+Tests for the keyset-paged zayavka lists of the staff inbox screens.
+"""
+
+import re
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from config import ConfigConstants
+from database import order_pages
+from keyboards.inbox_buttons import OrderPageCallback, get_order_page_keyboard
+from keyboards.junior_manager_buttons import get_junior_manager_inbox_actions
+
+
+def rows(*ids):
+    return [{'id': i, 'public_id': None, 'description': f'Zayavka {i}', 'status': 'new',
+             'created_at': datetime(2026, 1, 1), 'client_name': None} for i in ids]
+
+
+def test_page_query_seeks_on_the_primary_key():
+    query = order_pages.PAGE_QUERY
+    assert "z.id < $4" in query and "ORDER BY z.id DESC" in query and "LIMIT $5" in query
+    assert "OFFSET" not in query
+
+    schema = (Path(__file__).resolve().parent.parent / 'my_database.sql').read_text()
+    body = re.search(r"CREATE TABLE public\.zayavki \((.*?)\n\);", schema, re.S).group(1)
+    columns = {line.split()[0] for line in body.strip().splitlines()}
+    assert set(re.findall(r"\bz\.(\w+)", query)) <= columns
+
+
+@pytest.mark.asyncio
+async def test_fetch_page_returns_cursor_of_last_row():
+    conn = MagicMock()
+    conn.fetch = AsyncMock(side_effect=[rows(9, 8, 7), rows(6)])
+
+    page = await order_pages.fetch_page(conn, statuses=order_pages.NEW_STATUSES, limit=2)
+    assert [row['id'] for row in page] == [9, 8] and page.next_cursor == '8'
+    assert conn.fetch.await_args.args[1:] == (['new', 'pending'], None, None, None, 3)
+
+    page = await order_pages.fetch_page(conn, exclude_statuses=('closed',), current_user_id=5,
+                                        limit=2, cursor=page.next_cursor)
+    assert [row['id'] for row in page] == [6] and not page.has_more
+    assert conn.fetch.await_args.args[1:] == (None, ['closed'], 5, 8, 3)
+
+
+@pytest.mark.asyncio
+async def test_get_page_is_empty_on_bad_cursor_or_error():
+    conn = MagicMock()
+    conn.fetch = AsyncMock(side_effect=Exception("db down"))
+    pool = MagicMock()
+    pool.acquire.return_value.__aenter__ = AsyncMock(return_value=conn)
+    pool.acquire.return_value.__aexit__ = AsyncMock(return_value=False)
+
+    assert (await order_pages.get_page(pool, cursor='x1')).items == []
+    conn.fetch.assert_not_awaited()
+    assert (await order_pages.get_page(pool, cursor='5')).items == []
+
+
+def test_order_page_keyboard():
+    assert get_order_page_keyboard(OrderPageCallback(k='n'), None) is None
+
+    first = get_order_page_keyboard(OrderPageCallback(k='n'), '2147483647')
+    [[next_button]] = first.inline_keyboard
+    assert OrderPageCallback.unpack(next_button.callback_data) == OrderPageCallback(k='n', c='2147483647')
+    assert len(next_button.callback_data) <= ConfigConstants.MAX_CALLBACK_DATA_LENGTH
+
+    later = get_order_page_keyboard(OrderPageCallback(k='i', c='40'), '30', 'ru')
+    assert [button.text for button in later.inline_keyboard[0]] == ["⏮ В начало", "➡️ Далее"]
+
+
+def test_junior_manager_actions_keyboard():
+    keyboard = get_junior_manager_inbox_actions(7)
+    assert [row[0].callback_data for row in keyboard.inline_keyboard] == [
+        "action_assign_technician_zayavka_7", "action_comment_zayavka_7", "action_complete_zayavka_7"
+    ]
+
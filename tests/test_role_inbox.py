@@ -0,0 +1,209 @@
+"""
+Tests for the materialised per-role inbox (role_inbox) and its counters.
+"""
+
+import uuid
+
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from config import ConfigConstants
+from database import role_inbox
+from keyboards.inbox_buttons import InboxPageCallback
+from utils.inbox_service import ApplicationTransferService, InboxService, inbox_page_cache
+
+
+def make_conn(fetch=None, fetchval=None):
+    conn = MagicMock()
+    conn.fetch = AsyncMock(return_value=fetch or [])
+    conn.fetchval = AsyncMock(side_effect=fetchval) if isinstance(fetchval, list) else AsyncMock(return_value=fetchval)
+    conn.execute = AsyncMock(return_value="UPDATE 1")
+    conn.transaction.return_value.__aenter__ = AsyncMock(return_value=None)
+    conn.transaction.return_value.__aexit__ = AsyncMock(return_value=None)
+    return conn
+
+
+def make_pool(conn):
+    pool = MagicMock()
+    pool.acquire.return_value.__aenter__ = AsyncMock(return_value=conn)
+    pool.acquire.return_value.__aexit__ = AsyncMock(return_value=None)
+    return pool
+
+
+def test_create_message_writes_message_and_projection_in_one_statement():
+    query = role_inbox.CREATE_MESSAGE_QUERY
+    assert "INSERT INTO inbox_messages" in query
+    assert "INSERT INTO role_inbox" in query
+    assert "ON CONFLICT (assigned_role, application_type, application_id) DO UPDATE" in query
+    assert "is_read = ri.is_read AND EXCLUDED.is_read" in query
+    # No snapshot of the application is stored; pages read it live
+    assert "application_details" not in query
+    assert "application_details" not in role_inbox.REBUILD_APPLICATION_QUERY
+
+
+def test_list_query_adds_only_active_filters():
+    assert role_inbox.list_query() == ("assigned_role = $1", [])
+
+    where, params = role_inbox.list_query('zayavka', 'high', unread_only=True)
+
+    assert where == "assigned_role = $1 AND application_type = $2 AND priority = $3 AND NOT is_read"
+    assert params == ['zayavka', 'high']
+    assert role_inbox.list_query(priority='low')[0] == "assigned_role = $1 AND priority = $2"
+
+
+@pytest.mark.asyncio
+async def test_count_reads_counters():
+    conn = make_conn(fetchval=7)
+
+    assert await role_inbox.count_applications(conn, 'manager', unread_only=True) == 7
+    conn.fetchval.assert_awaited_once_with(role_inbox.COUNT_QUERY, 'manager', None, None, True)
+
+
+@pytest.mark.asyncio
+async def test_delete_read_messages_by_age_column():
+    conn = make_conn(fetchval=3)
+    cutoff = datetime(2024, 1, 1)
+
+    assert await role_inbox.delete_read_messages(conn, cutoff, ('notification',), age_column='created_at') == 3
+    query, *args = conn.fetchval.call_args.args
+    assert "created_at < $1" in query and "DELETE FROM role_inbox" in query
+    assert args == [cutoff, ['notification']]
+
+
+@pytest.mark.asyncio
+async def test_get_role_applications_reads_projection_and_counters():
+    row = {
+        'application_id': '12', 'application_type': 'zayavka', 'assigned_role': 'manager',
+        'priority': 'high', 'is_read': False, 'title': 'New', 'inbox_created_at': datetime.now(),
+        'inbox_updated_at': datetime.now(), 'application_details': '{"id": 12, "status": "new"}'
+    }
+    conn = make_conn(fetch=[row], fetchval=41)
+    service = InboxService(make_pool(conn))
+
+    result = await service.get_role_applications('manager', 1, page=2, page_size=20, include_read=False)
+
+    query, *args = conn.fetch.call_args.args
+    assert "FROM role_inbox" in query and "inbox_messages" not in query
+    assert "NOT is_read" in query
+    # The summary is looked up live for the page, after LIMIT/OFFSET picked it
+    assert query.index("LIMIT $2 OFFSET $3") < query.index(") ri")
+    assert "WHERE z.id = ri.application_id::integer" in query
+    assert args == ['manager', 20, 20]
+    conn.fetchval.assert_awaited_once_with(role_inbox.COUNT_QUERY, 'manager', None, None, True)
+    assert result['applications'][0]['application_details'] == {'id': 12, 'status': 'new'}
+    assert result['pagination']['total_count'] == 41
+    assert result['pagination']['total_pages'] == 3
+
+
+@pytest.mark.asyncio
+async def test_create_inbox_message_uses_callers_connection():
+    pool = make_pool(make_conn())
+    conn = make_conn(fetchval=5)
+
+    created = await InboxService(pool).create_inbox_message('12', 'zayavka', 'manager', conn=conn)
+
+    assert created
+    pool.acquire.assert_not_called()
+    assert conn.fetchval.call_args.args[0] == role_inbox.CREATE_MESSAGE_QUERY
+
+
+@pytest.mark.asyncio
+async def test_create_inbox_message_in_transaction_propagates_errors():
+    conn = make_conn()
+    conn.fetchval.side_effect = RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        await InboxService(make_pool(make_conn())).create_inbox_message('12', 'zayavka', 'manager', conn=conn)
+
+
+@pytest.mark.asyncio
+async def test_transfer_updates_projection_in_transfer_transaction():
+    conn = make_conn(fetchval=['12', 99, 100])
+    service = ApplicationTransferService(make_pool(conn))
+
+    with patch.object(service, 'validate_transfer', AsyncMock(return_value=(True, "ok"))), \
+            patch('utils.inbox_service.enqueue_for_role', AsyncMock(return_value=[])):
+        result = await service.execute_transfer('12', 'zayavka', 'manager', 'junior_manager', 1)
+
+    assert result['success'] and result['transfer_id'] == 99
+    queries = [call.args[0] for call in conn.fetchval.call_args_list]
+    assert queries[2] == role_inbox.CREATE_MESSAGE_QUERY
+    conn.execute.assert_awaited_once_with(role_inbox.MARK_ROLE_READ_QUERY, '12', 'zayavka', 'manager')
+
+
+def inbox_row(application_id, minute):
+    return {
+        'application_id': application_id, 'application_type': 'service_request', 'assigned_role': 'manager',
+        'priority': 'medium', 'is_read': True, 'title': None,
+        'inbox_created_at': datetime(2024, 5, 1, 12, minute, 30, 123456, tzinfo=timezone.utc),
+        'inbox_updated_at': None, 'application_details': {}
+    }
+
+
+def test_page_cursor_round_trip_and_fits_callback_data():
+    application_id = str(uuid.uuid4())
+    row = inbox_row(application_id, 1)
+
+    cursor = role_inbox.encode_page_cursor(row)
+
+    assert role_inbox.decode_page_cursor(cursor) == (row['inbox_created_at'], application_id)
+    assert role_inbox.decode_page_cursor(role_inbox.encode_page_cursor(inbox_row('42', 1)))[1] == '42'
+    data = InboxPageCallback.for_filters('service_request', 'urgent', include_read=False, cursor=cursor).pack()
+    assert len(data.encode()) <= ConfigConstants.MAX_CALLBACK_DATA_LENGTH
+    unpacked = InboxPageCallback.unpack(data)
+    assert (unpacked.application_type, unpacked.priority, unpacked.include_read, unpacked.c) == \
+        ('service_request', 'urgent', False, cursor)
+
+
+def test_malformed_page_cursor():
+    for cursor in ('', 'abc', 'zz.~!!'):
+        with pytest.raises(ValueError):
+            role_inbox.decode_page_cursor(cursor)
+
+
+@pytest.mark.asyncio
+async def test_fetch_page_seeks_after_cursor():
+    conn = make_conn()
+    after = (datetime(2024, 5, 1, tzinfo=timezone.utc), '17')
+
+    await role_inbox.fetch_page(conn, 'manager', 21, after, priority='high', unread_only=True)
+
+    query, *args = conn.fetch.call_args.args
+    assert "(last_message_at, application_id) < ($3, $4)" in query
+    assert "OFFSET" not in query and "LIMIT $5" in query
+    assert args == ['manager', 'high', after[0], '17', 21]
+
+
+@pytest.mark.asyncio
+async def test_next_page_is_prefetched():
+    inbox_page_cache.clear()
+    rows = [inbox_row(str(uuid.uuid4()), minute) for minute in range(59, 54, -1)]
+    conn = make_conn(fetch=rows)
+    service = InboxService(make_pool(conn))
+
+    first = await service.get_role_applications_page('manager', 1, page_size=2)
+    second = await service.get_role_applications_page('manager', 1, cursor=first.next_cursor, page_size=2)
+
+    conn.fetch.assert_awaited_once()
+    assert conn.fetch.call_args.args[-1] == 5
+    assert [a['application_id'] for a in first] == [r['application_id'] for r in rows[:2]]
+    assert [a['application_id'] for a in second] == [r['application_id'] for r in rows[2:4]]
+    assert second.next_cursor == role_inbox.encode_page_cursor(rows[3])
+
+    conn.fetch.return_value = rows[4:]
+    third = await service.get_role_applications_page('manager', 1, cursor=second.next_cursor, page_size=2)
+
+    assert conn.fetch.await_count == 2
+    assert len(third) == 1 and not third.has_more
+
+
+@pytest.mark.asyncio
+async def test_total_is_cached_between_page_flips():
+    inbox_page_cache.clear()
+    conn = make_conn(fetchval=12)
+    service = InboxService(make_pool(conn))
+
+    assert await service.get_role_application_total('controller') == 12
+    assert await service.get_role_application_total('controller') == 12
+    conn.fetchval.assert_awaited_once()
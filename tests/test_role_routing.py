@@ -0,0 +1,163 @@
+"""
+Tests for the compiled role dispatch table and RoleRoutingMiddleware.
+"""
+
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+
+from aiogram import Dispatcher, F, Router
+from aiogram.types import CallbackQuery, Chat, Message, User
+
+from filters.role_filter import RoleFilter
+from middlewares.role_routing_middleware import RoleRoutingMiddleware
+from utils.identity_context import IdentityContext, set_current_identity, reset_current_identity
+from utils.role_dispatcher import RoleDispatchTable, get_router_role
+from utils.role_router import get_role_router
+
+
+TELEGRAM_ID = 700100200
+
+
+def build_dispatcher():
+    """Dispatcher with role routers first and a shared router last, like handlers.setup_handlers"""
+    dp = Dispatcher()
+    handled = []
+
+    def record(name):
+        async def handler(event):
+            handled.append(name)
+            return name
+        return handler
+
+    for role in ('admin', 'manager', 'technician'):
+        router = get_role_router(role)
+        router.message(F.text == "📥 Inbox")(record(f"{role}:inbox"))
+        sub_router = get_role_router(role)
+        sub_router.message(F.text.in_(["📊 Hisobotlar", "📊 Отчеты"]))(record(f"{role}:reports"))
+        sub_router.callback_query(F.data.startswith("view_app_"))(record(f"{role}:view_app"))
+        sub_router.message(lambda m: m.text == "dynamic")(record(f"{role}:dynamic"))
+        router.include_router(sub_router)
+        dp.include_router(router)
+
+    shared = Router(name="shared")
+    shared.message(F.text == "/start")(record("shared:start"))
+    dp.include_router(shared)
+    return dp, handled
+
+
+def make_message(text):
+    return Message(
+        message_id=1, date=datetime.now(), text=text,
+        chat=Chat(id=TELEGRAM_ID, type="private"),
+        from_user=User(id=TELEGRAM_ID, is_bot=False, first_name="Test"),
+    )
+
+
+def make_callback(data):
+    return CallbackQuery(
+        id="1", chat_instance="1", data=data,
+        from_user=User(id=TELEGRAM_ID, is_bot=False, first_name="Test"),
+    )
+
+
+@pytest.fixture
+def technician_identity():
+    token = set_current_identity(IdentityContext(
+        telegram_id=TELEGRAM_ID, identity={'id': 1, 'role': 'technician'}, loaded=True
+    ))
+    yield
+    reset_current_identity(token)
+
+
+def test_table_compiles_leading_role_routers():
+    dp, _ = build_dispatcher()
+    table = RoleDispatchTable.from_dispatcher(dp)
+
+    assert sorted(table.role_routers) == ['admin', 'manager', 'technician']
+    assert table.keys('technician', 'message') == {"📥 Inbox", "📊 Hisobotlar", "📊 Отчеты"}
+    candidates = table.lookup('technician', 'callback_query', 'view_app_42')
+    assert [entry.handler.callback.__name__ for entry in candidates] == ['handler']
+    assert candidates[0].chain[0] is table.role_routers['technician']
+    assert table.lookup('technician', 'callback_query', 'view_other') is None
+    assert table.lookup('technician', 'message', 'dynamic') is None
+    # Uncompilable handlers stay candidates so they keep their precedence
+    assert len(table.lookup('technician', 'message', "📥 Inbox")) == 2
+    assert table.lookup('client', 'message', "📥 Inbox") is None
+    assert table.dynamic_handlers == 3
+    assert get_router_role(table.role_routers['admin']) == 'admin'
+
+
+@pytest.mark.asyncio
+async def test_static_event_skips_other_role_filters(technician_identity):
+    dp, handled = build_dispatcher()
+    middleware = RoleRoutingMiddleware()
+    middleware.compile(dp)
+    dp.message.outer_middleware(middleware)
+    dp.callback_query.outer_middleware(middleware)
+
+    with patch.object(RoleFilter, '__call__', autospec=True, side_effect=RoleFilter.__call__) as probe:
+        await dp.propagate_event('message', make_message("📊 Отчеты"))
+        await dp.propagate_event('callback_query', make_callback("view_app_7"))
+
+    assert handled == ['technician:reports', 'technician:view_app']
+    # Only the technician router's own filters ran, never admin's or manager's
+    assert {call.args[0].role for call in probe.call_args_list} == {'technician'}
+    assert middleware.get_stats()['fast_path_hits'] == 2
+
+
+@pytest.mark.asyncio
+async def test_dynamic_and_shared_events_fall_back(technician_identity):
+    dp, handled = build_dispatcher()
+    middleware = RoleRoutingMiddleware()
+    middleware.compile(dp)
+    dp.message.outer_middleware(middleware)
+
+    await dp.propagate_event('message', make_message("dynamic"))
+    await dp.propagate_event('message', make_message("/start"))
+
+    assert handled == ['technician:dynamic', 'shared:start']
+    assert middleware.get_stats()['fallbacks'] == 2
+
+
+@pytest.mark.asyncio
+async def test_results_match_plain_dispatch(technician_identity):
+    texts = ["📥 Inbox", "📊 Hisobotlar", "dynamic", "/start", "unknown"]
+
+    plain_dp, plain_handled = build_dispatcher()
+    for text in texts:
+        await plain_dp.propagate_event('message', make_message(text))
+
+    fast_dp, fast_handled = build_dispatcher()
+    middleware = RoleRoutingMiddleware()
+    middleware.compile(fast_dp)
+    fast_dp.message.outer_middleware(middleware)
+    for text in texts:
+        await fast_dp.propagate_event('message', make_message(text))
+
+    assert fast_handled == plain_handled
+
+
+@pytest.mark.asyncio
+async def test_earlier_dynamic_handler_keeps_precedence(technician_identity):
+    dp = Dispatcher()
+    handled = []
+    router = get_role_router('technician')
+
+    @router.message(lambda m: m.text.startswith("📥"))
+    async def catch_all(message):
+        handled.append('catch_all')
+
+    @router.message(F.text == "📥 Inbox")
+    async def inbox(message):
+        handled.append('inbox')
+
+    dp.include_router(router)
+    middleware = RoleRoutingMiddleware()
+    middleware.compile(dp)
+    dp.message.outer_middleware(middleware)
+
+    await dp.propagate_event('message', make_message("📥 Inbox"))
+
+    assert handled == ['catch_all']
+    assert middleware.get_stats()['fast_path_hits'] == 1
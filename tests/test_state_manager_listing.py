@@ -0,0 +1,180 @@
+"""
+Tests for StateManager listings: lazy state_data, keyset pages and the JSON codec helpers.
+"""
+
+import json
+import pytest
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock
+
+from database.jsonb import dumps, loads
+from database.pagination import decode_timestamp, encode_timestamp
+from utils.state_manager import LazyServiceRequest, StateManager
+
+
+def make_row(request_id, state_data='{"step": 3, "notes": "x"}'):
+    return {
+        'id': request_id, 'workflow_type': 'connection_request', 'client_id': 7,
+        'role_current': 'manager', 'current_status': 'created',
+        'created_at': datetime(2024, 1, 1), 'updated_at': datetime(2024, 1, 1),
+        'priority': 'high', 'description': 'Internet', 'location': 'Tashkent',
+        'contact_info': {'phone': '+998901234567'}, 'state_data': state_data,
+        'equipment_used': [], 'inventory_updated': False, 'completion_rating': None,
+        'feedback_comments': None, 'created_by_staff': False, 'staff_creator_id': None,
+        'staff_creator_role': None, 'creation_source': 'client', 'client_notified_at': None,
+        'version': 0,
+    }
+
+
+def make_ranked_rows(count):
+    ranks = {'urgent': 4, 'high': 3, 'medium': 2, 'low': 1}
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(count):
+        row = make_row(f'req-{i:03d}')
+        row['priority'] = list(ranks)[i % 4]
+        row['priority_rank'] = ranks[row['priority']]
+        row['created_at'] = start + timedelta(minutes=i // 3)  # ties on created_at
+        rows.append(row)
+    return rows
+
+
+def keyset_conn(rows):
+    """Connection whose fetch applies the keyset predicate and LIMIT like PostgreSQL"""
+    ordered = sorted(rows, key=lambda r: (r['priority_rank'], r['created_at'], r['id']), reverse=True)
+
+    async def fetch(query, *params):
+        assert 'ORDER BY priority_rank DESC, created_at DESC, id DESC' in query
+        role, *rest = params
+        limit = rest.pop()
+        result = [r for r in ordered if r['role_current'] == role]
+        if rest:
+            after = tuple(rest)
+            result = [r for r in result if (r['priority_rank'], r['created_at'], r['id']) < after]
+        return result[:limit]
+
+    conn = MagicMock()
+    conn.fetch = AsyncMock(side_effect=fetch)
+    return conn
+
+
+def make_pool(conn):
+    pool = MagicMock()
+    pool.acquire.return_value.__aenter__ = AsyncMock(return_value=conn)
+    pool.acquire.return_value.__aexit__ = AsyncMock(return_value=None)
+    return pool
+
+
+@pytest.mark.asyncio
+async def test_listing_defers_state_data_decoding():
+    conn = MagicMock()
+    conn.fetch = AsyncMock(return_value=[make_row('a'), make_row('b', None)])
+    requests = await StateManager(make_pool(conn)).get_requests_by_role('manager')
+
+    assert 'state_data::text' in conn.fetch.await_args.args[0]
+    assert [request.role_current for request in requests] == ['manager', 'manager']
+    lazy_attribute = LazyServiceRequest.state_data
+    assert not lazy_attribute.is_loaded(requests[0])
+
+    assert requests[0].state_data == {'step': 3, 'notes': 'x'}
+    assert lazy_attribute.is_loaded(requests[0])
+    assert requests[1].state_data == {}
+    assert requests[0].to_dict()['state_data'] == {'step': 3, 'notes': 'x'}
+
+
+@pytest.mark.asyncio
+async def test_single_request_is_decoded_eagerly():
+    conn = MagicMock()
+    conn.fetchrow = AsyncMock(return_value=make_row('a', {'step': 1}))
+    request = await StateManager(make_pool(conn)).get_request('a')
+
+    assert type(request) is not LazyServiceRequest
+    assert request.state_data == {'step': 1}
+
+
+def test_lazy_state_data_assignment():
+    request = LazyServiceRequest(state_data='{"a": 1}')
+    request.state_data = {'b': 2}
+    assert request.state_data == {'b': 2}
+    assert LazyServiceRequest().state_data == {}
+
+
+def test_dumps_matches_stdlib_semantics():
+    value = {'name': 'Ташкент', 'amount': Decimal('1.50'), 1: 'non-str key', 'big': 2 ** 70}
+    decoded = loads(dumps(value))
+    assert decoded == {'name': 'Ташкент', 'amount': '1.50', '1': 'non-str key', 'big': 2 ** 70}
+    assert 'Ташкент' in dumps(value)
+    assert json.loads(dumps({'at': datetime(2024, 1, 1, 12, 0)}))['at'].startswith('2024-01-01')
+
+
+@pytest.mark.asyncio
+async def test_keyset_pages_cover_all_rows_in_priority_order():
+    rows = make_ranked_rows(23)
+    manager = StateManager(make_pool(keyset_conn(rows)))
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = await manager.get_requests_page('manager', limit=5, cursor=cursor)
+        seen.extend(request.id for request in page)
+        pages += 1
+        if not page.has_more:
+            break
+        assert len(page.next_cursor) <= 64
+        cursor = page.next_cursor
+
+    assert pages == 5
+    expected = sorted(rows, key=lambda r: (r['priority_rank'], r['created_at'], r['id']), reverse=True)
+    assert seen == [row['id'] for row in expected]
+    assert [r['priority'] for r in expected[:6]] == ['urgent'] * 6  # ranked, not alphabetical
+
+
+@pytest.mark.asyncio
+async def test_iter_requests_by_role_streams_every_row():
+    conn = keyset_conn(make_ranked_rows(11))
+    manager = StateManager(make_pool(conn))
+
+    ids = [request.id async for request in manager.iter_requests_by_role('manager', batch_size=4)]
+    assert len(ids) == len(set(ids)) == 11
+    assert conn.fetch.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_iter_requests_by_role_raises_on_database_error():
+    conn = keyset_conn(make_ranked_rows(11))
+    fetch_rows = conn.fetch.side_effect
+
+    async def fetch(query, *params):
+        if conn.fetch.await_count > 1:
+            raise ConnectionError("db down")
+        return await fetch_rows(query, *params)
+
+    conn.fetch.side_effect = fetch
+    manager = StateManager(make_pool(conn))
+
+    # A failure after the first page ends the iteration with an error, not silently
+    seen = []
+    with pytest.raises(ConnectionError):
+        async for request in manager.iter_requests_by_role('manager', batch_size=4):
+            seen.append(request.id)
+    assert len(seen) == 4
+
+    # The UI page call still logs and returns an empty page
+    page = await manager.get_requests_page('manager', limit=4)
+    assert page.items == [] and not page.has_more
+
+
+@pytest.mark.asyncio
+async def test_invalid_cursor_returns_empty_page():
+    conn = keyset_conn(make_ranked_rows(3))
+    page = await StateManager(make_pool(conn)).get_requests_page('manager', cursor='garbage')
+    assert page.items == [] and not page.has_more
+    conn.fetch.assert_not_awaited()
+
+
+def test_timestamp_cursor_roundtrip():
+    aware = datetime(2024, 5, 1, 8, 30, 15, 123456, tzinfo=timezone.utc)
+    naive = datetime(2024, 5, 1, 8, 30, 15, 123456)
+    assert decode_timestamp(encode_timestamp(aware)) == aware
+    assert decode_timestamp(encode_timestamp(naive)) == naive
+    assert decode_timestamp(encode_timestamp(naive)).tzinfo is None
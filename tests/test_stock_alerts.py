@@ -0,0 +1,151 @@
+"""
+Tests for the maintained low-stock set and the debounced warehouse notifier.
+"""
+
+import re
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from database import stock_alerts, warehouse_queries
+from utils.inventory_manager import InventoryManager, StockLevel
+from utils.stock_alert_notifier import StockAlertNotifier, render_crossings
+
+
+def make_conn(fetch=None):
+    conn = MagicMock()
+    conn.fetch = AsyncMock(side_effect=fetch) if fetch is not None else AsyncMock(return_value=[])
+    conn.transaction.return_value.__aenter__ = AsyncMock(return_value=None)
+    conn.transaction.return_value.__aexit__ = AsyncMock(return_value=False)
+    return conn
+
+
+def make_pool(conn):
+    pool = MagicMock()
+    pool.acquire.return_value.__aenter__ = AsyncMock(return_value=conn)
+    pool.acquire.return_value.__aexit__ = AsyncMock(return_value=None)
+    return pool
+
+
+CROSSED = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def crossing(material_id, level, quantity, min_quantity=10, name=None):
+    return {'id': material_id, 'name': name or f'Item {material_id}', 'category': 'cables', 'unit': 'dona',
+            'price': 0, 'quantity': quantity, 'min_quantity': min_quantity,
+            'stock_level': level, 'crossed_at': CROSSED}
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def table_columns(sql, table):
+    """Column names of a CREATE TABLE statement"""
+    body = re.search(rf"CREATE TABLE (?:IF NOT EXISTS )?(?:public\.)?{table} \((.*?)\n\);", sql, re.S).group(1)
+    return {line.split()[0] for line in body.strip().splitlines() if not line.split()[0].isupper()}
+
+
+def test_queries_only_use_existing_columns():
+    materials = table_columns((ROOT / 'my_database.sql').read_text(), 'materials')
+    alerts = table_columns(
+        (ROOT / 'database/migrations/027_stock_alerts.sql').read_text(), 'material_stock_alerts'
+    )
+
+    for query in (stock_alerts.LOW_STOCK_QUERY, stock_alerts.CLAIM_CROSSINGS_QUERY):
+        assert set(re.findall(r"\bm\.(\w+)", query)) <= materials
+        assert set(re.findall(r"\ba\.(\w+)", query)) <= alerts
+    # The warehouse readers return whole materials rows, as before the set existed
+    assert "SELECT m.*," in stock_alerts.LOW_STOCK_QUERY
+
+
+def test_crossings_are_claimed_once_and_debounced():
+    query = stock_alerts.CLAIM_CROSSINGS_QUERY
+    assert "severity > notified_severity" in query
+    assert "crossed_at <= now() - make_interval(secs => $1)" in query
+    assert "FOR UPDATE SKIP LOCKED" in query
+    assert "SET notified_severity = a.severity" in query
+
+
+@pytest.mark.asyncio
+async def test_low_stock_reads_the_set_by_level():
+    conn = make_conn(fetch=[[crossing(1, 'critical', 3)], [crossing(2, 'out_of_stock', 0)]])
+
+    assert (await stock_alerts.low_stock(conn, category='cables'))[0]['id'] == 1
+    assert conn.fetch.await_args.args == (stock_alerts.LOW_STOCK_QUERY, 1, 'cables')
+    await stock_alerts.low_stock(conn, 'out_of_stock')
+    assert conn.fetch.await_args.args == (stock_alerts.LOW_STOCK_QUERY, 3, None)
+    assert "FROM material_stock_alerts a" in stock_alerts.LOW_STOCK_QUERY
+
+
+@pytest.mark.asyncio
+async def test_warehouse_readers_use_the_set():
+    conn = make_conn(fetch=[[crossing(1, 'low', 8)], [crossing(2, 'out_of_stock', 0)]])
+    manager = MagicMock()
+    manager.get_connection = AsyncMock(return_value=conn)
+    manager.pool.release = AsyncMock()
+
+    with patch.object(warehouse_queries, 'warehouse_db_manager', manager):
+        low = await warehouse_queries.get_low_stock_inventory_items()
+        out = await warehouse_queries.get_out_of_stock_items()
+
+    assert (low[0]['quantity'], out[0]['quantity']) == (8, 0)
+    assert [call.args[1] for call in conn.fetch.await_args_list] == [1, 3]
+    assert manager.pool.release.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_generate_stock_alerts_from_the_set():
+    conn = make_conn(fetch=[[crossing(2, 'out_of_stock', 0, 5, 'Router'), crossing(1, 'critical', 3)]])
+    bot = MagicMock()
+    bot.db = make_pool(conn)
+
+    with patch('loader.bot', bot):
+        alerts = await InventoryManager().generate_stock_alerts()
+
+    assert [(a.item_id, a.stock_level) for a in alerts] == [(2, StockLevel.OUT_OF_STOCK), (1, StockLevel.CRITICAL)]
+    assert alerts[0].alert_message.startswith("OUT OF STOCK: Router")
+    assert conn.fetch.await_args.args[0] == stock_alerts.LOW_STOCK_QUERY
+
+
+def test_render_crossings_escapes_and_localises():
+    items = [crossing(1, 'out_of_stock', 0, name='Cable <RJ45>')]
+
+    assert "Cable &lt;RJ45&gt;: 0 dona (min: 10) — закончился" in render_crossings(items, 'ru')
+    assert "tugadi" in render_crossings(items, None)
+
+
+@pytest.mark.asyncio
+async def test_notifier_queues_digests_until_nothing_is_due():
+    conn = make_conn(fetch=[[crossing(1, 'low', 9), crossing(2, 'critical', 4)], [crossing(3, 'low', 7)]])
+    notifier = StockAlertNotifier(pool=make_pool(conn), interval_seconds=1, debounce_seconds=120, batch_size=2)
+    enqueue = AsyncMock(side_effect=[[11, 12], [13, 14]])
+
+    with patch('utils.stock_alert_notifier.enqueue_for_role', enqueue), \
+            patch('utils.stock_alert_notifier.notification_outbox') as outbox:
+        assert await notifier.run_once() == 3
+        outbox.wake.assert_called_once()
+
+    # A short batch means nothing else was due
+    assert [call.args for call in conn.fetch.await_args_list] == [
+        (stock_alerts.CLAIM_CROSSINGS_QUERY, 120.0, 2)] * 2
+    conn_arg, role, render = enqueue.await_args.args
+    assert (conn_arg, role) == (conn, 'warehouse')
+    assert "Item 3: 7 dona" in render({'language': 'uz'})[0]
+    stats = notifier.get_stats()
+    assert (stats['crossings_sent'], stats['messages_queued']) == (3, 4)
+
+
+@pytest.mark.asyncio
+async def test_notifier_without_due_crossings_or_on_error():
+    conn = make_conn(fetch=[[], Exception("db down")])
+    notifier = StockAlertNotifier(pool=make_pool(conn), interval_seconds=1, debounce_seconds=0)
+
+    with patch('utils.stock_alert_notifier.enqueue_for_role', AsyncMock()) as enqueue:
+        assert await notifier.run_once() == 0
+        assert await notifier.run_once() == 0
+        enqueue.assert_not_awaited()
+
+    stats = notifier.get_stats()
+    assert (stats['runs'], stats['failed_runs'], stats['crossings_sent']) == (2, 1, 0)
@@ -0,0 +1,126 @@
+"""
+Tests for the stock reservation ledger and the expired-hold sweeper.
+"""
+
+import pytest
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from database import stock_reservations
+from utils.inventory_manager import InventoryManager, TransactionType
+from utils.reservation_sweeper import StockReservationSweeper
+
+
+def make_conn(fetch=None):
+    conn = MagicMock()
+    conn.fetch = AsyncMock(side_effect=fetch) if fetch is not None else AsyncMock(return_value=[])
+    conn.execute = AsyncMock(return_value="INSERT 0 1")
+    conn.transaction.return_value.__aenter__ = AsyncMock(return_value=None)
+    conn.transaction.return_value.__aexit__ = AsyncMock(return_value=False)
+    return conn
+
+
+def make_bot(conn):
+    bot = MagicMock()
+    bot.db.acquire.return_value.__aenter__ = AsyncMock(return_value=conn)
+    bot.db.acquire.return_value.__aexit__ = AsyncMock(return_value=None)
+    return bot
+
+
+EXPIRES = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def test_hold_is_guarded_by_available_stock():
+    # The guard and the increment are one UPDATE, so the row lock serialises competing holds
+    assert "m.quantity_in_stock - m.reserved_quantity >= l.quantity" in stock_reservations.HOLD_QUERY
+    assert "reserved_quantity = m.reserved_quantity + l.quantity" in stock_reservations.HOLD_QUERY
+    assert "FOR UPDATE SKIP LOCKED" in stock_reservations.RELEASE_EXPIRED_QUERY
+
+
+@pytest.mark.asyncio
+async def test_hold_writes_rows_only_when_every_material_is_held():
+    conn = make_conn(fetch=[[{'id': 1}, {'id': 2}]])
+    lines = [{'material_id': 1, 'quantity': 3, 'performed_by': 9}, {'material_id': 2, 'quantity': 1}]
+
+    assert await stock_reservations.hold(conn, 'req-1', lines, EXPIRES) == []
+    conn.execute.assert_awaited_once_with(stock_reservations.INSERT_HOLDS_QUERY, 'req-1', [1, 2], [3, 1],
+                                          [9, None], EXPIRES)
+
+    conn = make_conn(fetch=[[{'id': 1}]])
+    assert await stock_reservations.hold(conn, 'req-1', lines, EXPIRES) == [2]
+    conn.execute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_available_to_promise_is_a_key_lookup():
+    conn = make_conn(fetch=[[{'id': 1, 'available_quantity': 7}, {'id': 4, 'available_quantity': 0}]])
+
+    assert await stock_reservations.available_to_promise(conn, (1, 4)) == {1: 7, 4: 0}
+    query, ids = conn.fetch.await_args.args
+    assert "id = ANY($1::int[])" in query and ids == [1, 4]
+
+
+@pytest.mark.asyncio
+async def test_cancel_reservation_releases_and_logs_returns():
+    conn = make_conn(fetch=[
+        [{'request_id': 'req-1', 'material_id': 1, 'quantity': 3, 'performed_by': 9}],
+        [{'id': 30}],
+    ])
+
+    with patch('loader.bot', make_bot(conn)):
+        assert await InventoryManager().cancel_reservation('req-1') is True
+
+    release, log = conn.fetch.await_args_list
+    assert release.args == (stock_reservations.RELEASE_REQUEST_QUERY, 'req-1')
+    values = log.args[1:]
+    assert values[:4] == ('req-1', 1, TransactionType.RETURN.value, 3)
+    assert values[6] == "Reservation cancelled for request req-1"
+
+
+@pytest.mark.asyncio
+async def test_cancel_reservation_without_holds():
+    conn = make_conn()
+
+    with patch('loader.bot', make_bot(conn)):
+        assert await InventoryManager().cancel_reservation('req-none') is False
+
+    assert conn.fetch.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_get_reserved_items_reads_the_ledger():
+    conn = make_conn(fetch=[[{'material_id': 1, 'quantity': 3, 'performed_by': 9, 'expires_at': EXPIRES}]])
+
+    with patch('loader.bot', make_bot(conn)):
+        assert await InventoryManager().get_reserved_items('req-1') == [
+            {'material_id': 1, 'quantity': 3, 'performed_by': 9, 'expires_at': EXPIRES}]
+
+    assert conn.fetch.await_args.args == (stock_reservations.RESERVED_LINES_QUERY, 'req-1')
+
+
+@pytest.mark.asyncio
+async def test_release_expired_reservations_in_batches():
+    expired = [{'request_id': f'req-{n}', 'material_id': 1, 'quantity': 1, 'performed_by': None}
+               for n in range(3)]
+    conn = make_conn(fetch=[expired[:2], [{'id': 1}, {'id': 2}], expired[2:], [{'id': 3}]])
+
+    with patch('loader.bot', make_bot(conn)):
+        assert await InventoryManager().release_expired_reservations(batch_size=2) == 3
+
+    calls = conn.fetch.await_args_list
+    assert [call.args for call in calls[::2]] == [(stock_reservations.RELEASE_EXPIRED_QUERY, 2)] * 2
+    assert calls[3].args[7] == "Reservation expired for request req-2"
+
+
+@pytest.mark.asyncio
+async def test_sweeper_counts_and_survives_errors():
+    manager = MagicMock()
+    manager.release_expired_reservations = AsyncMock(side_effect=[4, Exception("db down")])
+    sweeper = StockReservationSweeper(manager=manager, interval_seconds=1, batch_size=100)
+
+    assert await sweeper.run_once() == 4
+    assert await sweeper.run_once() == 0
+
+    manager.release_expired_reservations.assert_awaited_with(100)
+    stats = sweeper.get_stats()
+    assert (stats['runs'], stats['failed_runs'], stats['released']) == (2, 1, 4)
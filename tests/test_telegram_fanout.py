@@ -0,0 +1,123 @@
+"""
+Tests for the rate-limited Telegram fan-out engine.
+"""
+
+import asyncio
+import time
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+
+from utils.telegram_fanout import OutgoingMessage, TelegramFanout, TokenBucket
+
+
+class FakeBot:
+    """Records sends and concurrency; ``failures`` maps chat_id -> exceptions to raise first"""
+
+    def __init__(self, failures=None, latency=0.0):
+        self.failures = failures or {}
+        self.latency = latency
+        self.sent = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def send_message(self, chat_id, text, reply_markup=None, parse_mode=None):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            pending = self.failures.get(chat_id)
+            if pending:
+                raise pending.pop(0)
+            self.sent.append((chat_id, time.monotonic()))
+            return SimpleNamespace(message_id=len(self.sent))
+        finally:
+            self.in_flight -= 1
+
+
+def retry_after(seconds):
+    return TelegramRetryAfter(method=MagicMock(), message="Flood control exceeded", retry_after=seconds)
+
+
+def make_fanout(bot, **kwargs):
+    options = {'rate': 1000, 'per_chat_interval': 0, 'concurrency': 4, 'max_retries': 2}
+    options.update(kwargs)
+    return TelegramFanout(bot=bot, **options)
+
+
+@pytest.mark.asyncio
+async def test_send_many_is_concurrent_but_bounded():
+    bot = FakeBot(latency=0.01)
+    fanout = make_fanout(bot, concurrency=5)
+
+    results = await fanout.send_many(OutgoingMessage(chat_id=i, text='hi', recipient_id=i * 10) for i in range(40))
+
+    assert [result.recipient_id for result in results] == [i * 10 for i in range(40)]
+    assert all(result.ok and result.attempts == 1 for result in results)
+    assert bot.max_in_flight == 5
+
+
+@pytest.mark.asyncio
+async def test_retry_after_pauses_and_retries():
+    bot = FakeBot(failures={1: [retry_after(0)]})
+    fanout = make_fanout(bot)
+
+    results = await fanout.send_many([OutgoingMessage(chat_id=1, text='a'), OutgoingMessage(chat_id=2, text='b')])
+
+    assert all(result.ok for result in results)
+    assert results[0].attempts == 2
+    assert fanout.get_stats()['flood_waits'] == 1
+
+
+@pytest.mark.asyncio
+async def test_permanent_errors_are_not_retried():
+    blocked = TelegramForbiddenError(method=MagicMock(), message="bot was blocked by the user")
+    bot = FakeBot(failures={1: [blocked]})
+    fanout = make_fanout(bot)
+
+    result = await fanout.send(OutgoingMessage(chat_id=1, text='a'))
+
+    assert not result.ok and result.attempts == 1
+    assert 'TelegramForbiddenError' in result.error
+    assert fanout.get_stats()['failed'] == 1
+
+
+@pytest.mark.asyncio
+async def test_flood_wait_gives_up_after_max_retries():
+    bot = FakeBot(failures={1: [retry_after(0) for _ in range(5)]})
+    result = await make_fanout(bot, max_retries=2).send(OutgoingMessage(chat_id=1, text='a'))
+    assert not result.ok and result.attempts == 3
+
+
+@pytest.mark.asyncio
+async def test_per_chat_interval_spaces_messages_to_same_chat():
+    bot = FakeBot()
+    fanout = make_fanout(bot, per_chat_interval=0.05)
+
+    await fanout.send_many([OutgoingMessage(chat_id=7, text=str(i)) for i in range(3)])
+
+    times = [sent_at for _, sent_at in bot.sent]
+    assert times[1] - times[0] >= 0.045 and times[2] - times[1] >= 0.045
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=100, capacity=1)
+    started = time.monotonic()
+    for _ in range(6):
+        await bucket.acquire()
+    assert time.monotonic() - started >= 0.045
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_does_not_refill_during_pause():
+    bucket = TokenBucket(rate=100, capacity=5)
+    bucket.pause(0.05)
+    started = time.monotonic()
+    for _ in range(4):
+        await bucket.acquire()
+    # After the pause the bucket starts empty: no burst of 5 tokens
+    assert time.monotonic() - started >= 0.05 + 0.035
+
@@ -0,0 +1,127 @@
+"""
+Tests for the compiled workflow state machine.
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from database.models import UserRole, WorkflowAction, WorkflowDefinition, WorkflowStep, WorkflowType
+from utils.workflow_engine import WorkflowEngine
+from utils.workflow_graph import (
+    CONSUME_INVENTORY, NOTIFY_NEXT_ROLE, WorkflowGraphError, compile_workflows
+)
+
+
+@pytest.fixture
+def engine():
+    state_manager = MagicMock()
+    state_manager.get_request = AsyncMock()
+    return WorkflowEngine(state_manager, MagicMock(), MagicMock(), access_control=MagicMock())
+
+
+def step(role, next_steps, actions=None, required=None):
+    return WorkflowStep(
+        role=role, actions=actions or list(next_steps), next_steps=next_steps, required_data=required or []
+    )
+
+
+def test_engine_definitions_compile_to_transition_table(engine):
+    graph = engine.get_workflow_graph()
+
+    assign = graph.get(WorkflowType.CONNECTION_REQUEST.value, UserRole.MANAGER.value,
+                       WorkflowAction.ASSIGN_TO_JUNIOR_MANAGER.value)
+    assert assign.next_role == UserRole.JUNIOR_MANAGER.value
+    assert assign.required_fields == frozenset({'junior_manager_id'})
+    assert assign.side_effects == frozenset({NOTIFY_NEXT_ROLE})
+
+    call = graph.get(WorkflowType.CONNECTION_REQUEST.value, UserRole.JUNIOR_MANAGER.value,
+                     WorkflowAction.CALL_CLIENT.value)
+    assert call.next_role == UserRole.JUNIOR_MANAGER.value and not call.side_effects
+
+    inventory = graph.get(WorkflowType.TECHNICAL_SERVICE.value, UserRole.WAREHOUSE.value,
+                          WorkflowAction.UPDATE_INVENTORY.value)
+    assert inventory.side_effects == frozenset({NOTIFY_NEXT_ROLE, CONSUME_INVENTORY})
+
+    assert graph.get(WorkflowType.CONNECTION_REQUEST.value, UserRole.MANAGER.value,
+                     WorkflowAction.CLOSE_REQUEST.value) is None
+    assert graph.validate() == []
+
+
+def test_graph_adjacency(engine):
+    graph = engine.get_workflow_graph()
+    technical = WorkflowType.TECHNICAL_SERVICE.value
+
+    assert set(graph.next_roles(technical, UserRole.TECHNICIAN.value)) == {UserRole.WAREHOUSE.value, UserRole.CLIENT.value}
+    assert set(graph.previous_roles(technical, UserRole.TECHNICIAN.value)) == {UserRole.CONTROLLER.value, UserRole.WAREHOUSE.value}
+    assert UserRole.CLIENT.value in graph.reachable_roles(WorkflowType.CALL_CENTER_DIRECT.value)
+
+
+def test_validation_reports_unreachable_and_dead_end_states():
+    definitions = {
+        'broken': WorkflowDefinition(
+            name='Broken',
+            initial_role='client',
+            steps={
+                'client': step('client', {'submit': 'manager'}),
+                'manager': step('manager', {}, actions=['comment']),      # can only stay
+                'orphan': step('orphan', {'finish': 'client'}),           # nothing leads here
+            },
+            completion_actions=[]
+        )
+    }
+
+    with pytest.raises(WorkflowGraphError) as error:
+        compile_workflows(definitions)
+
+    assert error.value.problems == [
+        "broken: state orphan is unreachable",
+        "broken: state manager is a dead end",
+    ]
+
+
+def test_validation_rejects_next_step_for_undeclared_action():
+    definitions = {
+        'typo': WorkflowDefinition(
+            name='Typo', initial_role='client',
+            steps={'client': step('client', {'sumbit': 'manager'}, actions=['submit'])},
+            completion_actions=[]
+        )
+    }
+
+    with pytest.raises(WorkflowGraphError, match="undeclared action sumbit"):
+        compile_workflows(definitions)
+
+
+def test_accepts_checks_action_and_required_fields_across_workflows(engine):
+    graph = engine.get_workflow_graph()
+
+    assert graph.accepts(WorkflowAction.ASSIGN_TO_TECHNICIAN.value, {'technician_id': 5})
+    assert not graph.accepts(WorkflowAction.ASSIGN_TO_TECHNICIAN.value, {'actor_id': 1})
+    assert not graph.accepts('drop_database', {})
+
+
+@pytest.mark.asyncio
+async def test_invalid_actions_are_rejected_without_queries(engine):
+    assert not await engine.transition_workflow('req-1', 'drop_database', UserRole.MANAGER.value, {'actor_id': 1})
+    assert not await engine.transition_workflow(
+        'req-1', WorkflowAction.ASSIGN_TO_JUNIOR_MANAGER.value, UserRole.MANAGER.value, {'actor_id': 1}
+    )
+
+    engine.state_manager.get_request.assert_not_awaited()
+    engine.access_control.validate_workflow_action.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_action_not_valid_for_current_role_is_rejected_after_loading(engine):
+    request = MagicMock()
+    request.workflow_type = WorkflowType.CONNECTION_REQUEST.value
+    request.role_current = UserRole.CONTROLLER.value
+    engine.state_manager.get_request.return_value = request
+    engine.state_manager.update_request_state = AsyncMock()
+
+    assert not await engine.transition_workflow(
+        'req-1', WorkflowAction.ASSIGN_TO_JUNIOR_MANAGER.value, UserRole.MANAGER.value,
+        {'actor_id': 1, 'junior_manager_id': 2}
+    )
+    engine.state_manager.get_request.assert_awaited_once()
+    engine.state_manager.update_request_state.assert_not_awaited()
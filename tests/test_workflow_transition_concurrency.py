@@ -0,0 +1,161 @@
+"""
+Tests for atomic, optimistically locked workflow transitions.
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from database.models import RequestStatus, ServiceRequest, UserRole, WorkflowAction, WorkflowType
+from utils import workflow_engine as engine_module
+from utils.state_manager import APPLY_TRANSITION_QUERY, StateManager, TransitionResult
+from utils.workflow_engine import WorkflowEngine
+
+
+def make_conn(*versions):
+    conn = MagicMock()
+    conn.fetchval = AsyncMock(side_effect=list(versions))
+    conn.transaction.return_value.__aenter__ = AsyncMock(return_value=None)
+    conn.transaction.return_value.__aexit__ = AsyncMock(return_value=None)
+    return conn
+
+
+def make_pool(conn):
+    pool = MagicMock()
+    pool.acquire.return_value.__aenter__ = AsyncMock(return_value=conn)
+    pool.acquire.return_value.__aexit__ = AsyncMock(return_value=None)
+    return pool
+
+
+async def apply(state_manager, in_transaction=None):
+    return await state_manager.apply_transition(
+        'req-1', 3, 'manager', 'junior_manager', RequestStatus.IN_PROGRESS.value,
+        {'junior_manager_id': 9}, 'assign_to_junior_manager', 1, {'junior_manager_id': 9}, 'assigned',
+        in_transaction=in_transaction
+    )
+
+
+@pytest.mark.asyncio
+async def test_apply_transition_updates_and_records_in_one_statement():
+    conn = make_conn(4)
+    in_transaction = AsyncMock()
+
+    result = await apply(StateManager(pool=make_pool(conn)), in_transaction)
+
+    assert result and result.version == 4
+    conn.fetchval.assert_awaited_once()
+    query, *args = conn.fetchval.call_args.args
+    assert query == APPLY_TRANSITION_QUERY
+    assert args[:4] == ['req-1', 3, 'junior_manager', RequestStatus.IN_PROGRESS.value]
+    assert args[5:8] == ['manager', 'assign_to_junior_manager', 1]
+    in_transaction.assert_awaited_once_with(conn)
+
+
+@pytest.mark.asyncio
+async def test_stale_version_is_a_conflict():
+    conn = make_conn(None, 5)
+    in_transaction = AsyncMock()
+
+    result = await apply(StateManager(pool=make_pool(conn)), in_transaction)
+
+    assert not result and result.conflict and result.version == 5
+    assert "другим сотрудником" in result.error_text('ru')
+    in_transaction.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_missing_request_is_not_a_conflict():
+    result = await apply(StateManager(pool=make_pool(make_conn(None, None))))
+
+    assert result.status == TransitionResult.NOT_FOUND and not result.conflict
+
+
+def make_engine(request, result):
+    state_manager = MagicMock()
+    state_manager.get_request = AsyncMock(return_value=request)
+    state_manager.apply_transition = AsyncMock(return_value=result)
+    notification_system = MagicMock()
+    notification_system.enqueue_assignment_notification = AsyncMock(return_value=1)
+    notification_system.send_staff_workflow_notification = AsyncMock()
+    access_control = MagicMock()
+    access_control.validate_workflow_action = AsyncMock(return_value=(True, None))
+    return WorkflowEngine(state_manager, notification_system, MagicMock(), access_control=access_control)
+
+
+def manager_request(**state_data):
+    return ServiceRequest(
+        id='req-1', workflow_type=WorkflowType.CONNECTION_REQUEST.value,
+        role_current=UserRole.MANAGER.value, state_data=state_data, version=3
+    )
+
+
+ASSIGN = WorkflowAction.ASSIGN_TO_JUNIOR_MANAGER.value
+
+
+@pytest.mark.asyncio
+async def test_transition_is_applied_at_the_loaded_version_with_notification_queued():
+    engine = make_engine(manager_request(), TransitionResult(TransitionResult.APPLIED, 4))
+    conn = object()
+
+    with patch.object(engine_module.notification_outbox, 'wake') as wake:
+        assert await engine.transition_workflow(
+            'req-1', ASSIGN, UserRole.MANAGER.value, {'actor_id': 1, 'junior_manager_id': 9}
+        ) is True
+
+    args = engine.state_manager.apply_transition.call_args
+    assert args.args[1:4] == (3, UserRole.MANAGER.value, UserRole.JUNIOR_MANAGER.value)
+    assert args.args[5] == {'actor_id': 1, 'junior_manager_id': 9}
+
+    # the notification is queued by the callback that runs inside the transaction
+    await args.kwargs['in_transaction'](conn)
+    engine.notification_system.enqueue_assignment_notification.assert_awaited_once_with(
+        conn, UserRole.JUNIOR_MANAGER.value, 'req-1', WorkflowType.CONNECTION_REQUEST.value
+    )
+    wake.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_conflict_is_reported_without_side_effects():
+    engine = make_engine(manager_request(), TransitionResult(TransitionResult.CONFLICT, 4))
+
+    with patch.object(engine_module.notification_outbox, 'wake') as wake:
+        result = await engine.execute_transition(
+            'req-1', ASSIGN, UserRole.MANAGER.value, {'actor_id': 1, 'junior_manager_id': 9}
+        )
+
+    assert result.conflict
+    wake.assert_not_called()
+    engine.notification_system.enqueue_assignment_notification.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_staff_created_requests_are_notified_after_commit():
+    request = manager_request(created_by_staff=True, staff_creator_info={'creator_role': 'call_center'})
+    engine = make_engine(request, TransitionResult(TransitionResult.APPLIED, 4))
+
+    assert await engine.transition_workflow(
+        'req-1', ASSIGN, UserRole.MANAGER.value, {'actor_id': 1, 'junior_manager_id': 9}
+    )
+
+    assert engine.state_manager.apply_transition.call_args.kwargs['in_transaction'] is None
+    engine.notification_system.send_staff_workflow_notification.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_only_a_patch_of_small_fields_is_merged_into_state_data():
+    request = ServiceRequest(
+        id='req-1', workflow_type=WorkflowType.CONNECTION_REQUEST.value,
+        role_current=UserRole.JUNIOR_MANAGER.value, state_data={'junior_manager_id': 9, 'step': 2}, version=5
+    )
+    engine = make_engine(request, TransitionResult(TransitionResult.APPLIED, 6))
+    data = {'actor_id': 9, 'call_notes': 'Evening visit', 'comments': 'Client asked for evening visit ' * 20}
+
+    with patch.object(engine_module.notification_outbox, 'wake'):
+        assert await engine.transition_workflow(
+            'req-1', WorkflowAction.FORWARD_TO_CONTROLLER.value, UserRole.JUNIOR_MANAGER.value, data
+        )
+
+    args = engine.state_manager.apply_transition.call_args.args
+    # call_notes is shown to junior managers from state_data; comments only go to the transition
+    assert args[5] == {'actor_id': 9, 'call_notes': 'Evening visit'}
+    assert args[8]['comments'] == data['comments']
+    assert "|| $5::jsonb" in APPLY_TRANSITION_QUERY
@@ -12,7 +12,7 @@ import json
 import csv
 import io
 
-from utils.application_tracker import application_tracker, ApplicationSource, TrackingAlert
+from utils.application_tracker import application_tracker, ApplicationSource, ApplicationWindowStats, TrackingAlert
 from utils.audit_viewer import audit_viewer, AuditFilter, AuditFilterType
 from utils.audit_analyzer import StaffApplicationAuditAnalyzer
 from database.queries import db_manager
@@ -106,10 +106,9 @@ class AdminReportingSystem:
             # Get basic admin dashboard stats
             admin_stats = await get_admin_dashboard_stats()
             
-            # Get application tracking data
-            today_stats = await application_tracker.get_application_statistics(1)
-            week_stats = await application_tracker.get_application_statistics(7)
-            month_stats = await application_tracker.get_application_statistics(30)
+            # Get application tracking data; one query covers every window,
+            # including the 14-day baseline of detect_unusual_patterns(7)
+            windows = await application_tracker.get_windowed_statistics((1, 7, 14, 30))
             
             # Get role performance
             role_stats = await application_tracker.get_role_statistics(7)
@@ -133,27 +132,9 @@ class AdminReportingSystem:
                     'pending_orders': admin_stats.get('pending_orders', 0)
                 },
                 'application_metrics': {
-                    'today': {
-                        'total': today_stats.total_applications,
-                        'staff_created': today_stats.staff_created,
-                        'client_created': today_stats.client_created,
-                        'staff_percentage': today_stats.staff_creation_percentage,
-                        'success_rate': today_stats.success_rate
-                    },
-                    'this_week': {
-                        'total': week_stats.total_applications,
-                        'staff_created': week_stats.staff_created,
-                        'client_created': week_stats.client_created,
-                        'staff_percentage': week_stats.staff_creation_percentage,
-                        'success_rate': week_stats.success_rate
-                    },
-                    'this_month': {
-                        'total': month_stats.total_applications,
-                        'staff_created': month_stats.staff_created,
-                        'client_created': month_stats.client_created,
-                        'staff_percentage': month_stats.staff_creation_percentage,
-                        'success_rate': month_stats.success_rate
-                    }
+                    'today': self._window_metrics(windows[1]),
+                    'this_week': self._window_metrics(windows[7]),
+                    'this_month': self._window_metrics(windows[30])
                 },
                 'role_performance': {
                     role: {
@@ -189,6 +170,21 @@ class AdminReportingSystem:
                 'recent_activity': {}
             }
     
+    @staticmethod
+    def _window_metrics(window: ApplicationWindowStats) -> Dict[str, Any]:
+        """Dashboard block of one statistics window"""
+        stats = window.overall
+        return {
+            'total': stats.total_applications,
+            'staff_created': stats.staff_created,
+            'client_created': stats.client_created,
+            'staff_percentage': stats.staff_creation_percentage,
+            'success_rate': stats.success_rate,
+            'by_source': window.by_source,
+            'by_status': window.by_status,
+            'peak_hours': stats.peak_hours
+        }
+    
     async def generate_performance_report(self, request: ReportRequest) -> ReportResult:
         """
         Generate performance analysis report.
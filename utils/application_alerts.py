@@ -4,6 +4,7 @@ Implements Requirements 6.4 from multi-role application creation spec.
 """
 
 import asyncio
+import html
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional, Callable
 from dataclasses import dataclass, asdict
@@ -567,32 +568,23 @@ class ApplicationAlertSystem:
             self.logger.error(f"Error sending notification {notification.alert_id}: {e}")
     
     async def _send_telegram_notification(self, notification: AlertNotification):
-        """Send notification via Telegram"""
-        try:
-            # Get admin users to notify
-            admin_users = await self._get_admin_users()
-            
-            message = f"🚨 *{notification.title}*\n\n{notification.message}\n\n_Alert ID: {notification.alert_id}_"
-            
-            # For now, just log the notification - can be extended to use actual Telegram API
-            self.logger.info(f"Telegram notification would be sent to {len(admin_users)} admin users: {message}")
-            
-            # TODO: Integrate with actual notification system when available
-            # for admin_user in admin_users:
-            #     try:
-            #         await notification_system.send_notification(
-            #             user_id=admin_user['id'],
-            #             title=notification.title,
-            #             message=notification.message,
-            #             notification_type="alert",
-            #             related_id=notification.alert_id,
-            #             related_type="application_alert"
-            #         )
-            #     except Exception as e:
-            #         self.logger.error(f"Error sending Telegram notification to user {admin_user['id']}: {e}")
-            
-        except Exception as e:
-            self.logger.error(f"Error in Telegram notification: {e}")
+        """Queue notification for admin users in the notification outbox"""
+        from utils.notification_outbox import enqueue_for_role, notification_outbox
+        
+        message = (
+            f"🚨 <b>{html.escape(notification.title)}</b>\n\n{html.escape(notification.message)}\n\n"
+            f"<i>Alert ID: {html.escape(notification.alert_id)}</i>"
+        )
+        
+        pool = await db_manager.get_pool()
+        async with pool.acquire() as conn:
+            queued = await enqueue_for_role(
+                conn, 'admin', lambda user: (message, None), notification_type='alert'
+            )
+        
+        if queued:
+            notification_outbox.wake()
+        self.logger.info(f"Queued alert {notification.alert_id} for {len(queued)} admin users")
     
     async def _store_notification_in_database(self, notification: AlertNotification):
         """Store notification in database"""
@@ -730,7 +722,9 @@ async def get_recent_alerts(hours: int = 24) -> List[AlertNotification]:
     return [alert for alert in all_alerts if alert.created_at >= cutoff_time]
 
 async def check_system_health() -> Dict[str, Any]:
-    """Check overall system health based on recent alerts"""
+    """Check overall system health based on recent alerts, with connection pool metrics"""
+    from database.pool import get_pool_stats
+
     recent_alerts = await get_recent_alerts(24)
     critical_alerts = [alert for alert in recent_alerts if alert.severity == "critical"]
     warning_alerts = [alert for alert in recent_alerts if alert.severity == "warning"]
@@ -747,5 +741,6 @@ async def check_system_health() -> Dict[str, Any]:
         "total_alerts_24h": len(recent_alerts),
         "critical_alerts_24h": len(critical_alerts),
         "warning_alerts_24h": len(warning_alerts),
-        "last_alert": recent_alerts[-1].created_at.isoformat() if recent_alerts else None
+        "last_alert": recent_alerts[-1].created_at.isoformat() if recent_alerts else None,
+        "database_pool": get_pool_stats()
     }
\ No newline at end of file
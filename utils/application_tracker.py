@@ -5,13 +5,15 @@ Implements Requirements 6.1, 6.2, 6.3, 6.4 from multi-role application creation
 
 import asyncio
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, List, Optional, Sequence, Tuple
 from dataclasses import dataclass, asdict
+from functools import lru_cache
 from enum import Enum
 import statistics
 from collections import defaultdict
 
 from database.models import ServiceRequest, StaffApplicationAudit, UserRole
+from database import application_rollups
 from database.queries import db_manager
 from utils.audit_viewer import audit_viewer, AuditFilter, AuditFilterType
 from utils.audit_analyzer import StaffApplicationAuditAnalyzer, AnalysisAlert, AlertSeverity
@@ -113,6 +115,123 @@ class TrackingAlert:
             'timestamp': self.timestamp.isoformat()
         }
 
+@dataclass
+class ApplicationWindowStats:
+    """Statistics and breakdowns of one reporting window"""
+    days_back: int
+    overall: ApplicationStats
+    client: ApplicationStats
+    staff: ApplicationStats
+    by_source: Dict[str, int]
+    by_status: Dict[str, int]
+    hourly: List[int]
+    
+    def for_source(self, source: ApplicationSource) -> ApplicationStats:
+        if source == ApplicationSource.CLIENT:
+            return self.client
+        if source == ApplicationSource.STAFF:
+            return self.staff
+        return self.overall
+    
+    @classmethod
+    def empty(cls, days_back: int) -> 'ApplicationWindowStats':
+        empty = _application_stats(days_back, 0, 0, 0, 0, [0] * 24)
+        return cls(days_back, empty, empty, empty, {}, {}, [0] * 24)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+# Per-window counters; ${n} is the first hour of the window, windows are
+# passed longest first so $1 also bounds the bucket range
+_WINDOW_COLUMNS = """,
+        COALESCE(SUM(total_count) FILTER (WHERE bucket_start >= ${n}), 0) AS total_{i},
+        COALESCE(SUM(total_count) FILTER (WHERE bucket_start >= ${n} AND created_by_staff), 0) AS staff_{i},
+        COALESCE(SUM(total_count) FILTER (WHERE bucket_start >= ${n} AND current_status = 'completed'), 0)
+            AS completed_{i},
+        COALESCE(SUM(total_count) FILTER (WHERE bucket_start >= ${n} AND current_status IN ('cancelled', 'failed')), 0)
+            AS failed_{i}"""
+
+@lru_cache(maxsize=16)
+def _statistics_query(window_count: int) -> str:
+    """Single-pass statistics of window_count windows over the hourly rollups, one row per breakdown group"""
+    columns = "".join(_WINDOW_COLUMNS.format(i=i, n=i + 1) for i in range(window_count))
+    return f"""
+    SELECT
+        CASE GROUPING(created_by_staff, hour, creation_source, current_status)
+            WHEN 15 THEN 'total'
+            WHEN 7 THEN 'staff'
+            WHEN 3 THEN 'staff_hour'
+            WHEN 11 THEN 'hour'
+            WHEN 13 THEN 'source'
+            ELSE 'status'
+        END AS breakdown,
+        created_by_staff, hour, creation_source, current_status{columns}
+    FROM (
+        SELECT
+            source = 'staff' AS created_by_staff,
+            role AS creation_source,
+            status AS current_status,
+            EXTRACT(HOUR FROM bucket_start)::int AS hour,
+            bucket_start,
+            total_count
+        FROM application_rollup_hourly
+        WHERE kind = 'service_request' AND bucket_start >= $1
+    ) buckets
+    GROUP BY GROUPING SETS (
+        (), (created_by_staff), (created_by_staff, hour), (hour), (creation_source), (current_status)
+    )
+    """
+
+def _application_stats(days_back: int, total: int, staff: int, completed: int, failed: int,
+                        hourly: List[int]) -> ApplicationStats:
+    peak_hours = sorted((hour for hour in range(24) if hourly[hour]), key=lambda hour: -hourly[hour])[:3]
+    return ApplicationStats(
+        total_applications=total,
+        client_created=total - staff,
+        staff_created=staff,
+        staff_creation_percentage=(staff / total * 100) if total > 0 else 0.0,
+        success_rate=(completed / total * 100) if total > 0 else 0.0,
+        error_rate=(failed / total * 100) if total > 0 else 0.0,
+        average_per_day=total / days_back if days_back > 0 else 0.0,
+        peak_hours=peak_hours
+    )
+
+def _window_stats(rows, index: int, days_back: int) -> ApplicationWindowStats:
+    """Assemble window number index of _statistics_query rows"""
+    counters = {'total': (0, 0, 0, 0), True: (0, 0, 0, 0), False: (0, 0, 0, 0)}
+    hourly = {'total': [0] * 24, True: [0] * 24, False: [0] * 24}
+    by_source, by_status = {}, {}
+    
+    for row in rows:
+        breakdown = row['breakdown']
+        total = row[f'total_{index}']
+        if breakdown == 'total':
+            counters['total'] = (total, row[f'staff_{index}'], row[f'completed_{index}'], row[f'failed_{index}'])
+        elif not total:
+            continue
+        elif breakdown == 'staff':
+            counters[row['created_by_staff']] = (
+                total, row[f'staff_{index}'], row[f'completed_{index}'], row[f'failed_{index}']
+            )
+        elif breakdown == 'staff_hour':
+            hourly[row['created_by_staff']][row['hour']] = total
+        elif breakdown == 'hour':
+            hourly['total'][row['hour']] = total
+        elif breakdown == 'source':
+            by_source[row['creation_source']] = total
+        else:
+            by_status[row['current_status'] or 'unknown'] = total
+    
+    return ApplicationWindowStats(
+        days_back=days_back,
+        overall=_application_stats(days_back, *counters['total'], hourly['total']),
+        client=_application_stats(days_back, *counters[False], hourly[False]),
+        staff=_application_stats(days_back, *counters[True], hourly[True]),
+        by_source=by_source,
+        by_status=by_status,
+        hourly=hourly['total']
+    )
+
 class ApplicationTracker:
     """Main application tracking and reporting system"""
     
@@ -135,102 +254,57 @@ class ApplicationTracker:
         Returns:
             ApplicationStats: Comprehensive statistics
         """
-        try:
-            cache_key = f"app_stats_{days_back}_{source.value}"
-            if self._is_cached(cache_key):
-                return self._cache[cache_key]['data']
-            
-            start_date = datetime.utcnow() - timedelta(days=days_back)
-            
-            # Get all applications from service requests
-            all_apps_query = """
-            SELECT 
-                id, created_by_staff, creation_source, created_at,
-                current_status, completion_rating
-            FROM service_requests 
-            WHERE created_at >= $1
-            ORDER BY created_at DESC
-            """
-            
-            all_apps = await db_manager.fetch(all_apps_query, start_date)
-            
-            if not all_apps:
-                return ApplicationStats(
-                    total_applications=0,
-                    client_created=0,
-                    staff_created=0,
-                    staff_creation_percentage=0.0,
-                    success_rate=0.0,
-                    error_rate=0.0,
-                    average_per_day=0.0,
-                    peak_hours=[]
-                )
+        cache_key = f"app_stats_{days_back}_{source.value}"
+        if self._is_cached(cache_key):
+            return self._cache[cache_key]['data']
+        
+        windows = await self.get_windowed_statistics((days_back,))
+        return windows[days_back].for_source(source)
+    
+    async def get_windowed_statistics(self, windows: Sequence[int] = (1, 7, 30)) -> Dict[int, ApplicationWindowStats]:
+        """
+        Get statistics for several reporting windows in one aggregate query.
+        
+        Every window that is not cached is summed by the same pass over the
+        hourly service_request rollups; the per-source ApplicationStats of
+        each window are cached too, so get_application_statistics for those
+        windows is free.
+        
+        Args:
+            windows: Window lengths in days
             
-            # Filter by source if specified
-            if source == ApplicationSource.CLIENT:
-                filtered_apps = [app for app in all_apps if not app['created_by_staff']]
-            elif source == ApplicationSource.STAFF:
-                filtered_apps = [app for app in all_apps if app['created_by_staff']]
+        Returns:
+            Dict mapping window length to its ApplicationWindowStats
+        """
+        result = {}
+        missing = []
+        for days in dict.fromkeys(windows):
+            cache_key = f"app_windows_{days}"
+            if self._is_cached(cache_key):
+                result[days] = self._cache[cache_key]['data']
             else:
-                filtered_apps = all_apps
-            
-            # Calculate statistics
-            total_apps = len(filtered_apps)
-            client_created = len([app for app in filtered_apps if not app['created_by_staff']])
-            staff_created = len([app for app in filtered_apps if app['created_by_staff']])
-            
-            staff_percentage = (staff_created / total_apps * 100) if total_apps > 0 else 0
-            
-            # Success rate (completed applications)
-            completed_apps = len([app for app in filtered_apps if app['current_status'] == 'completed'])
-            success_rate = (completed_apps / total_apps * 100) if total_apps > 0 else 0
-            
-            # Error rate (cancelled or failed applications)
-            error_apps = len([app for app in filtered_apps if app['current_status'] in ['cancelled', 'failed']])
-            error_rate = (error_apps / total_apps * 100) if total_apps > 0 else 0
-            
-            # Average per day
-            avg_per_day = total_apps / days_back if days_back > 0 else 0
-            
-            # Peak hours analysis
-            hourly_counts = defaultdict(int)
-            for app in filtered_apps:
-                if app['created_at']:
-                    hour = app['created_at'].hour
-                    hourly_counts[hour] += 1
-            
-            # Get top 3 peak hours
-            peak_hours = sorted(hourly_counts.items(), key=lambda x: x[1], reverse=True)[:3]
-            peak_hours_list = [hour for hour, count in peak_hours]
-            
-            stats = ApplicationStats(
-                total_applications=total_apps,
-                client_created=client_created,
-                staff_created=staff_created,
-                staff_creation_percentage=staff_percentage,
-                success_rate=success_rate,
-                error_rate=error_rate,
-                average_per_day=avg_per_day,
-                peak_hours=peak_hours_list
-            )
-            
-            # Cache result
-            self._cache_result(cache_key, stats)
-            
-            return stats
-            
+                missing.append(days)
+        if not missing:
+            return result
+        
+        missing.sort(reverse=True)
+        # Buckets are whole hours, so windows start at the top of the hour
+        now = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        starts = [now - timedelta(days=days) for days in missing]
+        try:
+            rows = await db_manager.fetch(_statistics_query(len(missing)), *starts)
         except Exception as e:
             self.logger.error(f"Error getting application statistics: {e}")
-            return ApplicationStats(
-                total_applications=0,
-                client_created=0,
-                staff_created=0,
-                staff_creation_percentage=0.0,
-                success_rate=0.0,
-                error_rate=0.0,
-                average_per_day=0.0,
-                peak_hours=[]
-            )
+            result.update((days, ApplicationWindowStats.empty(days)) for days in missing)
+            return result
+        
+        for index, days in enumerate(missing):
+            window = _window_stats(rows, index, days)
+            result[days] = window
+            self._cache_result(f"app_windows_{days}", window)
+            for source in ApplicationSource:
+                self._cache_result(f"app_stats_{days}_{source.value}", window.for_source(source))
+        return result
     
     async def get_role_statistics(self, days_back: int = 30) -> Dict[str, RoleStats]:
         """
@@ -247,62 +321,28 @@ class ApplicationTracker:
             if self._is_cached(cache_key):
                 return self._cache[cache_key]['data']
             
-            start_date = datetime.utcnow() - timedelta(days=days_back)
+            start_date = (datetime.utcnow() - timedelta(days=days_back)).replace(minute=0, second=0, microsecond=0)
             
-            # Get staff applications with audit data
-            result = await audit_viewer.get_audit_trail(
-                start_date=start_date,
-                limit=10000
-            )
-            
-            audits = result.audits
-            role_data = defaultdict(lambda: {
-                'total': 0,
-                'successful': 0,
-                'errors': 0,
-                'notified': 0,
-                'workflow_initiated': 0,
-                'hourly_counts': defaultdict(int)
-            })
-            
-            # Process audit data
-            for audit in audits:
-                role = audit.creator_role or 'unknown'
-                role_data[role]['total'] += 1
-                
-                if audit.client_notified:
-                    role_data[role]['notified'] += 1
-                
-                if audit.workflow_initiated:
-                    role_data[role]['workflow_initiated'] += 1
-                
-                if audit.client_notified and audit.workflow_initiated:
-                    role_data[role]['successful'] += 1
-                
-                if audit.metadata and audit.metadata.get('event_type') == 'error_occurred':
-                    role_data[role]['errors'] += 1
-                
-                # Track hourly activity
-                if audit.creation_timestamp:
-                    hour = audit.creation_timestamp.hour
-                    role_data[role]['hourly_counts'][hour] += 1
+            # Staff application audit counters per creator role from the hourly rollups
+            metrics = await application_rollups.fetch_audit_metrics(db_manager, start_date)
             
             # Convert to RoleStats objects
             role_stats = {}
-            for role, data in role_data.items():
+            for role, data in metrics.items():
                 total = data['total']
-                if total == 0:
+                if role is None or total == 0:
                     continue
+                role = role or 'unknown'
                 
                 success_rate = (data['successful'] / total * 100)
                 error_rate = (data['errors'] / total * 100)
                 notification_rate = (data['notified'] / total * 100)
-                workflow_rate = (data['workflow_initiated'] / total * 100)
+                workflow_rate = (data['workflow'] / total * 100)
                 avg_per_day = total / days_back if days_back > 0 else 0
                 
                 # Get most active hours
-                hourly_sorted = sorted(data['hourly_counts'].items(), key=lambda x: x[1], reverse=True)
-                most_active_hours = [hour for hour, count in hourly_sorted[:3]]
+                hourly = data['hourly']
+                most_active_hours = sorted((hour for hour in range(24) if hourly[hour]), key=lambda hour: -hourly[hour])[:3]
                 
                 role_stats[role] = RoleStats(
                     role=role,
@@ -557,44 +597,22 @@ class ApplicationTracker:
             Dict containing trend analysis
         """
         try:
-            start_date = datetime.utcnow() - timedelta(days=days_back)
-            
-            # Get all applications
-            apps_query = """
-            SELECT created_at, created_by_staff, creation_source, current_status
-            FROM service_requests 
-            WHERE created_at >= $1
-            ORDER BY created_at
-            """
-            
-            apps = await db_manager.fetch(apps_query, start_date)
-            
-            # Group by time period
-            time_groups = defaultdict(lambda: {
-                'total': 0,
-                'client_created': 0,
-                'staff_created': 0,
-                'successful': 0
-            })
-            
-            for app in apps:
-                if app['created_at']:
-                    if granularity == "daily":
-                        key = app['created_at'].date()
-                    elif granularity == "hourly":
-                        key = app['created_at'].replace(minute=0, second=0, microsecond=0)
-                    else:
-                        key = app['created_at'].date()
-                    
-                    time_groups[key]['total'] += 1
-                    
-                    if app['created_by_staff']:
-                        time_groups[key]['staff_created'] += 1
-                    else:
-                        time_groups[key]['client_created'] += 1
-                    
-                    if app['current_status'] == 'completed':
-                        time_groups[key]['successful'] += 1
+            start_date = (datetime.utcnow() - timedelta(days=days_back)).replace(minute=0, second=0, microsecond=0)
+            
+            # Per-period totals from the hourly rollups
+            periods = await application_rollups.fetch_period_totals(
+                db_manager, 'service_request', start_date, 'hour' if granularity == "hourly" else 'day'
+            )
+            
+            time_groups = {}
+            for period in periods:
+                key = period['period'] if granularity == "hourly" else period['period'].date()
+                time_groups[key] = {
+                    'total': period['total'],
+                    'client_created': period['total'] - period['staff'],
+                    'staff_created': period['staff'],
+                    'successful': period['completed']
+                }
             
             # Convert to trend data
             trend_data = []
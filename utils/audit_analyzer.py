@@ -12,11 +12,17 @@ import statistics
 from collections import defaultdict
 
 from database.models import StaffApplicationAudit, UserRole
+from database import application_rollups
+from database.queries import db_manager
 from utils.audit_viewer import audit_viewer, AuditFilter, AuditFilterType
 from utils.logger import setup_module_logger
 
 logger = setup_module_logger("audit_analyzer")
 
+def _window_start(days_back: int) -> datetime:
+    """Start of a days_back window, at the top of the hour like the rollup buckets"""
+    return (datetime.utcnow() - timedelta(days=days_back)).replace(minute=0, second=0, microsecond=0)
+
 class AnalysisType(Enum):
     """Types of audit analysis"""
     PERFORMANCE_ANALYSIS = "performance_analysis"
@@ -90,21 +96,12 @@ class StaffApplicationAuditAnalyzer:
             if self._is_cached(cache_key):
                 return self._analysis_cache[cache_key]['data']
             
-            start_date = datetime.utcnow() - timedelta(days=days_back)
-            filters = []
-            
-            if role_filter:
-                filters.append(AuditFilter(AuditFilterType.BY_ROLE.value, role_filter))
-            
-            result = await audit_viewer.get_audit_trail(
-                filters=filters,
-                start_date=start_date,
-                limit=10000
-            )
+            start_date = _window_start(days_back)
             
-            audits = result.audits
+            # Counters per creator role from the hourly rollups
+            counters = (await application_rollups.fetch_audit_metrics(db_manager, start_date)).get(role_filter)
             
-            if not audits:
+            if not counters or not counters['total']:
                 return PerformanceMetrics(
                     total_applications=0,
                     success_rate=0.0,
@@ -116,33 +113,19 @@ class StaffApplicationAuditAnalyzer:
                     peak_usage_hours=[]
                 )
             
-            # Calculate metrics
-            total_apps = len(audits)
-            successful_apps = sum(1 for audit in audits if audit.client_notified and audit.workflow_initiated)
-            notified_apps = sum(1 for audit in audits if audit.client_notified)
-            workflow_apps = sum(1 for audit in audits if audit.workflow_initiated)
-            error_apps = sum(1 for audit in audits if audit.metadata and 
-                           audit.metadata.get('event_type') == 'error_occurred')
-            
             # Calculate rates
-            success_rate = (successful_apps / total_apps * 100) if total_apps > 0 else 0
-            error_rate = (error_apps / total_apps * 100) if total_apps > 0 else 0
-            notification_rate = (notified_apps / total_apps * 100) if total_apps > 0 else 0
-            workflow_rate = (workflow_apps / total_apps * 100) if total_apps > 0 else 0
+            total_apps = counters['total']
+            success_rate = counters['successful'] / total_apps * 100
+            error_rate = counters['errors'] / total_apps * 100
+            notification_rate = counters['notified'] / total_apps * 100
+            workflow_rate = counters['workflow'] / total_apps * 100
             
             # Applications per day
             apps_per_day = total_apps / days_back if days_back > 0 else 0
             
-            # Peak usage hours
-            hourly_counts = defaultdict(int)
-            for audit in audits:
-                if audit.creation_timestamp:
-                    hour = audit.creation_timestamp.hour
-                    hourly_counts[hour] += 1
-            
             # Get top 3 peak hours
-            peak_hours = sorted(hourly_counts.items(), key=lambda x: x[1], reverse=True)[:3]
-            peak_usage_hours = [hour for hour, count in peak_hours]
+            hourly = counters['hourly']
+            peak_usage_hours = sorted((hour for hour in range(24) if hourly[hour]), key=lambda hour: -hourly[hour])[:3]
             
             metrics = PerformanceMetrics(
                 total_applications=total_apps,
@@ -189,47 +172,22 @@ class StaffApplicationAuditAnalyzer:
             TrendData: Trend analysis results
         """
         try:
-            start_date = datetime.utcnow() - timedelta(days=days_back)
+            start_date = _window_start(days_back)
             
-            result = await audit_viewer.get_audit_trail(
-                start_date=start_date,
-                limit=10000
+            # Per-period totals from the hourly rollups
+            periods = await application_rollups.fetch_period_totals(
+                db_manager, 'staff_audit', start_date, 'hour' if granularity == "hourly" else 'day'
             )
             
-            audits = result.audits
-            
-            # Group data by time period
-            time_groups = defaultdict(int)
-            
-            for audit in audits:
-                if audit.creation_timestamp:
-                    if granularity == "daily":
-                        key = audit.creation_timestamp.date()
-                    elif granularity == "hourly":
-                        key = audit.creation_timestamp.replace(minute=0, second=0, microsecond=0)
-                    else:
-                        key = audit.creation_timestamp.date()
-                    
-                    if metric == "application_count":
-                        time_groups[key] += 1
-                    elif metric == "success_rate":
-                        # For success rate, we need to track both total and successful
-                        if not hasattr(time_groups[key], '__iter__'):
-                            time_groups[key] = [0, 0]  # [total, successful]
-                        time_groups[key][0] += 1
-                        if audit.client_notified and audit.workflow_initiated:
-                            time_groups[key][1] += 1
-            
             # Convert to data points
             data_points = []
-            for time_key in sorted(time_groups.keys()):
-                if metric == "application_count":
-                    value = time_groups[time_key]
-                elif metric == "success_rate":
-                    total, successful = time_groups[time_key]
-                    value = (successful / total * 100) if total > 0 else 0
+            for period in periods:
+                time_key = period['period'] if granularity == "hourly" else period['period'].date()
+                if metric == "success_rate":
+                    total = period['total']
+                    value = (period['successful'] / total * 100) if total > 0 else 0
                 else:
-                    value = time_groups[time_key]
+                    value = period['total']
                 
                 data_points.append((time_key, float(value)))
             
@@ -441,18 +399,13 @@ class StaffApplicationAuditAnalyzer:
             Dict containing compliance analysis
         """
         try:
-            start_date = datetime.utcnow() - timedelta(days=days_back)
-            
-            result = await audit_viewer.get_audit_trail(
-                start_date=start_date,
-                limit=10000
-            )
+            start_date = _window_start(days_back)
             
-            audits = result.audits
+            counters = (await application_rollups.fetch_audit_metrics(db_manager, start_date))[None]
             
             compliance_report = {
                 'period_days': days_back,
-                'total_applications': len(audits),
+                'total_applications': counters['total'],
                 'compliance_metrics': {
                     'audit_coverage': 0.0,  # Percentage of applications with audit records
                     'notification_compliance': 0.0,  # Percentage with client notifications
@@ -463,14 +416,14 @@ class StaffApplicationAuditAnalyzer:
                 'recommendations': []
             }
             
-            if not audits:
+            if not counters['total']:
                 return compliance_report
             
             # Calculate compliance metrics
-            total = len(audits)
-            notified_count = sum(1 for audit in audits if audit.client_notified)
-            workflow_count = sum(1 for audit in audits if audit.workflow_initiated)
-            complete_data_count = sum(1 for audit in audits if self._is_audit_data_complete(audit))
+            total = counters['total']
+            notified_count = counters['notified']
+            workflow_count = counters['workflow']
+            complete_data_count = counters['complete']
             
             compliance_report['compliance_metrics'] = {
                 'audit_coverage': 100.0,  # All applications have audit records by definition
@@ -0,0 +1,211 @@
+"""
+Batched background writer for access_control_logs.
+
+Audit rows are appended to a bounded in-memory ring by ``record`` (no I/O,
+no await) and written by a background task with COPY every
+``AUDIT_FLUSH_INTERVAL_MS`` or as soon as ``AUDIT_BATCH_SIZE`` rows are
+queued. When the database is slow or down the ring keeps the newest rows
+and counts what it had to drop; ``stop`` flushes what is left on shutdown.
+A batch whose COPY the database rejects is written row by row, so only the
+offending rows are dropped.
+"""
+
+import asyncio
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import asyncpg
+
+from config import config
+from utils.logger import setup_module_logger
+
+logger = setup_module_logger("audit_sink")
+
+
+class AccessLogSink:
+    """Bounded ring of access log rows flushed to the database in batches"""
+
+    TABLE = 'access_control_logs'
+    # Same columns and user_id (Telegram id) as WorkflowAccessControl.log_access_attempt
+    COLUMNS = ('user_id', 'action', 'resource', 'granted', 'reason', 'timestamp')
+    INSERT_QUERY = (
+        f"INSERT INTO {TABLE} ({', '.join(COLUMNS)}) "
+        f"VALUES ({', '.join(f'${n}' for n in range(1, len(COLUMNS) + 1))})"
+    )
+
+    def __init__(self, pool=None, max_queue: Optional[int] = None, batch_size: Optional[int] = None,
+                 flush_interval_ms: Optional[int] = None):
+        self.pool = pool
+        self.max_queue = max_queue or config.AUDIT_QUEUE_SIZE
+        self.batch_size = batch_size or config.AUDIT_BATCH_SIZE
+        self.flush_interval = (flush_interval_ms or config.AUDIT_FLUSH_INTERVAL_MS) / 1000
+        self._queue: Deque[Tuple[Any, ...]] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.last_flush_ms = 0.0
+
+    def _get_pool(self):
+        """Get database pool"""
+        if self.pool:
+            return self.pool
+        try:
+            from loader import bot
+            return bot.db
+        except ImportError:
+            return None
+
+    def record(self, user_id: int, action: str, resource: str, granted: bool,
+               reason: Optional[str] = None) -> bool:
+        """Queue an access log row; never blocks. Returns False if the row was rejected"""
+        if self._closing:
+            self.dropped += 1
+            return False
+
+        if len(self._queue) >= self.max_queue:
+            # Ring buffer: the oldest row makes room for the newest
+            self._queue.popleft()
+            self.dropped += 1
+        self._queue.append((
+            user_id, action[:100], (resource or '')[:200], granted, reason,
+            datetime.now(timezone.utc)
+        ))
+        self.enqueued += 1
+
+        self._ensure_started()
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def _ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return  # no running loop; rows are written by the next flush/stop
+            # A fresh event per writer task, so it is bound to the running loop
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        """Flush every flush interval, or early once a full batch is queued"""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._queue:
+                if not await self.flush_batch():
+                    break  # database unavailable: retry on the next tick
+
+    async def flush_batch(self) -> bool:
+        """Write up to batch_size queued rows. Returns False if they must be retried"""
+        if not self._queue:
+            return True
+        batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+
+        pool = self._get_pool()
+        if pool is None:
+            self._requeue(batch)
+            return False
+
+        started = time.perf_counter()
+        pending = deque(batch)
+        try:
+            async with pool.acquire() as conn:
+                try:
+                    await conn.copy_records_to_table(self.TABLE, records=batch, columns=self.COLUMNS)
+                    pending.clear()
+                    self.written += len(batch)
+                except (asyncpg.IntegrityConstraintViolationError, asyncpg.DataError) as e:
+                    # One bad row fails the whole COPY: write the rows one by one
+                    # and drop only those the database rejects
+                    logger.warning(f"COPY of {len(batch)} access log rows rejected, "
+                                   f"writing them one by one: {str(e)}")
+                    await self._write_rows(conn, pending)
+        except asyncio.CancelledError:
+            # Writer stopped mid-flush: keep the unwritten rows for the final flush in stop()
+            self._requeue(list(pending))
+            raise
+        except Exception as e:
+            self.failed_flushes += 1
+            self._requeue(list(pending))
+            logger.error(f"Error flushing access log rows: {str(e)}")
+            return False
+
+        self.flushes += 1
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+        return True
+
+    async def _write_rows(self, conn, pending: Deque[Tuple[Any, ...]]) -> None:
+        """Insert rows one at a time, removing each from pending once written or rejected"""
+        while pending:
+            row = pending[0]
+            try:
+                await conn.execute(self.INSERT_QUERY, *row)
+                self.written += 1
+            except (asyncpg.IntegrityConstraintViolationError, asyncpg.DataError) as e:
+                # Retrying this row cannot succeed
+                self.dropped += 1
+                logger.error(f"Dropped access log row for user {row[0]} ({row[1]}): {str(e)}")
+            pending.popleft()
+
+    def _requeue(self, batch) -> None:
+        """Put a failed batch back in front of newer rows, dropping what no longer fits"""
+        space = max(self.max_queue - len(self._queue), 0)
+        keep = batch[len(batch) - space:] if space < len(batch) else batch
+        self.dropped += len(batch) - len(keep)
+        self._queue.extendleft(reversed(keep))
+
+    async def flush(self) -> int:
+        """Write everything queued now; returns the number of rows still queued"""
+        while self._queue:
+            if not await self.flush_batch():
+                break
+        return len(self._queue)
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Stop the writer and flush the remaining rows (used in on_shutdown)"""
+        self._closing = True
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+        try:
+            remaining = await asyncio.wait_for(self.flush(), timeout)
+        except asyncio.TimeoutError:
+            remaining = len(self._queue)
+        if remaining:
+            self.dropped += remaining
+            self._queue.clear()
+            logger.warning(f"Access log sink stopped with {remaining} unwritten rows")
+        logger.info(f"Access log sink stopped: {self.get_stats()}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get sink statistics"""
+        return {
+            'queued': len(self._queue),
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'flushes': self.flushes,
+            'failed_flushes': self.failed_flushes,
+            'last_flush_ms': round(self.last_flush_ms, 2),
+        }
+
+
+# Global instance used by EnhancedRoleFilterMiddleware
+access_log_sink = AccessLogSink()
@@ -1,112 +1,328 @@
 import asyncio
+import functools
+import hashlib
+import inspect
 import json
+import sys
 import time
-from typing import Any, Dict, Optional, Set
+from collections import OrderedDict
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
 from datetime import datetime, timedelta
 import weakref
 from utils.logger import setup_module_logger
 
 logger = setup_module_logger("cache_manager")
 
+_MISSING = object()
+
+def _estimate_size(value: Any, _depth: int = 0) -> int:
+    """Approximate memory footprint of a cached value (shallow, two levels deep)"""
+    size = sys.getsizeof(value)
+    if _depth >= 2:
+        return size
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += _estimate_size(k, _depth + 1) + _estimate_size(v, _depth + 1)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += _estimate_size(item, _depth + 1)
+    return size
+
+def _namespace(key: Any) -> str:
+    """Namespace of a "<namespace>:<rest>" cache key"""
+    if isinstance(key, str):
+        return key.split(':', 1)[0]
+    return ''
+
+class LRUCache:
+    """
+    Bounded LRU cache with TTL for hot lookups.
+
+    Methods are synchronous: the bot runs on a single event loop and no method
+    awaits, so reads and writes are atomic without a lock. ``move_to_end`` and
+    ``popitem`` on the OrderedDict make both hits and evictions O(1).
+    """
+    
+    def __init__(self, max_entries: int = 10000, default_ttl: int = 300,
+                 max_bytes: Optional[int] = None,
+                 on_remove: Optional[Callable[[Any, float], None]] = None):
+        # key -> (value, expires_at, size)
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.bytes = 0
+        self._on_remove = on_remove
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+    
+    def get(self, key: Any, default: Any = None) -> Any:
+        """Get value, refreshing its LRU position"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        
+        if entry[1] < time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return default
+        
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+    
+    def set(self, key: Any, value: Any, ttl: Optional[float] = None, size: int = 0) -> float:
+        """Set value, evicting the least recently used entries over budget; returns expiry"""
+        old = self._data.pop(key, None)
+        if old is not None:
+            self.bytes -= old[2]
+        expires_at = time.monotonic() + (ttl or self.default_ttl)
+        self._data[key] = (value, expires_at, size)
+        self.bytes += size
+        
+        while self._data and (
+            len(self._data) > self.max_entries
+            or (self.max_bytes is not None and self.bytes > self.max_bytes and len(self._data) > 1)
+        ):
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+        return expires_at
+    
+    def update(self, key: Any, **fields) -> bool:
+        """Write-through update of a cached dict value; keeps its TTL"""
+        entry = self._data.get(key)
+        if entry is None or not isinstance(entry[0], dict):
+            return False
+        value, expires_at, size = entry
+        self._data[key] = ({**value, **fields}, expires_at, size)
+        return True
+    
+    def delete(self, key: Any) -> bool:
+        """Delete key"""
+        if key in self._data:
+            self._remove(key)
+            self.invalidations += 1
+            return True
+        return False
+    
+    def expire(self, key: Any, now: float) -> bool:
+        """Remove key if it has expired by ``now`` (used by timer-wheel sweeps)"""
+        entry = self._data.get(key)
+        if entry is not None and entry[1] <= now:
+            self._remove(key)
+            self.expirations += 1
+            return True
+        return False
+    
+    def _remove(self, key: Any) -> None:
+        value, expires_at, size = self._data.pop(key)
+        self.bytes -= size
+        if self._on_remove is not None:
+            self._on_remove(key, expires_at)
+    
+    def clear(self) -> None:
+        """Drop all entries"""
+        self._data.clear()
+        self.bytes = 0
+    
+    def items(self):
+        """Iterate (key, value) pairs without touching LRU order or counters"""
+        return [(key, entry[0]) for key, entry in self._data.items()]
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def __contains__(self, key: Any) -> bool:
+        return key in self._data
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hit/miss/eviction counters"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._data),
+            'max_entries': self.max_entries,
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups * 100, 2) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations
+        }
+
+# Default TTLs (seconds) per key namespace, used when set() gets no explicit ttl
+NAMESPACE_TTLS = {
+    'user': 300,
+    'zayavka': 120,
+    'stats': 600,
+}
+
 class MemoryCache:
-    """Simple in-memory cache with TTL support"""
+    """
+    Sharded in-memory cache with LRU eviction, size budgets and per-namespace TTL.
+    
+    Keys are hashed onto independent LRU shards, each owning a slice of the
+    max-entries / approximate max-bytes budget. Operations never await, so
+    reads take no lock. Expiry is swept with a timer wheel (one bucket per
+    ``wheel_resolution`` seconds) instead of scanning every entry, and keys
+    are indexed by namespace so a namespace can be dropped on its own.
+    """
     
-    def __init__(self, default_ttl: int = 300):  # 5 minutes default
-        self._cache: Dict[str, Dict[str, Any]] = {}
+    def __init__(self, default_ttl: int = 300, max_entries: int = 50000,
+                 max_bytes: int = 64 * 1024 * 1024, shards: int = 16,
+                 namespace_ttls: Optional[Dict[str, int]] = None,
+                 wheel_resolution: float = 1.0):
         self._default_ttl = default_ttl
-        self._access_times: Dict[str, float] = {}
-        self._lock = asyncio.Lock()
+        self._namespace_ttls = dict(NAMESPACE_TTLS if namespace_ttls is None else namespace_ttls)
+        self._shards = [
+            LRUCache(
+                max_entries=max(1, max_entries // shards),
+                default_ttl=default_ttl,
+                max_bytes=max(1, max_bytes // shards),
+                on_remove=self._on_remove
+            )
+            for _ in range(shards)
+        ]
+        self._namespaces: Dict[str, Set[Any]] = {}
+        self._wheel: Dict[int, Set[Any]] = {}
+        self._wheel_resolution = wheel_resolution
+    
+    def _shard(self, key: Any) -> LRUCache:
+        return self._shards[hash(key) % len(self._shards)]
+    
+    def _slot(self, timestamp: float) -> int:
+        return int(timestamp // self._wheel_resolution)
+    
+    def _on_remove(self, key: Any, expires_at: float) -> None:
+        """Keep namespace and timer-wheel indexes in step with shard removals"""
+        keys = self._namespaces.get(_namespace(key))
+        if keys is not None:
+            keys.discard(key)
+        bucket = self._wheel.get(self._slot(expires_at))
+        if bucket is not None:
+            bucket.discard(key)
+    
+    def ttl_for(self, key: Any) -> int:
+        """Default TTL for a key based on its namespace"""
+        return self._namespace_ttls.get(_namespace(key), self._default_ttl)
     
     async def get(self, key: str) -> Optional[Any]:
         """Get value from cache"""
-        async with self._lock:
-            if key not in self._cache:
-                return None
-            
-            entry = self._cache[key]
-            
-            # Check if expired
-            if entry['expires_at'] < time.time():
-                await self._delete(key)
-                return None
-            
-            # Update access time
-            self._access_times[key] = time.time()
-            logger.debug(f"Cache hit: {key}")
-            return entry['value']
+        return self._shard(key).get(key)
     
     async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
         """Set value in cache"""
-        async with self._lock:
-            ttl = ttl or self._default_ttl
-            expires_at = time.time() + ttl
-            
-            self._cache[key] = {
-                'value': value,
-                'expires_at': expires_at,
-                'created_at': time.time()
-            }
-            self._access_times[key] = time.time()
-            logger.debug(f"Cache set: {key} (TTL: {ttl}s)")
+        ttl = ttl or self.ttl_for(key)
+        expires_at = self._shard(key).set(key, value, ttl, size=_estimate_size(value))
+        self._namespaces.setdefault(_namespace(key), set()).add(key)
+        self._wheel.setdefault(self._slot(expires_at), set()).add(key)
+        logger.debug(f"Cache set: {key} (TTL: {ttl}s)")
     
     async def delete(self, key: str) -> bool:
         """Delete key from cache"""
-        async with self._lock:
-            return await self._delete(key)
-    
-    async def _delete(self, key: str) -> bool:
-        """Internal delete method"""
-        if key in self._cache:
-            del self._cache[key]
-            self._access_times.pop(key, None)
+        deleted = self._shard(key).delete(key)
+        if deleted:
             logger.debug(f"Cache delete: {key}")
-            return True
-        return False
+        return deleted
+    
+    async def invalidate_namespace(self, namespace: str) -> int:
+        """Delete every key of a namespace (e.g. "stats")"""
+        keys = list(self._namespaces.pop(namespace, ()))
+        for key in keys:
+            self._shard(key).delete(key)
+        return len(keys)
     
     async def clear(self) -> None:
         """Clear all cache"""
-        async with self._lock:
-            self._cache.clear()
-            self._access_times.clear()
-            logger.info("Cache cleared")
+        for shard in self._shards:
+            shard.clear()
+        self._namespaces.clear()
+        self._wheel.clear()
+        logger.info("Cache cleared")
     
     async def cleanup_expired(self) -> int:
-        """Remove expired entries"""
-        async with self._lock:
-            current_time = time.time()
-            expired_keys = [
-                key for key, entry in self._cache.items()
-                if entry['expires_at'] < current_time
-            ]
-            
-            for key in expired_keys:
-                await self._delete(key)
-            
-            if expired_keys:
-                logger.info(f"Cleaned up {len(expired_keys)} expired cache entries")
-            
-            return len(expired_keys)
+        """Remove expired entries by sweeping timer-wheel buckets that have passed"""
+        now = time.monotonic()
+        current_slot = self._slot(now)
+        removed = 0
+        
+        # Only buckets that are due are visited, not every entry
+        due_slots = [slot for slot in self._wheel if slot < current_slot]
+        for slot in due_slots:
+            for key in list(self._wheel.pop(slot)):
+                if self._shard(key).expire(key, now):
+                    removed += 1
+        
+        if removed:
+            logger.info(f"Cleaned up {removed} expired cache entries")
+        
+        return removed
     
     async def get_stats(self) -> Dict[str, Any]:
-        """Get cache statistics"""
-        async with self._lock:
-            current_time = time.time()
-            total_entries = len(self._cache)
-            expired_entries = sum(
-                1 for entry in self._cache.values()
-                if entry['expires_at'] < current_time
-            )
-            
-            return {
-                'total_entries': total_entries,
-                'active_entries': total_entries - expired_entries,
-                'expired_entries': expired_entries,
-                'memory_usage_kb': len(str(self._cache)) / 1024
-            }
+        """Get cache statistics (O(shards), no walk over entries)"""
+        shard_stats = [shard.get_stats() for shard in self._shards]
+        totals = {
+            name: sum(stats[name] for stats in shard_stats)
+            for name in ('entries', 'bytes', 'hits', 'misses', 'evictions', 'expirations', 'invalidations')
+        }
+        lookups = totals['hits'] + totals['misses']
+        
+        return {
+            'total_entries': totals['entries'],
+            'namespaces': {ns: len(keys) for ns, keys in self._namespaces.items() if keys},
+            'hits': totals['hits'],
+            'misses': totals['misses'],
+            'hit_rate': round(totals['hits'] / lookups * 100, 2) if lookups else 0.0,
+            'evictions': totals['evictions'],
+            'expired_entries': totals['expirations'],
+            'invalidations': totals['invalidations'],
+            'memory_usage_kb': round(totals['bytes'] / 1024, 2)
+        }
 
 # Global cache instance
 cache = MemoryCache()
 
+# Process-wide identity cache: telegram_id -> {id, role, language, is_active, full_name}
+IDENTITY_CACHE_MAX_ENTRIES = 10000
+IDENTITY_CACHE_TTL = 600
+IDENTITY_FIELDS = ('id', 'role', 'language', 'is_active', 'full_name')
+
+identity_cache = LRUCache(max_entries=IDENTITY_CACHE_MAX_ENTRIES, default_ttl=IDENTITY_CACHE_TTL)
+
+def get_cached_identity(telegram_id: int) -> Optional[Dict[str, Any]]:
+    """Get cached identity summary for a user"""
+    return identity_cache.get(telegram_id)
+
+def cache_identity(telegram_id: int, user: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Store identity summary of a users row; unregistered users are not cached"""
+    if not user:
+        return None
+    identity = {field: user.get(field) for field in IDENTITY_FIELDS}
+    identity_cache.set(telegram_id, identity)
+    return identity
+
+def update_cached_identity(telegram_id: int, **fields) -> bool:
+    """Write-through update of cached identity fields (e.g. role after a role change)"""
+    return identity_cache.update(telegram_id, **{k: v for k, v in fields.items() if k in IDENTITY_FIELDS})
+
+def invalidate_identity(telegram_id: Optional[int] = None, user_id: Optional[int] = None) -> None:
+    """Drop cached identity by telegram_id or, for writes keyed by users.id, by id"""
+    if telegram_id is None and user_id is not None:
+        # Writes by users.id are rare (client profile edits), a scan of the bounded cache is fine
+        telegram_id = next(
+            (key for key, identity in identity_cache.items() if identity.get('id') == user_id),
+            None
+        )
+    if telegram_id is not None:
+        identity_cache.delete(telegram_id)
+
 # Cache key generators
 def user_cache_key(telegram_id: int) -> str:
     """Generate cache key for user data"""
@@ -133,29 +349,154 @@ def materials_cache_key() -> str:
     return "materials:all"
 
 # Cache decorators
-def cached(ttl: int = 300, key_func=None):
-    """Decorator for caching function results"""
+_CACHE_KEY_SKIP_PARAMS = frozenset({'pool', 'conn', 'connection', 'bot', 'self', 'cls'})
+
+def _stable_repr(value: Any) -> str:
+    """Deterministic representation of an argument for cache keys"""
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return repr(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return "{" + ",".join(f"{_stable_repr(k)}:{_stable_repr(v)}" for k, v in sorted(value.items(), key=lambda kv: repr(kv[0]))) + "}"
+    if isinstance(value, (list, tuple)):
+        return "[" + ",".join(_stable_repr(item) for item in value) + "]"
+    if isinstance(value, (set, frozenset)):
+        return "{" + ",".join(sorted(_stable_repr(item) for item in value)) + "}"
+    if isinstance(value, Enum):
+        return f"{type(value).__name__}.{value.name}"
+    return f"{type(value).__name__}:{value}"
+
+def build_cache_key(func: Callable, args: tuple, kwargs: dict, namespace: str = "fn") -> str:
+    """
+    Build a stable cache key for a call.
+    
+    Arguments are bound to the signature, so f(1) and f(x=1) share a key;
+    pool/connection arguments are ignored. The digest is deterministic across
+    processes, unlike hash(str(args)).
+    """
+    try:
+        bound = inspect.signature(func).bind(*args, **kwargs)
+        bound.apply_defaults()
+        params = [
+            (name, value) for name, value in bound.arguments.items()
+            if name not in _CACHE_KEY_SKIP_PARAMS
+        ]
+    except TypeError:
+        params = list(enumerate(args)) + sorted(kwargs.items())
+    
+    raw = ",".join(f"{name}={_stable_repr(value)}" for name, value in params)
+    digest = hashlib.blake2b(raw.encode('utf-8'), digest_size=10).hexdigest()
+    return f"{namespace}:{func.__module__}.{func.__qualname__}:{digest}"
+
+class _CachedResult:
+    """Cached loader result; wraps None/empty results so they can be cached too"""
+    __slots__ = ('value', 'fresh_until')
+    
+    def __init__(self, value: Any, fresh_until: float):
+        self.value = value
+        self.fresh_until = fresh_until
+
+# In-flight loads per cache key, shared by concurrent callers (single-flight)
+_inflight: Dict[str, asyncio.Future] = {}
+_background_refreshes: Dict[str, asyncio.Task] = {}
+
+def _is_empty(value: Any) -> bool:
+    return value is None or (isinstance(value, (list, dict, tuple, set, str)) and not value)
+
+async def _load_once(cache_key: str, loader: Callable[[], Awaitable[Any]],
+                     ttl: int, negative_ttl: int, stale_ttl: int) -> Any:
+    """Run loader once per key; concurrent callers await the same future"""
+    future = _inflight.get(cache_key)
+    if future is not None:
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if not future.cancelled():
+                raise  # this caller was cancelled, not the shared load
+            return await _load_once(cache_key, loader, ttl, negative_ttl, stale_ttl)
+    
+    future = asyncio.get_running_loop().create_future()
+    _inflight[cache_key] = future
+    try:
+        result = await loader()
+        fresh_ttl = negative_ttl if _is_empty(result) else ttl
+        if fresh_ttl > 0:
+            await cache.set(
+                cache_key,
+                _CachedResult(result, time.monotonic() + fresh_ttl),
+                fresh_ttl + stale_ttl
+            )
+        future.set_result(result)
+        return result
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        # Mark retrieved so an unobserved failure does not log a warning
+        future.exception()
+        raise
+    finally:
+        _inflight.pop(cache_key, None)
+
+def cached(ttl: int = 300, key_func=None, namespace: str = "fn",
+           negative_ttl: Optional[int] = None, stale_ttl: int = 0):
+    """
+    Decorator for caching async function results.
+    
+    Concurrent misses for the same key share one call of the wrapped loader.
+    None/empty results are cached for ``negative_ttl`` seconds (defaults to
+    ``ttl``; 0 disables negative caching). With ``stale_ttl`` > 0 an expired
+    result is still served for that long while a single background refresh
+    reloads it (stale-while-revalidate).
+    """
+    negative_ttl = ttl if negative_ttl is None else negative_ttl
+    
     def decorator(func):
+        @functools.wraps(func)
         async def wrapper(*args, **kwargs):
             # Generate cache key
             if key_func:
                 cache_key = key_func(*args, **kwargs)
             else:
-                cache_key = f"{func.__name__}:{hash(str(args) + str(kwargs))}"
+                cache_key = build_cache_key(func, args, kwargs, namespace)
+            
+            def loader():
+                return func(*args, **kwargs)
             
             # Try to get from cache
-            result = await cache.get(cache_key)
-            if result is not None:
-                return result
+            entry = await cache.get(cache_key)
+            if isinstance(entry, _CachedResult):
+                if entry.fresh_until >= time.monotonic():
+                    return entry.value
+                if cache_key not in _inflight and cache_key not in _background_refreshes:
+                    task = asyncio.create_task(
+                        _load_once(cache_key, loader, ttl, negative_ttl, stale_ttl)
+                    )
+                    _background_refreshes[cache_key] = task
+                    task.add_done_callback(
+                        functools.partial(_finish_background_refresh, cache_key)
+                    )
+                return entry.value
+            if entry is not None:
+                # Plain value stored under this key (e.g. by warm_cache)
+                return entry
             
-            # Execute function and cache result
-            result = await func(*args, **kwargs)
-            await cache.set(cache_key, result, ttl)
-            return result
+            # Execute function (once for all concurrent callers) and cache result
+            return await _load_once(cache_key, loader, ttl, negative_ttl, stale_ttl)
         
+        wrapper.cache_key = lambda *args, **kwargs: (
+            key_func(*args, **kwargs) if key_func else build_cache_key(func, args, kwargs, namespace)
+        )
         return wrapper
     return decorator
 
+def _finish_background_refresh(cache_key: str, task: asyncio.Task) -> None:
+    _background_refreshes.pop(cache_key, None)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Background cache refresh failed: {task.exception()}")
+
 # Cache invalidation helpers
 async def invalidate_user_cache(telegram_id: int):
     """Invalidate all cache entries for a user"""
@@ -166,6 +507,7 @@ async def invalidate_user_cache(telegram_id: int):
     
     for key in keys_to_delete:
         await cache.delete(key)
+    invalidate_identity(telegram_id=telegram_id)
     
     logger.info(f"Invalidated cache for user {telegram_id}")
 
@@ -183,9 +525,8 @@ async def invalidate_zayavka_cache(zayavka_id: int, user_id: int = None):
 
 async def invalidate_statistics_cache():
     """Invalidate all statistics cache"""
-    # This is a simple approach - in production you might want to track stat keys
-    await cache.clear()
-    logger.info("Invalidated statistics cache")
+    removed = await cache.invalidate_namespace("stats")
+    logger.info(f"Invalidated statistics cache ({removed} entries)")
 
 # Cache maintenance task
 async def cache_maintenance():
@@ -224,12 +565,9 @@ async def warm_cache():
     try:
         from database.base_queries import get_user_statistics, get_zayavka_statistics
         
-        # Cache statistics
-        user_stats = await get_user_statistics()
-        await cache.set(statistics_cache_key("users"), user_stats, 600)
-        
-        zayavka_stats = await get_zayavka_statistics()
-        await cache.set(statistics_cache_key("zayavkas"), zayavka_stats, 600)
+        # Statistics loaders are @cached, calling them populates the cache
+        await get_user_statistics()
+        await get_zayavka_statistics()
         
         logger.info("Cache warmed up successfully")
         
@@ -242,6 +580,7 @@ async def get_cache_info() -> Dict[str, Any]:
     
     return {
         'cache_stats': stats,
+        'identity_cache_stats': identity_cache.get_stats(),
         'default_ttl': cache._default_ttl,
         'maintenance_running': True  # Simplified check
     }
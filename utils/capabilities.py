@@ -0,0 +1,175 @@
+"""
+Precomputed, immutable capability maps per role.
+
+Capabilities depend only on the role, so they are built once (at startup,
+or on first use of an unknown role) from ROLE_PERMISSIONS and the
+WorkflowAccessControl role matrix, frozen, and handed out by reference.
+Permission checks are frozenset lookups. Rare per-user overrides are kept
+as a small grant/revoke delta whose derived capabilities are cached.
+"""
+
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Iterable, Mapping, Tuple
+
+from utils.cache_manager import LRUCache
+from utils.logger import setup_module_logger
+
+logger = setup_module_logger("capabilities")
+
+# Boolean flags of the legacy capability dict and the permission behind each
+LEGACY_FLAGS = {
+    'can_manage_users': 'manage_users',
+    'can_view_all_zayavkas': 'view_all_zayavkas',
+    'can_assign_tasks': 'assign_tasks',
+    'can_manage_materials': 'manage_materials',
+}
+
+
+@dataclass(frozen=True)
+class RoleCapabilities:
+    """
+    Frozen capabilities of a role.
+
+    Also readable like the dict the middleware used to build
+    (``caps['can_assign_tasks']``, ``caps.get('permissions')``).
+    """
+    role: str
+    level: int
+    permissions: FrozenSet[str]
+    workflow_actions: FrozenSet[str]
+    request_access: FrozenSet[str] = frozenset()
+    data_access: FrozenSet[str] = frozenset()
+    flags: Mapping[str, bool] = field(default_factory=lambda: MappingProxyType({}), compare=False)
+    _view: Mapping[str, Any] = field(default=None, repr=False, compare=False)
+
+    def __post_init__(self):
+        workflow_permissions = MappingProxyType({
+            'workflow_actions': self.workflow_actions,
+            'request_access': self.request_access,
+            'data_access': self.data_access,
+            **self.flags,
+        })
+        object.__setattr__(self, '_view', MappingProxyType({
+            'role': self.role,
+            'level': self.level,
+            'permissions': self.permissions,
+            **{flag: permission in self.permissions for flag, permission in LEGACY_FLAGS.items()},
+            'workflow_permissions': MappingProxyType({
+                'role': self.role,
+                'static_permissions': workflow_permissions,
+                'effective_permissions': workflow_permissions,
+            }),
+        }))
+
+    def can(self, permission: str) -> bool:
+        """Check a ROLE_PERMISSIONS permission"""
+        return permission in self.permissions
+
+    def can_perform(self, action: str) -> bool:
+        """Check a workflow action"""
+        return action in self.workflow_actions
+
+    def __getitem__(self, key: str) -> Any:
+        return self._view[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._view
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._view.get(key, default)
+
+    def keys(self):
+        return self._view.keys()
+
+    def with_override(self, grant: Iterable[str] = (), revoke: Iterable[str] = ()) -> 'RoleCapabilities':
+        """Derive capabilities with permissions/workflow actions granted or revoked"""
+        grant, revoke = frozenset(grant), frozenset(revoke)
+        return RoleCapabilities(
+            role=self.role,
+            level=self.level,
+            permissions=(self.permissions | grant) - revoke,
+            workflow_actions=(self.workflow_actions | grant) - revoke,
+            request_access=self.request_access,
+            data_access=self.data_access,
+            flags=self.flags,
+        )
+
+
+_role_capabilities: Dict[str, RoleCapabilities] = {}
+_overrides: Dict[int, Tuple[FrozenSet[str], FrozenSet[str]]] = {}
+# telegram_id -> (role, derived capabilities); only users with an override
+_override_cache = LRUCache(max_entries=1024, default_ttl=3600)
+
+
+def _build_role_capabilities(role: str, workflow_matrix: Mapping[str, Mapping[str, Any]]) -> RoleCapabilities:
+    from utils.get_role import ROLE_PERMISSIONS, get_role_level
+
+    workflow = workflow_matrix.get(role, {})
+    return RoleCapabilities(
+        role=role,
+        level=get_role_level(role),
+        permissions=frozenset(ROLE_PERMISSIONS.get(role, ())),
+        workflow_actions=frozenset(workflow.get('workflow_actions', ())),
+        request_access=frozenset(workflow.get('request_access', ())),
+        data_access=frozenset(workflow.get('data_access', ())),
+        flags=MappingProxyType({key: value for key, value in workflow.items() if key.startswith('can_')}),
+    )
+
+
+def _workflow_matrix() -> Mapping[str, Mapping[str, Any]]:
+    from utils.workflow_access_control import WorkflowAccessControl
+    return WorkflowAccessControl().role_permissions
+
+
+def build_capability_maps() -> Mapping[str, RoleCapabilities]:
+    """Precompute capabilities for every known role (called once at startup)"""
+    from utils.get_role import ROLE_HIERARCHY, ROLE_PERMISSIONS
+
+    matrix = _workflow_matrix()
+    roles = set(ROLE_HIERARCHY) | set(ROLE_PERMISSIONS) | set(matrix)
+    for role in roles:
+        _role_capabilities[role] = _build_role_capabilities(role, matrix)
+    _override_cache.clear()
+    logger.info(f"Built capability maps for {len(roles)} roles")
+    return MappingProxyType(_role_capabilities)
+
+
+def get_role_capabilities(role: str) -> RoleCapabilities:
+    """Get the shared, frozen capabilities of a role"""
+    capabilities = _role_capabilities.get(role)
+    if capabilities is None:
+        capabilities = _role_capabilities[role] = _build_role_capabilities(role, _workflow_matrix())
+    return capabilities
+
+
+def get_user_capabilities(telegram_id: int, role: str) -> RoleCapabilities:
+    """Get a user's capabilities: the role's shared map unless the user has an override"""
+    if telegram_id not in _overrides:
+        return get_role_capabilities(role)
+
+    cached = _override_cache.get(telegram_id)
+    if cached is not None and cached[0] == role:
+        return cached[1]
+    grant, revoke = _overrides[telegram_id]
+    capabilities = get_role_capabilities(role).with_override(grant, revoke)
+    _override_cache.set(telegram_id, (role, capabilities))
+    return capabilities
+
+
+def set_capability_override(telegram_id: int, grant: Iterable[str] = (), revoke: Iterable[str] = ()) -> None:
+    """Grant and/or revoke individual permissions or workflow actions for one user"""
+    _overrides[telegram_id] = (frozenset(grant), frozenset(revoke))
+    _override_cache.delete(telegram_id)
+
+
+def clear_capability_override(telegram_id: int) -> None:
+    """Remove a user's override; the role's shared map applies again"""
+    _overrides.pop(telegram_id, None)
+    _override_cache.delete(telegram_id)
+
+
+__all__ = [
+    'RoleCapabilities', 'build_capability_maps', 'get_role_capabilities',
+    'get_user_capabilities', 'set_capability_override', 'clear_capability_override'
+]
@@ -0,0 +1,426 @@
+"""
+In-memory typeahead index of users for call-centre client search.
+
+Operators look the same client base up hundreds of times an hour. When
+``CLIENT_INDEX_ENABLED`` is set, ``database.client_search.search_users``
+asks this index for the ranked user ids and only reads those rows by
+primary key:
+
+* phones are kept as sorted digit strings and reversed digit strings, so
+  both a number's beginning and its last digits are a bisection away;
+* names are folded to one Latin spelling (Uzbek/Russian Cyrillic is
+  transliterated, apostrophes and diacritics dropped) and split into
+  tokens; query tokens match whole tokens, token prefixes and, when
+  nothing else does, tokens with similar trigrams.
+
+The index is built from ``users`` at startup and rebuilt every
+``CLIENT_INDEX_REFRESH_SECONDS``, which also picks up writes from other
+processes. The client write paths apply their own changes immediately.
+Until the first build finishes ``search`` returns None and callers use
+the database.
+"""
+
+import asyncio
+import bisect
+import heapq
+import re
+import sys
+import unicodedata
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from config import config
+from database import client_search
+from utils.logger import setup_module_logger
+from utils.validators import normalize_phone_e164
+
+logger = setup_module_logger("client_index")
+
+# Uzbek and Russian Cyrillic in the Uzbek Latin spelling
+_CYRILLIC = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'yo', 'ж': 'j', 'з': 'z',
+    'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r',
+    'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'x', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sh',
+    'ъ': '', 'ы': 'i', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+    'ў': 'o', 'қ': 'q', 'ғ': 'g', 'ҳ': 'h',
+}
+_APOSTROPHES = re.compile(r"[ʻʼ'‘’`´]")
+_TOKENS = re.compile(r"[a-z0-9]+")
+
+WARM_QUERY = """
+SELECT id, full_name, phone_number, phone_e164, role
+FROM users
+WHERE id > $1
+ORDER BY id
+LIMIT $2
+"""
+
+# Completions of one query token looked at, and numbers one phone prefix collects
+MAX_COMPLETIONS = 200
+MAX_CANDIDATES = 5000
+# Trigram similarity below which a token is not a fuzzy match
+FUZZY_MIN_SIMILARITY = 0.4
+
+
+def fold_name(name: Optional[str]) -> str:
+    """Lower-case Latin spelling of a name, tokens separated by single spaces"""
+    text = ''.join(_CYRILLIC.get(char, char) for char in (name or '').lower())
+    text = _APOSTROPHES.sub('', text)
+    text = ''.join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char))
+    # Russian "kh" and Uzbek "x" are the same sound; "е" is written "ye" after vowels in Latin only
+    return ' '.join(_TOKENS.findall(text.replace('kh', 'x').replace('ye', 'e')))
+
+
+def _trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _token_score(query: str, token: str) -> float:
+    """1 for the same token, less for a completion, the trigram similarity for a near miss"""
+    if token == query:
+        return 1.0
+    if token.startswith(query):
+        return 0.5 + 0.4 * len(query) / len(token)
+    query_grams, token_grams = _trigrams(query), _trigrams(token)
+    similarity = len(query_grams & token_grams) / len(query_grams | token_grams)
+    return 0.5 * similarity if similarity >= FUZZY_MIN_SIMILARITY else 0.0
+
+
+class _SortedKeys:
+    """(key, user id) pairs kept sorted by key, for prefix range lookups"""
+
+    __slots__ = ('keys', 'ids')
+
+    def __init__(self, pairs: Iterable[Tuple[str, int]] = ()):
+        pairs = sorted(pairs)
+        self.keys: List[str] = [key for key, _ in pairs]
+        self.ids = array('q', [user_id for _, user_id in pairs])
+
+    def add(self, key: str, user_id: int) -> None:
+        index = bisect.bisect_left(self.keys, key)
+        self.keys.insert(index, key)
+        self.ids.insert(index, user_id)
+
+    def discard(self, key: str, user_id: int) -> None:
+        index = bisect.bisect_left(self.keys, key)
+        while index < len(self.keys) and self.keys[index] == key:
+            if self.ids[index] == user_id:
+                del self.keys[index]
+                del self.ids[index]
+                return
+            index += 1
+
+    def exact(self, key: str) -> List[int]:
+        start = bisect.bisect_left(self.keys, key)
+        end = bisect.bisect_right(self.keys, key, start)
+        return list(self.ids[start:end])
+
+    def prefixed(self, prefix: str, limit: int) -> List[int]:
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + '\uffff', start)
+        return list(self.ids[start:min(end, start + limit)])
+
+
+class _IndexState:
+    """The index structures, built off the event loop and swapped in whole"""
+
+    def __init__(self, rows: List[Tuple[int, Tuple[str, str, str]]] = ()):
+        # user id -> (phone digits, folded name, role)
+        self.records: Dict[int, Tuple[str, str, str]] = dict(rows)
+        self.phones = _SortedKeys((digits, user_id) for user_id, (digits, _, _) in rows if digits)
+        self.phone_suffixes = _SortedKeys((digits[::-1], user_id) for user_id, (digits, _, _) in rows if digits)
+        # token -> ids of the users whose name has it, ascending (rows come ordered by id)
+        self.token_ids: Dict[str, array] = {}
+        for user_id, (_, name, _) in rows:
+            for token in set(name.split()):
+                ids = self.token_ids.get(token)
+                if ids is None:
+                    ids = self.token_ids[token] = array('q')
+                ids.append(user_id)
+        self.tokens: List[str] = sorted(self.token_ids)
+        self.token_grams: Dict[str, Set[str]] = {}
+        for token in self.tokens:
+            for gram in _trigrams(token):
+                self.token_grams.setdefault(gram, set()).add(token)
+
+
+class ClientSearchIndex:
+    """Phone and name typeahead over users, answering with ranked user ids"""
+
+    def __init__(self, pool=None, enabled: Optional[bool] = None, refresh_seconds: Optional[int] = None):
+        self.pool = pool
+        self.enabled = config.CLIENT_INDEX_ENABLED if enabled is None else enabled
+        self.refresh_seconds = refresh_seconds or config.CLIENT_INDEX_REFRESH_SECONDS
+        self.ready = False
+        self._task: Optional[asyncio.Task] = None
+        self._building = False
+        self._pending: List[Tuple] = []
+        self._state = _IndexState()
+
+        self.searches = 0
+        self.builds = 0
+
+    def _get_pool(self):
+        """Get database pool"""
+        if self.pool:
+            return self.pool
+        try:
+            from loader import bot
+            return bot.db
+        except ImportError:
+            return None
+
+    def start(self) -> None:
+        """Build the index in the background and keep rebuilding it"""
+        if not self.enabled or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Client search index enabled, rebuilt every {self.refresh_seconds}s")
+
+    async def stop(self) -> None:
+        """Stop rebuilding; the last build keeps answering"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.warm()
+            except Exception as e:
+                logger.error(f"Error building client search index: {str(e)}", exc_info=True)
+            await asyncio.sleep(self.refresh_seconds)
+
+    async def warm(self, batch_size: int = 10000) -> int:
+        """(Re)build the index from users; returns the number of users indexed"""
+        pool = self._get_pool()
+        if pool is None:
+            return 0
+
+        self._building = True
+        self._pending = []
+        try:
+            rows = []
+            last_id = 0
+            async with pool.acquire() as conn:
+                while True:
+                    batch = await conn.fetch(WARM_QUERY, last_id, batch_size)
+                    if not batch:
+                        break
+                    last_id = batch[-1]['id']
+                    rows.extend(self._record(row['id'], row['full_name'], row['phone_e164']
+                                             or normalize_phone_e164(row['phone_number']), row['role'])
+                                for row in batch)
+            state = await asyncio.to_thread(_IndexState, rows)
+        finally:
+            self._building = False
+            pending, self._pending = self._pending, []
+
+        self._state = state
+        self.ready = True
+        # Writes that happened since the rows were read win over them
+        for args in pending:
+            self.upsert(*args)
+        self.builds += 1
+        logger.info(f"Client search index built: {len(self._state.records)} users, "
+                    f"{len(self._state.tokens)} name tokens")
+        return len(self._state.records)
+
+    @staticmethod
+    def _record(user_id: int, full_name: Optional[str], phone_e164: Optional[str],
+                role: Optional[str]) -> Tuple[int, Tuple[str, str, str]]:
+        digits = phone_e164[1:] if phone_e164 else ''
+        return user_id, (digits, fold_name(full_name), sys.intern(role or 'client'))
+
+    def upsert(self, user_id: int, full_name: Optional[str] = None, phone_number: Optional[str] = None,
+               role: Optional[str] = None) -> None:
+        """Apply a created or changed user; fields left as None keep their indexed value"""
+        if not self.enabled or not user_id:
+            return
+        if self._building:
+            self._pending.append((user_id, full_name, phone_number, role))
+        if not self.ready:
+            return
+
+        old = self._state.records.get(user_id)
+        digits, name, old_role = old or ('', '', 'client')
+        if phone_number is not None:
+            phone_e164 = normalize_phone_e164(phone_number)
+            digits = phone_e164[1:] if phone_e164 else ''
+        if full_name is not None:
+            name = fold_name(full_name)
+        record = (digits, name, sys.intern(role or old_role))
+        if record == old:
+            return
+        self.remove(user_id)
+        self._add(user_id, record)
+
+    def remove(self, user_id: int) -> None:
+        """Drop a user from the index"""
+        state = self._state
+        old = state.records.pop(user_id, None)
+        if old is None:
+            return
+        digits, name, _ = old
+        if digits:
+            state.phones.discard(digits, user_id)
+            state.phone_suffixes.discard(digits[::-1], user_id)
+        for token in set(name.split()):
+            ids = state.token_ids.get(token)
+            if ids is None:
+                continue
+            ids.remove(user_id)
+            if not ids:
+                del state.token_ids[token]
+                del state.tokens[bisect.bisect_left(state.tokens, token)]
+                for gram in _trigrams(token):
+                    state.token_grams[gram].discard(token)
+
+    def _add(self, user_id: int, record: Tuple[str, str, str]) -> None:
+        state = self._state
+        digits, name, _ = record
+        state.records[user_id] = record
+        if digits:
+            state.phones.add(digits, user_id)
+            state.phone_suffixes.add(digits[::-1], user_id)
+        for token in set(name.split()):
+            ids = state.token_ids.get(token)
+            if ids is None:
+                ids = state.token_ids[token] = array('q')
+                bisect.insort(state.tokens, token)
+                for gram in _trigrams(token):
+                    state.token_grams.setdefault(gram, set()).add(token)
+            if ids and ids[-1] > user_id:
+                ids.insert(bisect.bisect_left(ids, user_id), user_id)
+            else:
+                ids.append(user_id)
+
+    def search(self, term: str, role: Optional[str] = 'client', limit: int = 10,
+               phone_prefix: bool = True) -> Optional[List[Tuple[int, int, float]]]:
+        """
+        Ranked (user id, match rank, score) for term, like search_users orders them.
+
+        Returns None while the index is not built, so the caller asks the database.
+        """
+        if not self.ready:
+            return None
+        self.searches += 1
+        term = (term or '').strip()
+        if not any(char.isalpha() for char in term):
+            matches = self._search_phone(term, phone_prefix, limit)
+            if role is not None:
+                records = self._state.records
+                matches = {user_id: match for user_id, match in matches.items() if records[user_id][2] == role}
+        elif len(term) >= 2:
+            matches = self._search_name(fold_name(term).split(), role, limit)
+        else:
+            matches = {}
+
+        ranked = heapq.nsmallest(limit, matches.items(), key=lambda item: (item[1][0], -item[1][1], -item[0]))
+        return [(user_id, rank, score) for user_id, (rank, score) in ranked]
+
+    def _search_phone(self, term: str, phone_prefix: bool, limit: int) -> Dict[int, Tuple[int, float]]:
+        matches: Dict[int, Tuple[int, float]] = {}
+        phone_e164 = normalize_phone_e164(term)
+        if phone_e164:
+            for user_id in self._state.phones.exact(phone_e164[1:]):
+                matches[user_id] = (client_search.EXACT_PHONE, 1.0)
+        if not phone_prefix:
+            return matches
+
+        low, _ = client_search.phone_prefix_range(term)
+        if low:
+            for user_id in self._state.phones.prefixed(low[1:], MAX_CANDIDATES):
+                matches.setdefault(user_id, (client_search.PHONE_PREFIX, 1.0))
+            # Operators often type the last digits of a number
+            digits = re.sub(r'\D', '', term)
+            for user_id in self._state.phone_suffixes.prefixed(digits[::-1], MAX_CANDIDATES):
+                matches.setdefault(user_id, (client_search.PHONE_PREFIX, 0.9))
+        return matches
+
+    def _token_matches(self, query: str) -> List[Tuple[str, float]]:
+        """Indexed tokens query stands for, best first"""
+        tokens = self._state.tokens
+        start = bisect.bisect_left(tokens, query)
+        end = min(bisect.bisect_left(tokens, query + '\uffff', start), start + MAX_COMPLETIONS)
+        matches = [(token, _token_score(query, token)) for token in tokens[start:end]]
+        if not matches:
+            token_grams = self._state.token_grams
+            query_grams = _trigrams(query)
+            shared = Counter(token for gram in query_grams for token in token_grams.get(gram, ()))
+            # A token sharing fewer trigrams cannot reach FUZZY_MIN_SIMILARITY
+            enough = FUZZY_MIN_SIMILARITY * len(query_grams)
+            matches = [(token, _token_score(query, token)) for token, count in shared.most_common(MAX_COMPLETIONS)
+                       if count >= enough]
+            matches = [(token, score) for token, score in matches if score > 0]
+        return sorted(matches, key=lambda match: -match[1])
+
+    def _search_name(self, query_tokens: List[str], role: Optional[str],
+                     limit: int) -> Dict[int, Tuple[int, float]]:
+        """
+        Users whose name has a match for every query token, scored by the mean token score.
+
+        The users of the most selective query token's matches are walked best
+        match first and newest first, and checked against the other query
+        tokens; the walk stops once nothing left can enter the top limit.
+        """
+        if not query_tokens:
+            return {}
+
+        state = self._state
+        expansions = [self._token_matches(query) for query in query_tokens]
+        lead = min(range(len(expansions)), key=lambda position: sum(len(state.token_ids[token])
+                                                                    for token, _ in expansions[position]))
+        others = [dict(token_matches) for position, token_matches in enumerate(expansions) if position != lead]
+        records = state.records
+
+        matches: Dict[int, Tuple[int, float]] = {}
+        # The top `limit` (score, user id) so far as a min-heap, so best[0] is the one to beat
+        best: List[Tuple[float, int]] = []
+        for token, score in expansions[lead]:
+            bound = (score + len(others)) / len(query_tokens)
+            if len(best) >= limit and bound < best[0][0]:
+                break
+            for user_id in reversed(state.token_ids[token]):
+                # The rest of this token's users are older and score at most bound
+                if len(best) >= limit and (bound, user_id) < best[0]:
+                    break
+                _, name, user_role = records[user_id]
+                if role is not None and user_role != role:
+                    continue
+                name_tokens = name.split()
+                other_scores = [max(token_scores.get(name_token, 0.0) for name_token in name_tokens)
+                                for token_scores in others]
+                if not all(other_scores):
+                    continue
+                total = (score + sum(other_scores)) / len(query_tokens)
+
+                if user_id in matches:
+                    # best already holds this user once (with a lower score, which only delays the stop)
+                    if matches[user_id][1] < total:
+                        matches[user_id] = (client_search.NAME_SIMILARITY, total)
+                    continue
+                matches[user_id] = (client_search.NAME_SIMILARITY, total)
+                if len(best) < limit:
+                    heapq.heappush(best, (total, user_id))
+                elif (total, user_id) > best[0]:
+                    heapq.heapreplace(best, (total, user_id))
+        return matches
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get index statistics"""
+        return {
+            'enabled': self.enabled,
+            'ready': self.ready,
+            'users': len(self._state.records),
+            'name_tokens': len(self._state.tokens),
+            'builds': self.builds,
+            'searches': self.searches,
+        }
+
+
+# Global instance warmed in loader.on_startup
+client_index = ClientSearchIndex()
@@ -13,6 +13,7 @@ from dataclasses import dataclass
 
 from database.models import User, ClientSelectionData, ModelConstants
 from database.base_queries import get_user_by_telegram_id, get_user_by_id, create_user
+from database import client_search
 from loader import bot
 
 logger = logging.getLogger(__name__)
@@ -149,19 +150,9 @@ class ClientSearchEngine:
                     error="Invalid phone number format"
                 )
             
-            # Search in database
+            # Exact match on the canonical E.164 column
             async with bot.db.acquire() as conn:
-                query = """
-                    SELECT id, telegram_id, full_name, phone_number, role, language, 
-                           is_active, address, created_at, updated_at
-                    FROM users 
-                    WHERE phone_number = $1 OR phone_number = $2
-                    ORDER BY created_at DESC
-                """
-                
-                # Try both with and without + prefix
-                phone_variants = [normalized_phone, normalized_phone.lstrip('+')]
-                results = await conn.fetch(query, normalized_phone, normalized_phone.lstrip('+'))
+                results = await client_search.search_users(conn, normalized_phone, role=None, phone_prefix=False)
                 
                 if not results:
                     return ClientSearchResult(found=False)
@@ -197,23 +188,8 @@ class ClientSearchEngine:
             name = name.strip()
             
             async with bot.db.acquire() as conn:
-                # Use ILIKE for case-insensitive partial matching
-                query = """
-                    SELECT id, telegram_id, full_name, phone_number, role, language, 
-                           is_active, address, created_at, updated_at
-                    FROM users 
-                    WHERE full_name ILIKE $1
-                    ORDER BY 
-                        CASE WHEN full_name ILIKE $2 THEN 1 ELSE 2 END,
-                        created_at DESC
-                    LIMIT 10
-                """
-                
-                # Search patterns: exact match gets priority, then partial
-                exact_pattern = name
-                partial_pattern = f"%{name}%"
-                
-                results = await conn.fetch(query, partial_pattern, exact_pattern)
+                # Trigram similarity, best match first
+                results = await client_search.search_users(conn, name, role=None)
                 
                 if not results:
                     return ClientSearchResult(found=False)
@@ -14,6 +14,7 @@ import asyncio
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 
+from database.pagination import Page
 from utils.state_manager import StateManager, StateManagerInterface
 from utils.error_recovery import (
     TransactionalStateManager, error_handler, ErrorCategory, ErrorSeverity
@@ -266,6 +267,18 @@ class EnhancedStateManager(StateManagerInterface):
             })
             return []
     
+    async def get_requests_page(self, role: str, status_filter: str = None, limit: int = 20, cursor: str = None):
+        """Get one page of requests by role with error handling"""
+        try:
+            return await self.base_state_manager.get_requests_page(role, status_filter, limit, cursor)
+        except Exception as e:
+            await self.error_handler.handle_error(e, {
+                'operation': 'get_requests_page',
+                'role': role,
+                'status_filter': status_filter
+            })
+            return Page()
+    
     async def get_request_history(self, request_id: str):
         """Get request history with error handling"""
         try:
@@ -241,55 +241,103 @@ class TransactionalStateManager:
 
 
 class NotificationRetryManager:
-    """Manages notification retry with exponential backoff"""
+    """
+    Manages notification retry with exponential backoff.
     
-    def __init__(self, base_notification_system):
+    Retries are stored in notification_retry_queue so they survive restarts
+    and are shared by all bot processes; without a database they are kept in
+    ``retry_queue`` and scheduled in-process.
+    """
+    
+    def __init__(self, base_notification_system, pool=None):
         self.base_notification_system = base_notification_system
+        self.pool = pool
         self.retry_queue: List[Dict[str, Any]] = []
         self.max_retries = 5
         self.base_delay = 1  # seconds
         self.max_delay = 300  # 5 minutes
+        self.claim_batch_size = 50
         self.logger = setup_module_logger("notification_retry_manager")
     
+    def _get_pool(self):
+        """Get database pool (None when the database is not available)"""
+        if self.pool:
+            return self.pool
+        try:
+            from loader import bot
+            return bot.db
+        except Exception:
+            return None
+    
+    def _retry_delay(self, retry_count: int) -> float:
+        return min(self.base_delay * (2 ** retry_count), self.max_delay)
+    
+    async def _attempt(self, role: str, request_id: str, workflow_type: str) -> Optional[str]:
+        """Send once; returns None on success or the error text"""
+        try:
+            success = await self.base_notification_system.send_assignment_notification(
+                role, request_id, workflow_type
+            )
+            return None if success else "Notification sending failed"
+        except Exception as e:
+            return str(e)
+    
     async def send_notification_with_retry(self, role: str, request_id: str, 
                                          workflow_type: str, retry_count: int = 0) -> bool:
         """Send notification with retry mechanism"""
+        error = await self._attempt(role, request_id, workflow_type)
+        if error is None:
+            self.logger.info(f"Notification sent successfully for request {request_id}")
+            return True
+        
+        if retry_count >= self.max_retries:
+            self.logger.error(f"Notification failed permanently for request {request_id} after {retry_count} retries")
+            return False
+        
+        # Calculate exponential backoff delay
+        delay = self._retry_delay(retry_count)
+        if await self._persist_retry(role, request_id, workflow_type, retry_count + 1, delay, error):
+            self.logger.warning(f"Notification failed for request {request_id}, retry {retry_count + 1} stored for {delay}s")
+            return False
+        
+        # Add to retry queue
+        retry_item = {
+            'role': role,
+            'request_id': request_id,
+            'workflow_type': workflow_type,
+            'retry_count': retry_count + 1,
+            'next_retry_at': datetime.now() + timedelta(seconds=delay),
+            'error': error
+        }
+        
+        self.retry_queue.append(retry_item)
+        
+        self.logger.warning(f"Notification failed for request {request_id}, retry {retry_count + 1} scheduled in {delay}s")
+        
+        # Schedule retry
+        asyncio.create_task(self._schedule_retry(retry_item, delay))
+        return False
+    
+    async def _persist_retry(self, role: str, request_id: str, workflow_type: str,
+                             retry_count: int, delay: float, error: str) -> bool:
+        """Store a retry in notification_retry_queue; False if there is no usable database"""
+        pool = self._get_pool()
+        if pool is None:
+            return False
         try:
-            success = await self.base_notification_system.send_assignment_notification(
-                role, request_id, workflow_type
+            await pool.execute(
+                """
+                INSERT INTO notification_retry_queue (
+                    role, request_id, workflow_type, retry_count, max_retries, next_retry_at, last_error
+                )
+                VALUES ($1, $2, $3, $4, $5, NOW() + make_interval(secs => $6), $7)
+                """,
+                role, request_id, workflow_type, retry_count, self.max_retries, float(delay), error
             )
-            
-            if success:
-                self.logger.info(f"Notification sent successfully for request {request_id}")
-                return True
-            else:
-                raise Exception("Notification sending failed")
-                
+            return True
         except Exception as e:
-            if retry_count < self.max_retries:
-                # Calculate exponential backoff delay
-                delay = min(self.base_delay * (2 ** retry_count), self.max_delay)
-                
-                # Add to retry queue
-                retry_item = {
-                    'role': role,
-                    'request_id': request_id,
-                    'workflow_type': workflow_type,
-                    'retry_count': retry_count + 1,
-                    'next_retry_at': datetime.now() + timedelta(seconds=delay),
-                    'error': str(e)
-                }
-                
-                self.retry_queue.append(retry_item)
-                
-                self.logger.warning(f"Notification failed for request {request_id}, retry {retry_count + 1} scheduled in {delay}s")
-                
-                # Schedule retry
-                asyncio.create_task(self._schedule_retry(retry_item, delay))
-                return False
-            else:
-                self.logger.error(f"Notification failed permanently for request {request_id} after {retry_count} retries")
-                return False
+            self.logger.error(f"Error storing notification retry: {str(e)}")
+            return False
     
     async def _schedule_retry(self, retry_item: Dict[str, Any], delay: float):
         """Schedule a retry after delay"""
@@ -322,6 +370,59 @@ class NotificationRetryManager:
                 retry_item['workflow_type'],
                 retry_item['retry_count']
             )
+        
+        pool = self._get_pool()
+        if pool is not None:
+            try:
+                await self._process_stored_retries(pool)
+            except Exception as e:
+                self.logger.error(f"Error processing stored notification retries: {str(e)}")
+    
+    async def _process_stored_retries(self, pool) -> int:
+        """Retry due rows of notification_retry_queue; rows claimed by another process are skipped"""
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                # Push the claimed rows' next_retry_at out so a crashed attempt is retried later
+                rows = await conn.fetch(
+                    """
+                    UPDATE notification_retry_queue q
+                    SET next_retry_at = NOW() + make_interval(secs => $2)
+                    WHERE q.id IN (
+                        SELECT id FROM notification_retry_queue
+                        WHERE status = 'pending' AND next_retry_at <= NOW()
+                        ORDER BY next_retry_at
+                        LIMIT $1
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING q.id, q.role, q.request_id::text AS request_id, q.workflow_type,
+                              q.retry_count, q.max_retries
+                    """,
+                    self.claim_batch_size, float(self.max_delay)
+                )
+        
+        for row in rows:
+            error = await self._attempt(row['role'], row['request_id'], row['workflow_type'])
+            if error is None:
+                await pool.execute(
+                    "UPDATE notification_retry_queue SET status = 'completed' WHERE id = $1", row['id']
+                )
+            elif row['retry_count'] >= row['max_retries']:
+                self.logger.error(f"Notification failed permanently for request {row['request_id']} after {row['retry_count']} retries")
+                await pool.execute(
+                    "UPDATE notification_retry_queue SET status = 'failed', last_error = $2 WHERE id = $1",
+                    row['id'], error
+                )
+            else:
+                await pool.execute(
+                    """
+                    UPDATE notification_retry_queue
+                    SET retry_count = retry_count + 1, last_error = $2,
+                        next_retry_at = NOW() + make_interval(secs => $3)
+                    WHERE id = $1
+                    """,
+                    row['id'], error, float(self._retry_delay(row['retry_count']))
+                )
+        return len(rows)
     
     def get_retry_stats(self) -> Dict[str, Any]:
         """Get retry queue statistics"""
@@ -680,12 +781,9 @@ class WorkflowRecoveryManager:
             if not request:
                 return []
             
-            workflow_def = self.workflow_engine.get_workflow_definition(request.workflow_type)
-            if not workflow_def:
-                return []
-            
-            current_step = workflow_def.steps.get(request.role_current )
-            if not current_step:
+            graph = self.workflow_engine.get_workflow_graph()
+            workflow_type, role = request.workflow_type, request.role_current
+            if role not in graph.states(workflow_type):
                 return []
             
             options = [
@@ -693,13 +791,13 @@ class WorkflowRecoveryManager:
                     'action': 'force_transition',
                     'description': 'Force transition to next role',
                     'requires_data': ['target_role'],
-                    'available_roles': list(current_step.next_steps.values())
+                    'available_roles': list(graph.next_roles(workflow_type, role))
                 },
                 {
                     'action': 'reset_to_previous_state',
                     'description': 'Reset to previous workflow state',
                     'requires_data': [],
-                    'available_roles': []
+                    'available_roles': list(graph.previous_roles(workflow_type, role))
                 },
                 {
                     'action': 'complete_workflow',
@@ -1,6 +1,6 @@
 from typing import Optional, Union
 from aiogram.types import User, Message, CallbackQuery
-from database.base_queries import get_user_by_telegram_id
+from utils.identity_context import get_identity
 from config import config
 from utils.logger import setup_module_logger
 
@@ -11,7 +11,7 @@ async def get_user_language(user: Union[User, int]) -> str:
     try:
         # If user is an integer (telegram_id), get from database directly
         if isinstance(user, int):
-            db_user = await get_user_by_telegram_id(user)
+            db_user = await get_identity(user)
             return db_user.get('language', config.DEFAULT_LANGUAGE) if db_user else config.DEFAULT_LANGUAGE
         
         # If user is a User object
@@ -32,7 +32,7 @@ async def get_user_language(user: Union[User, int]) -> str:
                 return lang_map[lang_prefix]
         
         # Try to get from database first
-        db_user = await get_user_by_telegram_id(user.id)
+        db_user = await get_identity(user.id)
         if db_user and db_user.get('language'):
             return db_user['language']
         
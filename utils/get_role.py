@@ -1,6 +1,6 @@
 from typing import Optional, List
 from aiogram.types import User
-from database.base_queries import get_user_by_telegram_id
+from utils.identity_context import get_identity
 from config import config
 from utils.logger import setup_module_logger
 import logging
@@ -66,8 +66,8 @@ async def get_user_role(user: User | int) -> str:
         if config.is_admin(user_id):
             return 'admin'
         
-        # Get from database
-        db_user = await get_user_by_telegram_id(user_id)
+        # Per-update context / identity cache, database only on a cold miss
+        db_user = await get_identity(user_id)
         if db_user and db_user.get('role'):
             role = db_user['role']
             logger.debug(f"User {user_id} role: {role}")
@@ -87,8 +87,8 @@ async def get_user_role_by_telegram_id(telegram_id: int) -> str:
         if config.is_admin(telegram_id):
             return 'admin'
         
-        # Get from database
-        db_user = await get_user_by_telegram_id(telegram_id)
+        # Per-update context / identity cache, database only on a cold miss
+        db_user = await get_identity(telegram_id)
         if db_user and db_user.get('role'):
             return db_user['role']
         
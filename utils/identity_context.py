@@ -0,0 +1,227 @@
+"""
+Per-update identity context.
+
+The sender's identity is resolved once per incoming update by
+``IdentityContextMiddleware`` and kept in a ContextVar, so RoleFilter, the
+role/language helpers and the ``*_by_telegram_id`` queries can all read it
+instead of hitting the database again for every router aiogram probes.
+Identity summaries are also kept in the process-wide ``identity_cache``
+(utils.cache_manager), so hot users cost no users query at all; writes to
+users go through ``mark_user_stale`` to keep both layers exact.
+"""
+
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+from utils.logger import setup_module_logger
+
+logger = setup_module_logger("identity_context")
+
+
+class UserLookupCounter:
+    """Counts users-by-telegram_id database lookups (used by tests and diagnostics)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def increment(self) -> None:
+        self.count += 1
+
+    def reset(self) -> None:
+        self.count = 0
+
+
+# Incremented by every real ``SELECT ... FROM users WHERE telegram_id = $1``
+user_lookup_counter = UserLookupCounter()
+
+
+@dataclass
+class IdentityContext:
+    """
+    Identity of the user that sent the update being processed.
+
+    ``identity`` is the {id, role, language, is_active, full_name} summary used
+    for role and language checks; it usually comes from the process-wide
+    identity cache. ``user`` is the full users row, fetched only when a
+    handler asks for it through get_user_by_telegram_id.
+    """
+    telegram_id: int
+    identity: Optional[Dict[str, Any]] = None
+    user: Optional[Dict[str, Any]] = None
+    loaded: bool = False
+    row_loaded: bool = False
+    lookups: int = 0
+    pool: Any = field(default=None, repr=False, compare=False)
+
+    @property
+    def exists(self) -> bool:
+        return self.identity is not None
+
+    @property
+    def user_id(self) -> Optional[int]:
+        return self.identity.get('id') if self.identity else None
+
+    @property
+    def role(self) -> Optional[str]:
+        return self.identity.get('role') if self.identity else None
+
+    @property
+    def language(self) -> Optional[str]:
+        return self.identity.get('language') if self.identity else None
+
+    @property
+    def is_active(self) -> bool:
+        return bool(self.identity.get('is_active', True)) if self.identity else False
+
+    @property
+    def full_name(self) -> Optional[str]:
+        return self.identity.get('full_name') if self.identity else None
+
+    async def load(self, pool=None) -> Optional[Dict[str, Any]]:
+        """Resolve the identity summary, from the identity cache when possible"""
+        from utils.cache_manager import get_cached_identity
+
+        if pool is not None:
+            self.pool = pool
+        cached = get_cached_identity(self.telegram_id)
+        if cached is not None:
+            self.identity = cached
+            self.loaded = True
+            return self.identity
+        await self.load_row()
+        return self.identity
+
+    async def load_row(self) -> Optional[Dict[str, Any]]:
+        """Load the full users row from the database (one query)"""
+        from database.base_queries import fetch_user_by_telegram_id
+        from utils.cache_manager import cache_identity
+
+        try:
+            self.user = await fetch_user_by_telegram_id(self.telegram_id, self.pool)
+            self.identity = cache_identity(self.telegram_id, self.user)
+            self.loaded = self.row_loaded = True
+        except Exception as e:
+            # Leave the context unloaded so helpers fall back to their own queries
+            logger.error(f"Error loading identity for {self.telegram_id}: {str(e)}")
+            self.identity = self.user = None
+            self.loaded = self.row_loaded = False
+        self.lookups += 1
+        return self.user
+
+    def invalidate(self) -> None:
+        """Forget loaded data; the next read goes back to the database"""
+        self.identity = self.user = None
+        self.loaded = self.row_loaded = False
+
+
+_current_identity: ContextVar[Optional[IdentityContext]] = ContextVar(
+    'current_identity', default=None
+)
+
+
+def get_current_identity() -> Optional[IdentityContext]:
+    """Get identity context of the update being processed, if any"""
+    return _current_identity.get()
+
+
+def set_current_identity(identity: Optional[IdentityContext]) -> Token:
+    """Bind identity context to the current task"""
+    return _current_identity.set(identity)
+
+
+def reset_current_identity(token: Token) -> None:
+    """Restore the previous identity context"""
+    _current_identity.reset(token)
+
+
+def _matching_identity(telegram_id: Any) -> Optional[IdentityContext]:
+    identity = _current_identity.get()
+    if identity is None:
+        return None
+    try:
+        return identity if identity.telegram_id == int(telegram_id) else None
+    except (TypeError, ValueError):
+        return None
+
+
+async def lookup_identity_user(telegram_id: int) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """
+    Look the full users row up in the current identity context.
+
+    Returns (found, user). ``found`` is True when the context belongs to
+    ``telegram_id``; the row is fetched at most once per update (again after
+    a write invalidated it). ``user`` is a copy (or None for an unregistered
+    user) so callers may mutate it freely.
+    """
+    identity = _matching_identity(telegram_id)
+    if identity is None:
+        return False, None
+
+    if not identity.row_loaded:
+        await identity.load_row()
+        if not identity.row_loaded:
+            return False, None
+    return True, dict(identity.user) if identity.user is not None else None
+
+
+async def get_identity(telegram_id: int, pool=None) -> Optional[Dict[str, Any]]:
+    """
+    Get the {id, role, language, is_active, full_name} summary of a user.
+
+    Served from the current update's context, then the process-wide identity
+    cache; only a cold miss queries the database. Returns None for
+    unregistered users or when the lookup fails.
+    """
+    from utils.cache_manager import get_cached_identity
+
+    identity = _matching_identity(telegram_id)
+    if identity is not None:
+        if not identity.loaded:
+            await identity.load(pool)
+        if identity.loaded:
+            return identity.identity
+
+    cached = get_cached_identity(telegram_id)
+    if cached is not None:
+        return cached
+
+    from database.base_queries import fetch_user_by_telegram_id
+    from utils.cache_manager import cache_identity
+    try:
+        return cache_identity(telegram_id, await fetch_user_by_telegram_id(telegram_id, pool))
+    except Exception as e:
+        logger.error(f"Error getting identity for {telegram_id}: {str(e)}")
+        return None
+
+
+def mark_user_stale(telegram_id: Optional[int] = None, user_id: Optional[int] = None, **changes) -> None:
+    """
+    Invalidate identity data after a write to the users row.
+
+    The process-wide cache entry is patched in place when the written
+    ``changes`` are known (write-through) and dropped otherwise; the current
+    update's context is always reloaded on next read.
+    """
+    from utils.cache_manager import invalidate_identity, update_cached_identity
+
+    if telegram_id is not None and changes:
+        if not update_cached_identity(telegram_id, **changes):
+            invalidate_identity(telegram_id=telegram_id)
+    else:
+        invalidate_identity(telegram_id=telegram_id, user_id=user_id)
+
+    identity = _current_identity.get()
+    if identity is None:
+        return
+    if telegram_id is not None and identity.telegram_id == telegram_id:
+        identity.invalidate()
+    elif user_id is not None and identity.user_id == user_id:
+        identity.invalidate()
+
+
+__all__ = [
+    'IdentityContext', 'UserLookupCounter', 'user_lookup_counter',
+    'get_current_identity', 'set_current_identity', 'reset_current_identity',
+    'lookup_identity_user', 'get_identity', 'mark_user_stale'
+]
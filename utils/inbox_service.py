@@ -9,14 +9,46 @@ This service provides functionality for:
 """
 
 import asyncpg
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Callable
 from datetime import datetime, timedelta
 import json
 from dataclasses import dataclass, field
+from config import config
+from database import role_inbox
+from database.inbox_models import get_role_display_name
+from database.pagination import Page
+from utils.cache_manager import LRUCache
 from utils.logger import setup_module_logger
+from utils.notification_outbox import enqueue_for_role, notification_outbox
+from utils.notification_templates import APPLICATION_TYPE_NAMES, template_registry
 
 logger = setup_module_logger("inbox_service")
 
+# Pages fetched ahead of the user, keyed by (role, filters, page size, cursor),
+# and role totals, keyed by (role, filters); both short-lived
+inbox_page_cache = LRUCache(
+    max_entries=config.INBOX_PAGE_CACHE_ENTRIES, default_ttl=config.INBOX_PAGE_CACHE_TTL
+)
+
+
+def _role_notice(key: str, application_id: str, application_type: str,
+                from_role: Optional[str] = None) -> Callable[[Any], Tuple[str, None]]:
+    """enqueue_for_role renderer for an inbox template, rendered once per recipient language"""
+    rendered: Dict[str, Tuple[str, None]] = {}
+
+    def render(user) -> Tuple[str, None]:
+        lang = user['language'] if user['language'] in APPLICATION_TYPE_NAMES else template_registry.default_language
+        if lang not in rendered:
+            rendered[lang] = (template_registry.render(
+                key, lang,
+                application_type=APPLICATION_TYPE_NAMES[lang].get(application_type, application_type),
+                application_id=application_id,
+                from_role=get_role_display_name(from_role, lang) if from_role else ''
+            ), None)
+        return rendered[lang]
+
+    return render
+
 @dataclass
 class InboxMessage:
     """Data model for inbox messages"""
@@ -140,127 +172,32 @@ class InboxService:
         Returns:
             Dict containing applications, pagination info, and metadata
         """
-        if role not in self.VALID_ROLES:
-            raise ValueError(f"Invalid role: {role}. Must be one of {self.VALID_ROLES}")
-        
-        if application_type and application_type not in self.VALID_APPLICATION_TYPES:
-            raise ValueError(f"Invalid application_type: {application_type}. Must be one of {self.VALID_APPLICATION_TYPES}")
-        
-        if priority and priority not in self.VALID_PRIORITIES:
-            raise ValueError(f"Invalid priority: {priority}. Must be one of {self.VALID_PRIORITIES}")
+        self._validate_filters(role, application_type, priority)
 
         pool = self._get_pool()
         offset = (page - 1) * page_size
         
-        # Build WHERE conditions
-        where_conditions = ["assigned_role = $1"]
-        params = [role]
-        param_count = 2
-        
-        if application_type:
-            where_conditions.append(f"application_type = ${param_count}")
-            params.append(application_type)
-            param_count += 1
-        
-        if priority:
-            where_conditions.append(f"priority = ${param_count}")
-            params.append(priority)
-            param_count += 1
-        
-        if not include_read:
-            where_conditions.append(f"is_read = ${param_count}")
-            params.append(False)
-            param_count += 1
-
-        where_clause = " AND ".join(where_conditions)
-        
-        # Query for applications with details
-        applications_query = f"""
-            WITH inbox_apps AS (
-                SELECT DISTINCT 
-                    im.application_id,
-                    im.application_type,
-                    im.assigned_role,
-                    im.priority,
-                    im.is_read,
-                    im.created_at as inbox_created_at,
-                    im.updated_at as inbox_updated_at
-                FROM inbox_messages im
-                WHERE {where_clause}
-            )
-            SELECT 
-                ia.*,
-                CASE 
-                    WHEN ia.application_type = 'zayavka' THEN
-                        (SELECT row_to_json(z_data) FROM (
-                            SELECT 
-                                z.id,
-                                z.description,
-                                z.address,
-                                z.phone,
-                                z.status,
-                                z.priority as app_priority,
-                                z.created_at,
-                                z.updated_at,
-                                u.full_name as client_name,
-                                u.phone_number as client_phone,
-                                u.language as client_language
-                            FROM zayavki z
-                            LEFT JOIN users u ON z.user_id = u.id
-                            WHERE z.id::text = ia.application_id
-                        ) z_data)
-                    WHEN ia.application_type = 'service_request' THEN
-                        (SELECT row_to_json(sr_data) FROM (
-                            SELECT 
-                                sr.id,
-                                sr.workflow_type,
-                                sr.current_status,
-                                sr.priority as app_priority,
-                                sr.description,
-                                sr.location,
-                                sr.contact_info,
-                                sr.created_at,
-                                sr.updated_at,
-                                u.full_name as client_name,
-                                u.phone_number as client_phone,
-                                u.language as client_language
-                            FROM service_requests sr
-                            LEFT JOIN users u ON sr.client_id = u.id
-                            WHERE sr.id = ia.application_id
-                        ) sr_data)
-                END as application_details
-            FROM inbox_apps ia
-            ORDER BY ia.inbox_created_at DESC
-            LIMIT ${param_count} OFFSET ${param_count + 1}
-        """
-        
-        # Count query for pagination
-        count_query = f"""
-            SELECT COUNT(DISTINCT application_id) 
-            FROM inbox_messages 
-            WHERE {where_clause}
-        """
-        
-        params.extend([page_size, offset])
+        # One indexed range over the role's inbox projection; the total comes
+        # from the counters maintained with it
+        where_clause, filter_params = role_inbox.list_query(
+            application_type, priority, unread_only=not include_read
+        )
+        params = [role, *filter_params]
+        applications_query = role_inbox.page_query(
+            where_clause, f"LIMIT ${len(params) + 1} OFFSET ${len(params) + 2}"
+        )
         
         try:
             async with pool.acquire() as conn:
                 # Get applications
-                applications_result = await conn.fetch(applications_query, *params[:-2])
+                applications_result = await conn.fetch(applications_query, *params, page_size, offset)
                 
                 # Get total count
-                total_count = await conn.fetchval(count_query, *params[:-2])
+                total_count = await role_inbox.count_applications(
+                    conn, role, application_type, priority, unread_only=not include_read
+                )
                 
-                # Process results
-                applications = []
-                for row in applications_result:
-                    app_data = dict(row)
-                    
-                    # Parse application details JSON
-                    if app_data['application_details']:
-                        app_data['application_details'] = dict(app_data['application_details'])
-                    
-                    applications.append(app_data)
+                applications = [role_inbox.row_to_application(row) for row in applications_result]
                 
                 # Calculate pagination info
                 total_pages = (total_count + page_size - 1) // page_size
@@ -289,6 +226,121 @@ class InboxService:
             logger.error(f"Error getting role applications for role {role}: {str(e)}", exc_info=True)
             raise
 
+    async def get_role_applications_page(
+        self,
+        role: str,
+        user_id: int,
+        cursor: Optional[str] = None,
+        page_size: int = 10,
+        application_type: Optional[str] = None,
+        priority: Optional[str] = None,
+        include_read: bool = True
+    ) -> Page:
+        """
+        Get one page of a role's inbox, newest first, by keyset on
+        (last_message_at, application_id).
+        
+        Pass the previous page's ``next_cursor`` to get the following page;
+        every page is the same index range scan as the first. Each query
+        also fetches the page after it, so flipping forward is usually
+        served from ``inbox_page_cache``.
+        
+        Args:
+            role: Role to get applications for
+            user_id: User ID requesting the applications (for access control)
+            cursor: ``next_cursor`` of the previous page, or None for the first page
+            page_size: Number of applications per page
+            application_type: Filter by application type
+            priority: Filter by priority
+            include_read: Whether to include read applications
+            
+        Returns:
+            Page of application dicts (same shape as get_role_applications)
+        """
+        self._validate_filters(role, application_type, priority)
+        page_size = max(1, min(page_size, config.MAX_PAGE_SIZE))
+        filters = (role, application_type, priority, include_read)
+        
+        cached = inbox_page_cache.get(('page', filters, page_size, cursor))
+        if cached is not None:
+            return cached
+        
+        after = None
+        if cursor:
+            try:
+                after = role_inbox.decode_page_cursor(cursor)
+            except ValueError:
+                logger.warning(f"Invalid inbox cursor for role {role}: {cursor!r}")
+                return Page()
+        
+        pool = self._get_pool()
+        try:
+            async with pool.acquire() as conn:
+                rows = await role_inbox.fetch_page(
+                    conn, role, 2 * page_size + 1, after,
+                    application_type, priority, unread_only=not include_read
+                )
+        except Exception as e:
+            logger.error(f"Error getting inbox page for role {role}: {str(e)}", exc_info=True)
+            raise
+        
+        applications = [role_inbox.row_to_application(row) for row in rows]
+        page = self._cut_page(applications, page_size)
+        if page.next_cursor:
+            inbox_page_cache.set(
+                ('page', filters, page_size, page.next_cursor),
+                self._cut_page(applications[page_size:], page_size)
+            )
+        return page
+
+    @staticmethod
+    def _cut_page(applications: List[Dict[str, Any]], page_size: int) -> Page:
+        """First ``page_size`` applications as a Page; any row beyond them means there is a next page"""
+        items = applications[:page_size]
+        next_cursor = role_inbox.encode_page_cursor(items[-1]) if len(applications) > page_size else None
+        return Page(items=items, next_cursor=next_cursor)
+
+    async def get_role_application_total(
+        self,
+        role: str,
+        application_type: Optional[str] = None,
+        priority: Optional[str] = None,
+        include_read: bool = True
+    ) -> int:
+        """
+        Number of applications in a role's inbox for the given filters.
+        
+        Read from role_inbox_counters and reused for ``INBOX_PAGE_CACHE_TTL``
+        seconds, so page flips do not recount; the value may lag by that much.
+        """
+        self._validate_filters(role, application_type, priority)
+        key = ('total', role, application_type, priority, include_read)
+        total = inbox_page_cache.get(key)
+        if total is not None:
+            return total
+        
+        pool = self._get_pool()
+        try:
+            async with pool.acquire() as conn:
+                total = await role_inbox.count_applications(
+                    conn, role, application_type, priority, unread_only=not include_read
+                )
+        except Exception as e:
+            logger.error(f"Error counting inbox for role {role}: {str(e)}", exc_info=True)
+            return 0
+        inbox_page_cache.set(key, total)
+        return total
+
+    def _validate_filters(self, role: str, application_type: Optional[str], priority: Optional[str]) -> None:
+        if role not in self.VALID_ROLES:
+            raise ValueError(f"Invalid role: {role}. Must be one of {self.VALID_ROLES}")
+        
+        if application_type and application_type not in self.VALID_APPLICATION_TYPES:
+            raise ValueError(f"Invalid application_type: {application_type}. Must be one of {self.VALID_APPLICATION_TYPES}")
+        
+        if priority and priority not in self.VALID_PRIORITIES:
+            raise ValueError(f"Invalid priority: {priority}. Must be one of {self.VALID_PRIORITIES}")
+
     async def get_application_details(
         self, 
         application_id: str, 
@@ -418,7 +470,8 @@ class InboxService:
         title: Optional[str] = None,
         description: Optional[str] = None,
         message_type: str = 'application',
-        priority: str = 'medium'
+        priority: str = 'medium',
+        conn: Optional[asyncpg.Connection] = None
     ) -> bool:
         """
         Create a new inbox message for an application.
@@ -431,6 +484,8 @@ class InboxService:
             description: Message description
             message_type: Type of message
             priority: Message priority
+            conn: Connection of the caller's transaction; the message and the
+                role's inbox row are then written in that transaction
             
         Returns:
             True if message was created successfully
@@ -447,32 +502,30 @@ class InboxService:
         if priority not in self.VALID_PRIORITIES:
             raise ValueError(f"Invalid priority: {priority}")
 
-        pool = self._get_pool()
-        
-        query = """
-            INSERT INTO inbox_messages (
-                application_id, application_type, assigned_role, 
-                title, description, message_type, priority
-            )
-            VALUES ($1, $2, $3, $4, $5, $6, $7)
-            RETURNING id
-        """
-        
+        in_transaction = conn is not None
         try:
-            async with pool.acquire() as conn:
-                message_id = await conn.fetchval(
-                    query, 
-                    application_id, application_type, assigned_role,
+            if in_transaction:
+                message_id = await role_inbox.create_message(
+                    conn, application_id, application_type, assigned_role,
                     title, description, message_type, priority
                 )
+            else:
+                async with self._get_pool().acquire() as conn:
+                    message_id = await role_inbox.create_message(
+                        conn, application_id, application_type, assigned_role,
+                        title, description, message_type, priority
+                    )
                 
-                if message_id:
-                    logger.info(f"Created inbox message {message_id} for {application_type} {application_id} assigned to {assigned_role}")
-                    return True
-                
-                return False
+            if message_id:
+                logger.info(f"Created inbox message {message_id} for {application_type} {application_id} assigned to {assigned_role}")
+                return True
+            
+            return False
                 
         except Exception as e:
+            if in_transaction:
+                # Part of the caller's transaction: let it roll back as a whole
+                raise
             logger.error(f"Error creating inbox message: {str(e)}", exc_info=True)
             return False
 
@@ -489,16 +542,9 @@ class InboxService:
         """
         pool = self._get_pool()
         
-        query = """
-            UPDATE inbox_messages 
-            SET is_read = TRUE, updated_at = CURRENT_TIMESTAMP
-            WHERE id = $1
-            RETURNING id
-        """
-        
         try:
             async with pool.acquire() as conn:
-                result = await conn.fetchval(query, message_id)
+                result = await role_inbox.mark_message_read(conn, message_id)
                 
                 if result:
                     logger.info(f"Marked inbox message {message_id} as read by user {user_id}")
@@ -524,19 +570,11 @@ class InboxService:
         
         cutoff_date = datetime.now() - timedelta(days=days_old)
         
-        query = """
-            DELETE FROM inbox_messages 
-            WHERE is_read = TRUE 
-            AND updated_at < $1
-            AND message_type IN ('notification', 'reminder')
-        """
-        
         try:
             async with pool.acquire() as conn:
-                result = await conn.execute(query, cutoff_date)
-                
-                # Extract number of deleted rows from result
-                deleted_count = int(result.split()[-1]) if result and result.split() else 0
+                deleted_count = await role_inbox.delete_read_messages(
+                    conn, cutoff_date, ('notification', 'reminder')
+                )
                 
                 if deleted_count > 0:
                     logger.info(f"Cleaned up {deleted_count} old inbox messages")
@@ -549,29 +587,22 @@ class InboxService:
 
     async def get_unread_count(self, role: str) -> int:
         """
-        Get count of unread messages for a role.
+        Get count of applications with unread messages for a role.
         
         Args:
             role: Role to get unread count for
             
         Returns:
-            Number of unread messages
+            Number of unread applications in the role's inbox
         """
         if role not in self.VALID_ROLES:
             raise ValueError(f"Invalid role: {role}")
 
         pool = self._get_pool()
         
-        query = """
-            SELECT COUNT(*) 
-            FROM inbox_messages 
-            WHERE assigned_role = $1 AND is_read = FALSE
-        """
-        
         try:
             async with pool.acquire() as conn:
-                count = await conn.fetchval(query, role)
-                return count or 0
+                return await role_inbox.count_applications(conn, role, unread_only=True)
                 
         except Exception as e:
             logger.error(f"Error getting unread count for role {role}: {str(e)}", exc_info=True)
@@ -735,7 +766,7 @@ class ApplicationTransferService:
                     elif application_type == 'service_request':
                         update_query = """
                             UPDATE service_requests 
-                            SET role_current = $1, updated_at = CURRENT_TIMESTAMP
+                            SET role_current = $1, updated_at = CURRENT_TIMESTAMP, version = version + 1
                             WHERE id = $2
                             RETURNING id
                         """
@@ -771,34 +802,37 @@ class ApplicationTransferService:
                         title=f"Application transferred from {from_role}",
                         description=f"Application {application_id} has been transferred to your role",
                         message_type='transfer',
-                        priority='medium'
+                        priority='medium',
+                        conn=conn
                     )
                     
                     # Remove old inbox messages for the from_role (mark as read)
-                    cleanup_query = """
-                        UPDATE inbox_messages 
-                        SET is_read = TRUE, updated_at = CURRENT_TIMESTAMP
-                        WHERE application_id = $1 
-                        AND application_type = $2 
-                        AND assigned_role = $3
-                        AND is_read = FALSE
-                    """
+                    await role_inbox.mark_role_read(conn, application_id, application_type, from_role)
                     
-                    await conn.execute(cleanup_query, application_id, application_type, from_role)
+                    # Telegram notification for the target role commits with the transfer
+                    queued = await enqueue_for_role(
+                        conn, to_role,
+                        _role_notice('inbox.transfer', application_id, application_type, from_role),
+                        notification_type='transfer',
+                        request_id=application_id if application_type == 'service_request' else None
+                    )
                     
                     logger.info(f"Successfully transferred {application_type} {application_id} from {from_role} to {to_role} by user {user_id}")
                     
-                    return {
-                        'success': True,
-                        'transfer_id': transfer_id,
-                        'application_id': application_id,
-                        'application_type': application_type,
-                        'from_role': from_role,
-                        'to_role': to_role,
-                        'transferred_by': user_id,
-                        'transfer_reason': transfer_reason,
-                        'transfer_notes': transfer_notes
-                    }
+            if queued:
+                notification_outbox.wake()
+            
+            return {
+                'success': True,
+                'transfer_id': transfer_id,
+                'application_id': application_id,
+                'application_type': application_type,
+                'from_role': from_role,
+                'to_role': to_role,
+                'transferred_by': user_id,
+                'transfer_reason': transfer_reason,
+                'transfer_notes': transfer_notes
+            }
                     
         except Exception as e:
             logger.error(f"Error executing transfer: {str(e)}", exc_info=True)
@@ -933,17 +967,28 @@ class ApplicationTransferService:
             True if notification was sent successfully
         """
         try:
-            # This would integrate with the existing notification system
-            # For now, we create an inbox message
-            return await self.inbox_service.create_inbox_message(
-                application_id=application_id,
-                application_type=application_type,
-                assigned_role=to_role,
-                title=f"New {application_type} assigned",
-                description=f"You have been assigned {application_type} {application_id}",
-                message_type='notification',
-                priority='medium'
-            )
+            pool = self._get_pool()
+            async with pool.acquire() as conn:
+                created = await self.inbox_service.create_inbox_message(
+                    application_id=application_id,
+                    application_type=application_type,
+                    assigned_role=to_role,
+                    title=f"New {application_type} assigned",
+                    description=f"You have been assigned {application_type} {application_id}",
+                    message_type='notification',
+                    priority='medium',
+                    conn=conn
+                )
+                queued = await enqueue_for_role(
+                    conn, to_role,
+                    _role_notice('inbox.assigned', application_id, application_type),
+                    notification_type=notification_type,
+                    request_id=application_id if application_type == 'service_request' else None
+                )
+            if queued:
+                notification_outbox.wake()
+            
+            return created
             
         except Exception as e:
             logger.error(f"Error sending notification: {str(e)}", exc_info=True)
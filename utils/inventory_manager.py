@@ -19,6 +19,8 @@ from dataclasses import dataclass, field
 from enum import Enum
 import uuid
 
+from config import config
+from database import stock_alerts, stock_reservations
 from database.models import Material, Equipment
 
 
@@ -115,6 +117,51 @@ class StockAlert:
                 self.alert_message = f"LOW STOCK: {self.item_name} has {self.current_quantity} units (min: {self.min_quantity})"
 
 
+# Equipment lines are (material_id, quantity) arrays; lines for the same
+# material are summed so each material row is checked and updated once
+REQUESTED_LINES = """
+SELECT material_id, SUM(quantity)::int AS quantity
+FROM unnest($1::int[], $2::int[]) AS l(material_id, quantity)
+GROUP BY material_id
+"""
+
+AVAILABILITY_QUERY = f"""
+SELECT l.material_id, l.quantity, m.name, m.quantity_in_stock - m.reserved_quantity AS available_quantity
+FROM ({REQUESTED_LINES}) l
+LEFT JOIN materials m ON m.id = l.material_id AND m.is_active = true
+"""
+
+# Stock held for other requests is not consumed
+CONSUME_QUERY = f"""
+UPDATE materials m
+SET quantity_in_stock = m.quantity_in_stock - l.quantity,
+    updated_at = CURRENT_TIMESTAMP
+FROM ({REQUESTED_LINES}) l
+WHERE m.id = l.material_id AND m.quantity_in_stock - m.reserved_quantity >= l.quantity
+RETURNING m.id, m.name, m.quantity_in_stock
+"""
+
+TRANSACTION_COLUMNS = ('request_id', 'material_id', 'transaction_type', 'quantity',
+                       'performed_by', 'transaction_date', 'notes')
+
+
+def _equipment_arrays(equipment_list: List[Dict[str, Any]]) -> Tuple[List[int], List[int]]:
+    """material_id and quantity arrays of equipment lines"""
+    return ([equipment.get('material_id') for equipment in equipment_list],
+            [equipment.get('quantity', 1) for equipment in equipment_list])
+
+
+def _insert_transactions_query(count: int) -> str:
+    """A single INSERT of count inventory_transactions rows"""
+    width = len(TRANSACTION_COLUMNS)
+    rows = ', '.join(
+        '(' + ', '.join(f'${row * width + column + 1}' for column in range(width)) + ')'
+        for row in range(count)
+    )
+    return (f"INSERT INTO inventory_transactions ({', '.join(TRANSACTION_COLUMNS)}) "
+            f"VALUES {rows} RETURNING id")
+
+
 class InventoryManager:
     """
     Manages inventory operations for the enhanced workflow system.
@@ -125,15 +172,20 @@ class InventoryManager:
     
     def __init__(self):
         self.logger = logging.getLogger(__name__)
-        self._reserved_items: Dict[str, List[Dict]] = {}  # request_id -> list of reserved items
     
-    async def reserve_equipment(self, request_id: str, equipment_list: List[Dict[str, Any]]) -> bool:
+    async def reserve_equipment(self, request_id: str, equipment_list: List[Dict[str, Any]],
+                                ttl_seconds: Optional[int] = None) -> bool:
         """
         Reserve equipment for a specific request.
         
+        The stock is held in the reservation ledger until the request consumes
+        it, cancels the reservation or the hold expires. Reserving again for
+        the same request replaces its holds.
+        
         Args:
             request_id: The service request ID
             equipment_list: List of equipment items with 'material_id' and 'quantity'
+            ttl_seconds: How long the hold lasts (STOCK_RESERVATION_TTL_SECONDS by default)
         
         Returns:
             bool: True if reservation successful, False otherwise
@@ -143,48 +195,40 @@ class InventoryManager:
         try:
             from loader import bot
             pool = bot.db
+            expires_at = datetime.now().astimezone() + timedelta(
+                seconds=ttl_seconds or config.STOCK_RESERVATION_TTL_SECONDS)
             async with pool.acquire() as conn:
-                # Check availability for all items first
-                for equipment in equipment_list:
-                    material_id = equipment.get('material_id')
-                    quantity_needed = equipment.get('quantity', 1)
-                    
-                    # Get current stock
-                    stock_query = """
-                    SELECT quantity_in_stock, name FROM materials 
-                    WHERE id = $1 AND is_active = true
-                    """
-                    result = await conn.fetchrow(stock_query, material_id)
-                    
-                    if not result:
-                        self.logger.error(f"Material {material_id} not found or inactive")
-                        return False
-                    
-                    available_quantity = result['quantity_in_stock']
-                    if available_quantity < quantity_needed:
-                        self.logger.error(f"Insufficient stock for {result['name']}: need {quantity_needed}, have {available_quantity}")
-                        return False
-                
-                # Reserve all items
-                for equipment in equipment_list:
-                    material_id = equipment.get('material_id')
-                    quantity_needed = equipment.get('quantity', 1)
+                async with conn.transaction():
+                    await stock_reservations.release_request(conn, request_id)
                     
-                    # Create reservation transaction
-                    transaction = InventoryTransaction(
-                        request_id=request_id,
-                        material_id=material_id,
-                        transaction_type=TransactionType.RESERVE.value,
-                        quantity=quantity_needed,
-                        performed_by=equipment.get('performed_by'),
-                        transaction_date=datetime.now(),
-                        notes=f"Reserved for request {request_id}"
-                    )
+                    # Hold every line; stock already held for other requests is not available
+                    missing = await stock_reservations.hold(conn, request_id, equipment_list, expires_at)
+                    if missing:
+                        lines = await conn.fetch(AVAILABILITY_QUERY, *_equipment_arrays(equipment_list))
+                        for line in lines:
+                            if line['name'] is None:
+                                self.logger.error(f"Material {line['material_id']} not found or inactive")
+                            elif line['available_quantity'] < line['quantity']:
+                                self.logger.error(f"Insufficient stock for {line['name']}: need {line['quantity']}, "
+                                                  f"available {line['available_quantity']}")
+                        raise Exception(f"Cannot hold materials {missing}")
                     
-                    await self._log_transaction(transaction)
-                
-                # Store reservation in memory for tracking
-                self._reserved_items[request_id] = equipment_list
+                    # Log the reservation
+                    now = datetime.now()
+                    transactions = [
+                        InventoryTransaction(
+                            request_id=request_id,
+                            material_id=equipment.get('material_id'),
+                            transaction_type=TransactionType.RESERVE.value,
+                            quantity=equipment.get('quantity', 1),
+                            performed_by=equipment.get('performed_by'),
+                            transaction_date=now,
+                            notes=f"Reserved for request {request_id}"
+                        )
+                        for equipment in equipment_list
+                    ]
+                    if not await self._log_transactions(transactions, conn):
+                        raise Exception(f"Failed to log reservation for request {request_id}")
                 
                 self.logger.info(f"Successfully reserved equipment for request {request_id}")
                 return True
@@ -211,42 +255,38 @@ class InventoryManager:
             pool = bot.db
             async with pool.acquire() as conn:
                 async with conn.transaction():
-                    for equipment in equipment_used:
-                        material_id = equipment.get('material_id')
-                        quantity_used = equipment.get('quantity', 1)
-                        performed_by = equipment.get('performed_by')
-                        
-                        # Update inventory quantity
-                        update_query = """
-                        UPDATE materials 
-                        SET quantity_in_stock = quantity_in_stock - $1,
-                            updated_at = CURRENT_TIMESTAMP
-                        WHERE id = $2 AND quantity_in_stock >= $1
-                        RETURNING name, quantity_in_stock
-                        """
-                        result = await conn.fetchrow(update_query, quantity_used, material_id)
-                        
-                        if not result:
-                            raise Exception(f"Failed to consume material {material_id}: insufficient stock or item not found")
-                        
-                        # Log consumption transaction
-                        transaction = InventoryTransaction(
+                    # The request's own holds become consumable stock
+                    await stock_reservations.release_request(conn, request_id)
+                    
+                    # Update every material in one statement; a line that cannot be
+                    # covered fails the whole call
+                    material_ids, quantities = _equipment_arrays(equipment_used)
+                    results = await conn.fetch(CONSUME_QUERY, material_ids, quantities)
+                    missing = set(material_ids) - {row['id'] for row in results}
+                    if missing:
+                        raise Exception(f"Failed to consume materials {sorted(missing)}: "
+                                        f"insufficient stock or item not found")
+                    
+                    # Log consumption transactions
+                    now = datetime.now()
+                    transactions = [
+                        InventoryTransaction(
                             request_id=request_id,
-                            material_id=material_id,
+                            material_id=equipment.get('material_id'),
                             transaction_type=TransactionType.CONSUME.value,
-                            quantity=quantity_used,
-                            performed_by=performed_by,
-                            transaction_date=datetime.now(),
+                            quantity=equipment.get('quantity', 1),
+                            performed_by=equipment.get('performed_by'),
+                            transaction_date=now,
                             notes=f"Consumed for request {request_id}"
                         )
-                        
-                        await self._log_transaction(transaction)
-                        
-                        self.logger.info(f"Consumed {quantity_used} units of {result['name']} for request {request_id}")
-            
-            # Remove reservation if it exists
-            if request_id in self._reserved_items:
-                del self._reserved_items[request_id]
+                        for equipment in equipment_used
+                    ]
+                    if not await self._log_transactions(transactions, conn):
+                        raise Exception(f"Failed to log consumption for request {request_id}")
+                    
+                    for row in results:
+                        self.logger.info(f"Consumed {row['name']} for request {request_id}, "
+                                         f"{row['quantity_in_stock']} left")
             
             return True
             
@@ -273,7 +313,7 @@ class InventoryManager:
                 if equipment_type:
                     query = """
                     SELECT id, name, category, quantity_in_stock, min_quantity, 
-                           unit, location, supplier
+                           reserved_quantity, unit, location, supplier
                     FROM materials 
                     WHERE is_active = true AND category = $1
                     ORDER BY name
@@ -282,7 +322,7 @@ class InventoryManager:
                 else:
                     query = """
                     SELECT id, name, category, quantity_in_stock, min_quantity, 
-                           unit, location, supplier
+                           reserved_quantity, unit, location, supplier
                     FROM materials 
                     WHERE is_active = true
                     ORDER BY name
@@ -309,6 +349,7 @@ class InventoryManager:
                     location=row.get('location', ''),
                     supplier=row.get('supplier', '')
                 )
+                reserved = row.get('reserved_quantity') or 0
                 
                 stock_summary['items'].append({
                     'id': item.id,
@@ -318,6 +359,8 @@ class InventoryManager:
                     'min_quantity': item.min_quantity,
                     'stock_level': item.stock_level.value,
                     'is_low_stock': item.is_low_stock,
+                    'reserved_quantity': reserved,
+                    'available_quantity': item.quantity_in_stock - reserved,
                     'unit': item.unit,
                     'location': item.location
                 })
@@ -342,6 +385,9 @@ class InventoryManager:
         """
         Generate low stock alerts for warehouse.
         
+        Reads the low-stock set kept current by the materials trigger
+        (migration 027) instead of scanning every material.
+        
         Returns:
             List of StockAlert objects for items needing attention
             
@@ -351,38 +397,20 @@ class InventoryManager:
             from loader import bot
             pool = bot.db
             async with pool.acquire() as conn:
-                # Get items with low stock (at or below minimum quantity)
-                query = """
-                SELECT id, name, category, quantity_in_stock, min_quantity, location
-                FROM materials 
-                WHERE is_active = true AND quantity_in_stock <= min_quantity
-                ORDER BY (quantity_in_stock::float / NULLIF(min_quantity, 0)::float) ASC
-                """
-                results = await conn.fetch(query)
+                results = await stock_alerts.low_stock(conn)
             
-            alerts = []
-            for row in results:
-                item = InventoryItem(
-                    id=row['id'],
-                    name=row['name'],
-                    category=row['category'],
-                    quantity_in_stock=row['quantity_in_stock'],
+            alerts = [
+                StockAlert(
+                    item_id=row['id'],
+                    item_name=row['name'],
+                    current_quantity=row['quantity'],
                     min_quantity=row['min_quantity'],
-                    unit="",  # Not needed for alerts
-                    location=row.get('location', '')
-                )
-                
-                alert = StockAlert(
-                    item_id=item.id,
-                    item_name=item.name,
-                    current_quantity=item.quantity_in_stock,
-                    min_quantity=item.min_quantity,
-                    stock_level=item.stock_level,
-                    category=item.category,
-                    location=item.location
+                    stock_level=StockLevel(row['stock_level']),
+                    category=row['category'],
+                    location=row.get('location') or ''
                 )
-                
-                alerts.append(alert)
+                for row in results
+            ]
             
             self.logger.info(f"Generated {len(alerts)} stock alerts")
             return alerts
@@ -562,49 +590,62 @@ class InventoryManager:
             self.logger.error(f"Error getting inventory summary: {e}")
             return {}
     
-    async def _log_transaction(self, transaction: InventoryTransaction) -> bool:
+    async def _log_transaction(self, transaction: InventoryTransaction, conn=None) -> bool:
         """
         Log an inventory transaction to the database.
         
         Args:
             transaction: InventoryTransaction object to log
+            conn: Connection of the caller's database transaction, if any
         
         Returns:
             bool: True if logging successful
         """
-        try:
-            from loader import bot
-            pool = bot.db
-            async with pool.acquire() as conn:
-                query = """
-                INSERT INTO inventory_transactions 
-                (request_id, material_id, transaction_type, quantity, performed_by, transaction_date, notes)
-                VALUES ($1, $2, $3, $4, $5, $6, $7)
-                RETURNING id
-                """
-                
-                result = await conn.fetchrow(
-                    query,
-                    transaction.request_id,
-                    transaction.material_id,
-                    transaction.transaction_type,
-                    transaction.quantity,
-                    transaction.performed_by,
-                    transaction.transaction_date or datetime.now(),
-                    transaction.notes
-                )
-                
-                if result:
-                    transaction.id = result['id']
-                    return True
-                
+        return await self._log_transactions([transaction], conn)
+    
+    async def _log_transactions(self, transactions: List[InventoryTransaction], conn=None) -> bool:
+        """
+        Log inventory transactions with a single multi-row INSERT.
+        
+        Args:
+            transactions: InventoryTransaction objects to log; their ids are set
+            conn: Connection of the caller's database transaction; without one
+                a connection is acquired from the pool
+        
+        Returns:
+            bool: True if every transaction was logged
+        """
+        if not transactions:
+            return True
+        if conn is None:
+            try:
+                from loader import bot
+                async with bot.db.acquire() as conn:
+                    return await self._log_transactions(transactions, conn)
+            except Exception as e:
+                self.logger.error(f"Error logging transaction: {e}")
                 return False
-            
-        except Exception as e:
-            self.logger.error(f"Error logging transaction: {e}")
+        
+        values = []
+        for transaction in transactions:
+            values.extend((
+                transaction.request_id,
+                transaction.material_id,
+                transaction.transaction_type,
+                transaction.quantity,
+                transaction.performed_by,
+                transaction.transaction_date or datetime.now(),
+                transaction.notes
+            ))
+        results = await conn.fetch(_insert_transactions_query(len(transactions)), *values)
+        
+        if len(results) != len(transactions):
             return False
+        for transaction, row in zip(transactions, results):
+            transaction.id = row['id']
+        return True
     
-    def get_reserved_items(self, request_id: str) -> List[Dict[str, Any]]:
+    async def get_reserved_items(self, request_id: str) -> List[Dict[str, Any]]:
         """
         Get reserved items for a specific request.
         
@@ -612,9 +653,33 @@ class InventoryManager:
             request_id: The service request ID
         
         Returns:
-            List of reserved items
+            List of live holds with 'material_id', 'quantity', 'performed_by' and 'expires_at'
         """
-        return self._reserved_items.get(request_id, [])
+        try:
+            from loader import bot
+            async with bot.db.acquire() as conn:
+                return await stock_reservations.reserved_lines(conn, request_id)
+        except Exception as e:
+            self.logger.error(f"Error getting reserved items for request {request_id}: {e}")
+            return []
+    
+    async def get_available_to_promise(self, material_ids: List[int]) -> Dict[int, int]:
+        """
+        Quantity of each material that can still be reserved or consumed.
+        
+        Args:
+            material_ids: Materials to look up
+        
+        Returns:
+            Dict of material id -> quantity in stock minus quantity held
+        """
+        try:
+            from loader import bot
+            async with bot.db.acquire() as conn:
+                return await stock_reservations.available_to_promise(conn, material_ids)
+        except Exception as e:
+            self.logger.error(f"Error getting available stock: {e}")
+            return {}
     
     async def cancel_reservation(self, request_id: str) -> bool:
         """
@@ -627,30 +692,65 @@ class InventoryManager:
             bool: True if cancellation successful
         """
         try:
-            if request_id in self._reserved_items:
-                # Log cancellation transactions
-                for equipment in self._reserved_items[request_id]:
-                    transaction = InventoryTransaction(
-                        request_id=request_id,
-                        material_id=equipment.get('material_id'),
-                        transaction_type=TransactionType.RETURN.value,
-                        quantity=equipment.get('quantity', 1),
-                        performed_by=equipment.get('performed_by'),
-                        transaction_date=datetime.now(),
-                        notes=f"Reservation cancelled for request {request_id}"
-                    )
+            from loader import bot
+            async with bot.db.acquire() as conn:
+                async with conn.transaction():
+                    released = await stock_reservations.release_request(conn, request_id)
+                    if not released:
+                        return False
                     
-                    await self._log_transaction(transaction)
-                
-                del self._reserved_items[request_id]
-                self.logger.info(f"Cancelled reservation for request {request_id}")
-                return True
+                    # Log cancellation transactions
+                    await self._log_transactions(self._return_transactions(released, "Reservation cancelled"), conn)
             
-            return False
+            self.logger.info(f"Cancelled reservation for request {request_id}")
+            return True
             
         except Exception as e:
             self.logger.error(f"Error cancelling reservation for request {request_id}: {e}")
             return False
+    
+    async def release_expired_reservations(self, batch_size: int = 500) -> int:
+        """
+        Release holds past their expiry and log them as returned.
+        
+        Args:
+            batch_size: Holds released per transaction
+        
+        Returns:
+            int: Number of holds released
+        """
+        from loader import bot
+        released_total = 0
+        while True:
+            async with bot.db.acquire() as conn:
+                async with conn.transaction():
+                    released = await stock_reservations.release_expired(conn, batch_size)
+                    if released:
+                        await self._log_transactions(self._return_transactions(released, "Reservation expired"), conn)
+            released_total += len(released)
+            if len(released) < batch_size:
+                break
+        
+        if released_total:
+            self.logger.info(f"Released {released_total} expired stock reservations")
+        return released_total
+    
+    @staticmethod
+    def _return_transactions(released: List[Dict[str, Any]], reason: str) -> List[InventoryTransaction]:
+        """RETURN transactions for released holds, noted as '<reason> for request <id>'"""
+        now = datetime.now()
+        return [
+            InventoryTransaction(
+                request_id=line['request_id'],
+                material_id=line['material_id'],
+                transaction_type=TransactionType.RETURN.value,
+                quantity=line['quantity'],
+                performed_by=line['performed_by'],
+                transaction_date=now,
+                notes=f"{reason} for request {line['request_id']}"
+            )
+            for line in released
+        ]
 
 
 # Global inventory manager instance
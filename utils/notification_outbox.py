@@ -0,0 +1,303 @@
+"""
+Durable outbound Telegram message queue (outbox) on top of notification_queue.
+
+Producers render their messages and ``enqueue`` them with the connection of
+the transaction that makes the state change, so a message exists if and
+only if the change committed. Worker tasks claim due rows in batches with
+``FOR UPDATE SKIP LOCKED`` (any number of workers or bot processes can run
+side by side), send them through the rate-limited ``TelegramFanout`` with no
+connection held, and record each row's outcome. Failed rows are retried
+individually with exponential backoff until ``max_attempts``; a row whose
+worker died mid-send is picked up again when its lease expires.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from aiogram.types import InlineKeyboardMarkup, ReplyKeyboardMarkup
+
+from config import config
+from database.jsonb import dumps, load_json
+from utils.logger import setup_module_logger
+from utils.telegram_fanout import DeliveryResult, OutgoingMessage, TelegramFanout, telegram_fanout
+
+logger = setup_module_logger("notification_outbox")
+
+
+@dataclass
+class OutboxMessage:
+    """A rendered message for one recipient (user_id is users.id, chat_id the Telegram chat)"""
+    user_id: Optional[int]
+    chat_id: int
+    text: str
+    reply_markup: Any = None
+    parse_mode: Optional[str] = 'HTML'
+    notification_type: str = 'notification'
+    request_id: Optional[str] = None
+    zayavka_id: Optional[int] = None
+
+
+def _dump_markup(markup: Any) -> Optional[str]:
+    if markup is None:
+        return None
+    if hasattr(markup, 'model_dump_json'):
+        return markup.model_dump_json(exclude_none=True)
+    return dumps(markup)
+
+
+def _load_markup(value: Any):
+    data = load_json(value, None)
+    if not data:
+        return None
+    if 'inline_keyboard' in data:
+        return InlineKeyboardMarkup.model_validate(data)
+    if 'keyboard' in data:
+        return ReplyKeyboardMarkup.model_validate(data)
+    return data
+
+
+async def enqueue(conn, messages: Iterable[OutboxMessage], max_attempts: Optional[int] = None) -> List[int]:
+    """Insert messages into the outbox with one statement; call inside the producer's transaction"""
+    messages = list(messages)
+    if not messages:
+        return []
+    return [row['id'] for row in await conn.fetch(
+        """
+        INSERT INTO notification_queue (
+            user_id, chat_id, message, reply_markup, parse_mode, notification_type,
+            request_id, zayavka_id, max_attempts
+        )
+        SELECT m.user_id, m.chat_id, m.message, m.reply_markup::jsonb, m.parse_mode,
+               m.notification_type, m.request_id, m.zayavka_id, $9
+        FROM unnest(
+            $1::integer[], $2::bigint[], $3::text[], $4::text[], $5::varchar[],
+            $6::varchar[], $7::varchar[], $8::integer[]
+        ) AS m(user_id, chat_id, message, reply_markup, parse_mode, notification_type, request_id, zayavka_id)
+        RETURNING id
+        """,
+        [m.user_id for m in messages],
+        [m.chat_id for m in messages],
+        [m.text for m in messages],
+        [_dump_markup(m.reply_markup) for m in messages],
+        [m.parse_mode for m in messages],
+        [m.notification_type for m in messages],
+        [m.request_id for m in messages],
+        [m.zayavka_id for m in messages],
+        max_attempts or config.OUTBOX_MAX_ATTEMPTS
+    )]
+
+
+async def enqueue_for_role(conn, role: str, render: Callable[[Any], Tuple[str, Any]],
+                           notification_type: str = 'notification', request_id: Optional[str] = None,
+                           zayavka_id: Optional[int] = None) -> List[int]:
+    """
+    Render and enqueue a message for every active user of a role.
+
+    ``render(user)`` gets a users row (id, telegram_id, full_name, language)
+    and returns ``(text, reply_markup)``.
+    """
+    users = await conn.fetch(
+        """
+        SELECT id, telegram_id, full_name, language
+        FROM users
+        WHERE role = $1 AND telegram_id IS NOT NULL AND is_active = true
+        """,
+        role
+    )
+    messages = []
+    for user in users:
+        text, markup = render(user)
+        messages.append(OutboxMessage(
+            user_id=user['id'], chat_id=user['telegram_id'], text=text, reply_markup=markup,
+            notification_type=notification_type, request_id=request_id, zayavka_id=zayavka_id
+        ))
+    return await enqueue(conn, messages)
+
+
+CLAIM_QUERY = """
+WITH due AS (
+    SELECT id
+    FROM notification_queue
+    WHERE (status = 'pending' AND next_attempt_at <= NOW())
+       OR (status = 'sending' AND locked_until < NOW())
+    ORDER BY next_attempt_at, id
+    LIMIT $1
+    FOR UPDATE SKIP LOCKED
+)
+UPDATE notification_queue q
+SET status = 'sending',
+    attempts = q.attempts + 1,
+    locked_until = NOW() + make_interval(secs => $2)
+FROM due
+WHERE q.id = due.id
+RETURNING q.id, q.user_id, q.chat_id, q.message, q.reply_markup, q.parse_mode, q.attempts, q.max_attempts
+"""
+
+MARK_SENT_QUERY = """
+UPDATE notification_queue q
+SET status = 'sent', sent = TRUE, sent_at = NOW(), message_id = r.message_id,
+    locked_until = NULL, last_error = NULL
+FROM unnest($1::integer[], $2::bigint[]) AS r(id, message_id)
+WHERE q.id = r.id
+"""
+
+MARK_RETRY_QUERY = """
+UPDATE notification_queue q
+SET status = 'pending', locked_until = NULL, last_error = r.error,
+    next_attempt_at = NOW() + make_interval(secs => LEAST($3 * power(2, q.attempts - 1), $4))
+FROM unnest($1::integer[], $2::text[]) AS r(id, error)
+WHERE q.id = r.id
+"""
+
+MARK_FAILED_QUERY = """
+UPDATE notification_queue q
+SET status = 'failed', locked_until = NULL, last_error = r.error
+FROM unnest($1::integer[], $2::text[]) AS r(id, error)
+WHERE q.id = r.id
+"""
+
+
+class NotificationOutbox:
+    """Background workers that drain notification_queue"""
+
+    def __init__(self, pool=None, fanout: Optional[TelegramFanout] = None, workers: Optional[int] = None,
+                 batch_size: Optional[int] = None, poll_interval_ms: Optional[int] = None,
+                 lease_seconds: Optional[int] = None):
+        self.pool = pool
+        # Transient failures are retried by the outbox, so the sender itself retries only once
+        self.fanout = fanout or TelegramFanout(max_retries=1, bucket=telegram_fanout.bucket)
+        self.workers = workers or config.OUTBOX_WORKERS
+        self.batch_size = batch_size or config.OUTBOX_BATCH_SIZE
+        self.poll_interval = (poll_interval_ms or config.OUTBOX_POLL_INTERVAL_MS) / 1000
+        self.lease_seconds = lease_seconds or config.OUTBOX_LEASE_SECONDS
+        self.retry_base_seconds = config.OUTBOX_RETRY_BASE_SECONDS
+        self.retry_max_seconds = config.OUTBOX_RETRY_MAX_SECONDS
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+        self.claimed = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    def _get_pool(self):
+        """Get database pool"""
+        if self.pool:
+            return self.pool
+        try:
+            from loader import bot
+            return bot.db
+        except ImportError:
+            return None
+
+    def start(self) -> None:
+        """Start the worker tasks on the running loop"""
+        if any(not task.done() for task in self._tasks):
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run(i)) for i in range(self.workers)]
+        logger.info(f"Notification outbox started with {self.workers} workers")
+
+    def wake(self) -> None:
+        """Let idle workers look for work now (call after committing enqueued messages)"""
+        self._wakeup.set()
+
+    async def stop(self) -> None:
+        """Stop the workers; rows being sent stay leased and are retried after the lease expires"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info(f"Notification outbox stopped: {self.get_stats()}")
+
+    async def _run(self, worker: int) -> None:
+        while True:
+            try:
+                processed = await self.process_batch()
+            except Exception as e:
+                logger.error(f"Outbox worker {worker} error: {str(e)}", exc_info=True)
+                processed = 0
+            if processed >= self.batch_size:
+                continue  # more rows are probably due
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def process_batch(self) -> int:
+        """Claim, send and settle one batch of due messages; returns the number claimed"""
+        pool = self._get_pool()
+        if pool is None:
+            return 0
+
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                rows = await conn.fetch(CLAIM_QUERY, self.batch_size, self.lease_seconds)
+        if not rows:
+            return 0
+        self.claimed += len(rows)
+
+        results = await self.fanout.send_many(
+            OutgoingMessage(
+                chat_id=row['chat_id'], text=row['message'], reply_markup=_load_markup(row['reply_markup']),
+                parse_mode=row['parse_mode'], recipient_id=row['id']
+            )
+            for row in rows
+        )
+        await self._settle(pool, rows, results)
+        return len(rows)
+
+    async def _settle(self, pool, rows, results: List[DeliveryResult]) -> None:
+        sent, retry, failed = ([], []), ([], []), ([], [])
+        for row, result in zip(rows, results):
+            if result.ok:
+                sent[0].append(row['id'])
+                sent[1].append(result.message_id)
+            elif result.retryable and row['attempts'] < row['max_attempts']:
+                retry[0].append(row['id'])
+                retry[1].append(result.error)
+            else:
+                failed[0].append(row['id'])
+                failed[1].append(result.error)
+
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                if sent[0]:
+                    await conn.execute(MARK_SENT_QUERY, *sent)
+                if retry[0]:
+                    await conn.execute(MARK_RETRY_QUERY, *retry, self.retry_base_seconds, self.retry_max_seconds)
+                if failed[0]:
+                    await conn.execute(MARK_FAILED_QUERY, *failed)
+
+        self.sent += len(sent[0])
+        self.retried += len(retry[0])
+        self.failed += len(failed[0])
+        if failed[0]:
+            logger.warning(f"Outbox gave up on {len(failed[0])} messages: {failed[1][0]}")
+
+    async def get_queue_stats(self) -> Dict[str, int]:
+        """Count outbox rows by status"""
+        pool = self._get_pool()
+        try:
+            rows = await pool.fetch("SELECT status, COUNT(*) AS count FROM notification_queue GROUP BY status")
+            return {row['status']: row['count'] for row in rows}
+        except Exception as e:
+            logger.error(f"Error getting outbox stats: {str(e)}")
+            return {}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get worker statistics"""
+        return {
+            'workers': len([task for task in self._tasks if not task.done()]),
+            'claimed': self.claimed,
+            'sent': self.sent,
+            'retried': self.retried,
+            'failed': self.failed,
+            'fanout': self.fanout.get_stats(),
+        }
+
+
+# Global instance started in loader.on_startup
+notification_outbox = NotificationOutbox()
@@ -6,12 +6,16 @@ Provides single notification delivery with reply button handling for viewing all
 import json
 import uuid
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from abc import ABC, abstractmethod
 
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from database.models import UserRole, ServiceRequest
 from utils.logger import setup_module_logger
+from utils.notification_outbox import OutboxMessage, enqueue as outbox_enqueue, notification_outbox
+from utils.notification_templates import (
+    SERVICE_NAMES, STAFF_NOTIFICATION_TEMPLATES, WORKFLOW_NAMES, TemplateRegistry, template_registry
+)
 
 logger = setup_module_logger("notification_system")
 
@@ -68,8 +72,9 @@ class PendingNotification:
 class NotificationSystem(NotificationInterface):
     """Universal notification system implementation"""
     
-    def __init__(self, pool=None):
+    def __init__(self, pool=None, templates: Optional[TemplateRegistry] = None):
         self.pool = pool
+        self.templates = templates or template_registry
         # Exclude client and admin roles from notification system as per requirements
         self.excluded_roles = {UserRole.CLIENT.value, UserRole.ADMIN.value}
         
@@ -92,207 +97,12 @@ class NotificationSystem(NotificationInterface):
         """Generate unique notification ID"""
         return str(uuid.uuid4())
     
-    def _load_staff_notification_templates(self) -> Dict[str, Dict[str, Dict[str, str]]]:
+    def _load_staff_notification_templates(self) -> Dict[str, Dict[str, Dict[str, Dict[str, str]]]]:
         """Load notification templates for staff-created applications"""
-        return {
-            'client_notification': {
-                'uz': {
-                    'connection_request': {
-                        'title': '📋 Sizning nomingizdan ariza yaratildi',
-                        'body': (
-                            "Hurmatli {client_name},\n\n"
-                            "Sizning nomingizdan ulanish uchun ariza yaratildi.\n\n"
-                            "📋 Ariza turi: Ulanish so'rovi\n"
-                            "📝 Tavsif: {description}\n"
-                            "📍 Manzil: {location}\n"
-                            "👤 Yaratuvchi: {creator_role}\n"
-                            "📅 Yaratilgan vaqt: {created_at}\n"
-                            "🆔 Ariza ID: {request_id}\n\n"
-                            "Ariza holati haqida xabardor bo'lib turasiz."
-                        ),
-                        'button': '📋 Arizani ko\'rish'
-                    },
-                    'technical_service': {
-                        'title': '🔧 Sizning nomingizdan texnik xizmat arizasi yaratildi',
-                        'body': (
-                            "Hurmatli {client_name},\n\n"
-                            "Sizning nomingizdan texnik xizmat arizasi yaratildi.\n\n"
-                            "📋 Ariza turi: Texnik xizmat\n"
-                            "📝 Tavsif: {description}\n"
-                            "📍 Manzil: {location}\n"
-                            "👤 Yaratuvchi: {creator_role}\n"
-                            "📅 Yaratilgan vaqt: {created_at}\n"
-                            "🆔 Ariza ID: {request_id}\n\n"
-                            "Ariza holati haqida xabardor bo'lib turasiz."
-                        ),
-                        'button': '🔧 Arizani ko\'rish'
-                    }
-                },
-                'ru': {
-                    'connection_request': {
-                        'title': '📋 Заявка создана от вашего имени',
-                        'body': (
-                            "Уважаемый(ая) {client_name},\n\n"
-                            "От вашего имени создана заявка на подключение.\n\n"
-                            "📋 Тип заявки: Запрос подключения\n"
-                            "📝 Описание: {description}\n"
-                            "📍 Адрес: {location}\n"
-                            "👤 Создатель: {creator_role}\n"
-                            "📅 Время создания: {created_at}\n"
-                            "🆔 ID заявки: {request_id}\n\n"
-                            "Вы будете уведомлены о статусе заявки."
-                        ),
-                        'button': '📋 Просмотр заявки'
-                    },
-                    'technical_service': {
-                        'title': '🔧 Заявка на техническое обслуживание создана от вашего имени',
-                        'body': (
-                            "Уважаемый(ая) {client_name},\n\n"
-                            "От вашего имени создана заявка на техническое обслуживание.\n\n"
-                            "📋 Тип заявки: Техническое обслуживание\n"
-                            "📝 Описание: {description}\n"
-                            "📍 Адрес: {location}\n"
-                            "👤 Создатель: {creator_role}\n"
-                            "📅 Время создания: {created_at}\n"
-                            "🆔 ID заявки: {request_id}\n\n"
-                            "Вы будете уведомлены о статусе заявки."
-                        ),
-                        'button': '🔧 Просмотр заявки'
-                    }
-                }
-            },
-            'staff_confirmation': {
-                'uz': {
-                    'connection_request': {
-                        'title': '✅ Ulanish arizasi muvaffaqiyatli yaratildi',
-                        'body': (
-                            "Ariza muvaffaqiyatli yaratildi va ishlov berishga yuborildi.\n\n"
-                            "📋 Ariza turi: Ulanish so'rovi\n"
-                            "👤 Mijoz: {client_name}\n"
-                            "📝 Tavsif: {description}\n"
-                            "📍 Manzil: {location}\n"
-                            "🆔 Ariza ID: {request_id}\n"
-                            "📅 Yaratilgan: {created_at}\n\n"
-                            "Mijoz xabardor qilindi va ariza ish jarayoniga kiritildi."
-                        ),
-                        'button': '📋 Arizani kuzatish'
-                    },
-                    'technical_service': {
-                        'title': '✅ Texnik xizmat arizasi muvaffaqiyatli yaratildi',
-                        'body': (
-                            "Ariza muvaffaqiyatli yaratildi va ishlov berishga yuborildi.\n\n"
-                            "📋 Ariza turi: Texnik xizmat\n"
-                            "👤 Mijoz: {client_name}\n"
-                            "📝 Tavsif: {description}\n"
-                            "📍 Manzil: {location}\n"
-                            "🆔 Ariza ID: {request_id}\n"
-                            "📅 Yaratilgan: {created_at}\n\n"
-                            "Mijoz xabardor qilindi va ariza ish jarayoniga kiritildi."
-                        ),
-                        'button': '🔧 Arizani kuzatish'
-                    }
-                },
-                'ru': {
-                    'connection_request': {
-                        'title': '✅ Заявка на подключение успешно создана',
-                        'body': (
-                            "Заявка успешно создана и отправлена на обработку.\n\n"
-                            "📋 Тип заявки: Запрос подключения\n"
-                            "👤 Клиент: {client_name}\n"
-                            "📝 Описание: {description}\n"
-                            "📍 Адрес: {location}\n"
-                            "🆔 ID заявки: {request_id}\n"
-                            "📅 Создано: {created_at}\n\n"
-                            "Клиент уведомлен и заявка передана в работу."
-                        ),
-                        'button': '📋 Отслеживать заявку'
-                    },
-                    'technical_service': {
-                        'title': '✅ Заявка на техническое обслуживание успешно создана',
-                        'body': (
-                            "Заявка успешно создана и отправлена на обработку.\n\n"
-                            "📋 Тип заявки: Техническое обслуживание\n"
-                            "👤 Клиент: {client_name}\n"
-                            "📝 Описание: {description}\n"
-                            "📍 Адрес: {location}\n"
-                            "🆔 ID заявки: {request_id}\n"
-                            "📅 Создано: {created_at}\n\n"
-                            "Клиент уведомлен и заявка передана в работу."
-                        ),
-                        'button': '🔧 Отслеживать заявку'
-                    }
-                }
-            },
-            'workflow_participant': {
-                'uz': {
-                    'connection_request': {
-                        'title': '🔔 Xodim tomonidan yaratilgan yangi ariza',
-                        'body': (
-                            "Xodim tomonidan yangi ulanish arizasi yaratildi.\n\n"
-                            "📋 Ariza turi: Ulanish so'rovi\n"
-                            "👤 Mijoz: {client_name}\n"
-                            "📝 Tavsif: {description}\n"
-                            "📍 Manzil: {location}\n"
-                            "👤 Yaratuvchi: {creator_role}\n"
-                            "🆔 Ariza ID: {request_id}\n"
-                            "📅 Yaratilgan: {created_at}\n\n"
-                            "Ariza sizga tayinlandi."
-                        ),
-                        'button': '📋 Arizani ko\'rib chiqish'
-                    },
-                    'technical_service': {
-                        'title': '🔔 Xodim tomonidan yaratilgan yangi texnik ariza',
-                        'body': (
-                            "Xodim tomonidan yangi texnik xizmat arizasi yaratildi.\n\n"
-                            "📋 Ariza turi: Texnik xizmat\n"
-                            "👤 Mijoz: {client_name}\n"
-                            "📝 Tavsif: {description}\n"
-                            "📍 Manzil: {location}\n"
-                            "👤 Yaratuvchi: {creator_role}\n"
-                            "🆔 Ariza ID: {request_id}\n"
-                            "📅 Yaratilgan: {created_at}\n\n"
-                            "Ariza sizga tayinlandi."
-                        ),
-                        'button': '🔧 Arizani ko\'rib chiqish'
-                    }
-                },
-                'ru': {
-                    'connection_request': {
-                        'title': '🔔 Новая заявка создана сотрудником',
-                        'body': (
-                            "Сотрудником создана новая заявка на подключение.\n\n"
-                            "📋 Тип заявки: Запрос подключения\n"
-                            "👤 Клиент: {client_name}\n"
-                            "📝 Описание: {description}\n"
-                            "📍 Адрес: {location}\n"
-                            "👤 Создатель: {creator_role}\n"
-                            "🆔 ID заявки: {request_id}\n"
-                            "📅 Создано: {created_at}\n\n"
-                            "Заявка назначена вам."
-                        ),
-                        'button': '📋 Рассмотреть заявку'
-                    },
-                    'technical_service': {
-                        'title': '🔔 Новая техническая заявка создана сотрудником',
-                        'body': (
-                            "Сотрудником создана новая заявка на техническое обслуживание.\n\n"
-                            "📋 Тип заявки: Техническое обслуживание\n"
-                            "👤 Клиент: {client_name}\n"
-                            "📝 Описание: {description}\n"
-                            "📍 Адрес: {location}\n"
-                            "👤 Создатель: {creator_role}\n"
-                            "🆔 ID заявки: {request_id}\n"
-                            "📅 Создано: {created_at}\n\n"
-                            "Заявка назначена вам."
-                        ),
-                        'button': '🔧 Рассмотреть заявку'
-                    }
-                }
-            }
-        }
+        return STAFF_NOTIFICATION_TEMPLATES
     
     async def send_assignment_notification(self, role: str, request_id: str, workflow_type: str) -> bool:
-        """Sends single notification with reply button to all users with specified role"""
+        """Queues single notification with reply button for all users with specified role"""
         # Exclude client and admin roles from notification system
         if role in self.excluded_roles:
             logger.info(f"Skipping notification for excluded role: {role}")
@@ -305,71 +115,126 @@ class NotificationSystem(NotificationInterface):
         
         try:
             async with pool.acquire() as conn:
-                # Get all users with the specified role who have telegram_id
-                users_query = """
-                SELECT id, telegram_id, full_name, language
-                FROM users 
-                WHERE role = $1 AND telegram_id IS NOT NULL AND is_active = true
-                """
-                
-                users = await conn.fetch(users_query, role)
-                
-                if not users:
-                    logger.warning(f"No active users found for role: {role}")
-                    return False
-                
-                # Get request details for notification content
-                request_query = """
-                SELECT description, priority, created_at
-                FROM service_requests
-                WHERE id = $1
-                """
-                
-                request_row = await conn.fetchrow(request_query, request_id)
-                if not request_row:
-                    logger.error(f"Request {request_id} not found")
-                    return False
-                
-                sent_count = 0
-                
-                for user in users:
-                    try:
-                        # Create notification record
-                        notification_id = self._generate_notification_id()
-                        
-                        await conn.execute(
-                            """
-                            INSERT INTO pending_notifications 
-                            (id, user_id, request_id, workflow_type, role, created_at, is_handled)
-                            VALUES ($1, $2, $3, $4, $5, $6, $7)
-                            """,
-                            notification_id,
-                            user['id'],
-                            request_id,
-                            workflow_type,
-                            role,
-                            datetime.now(),
-                            False
-                        )
-                        
-                        # Send notification message
-                        await self._send_notification_message(
-                            user, request_id, workflow_type, request_row, notification_id
-                        )
-                        
-                        sent_count += 1
-                        logger.info(f"Sent notification to user {user['id']} for request {request_id}")
-                        
-                    except Exception as e:
-                        logger.error(f"Failed to send notification to user {user['id']}: {e}")
-                        continue
-                
-                logger.info(f"Sent {sent_count} notifications for request {request_id} to role {role}")
-                return sent_count > 0
-                
+                async with conn.transaction():
+                    queued = await self.enqueue_assignment_notification(conn, role, request_id, workflow_type)
         except Exception as e:
             logger.error(f"Error sending assignment notification: {e}", exc_info=True)
             return False
+        
+        if queued:
+            notification_outbox.wake()
+        return queued > 0
+    
+    async def enqueue_assignment_notification(self, conn, role: str, request_id: str, workflow_type: str) -> int:
+        """
+        Records the assignment notification for every active user of a role and
+        queues the messages in the outbox, using the caller's connection.
+        
+        Run it inside the transaction that assigns the request, so the messages
+        are sent if and only if the assignment commits. Returns the number queued.
+        """
+        if role in self.excluded_roles:
+            return 0
+        
+        recorded = await self._record_assignment(conn, role, request_id, workflow_type)
+        if not recorded:
+            return 0
+        
+        users, request_row, notification_ids = recorded
+        messages = []
+        rendered = {}  # the text only differs by language, render it once per language
+        for user, notification_id in zip(users, notification_ids):
+            text, keyboard = self._build_notification_message(
+                user, request_id, workflow_type, request_row, notification_id, rendered
+            )
+            messages.append(OutboxMessage(
+                user_id=user['id'], chat_id=user['telegram_id'], text=text, reply_markup=keyboard,
+                notification_type='assignment', request_id=request_id
+            ))
+        
+        await outbox_enqueue(conn, messages)
+        logger.info(f"Queued {len(messages)} notifications for request {request_id} to role {role}")
+        return len(messages)
+    
+    async def _record_assignment(self, conn, role: str, request_id: str, workflow_type: str):
+        """Insert pending_notifications rows for a role's active users in one statement"""
+        # Get all users with the specified role who have telegram_id
+        users_query = """
+        SELECT id, telegram_id, full_name, language
+        FROM users 
+        WHERE role = $1 AND telegram_id IS NOT NULL AND is_active = true
+        """
+        
+        users = await conn.fetch(users_query, role)
+        
+        if not users:
+            logger.warning(f"No active users found for role: {role}")
+            return None
+        
+        # Get request details for notification content
+        request_query = """
+        SELECT description, priority, created_at
+        FROM service_requests
+        WHERE id = $1
+        """
+        
+        request_row = await conn.fetchrow(request_query, request_id)
+        if not request_row:
+            logger.error(f"Request {request_id} not found")
+            return None
+        
+        notification_ids = [self._generate_notification_id() for _ in users]
+        await conn.execute(
+            """
+            INSERT INTO pending_notifications 
+            (id, user_id, request_id, workflow_type, role, created_at, is_handled)
+            SELECT n.id, n.user_id, $3, $4, $5, $6, FALSE
+            FROM unnest($1::varchar[], $2::integer[]) AS n(id, user_id)
+            """,
+            notification_ids,
+            [user['id'] for user in users],
+            request_id,
+            workflow_type,
+            role,
+            datetime.now()
+        )
+        return users, request_row, notification_ids
+    
+    def _build_notification_message(self, user: Dict[str, Any], request_id: str, workflow_type: str,
+                                    request_data: Dict[str, Any], notification_id: str,
+                                    rendered: Optional[Dict[str, Tuple[str, str]]] = None):
+        """
+        Build assignment notification text and reply keyboard for a user.
+        
+        ``rendered`` caches (text, button text) per language across the users of one request.
+        """
+        lang = user.get('language', 'ru')
+        
+        cached = rendered.get(lang) if rendered is not None else None
+        if cached is None:
+            cached = (
+                self.templates.render(
+                    'assignment', lang,
+                    static={'workflow_name': WORKFLOW_NAMES.get(lang, WORKFLOW_NAMES['ru']).get(workflow_type, workflow_type)},
+                    description=(request_data['description'] or '')[:100],
+                    priority=request_data['priority'],
+                    created_at=request_data['created_at'].strftime('%d.%m.%Y %H:%M')
+                ),
+                self.templates.render('assignment.button', lang)
+            )
+            if rendered is not None:
+                rendered[lang] = cached
+        notification_text, button_text = cached
+        
+        # Create reply button
+        keyboard = InlineKeyboardMarkup(inline_keyboard=[
+            [InlineKeyboardButton(
+                text=button_text,
+                callback_data=f"view_assignments_{notification_id}"
+            )]
+        ])
+        
+        return notification_text, keyboard
     
     async def _send_notification_message(self, user: Dict[str, Any], request_id: str, 
                                        workflow_type: str, request_data: Dict[str, Any], 
@@ -378,53 +243,9 @@ class NotificationSystem(NotificationInterface):
         try:
             from loader import bot
             
-            lang = user.get('language', 'ru')
-            
-            # Create notification text based on language
-            if lang == 'uz':
-                title = "🔔 Yangi topshiriq"
-                workflow_names = {
-                    'connection_request': 'Ulanish so\'rovi',
-                    'technical_service': 'Texnik xizmat',
-                    'call_center_direct': 'Call-markaz xizmati'
-                }
-                workflow_name = workflow_names.get(workflow_type, workflow_type)
-                
-                notification_text = (
-                    f"{title}\n\n"
-                    f"📋 Tur: {workflow_name}\n"
-                    f"📝 Tavsif: {request_data['description'][:100]}...\n"
-                    f"⚡ Muhimlik: {request_data['priority']}\n"
-                    f"📅 Yaratilgan: {request_data['created_at'].strftime('%d.%m.%Y %H:%M')}\n\n"
-                    f"Barcha topshiriqlarni ko'rish uchun tugmani bosing:"
-                )
-                button_text = "📋 Topshiriqlarni ko'rish"
-            else:
-                title = "🔔 Новое задание"
-                workflow_names = {
-                    'connection_request': 'Запрос подключения',
-                    'technical_service': 'Техническое обслуживание',
-                    'call_center_direct': 'Сервис call-центра'
-                }
-                workflow_name = workflow_names.get(workflow_type, workflow_type)
-                
-                notification_text = (
-                    f"{title}\n\n"
-                    f"📋 Тип: {workflow_name}\n"
-                    f"📝 Описание: {request_data['description'][:100]}...\n"
-                    f"⚡ Приоритет: {request_data['priority']}\n"
-                    f"📅 Создано: {request_data['created_at'].strftime('%d.%m.%Y %H:%M')}\n\n"
-                    f"Нажмите кнопку для просмотра всех заданий:"
-                )
-                button_text = "📋 Просмотр заданий"
-            
-            # Create reply button
-            keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                [InlineKeyboardButton(
-                    text=button_text,
-                    callback_data=f"view_assignments_{notification_id}"
-                )]
-            ])
+            notification_text, keyboard = self._build_notification_message(
+                user, request_id, workflow_type, request_data, notification_id
+            )
             
             await bot.send_message(
                 chat_id=user['telegram_id'],
@@ -490,43 +311,14 @@ class NotificationSystem(NotificationInterface):
             
             lang = user.get('language', 'ru')
             
-            # Create completion notification text based on language
-            if lang == 'uz':
-                title = "✅ Xizmat yakunlandi!"
-                workflow_names = {
-                    'connection_request': 'Ulanish xizmati',
-                    'technical_service': 'Texnik xizmat',
-                    'call_center_direct': 'Call-markaz xizmati'
-                }
-                workflow_name = workflow_names.get(workflow_type, workflow_type)
-                
-                notification_text = (
-                    f"{title}\n\n"
-                    f"📋 Tur: {workflow_name}\n"
-                    f"📝 Tavsif: {request_data['description'][:100]}...\n"
-                    f"📅 Yaratilgan: {request_data['created_at'].strftime('%d.%m.%Y %H:%M')}\n"
-                    f"🆔 Ariza ID: {request_id[:8]}\n\n"
-                    f"Xizmat sifatini baholang:"
-                )
-                button_text = "⭐ Baholash"
-            else:
-                title = "✅ Услуга завершена!"
-                workflow_names = {
-                    'connection_request': 'Услуга подключения',
-                    'technical_service': 'Техническое обслуживание',
-                    'call_center_direct': 'Сервис call-центра'
-                }
-                workflow_name = workflow_names.get(workflow_type, workflow_type)
-                
-                notification_text = (
-                    f"{title}\n\n"
-                    f"📋 Тип: {workflow_name}\n"
-                    f"📝 Описание: {request_data['description'][:100]}...\n"
-                    f"📅 Создано: {request_data['created_at'].strftime('%d.%m.%Y %H:%M')}\n"
-                    f"🆔 ID заявки: {request_id[:8]}\n\n"
-                    f"Оцените качество обслуживания:"
-                )
-                button_text = "⭐ Оценить"
+            notification_text = self.templates.render(
+                'completion', lang,
+                static={'workflow_name': SERVICE_NAMES.get(lang, SERVICE_NAMES['ru']).get(workflow_type, workflow_type)},
+                description=request_data['description'][:100],
+                created_at=request_data['created_at'].strftime('%d.%m.%Y %H:%M'),
+                request_id=request_id[:8]
+            )
+            button_text = self.templates.render('completion.button', lang)
             
             # Create rating button
             keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -602,14 +394,15 @@ class NotificationSystem(NotificationInterface):
             lang = user.get('language', 'ru')
             
             # Get template based on workflow type and language
-            template_key = 'connection_request' if workflow_type == 'connection_request' else 'technical_service'
-            template = self.staff_notification_templates['client_notification'][lang][template_key]
+            workflow_key = 'connection_request' if workflow_type == 'connection_request' else 'technical_service'
+            template_key = f"client_notification.{workflow_key}"
             
             # Format creator role for display
             creator_role_display = self._format_creator_role(creator_role, lang)
             
             # Format notification text
-            notification_text = template['body'].format(
+            notification_text = self.templates.render(
+                f"{template_key}.body", lang,
                 client_name=user['full_name'],
                 description=request_data.get('description', '')[:100],
                 location=request_data.get('location', ''),
@@ -621,7 +414,7 @@ class NotificationSystem(NotificationInterface):
             # Create view button
             keyboard = InlineKeyboardMarkup(inline_keyboard=[
                 [InlineKeyboardButton(
-                    text=template['button'],
+                    text=self.templates.render(f"{template_key}.button", lang),
                     callback_data=f"view_staff_created_{request_id}"
                 )]
             ])
@@ -682,11 +475,12 @@ class NotificationSystem(NotificationInterface):
             lang = user.get('language', 'ru')
             
             # Get template based on workflow type and language
-            template_key = 'connection_request' if workflow_type == 'connection_request' else 'technical_service'
-            template = self.staff_notification_templates['staff_confirmation'][lang][template_key]
+            workflow_key = 'connection_request' if workflow_type == 'connection_request' else 'technical_service'
+            template_key = f"staff_confirmation.{workflow_key}"
             
             # Format notification text
-            notification_text = template['body'].format(
+            notification_text = self.templates.render(
+                f"{template_key}.body", lang,
                 client_name=client_name,
                 description=request_data.get('description', '')[:100],
                 location=request_data.get('location', ''),
@@ -697,7 +491,7 @@ class NotificationSystem(NotificationInterface):
             # Create tracking button
             keyboard = InlineKeyboardMarkup(inline_keyboard=[
                 [InlineKeyboardButton(
-                    text=template['button'],
+                    text=self.templates.render(f"{template_key}.button", lang),
                     callback_data=f"track_staff_created_{request_id}"
                 )]
             ])
@@ -795,14 +589,15 @@ class NotificationSystem(NotificationInterface):
             lang = user.get('language', 'ru')
             
             # Get template based on workflow type and language
-            template_key = 'connection_request' if workflow_type == 'connection_request' else 'technical_service'
-            template = self.staff_notification_templates['workflow_participant'][lang][template_key]
+            workflow_key = 'connection_request' if workflow_type == 'connection_request' else 'technical_service'
+            template_key = f"workflow_participant.{workflow_key}"
             
             # Format creator role for display
             creator_role_display = self._format_creator_role(creator_role, lang)
             
             # Format notification text
-            notification_text = template['body'].format(
+            notification_text = self.templates.render(
+                f"{template_key}.body", lang,
                 client_name=client_name,
                 description=request_data.get('description', '')[:100],
                 location=request_data.get('location', ''),
@@ -814,7 +609,7 @@ class NotificationSystem(NotificationInterface):
             # Create view assignments button (reuse existing functionality)
             keyboard = InlineKeyboardMarkup(inline_keyboard=[
                 [InlineKeyboardButton(
-                    text=template['button'],
+                    text=self.templates.render(f"{template_key}.button", lang),
                     callback_data=f"view_assignments_{notification_id}"
                 )]
             ])
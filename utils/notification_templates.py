@@ -0,0 +1,437 @@
+"""
+Notification template registry.
+
+Templates are ``str.format`` strings keyed by ``(key, language)`` and
+rendered with ``str.format_map``. Built-in templates are parsed once
+at import, rows of the notification_templates
+table are loaded over them at startup (``load``) and replaced one by one
+when an admin edits them (``set``), so nothing is rebuilt per message.
+
+Values that are the same for many messages (e.g. the workflow name) can be
+passed as ``static``: the template with those fields substituted is cached
+per ``(key, language, static)`` and only the personal fields are formatted
+for each recipient.
+"""
+
+import string
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from utils.logger import setup_module_logger
+
+logger = setup_module_logger("notification_templates")
+
+_FORMATTER = string.Formatter()
+
+STAFF_NOTIFICATION_TEMPLATES: Dict[str, Dict[str, Dict[str, Dict[str, str]]]] = {
+    'client_notification': {
+        'uz': {
+            'connection_request': {
+                'title': '📋 Sizning nomingizdan ariza yaratildi',
+                'body': (
+                    "Hurmatli {client_name},\n\n"
+                    "Sizning nomingizdan ulanish uchun ariza yaratildi.\n\n"
+                    "📋 Ariza turi: Ulanish so'rovi\n"
+                    "📝 Tavsif: {description}\n"
+                    "📍 Manzil: {location}\n"
+                    "👤 Yaratuvchi: {creator_role}\n"
+                    "📅 Yaratilgan vaqt: {created_at}\n"
+                    "🆔 Ariza ID: {request_id}\n\n"
+                    "Ariza holati haqida xabardor bo'lib turasiz."
+                ),
+                'button': '📋 Arizani ko\'rish'
+            },
+            'technical_service': {
+                'title': '🔧 Sizning nomingizdan texnik xizmat arizasi yaratildi',
+                'body': (
+                    "Hurmatli {client_name},\n\n"
+                    "Sizning nomingizdan texnik xizmat arizasi yaratildi.\n\n"
+                    "📋 Ariza turi: Texnik xizmat\n"
+                    "📝 Tavsif: {description}\n"
+                    "📍 Manzil: {location}\n"
+                    "👤 Yaratuvchi: {creator_role}\n"
+                    "📅 Yaratilgan vaqt: {created_at}\n"
+                    "🆔 Ariza ID: {request_id}\n\n"
+                    "Ariza holati haqida xabardor bo'lib turasiz."
+                ),
+                'button': '🔧 Arizani ko\'rish'
+            }
+        },
+        'ru': {
+            'connection_request': {
+                'title': '📋 Заявка создана от вашего имени',
+                'body': (
+                    "Уважаемый(ая) {client_name},\n\n"
+                    "От вашего имени создана заявка на подключение.\n\n"
+                    "📋 Тип заявки: Запрос подключения\n"
+                    "📝 Описание: {description}\n"
+                    "📍 Адрес: {location}\n"
+                    "👤 Создатель: {creator_role}\n"
+                    "📅 Время создания: {created_at}\n"
+                    "🆔 ID заявки: {request_id}\n\n"
+                    "Вы будете уведомлены о статусе заявки."
+                ),
+                'button': '📋 Просмотр заявки'
+            },
+            'technical_service': {
+                'title': '🔧 Заявка на техническое обслуживание создана от вашего имени',
+                'body': (
+                    "Уважаемый(ая) {client_name},\n\n"
+                    "От вашего имени создана заявка на техническое обслуживание.\n\n"
+                    "📋 Тип заявки: Техническое обслуживание\n"
+                    "📝 Описание: {description}\n"
+                    "📍 Адрес: {location}\n"
+                    "👤 Создатель: {creator_role}\n"
+                    "📅 Время создания: {created_at}\n"
+                    "🆔 ID заявки: {request_id}\n\n"
+                    "Вы будете уведомлены о статусе заявки."
+                ),
+                'button': '🔧 Просмотр заявки'
+            }
+        }
+    },
+    'staff_confirmation': {
+        'uz': {
+            'connection_request': {
+                'title': '✅ Ulanish arizasi muvaffaqiyatli yaratildi',
+                'body': (
+                    "Ariza muvaffaqiyatli yaratildi va ishlov berishga yuborildi.\n\n"
+                    "📋 Ariza turi: Ulanish so'rovi\n"
+                    "👤 Mijoz: {client_name}\n"
+                    "📝 Tavsif: {description}\n"
+                    "📍 Manzil: {location}\n"
+                    "🆔 Ariza ID: {request_id}\n"
+                    "📅 Yaratilgan: {created_at}\n\n"
+                    "Mijoz xabardor qilindi va ariza ish jarayoniga kiritildi."
+                ),
+                'button': '📋 Arizani kuzatish'
+            },
+            'technical_service': {
+                'title': '✅ Texnik xizmat arizasi muvaffaqiyatli yaratildi',
+                'body': (
+                    "Ariza muvaffaqiyatli yaratildi va ishlov berishga yuborildi.\n\n"
+                    "📋 Ariza turi: Texnik xizmat\n"
+                    "👤 Mijoz: {client_name}\n"
+                    "📝 Tavsif: {description}\n"
+                    "📍 Manzil: {location}\n"
+                    "🆔 Ariza ID: {request_id}\n"
+                    "📅 Yaratilgan: {created_at}\n\n"
+                    "Mijoz xabardor qilindi va ariza ish jarayoniga kiritildi."
+                ),
+                'button': '🔧 Arizani kuzatish'
+            }
+        },
+        'ru': {
+            'connection_request': {
+                'title': '✅ Заявка на подключение успешно создана',
+                'body': (
+                    "Заявка успешно создана и отправлена на обработку.\n\n"
+                    "📋 Тип заявки: Запрос подключения\n"
+                    "👤 Клиент: {client_name}\n"
+                    "📝 Описание: {description}\n"
+                    "📍 Адрес: {location}\n"
+                    "🆔 ID заявки: {request_id}\n"
+                    "📅 Создано: {created_at}\n\n"
+                    "Клиент уведомлен и заявка передана в работу."
+                ),
+                'button': '📋 Отслеживать заявку'
+            },
+            'technical_service': {
+                'title': '✅ Заявка на техническое обслуживание успешно создана',
+                'body': (
+                    "Заявка успешно создана и отправлена на обработку.\n\n"
+                    "📋 Тип заявки: Техническое обслуживание\n"
+                    "👤 Клиент: {client_name}\n"
+                    "📝 Описание: {description}\n"
+                    "📍 Адрес: {location}\n"
+                    "🆔 ID заявки: {request_id}\n"
+                    "📅 Создано: {created_at}\n\n"
+                    "Клиент уведомлен и заявка передана в работу."
+                ),
+                'button': '🔧 Отслеживать заявку'
+            }
+        }
+    },
+    'workflow_participant': {
+        'uz': {
+            'connection_request': {
+                'title': '🔔 Xodim tomonidan yaratilgan yangi ariza',
+                'body': (
+                    "Xodim tomonidan yangi ulanish arizasi yaratildi.\n\n"
+                    "📋 Ariza turi: Ulanish so'rovi\n"
+                    "👤 Mijoz: {client_name}\n"
+                    "📝 Tavsif: {description}\n"
+                    "📍 Manzil: {location}\n"
+                    "👤 Yaratuvchi: {creator_role}\n"
+                    "🆔 Ariza ID: {request_id}\n"
+                    "📅 Yaratilgan: {created_at}\n\n"
+                    "Ariza sizga tayinlandi."
+                ),
+                'button': '📋 Arizani ko\'rib chiqish'
+            },
+            'technical_service': {
+                'title': '🔔 Xodim tomonidan yaratilgan yangi texnik ariza',
+                'body': (
+                    "Xodim tomonidan yangi texnik xizmat arizasi yaratildi.\n\n"
+                    "📋 Ariza turi: Texnik xizmat\n"
+                    "👤 Mijoz: {client_name}\n"
+                    "📝 Tavsif: {description}\n"
+                    "📍 Manzil: {location}\n"
+                    "👤 Yaratuvchi: {creator_role}\n"
+                    "🆔 Ariza ID: {request_id}\n"
+                    "📅 Yaratilgan: {created_at}\n\n"
+                    "Ariza sizga tayinlandi."
+                ),
+                'button': '🔧 Arizani ko\'rib chiqish'
+            }
+        },
+        'ru': {
+            'connection_request': {
+                'title': '🔔 Новая заявка создана сотрудником',
+                'body': (
+                    "Сотрудником создана новая заявка на подключение.\n\n"
+                    "📋 Тип заявки: Запрос подключения\n"
+                    "👤 Клиент: {client_name}\n"
+                    "📝 Описание: {description}\n"
+                    "📍 Адрес: {location}\n"
+                    "👤 Создатель: {creator_role}\n"
+                    "🆔 ID заявки: {request_id}\n"
+                    "📅 Создано: {created_at}\n\n"
+                    "Заявка назначена вам."
+                ),
+                'button': '📋 Рассмотреть заявку'
+            },
+            'technical_service': {
+                'title': '🔔 Новая техническая заявка создана сотрудником',
+                'body': (
+                    "Сотрудником создана новая заявка на техническое обслуживание.\n\n"
+                    "📋 Тип заявки: Техническое обслуживание\n"
+                    "👤 Клиент: {client_name}\n"
+                    "📝 Описание: {description}\n"
+                    "📍 Адрес: {location}\n"
+                    "👤 Создатель: {creator_role}\n"
+                    "🆔 ID заявки: {request_id}\n"
+                    "📅 Создано: {created_at}\n\n"
+                    "Заявка назначена вам."
+                ),
+                'button': '🔧 Рассмотреть заявку'
+            }
+        }
+    }
+}
+
+
+WORKFLOW_NAMES: Dict[str, Dict[str, str]] = {
+    'uz': {
+        'connection_request': 'Ulanish so\'rovi',
+        'technical_service': 'Texnik xizmat',
+        'call_center_direct': 'Call-markaz xizmati'
+    },
+    'ru': {
+        'connection_request': 'Запрос подключения',
+        'technical_service': 'Техническое обслуживание',
+        'call_center_direct': 'Сервис call-центра'
+    }
+}
+
+SERVICE_NAMES: Dict[str, Dict[str, str]] = {
+    'uz': {
+        'connection_request': 'Ulanish xizmati',
+        'technical_service': 'Texnik xizmat',
+        'call_center_direct': 'Call-markaz xizmati'
+    },
+    'ru': {
+        'connection_request': 'Услуга подключения',
+        'technical_service': 'Техническое обслуживание',
+        'call_center_direct': 'Сервис call-центра'
+    }
+}
+
+APPLICATION_TYPE_NAMES: Dict[str, Dict[str, str]] = {
+    'uz': {
+        'zayavka': 'Ariza',
+        'service_request': "Xizmat so'rovi"
+    },
+    'ru': {
+        'zayavka': 'Заявка',
+        'service_request': 'Сервисная заявка'
+    }
+}
+
+BUILTIN_TEMPLATES: Dict[Tuple[str, str], str] = {
+    ('assignment', 'uz'): (
+        "🔔 Yangi topshiriq\n\n"
+        "📋 Tur: {workflow_name}\n"
+        "📝 Tavsif: {description}...\n"
+        "⚡ Muhimlik: {priority}\n"
+        "📅 Yaratilgan: {created_at}\n\n"
+        "Barcha topshiriqlarni ko'rish uchun tugmani bosing:"
+    ),
+    ('assignment', 'ru'): (
+        "🔔 Новое задание\n\n"
+        "📋 Тип: {workflow_name}\n"
+        "📝 Описание: {description}...\n"
+        "⚡ Приоритет: {priority}\n"
+        "📅 Создано: {created_at}\n\n"
+        "Нажмите кнопку для просмотра всех заданий:"
+    ),
+    ('assignment.button', 'uz'): "📋 Topshiriqlarni ko'rish",
+    ('assignment.button', 'ru'): "📋 Просмотр заданий",
+    ('completion', 'uz'): (
+        "✅ Xizmat yakunlandi!\n\n"
+        "📋 Tur: {workflow_name}\n"
+        "📝 Tavsif: {description}...\n"
+        "📅 Yaratilgan: {created_at}\n"
+        "🆔 Ariza ID: {request_id}\n\n"
+        "Xizmat sifatini baholang:"
+    ),
+    ('completion', 'ru'): (
+        "✅ Услуга завершена!\n\n"
+        "📋 Тип: {workflow_name}\n"
+        "📝 Описание: {description}...\n"
+        "📅 Создано: {created_at}\n"
+        "🆔 ID заявки: {request_id}\n\n"
+        "Оцените качество обслуживания:"
+    ),
+    ('completion.button', 'uz'): "⭐ Baholash",
+    ('completion.button', 'ru'): "⭐ Оценить",
+    ('inbox.transfer', 'uz'): "📥 {application_type} {application_id} sizga {from_role} rolidan o'tkazildi",
+    ('inbox.transfer', 'ru'): "📥 {application_type} {application_id} передана вам из роли «{from_role}»",
+    ('inbox.assigned', 'uz'): "📥 Sizga tayinlandi: {application_type} {application_id}",
+    ('inbox.assigned', 'ru'): "📥 Вам назначено: {application_type} {application_id}",
+}
+
+# Staff templates are addressed as '<group>.<workflow>.<part>', e.g. 'client_notification.technical_service.body'
+BUILTIN_TEMPLATES.update(
+    ((f"{group}.{workflow}.{part}", language), source)
+    for group, languages in STAFF_NOTIFICATION_TEMPLATES.items()
+    for language, workflows in languages.items()
+    for workflow, parts in workflows.items()
+    for part, source in parts.items()
+)
+
+
+def _escape(text: str) -> str:
+    return text.replace('{', '{{').replace('}', '}}')
+
+
+class _BlankMissing(dict):
+    """Format values where missing fields render as empty strings"""
+
+    def __missing__(self, key):
+        return ''
+
+
+class CompiledTemplate:
+    """A parsed ``str.format`` template"""
+
+    __slots__ = ('source', 'fields', '_render')
+
+    def __init__(self, source: str):
+        fields = set()
+        for _, name, _, _ in _FORMATTER.parse(source):  # raises ValueError for unbalanced braces
+            if name is None:
+                continue
+            if not name or name[0].isdigit():
+                raise ValueError(f"Positional field in template: {source!r}")
+            fields.add(name.split('.', 1)[0].split('[', 1)[0])
+        self.source = source
+        self.fields = frozenset(fields)
+        self._render = source.format_map
+
+    def render(self, values: Mapping[str, Any]) -> str:
+        try:
+            return self._render(values)
+        except KeyError:
+            return self.source.format_map(_BlankMissing(values))
+
+    def bind(self, static: Mapping[str, Any]) -> 'CompiledTemplate':
+        """Substitute the fields present in ``static`` and keep the rest as fields"""
+        parts = []
+        for literal, name, spec, conversion in _FORMATTER.parse(self.source):
+            parts.append(_escape(literal))
+            if name is None:
+                continue
+            if name.split('.', 1)[0].split('[', 1)[0] in static:
+                value = _FORMATTER.convert_field(_FORMATTER.get_field(name, (), static)[0], conversion)
+                parts.append(_escape(_FORMATTER.format_field(value, spec)))
+            else:
+                parts.append('{' + name + ('!' + conversion if conversion else '') + (':' + spec if spec else '') + '}')
+        return CompiledTemplate(''.join(parts))
+
+
+class TemplateRegistry:
+    """Parsed notification templates keyed by (key, language)"""
+
+    def __init__(self, pool=None, default_language: str = 'ru'):
+        self.pool = pool
+        self.default_language = default_language
+        self._templates: Dict[Tuple[str, str], CompiledTemplate] = {}
+        self._bound: Dict[Tuple, CompiledTemplate] = {}
+        self.version = 0
+        self.loaded_from_db = 0
+        for (key, language), source in BUILTIN_TEMPLATES.items():
+            self.set(key, language, source)
+
+    def _get_pool(self):
+        """Get database pool"""
+        if self.pool:
+            return self.pool
+        from loader import bot
+        return bot.db
+
+    def set(self, key: str, language: str, source: str) -> CompiledTemplate:
+        """Parse and (re)place a template; cached variants of it are dropped"""
+        try:
+            template = CompiledTemplate(source)
+        except ValueError as e:
+            # An admin-edited text with stray braces is sent verbatim rather than failing every send
+            logger.warning(f"Template {key}/{language} is not a valid format string, using it as plain text: {e}")
+            template = CompiledTemplate(_escape(source))
+        self._templates[(key, language)] = template
+        self._bound = {cache_key: bound for cache_key, bound in self._bound.items() if cache_key[0] != key}
+        self.version += 1
+        return template
+
+    def get(self, key: str, language: str) -> CompiledTemplate:
+        """Template for a language, falling back to the default language; KeyError if unknown"""
+        template = self._templates.get((key, language))
+        if template is None:
+            template = self._templates[(key, self.default_language)]
+        return template
+
+    def render(self, key: str, language: str, static: Optional[Mapping[str, Any]] = None, **values) -> str:
+        """Render a template; ``static`` values are substituted once and cached"""
+        if not static:
+            return self.get(key, language).render(values)
+        cache_key = (key, language, tuple(static.items()))
+        template = self._bound.get(cache_key)
+        if template is None:
+            template = self._bound[cache_key] = self.get(key, language).bind(static)
+        return template.render(values)
+
+    async def load(self, pool=None) -> int:
+        """Load notification_templates rows over the built-in templates; returns the number loaded"""
+        try:
+            pool = pool or self._get_pool()
+            rows = await pool.fetch("SELECT template_type, language, content FROM notification_templates")
+        except Exception as e:
+            logger.error(f"Error loading notification templates: {str(e)}")
+            return 0
+        for row in rows:
+            self.set(row['template_type'], row['language'], row['content'])
+        self.loaded_from_db = len(rows)
+        logger.info(f"Loaded {len(rows)} notification templates from the database")
+        return len(rows)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get registry statistics"""
+        return {
+            'templates': len(self._templates),
+            'cached_variants': len(self._bound),
+            'loaded_from_db': self.loaded_from_db,
+            'version': self.version,
+        }
+
+
+# Global instance, loaded from the database in loader.initialize_workflow_system
+template_registry = TemplateRegistry()
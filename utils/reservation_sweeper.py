@@ -0,0 +1,81 @@
+"""
+Background release of expired stock reservations.
+
+Every ``STOCK_RESERVATION_SWEEP_SECONDS`` the sweeper asks the inventory
+manager to release holds whose ``expires_at`` has passed, which returns
+their quantities to available stock and logs them as returned. Several bot
+processes may sweep at once; each skips the holds another is releasing.
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from config import config
+from utils.inventory_manager import InventoryManager, inventory_manager
+from utils.logger import setup_module_logger
+
+logger = setup_module_logger("reservation_sweeper")
+
+
+class StockReservationSweeper:
+    """Periodic release of stock_reservations past their expiry"""
+
+    def __init__(self, manager: Optional[InventoryManager] = None, interval_seconds: Optional[int] = None,
+                 batch_size: int = 500):
+        self.manager = manager or inventory_manager
+        self.interval = interval_seconds or config.STOCK_RESERVATION_SWEEP_SECONDS
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+        self.runs = 0
+        self.failed_runs = 0
+        self.released = 0
+        self.last_run_at: Optional[datetime] = None
+
+    def start(self) -> None:
+        """Start the sweep loop on the running loop"""
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Stock reservation sweeper started, every {self.interval}s")
+
+    async def stop(self) -> None:
+        """Stop the sweep loop; an interrupted batch rolls back and is released next time"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        logger.info(f"Stock reservation sweeper stopped: {self.get_stats()}")
+
+    async def _run(self) -> None:
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> int:
+        """Release every expired hold; returns the number released"""
+        try:
+            released = await self.manager.release_expired_reservations(self.batch_size)
+        except Exception as e:
+            self.failed_runs += 1
+            logger.error(f"Error releasing expired stock reservations: {str(e)}", exc_info=True)
+            released = 0
+        self.runs += 1
+        self.released += released
+        self.last_run_at = datetime.utcnow()
+        return released
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get sweeper statistics"""
+        return {
+            'running': self._task is not None and not self._task.done(),
+            'runs': self.runs,
+            'failed_runs': self.failed_runs,
+            'released': self.released,
+            'last_run_at': self.last_run_at.isoformat() if self.last_run_at else None,
+        }
+
+
+# Global instance started in loader.on_startup
+stock_reservation_sweeper = StockReservationSweeper()
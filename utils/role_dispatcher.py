@@ -1,5 +1,7 @@
 from aiogram import Dispatcher, Router
-from typing import Dict, List
+from aiogram.dispatcher.event.bases import UNHANDLED, SkipHandler
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set, Tuple
+from filters.role_filter import RoleFilter
 from utils.logger import setup_logger
 
 logger = setup_logger('bot.role_dispatcher')
@@ -44,3 +46,216 @@ def get_role_router(role: str):
     if global_role_dispatcher is None:
         raise RuntimeError("Global RoleAwareDispatcher is not set.")
     return global_role_dispatcher.get_role_router(role)
+
+
+# Event types compiled into the dispatch table and the attribute their key is read from
+DISPATCH_EVENT_KEYS = {
+    'message': 'text',
+    'callback_query': 'data',
+}
+
+
+def get_router_role(router: Router) -> Optional[str]:
+    """Get the role a router is bound to by its root RoleFilter, if any"""
+    for event_type in DISPATCH_EVENT_KEYS:
+        observer = router.observers.get(event_type)
+        for filter_obj in (observer._handler.filters or []) if observer else []:
+            if isinstance(filter_obj.callback, RoleFilter):
+                return filter_obj.callback.role
+    return None
+
+
+def _handler_keys(handler, attribute: str) -> Optional[Tuple[Set[str], Set[str]]]:
+    """
+    Extract (exact values, prefixes) a handler matches on ``attribute``.
+
+    Only understands ``F.<attr> == x``, ``F.<attr>.in_([...])`` and
+    ``F.<attr>.startswith(x)``; returns None for any other handler.
+    """
+    for filter_obj in handler.filters or []:
+        magic = getattr(filter_obj, 'magic', None)
+        operations = getattr(magic, '_operations', ())
+        if not operations or getattr(operations[0], 'name', None) != attribute:
+            continue
+        rest = operations[1:]
+        if len(rest) == 1 and type(rest[0]).__name__ == 'ComparatorOperation':
+            if rest[0].comparator.__name__ == 'eq' and isinstance(rest[0].right, str):
+                return {rest[0].right}, set()
+        elif len(rest) == 1 and type(rest[0]).__name__ == 'FunctionOperation':
+            values = rest[0].args[0] if rest[0].args else None
+            if rest[0].function.__name__ == 'in_op' and isinstance(values, (list, tuple, set, frozenset)):
+                if all(isinstance(value, str) for value in values):
+                    return set(values), set()
+        elif (len(rest) == 2 and getattr(rest[0], 'name', None) == 'startswith'
+              and type(rest[1]).__name__ == 'CallOperation' and rest[1].args):
+            prefixes = rest[1].args[0]
+            prefixes = (prefixes,) if isinstance(prefixes, str) else prefixes
+            if isinstance(prefixes, tuple) and all(isinstance(p, str) for p in prefixes):
+                return set(), set(prefixes)
+    return None
+
+
+class DispatchEntry(NamedTuple):
+    """A compiled handler: routers from the role router down to it, its observer and the handler"""
+    chain: Tuple[Router, ...]
+    observer: Any
+    handler: Any
+
+
+class RoleDispatchTable:
+    """
+    Lookup table from (role, event type, text / callback prefix) to handlers.
+
+    Compiled once at startup from the role routers' handler filters. An
+    update whose text or callback data is in the table goes straight to the
+    handlers that can match it, in the same order aiogram would try them,
+    without probing the other role routers or the rest of the role's
+    handlers. Handlers whose filters cannot be compiled (FSM states, lambdas,
+    content types) are kept as candidates for every key so their precedence
+    is preserved; events with no compiled key take the normal aiogram route.
+    """
+
+    def __init__(self):
+        self.role_routers: Dict[str, Router] = {}
+        self._entries: Dict[Tuple[str, str], List[DispatchEntry]] = {}
+        self._exact: Dict[Tuple[str, str], Dict[str, List[int]]] = {}
+        self._prefixes: Dict[Tuple[str, str], Dict[str, List[int]]] = {}
+        self._prefix_lengths: Dict[Tuple[str, str], Tuple[int, ...]] = {}
+        self._dynamic: Dict[Tuple[str, str], List[int]] = {}
+        self._candidates: Dict[Tuple[Any, ...], Tuple[DispatchEntry, ...]] = {}
+        self.dynamic_handlers = 0
+
+    @classmethod
+    def from_dispatcher(cls, dispatcher: Router) -> 'RoleDispatchTable':
+        """
+        Compile the role routers included in ``dispatcher``.
+
+        Only the leading run of role routers is compiled: sending an event to
+        one of them first gives the same result as aiogram's own order, since
+        every router before it is bound to another role.
+        """
+        table = cls()
+        for router in dispatcher.sub_routers:
+            role = get_router_role(router)
+            if role is None:
+                break
+            if role not in table.role_routers:
+                table.add_role_router(role, router)
+        return table
+
+    def add_role_router(self, role: str, router: Router) -> None:
+        """Compile all handlers reachable in a role router tree"""
+        self.role_routers[role] = router
+        for event_type, attribute in DISPATCH_EVENT_KEYS.items():
+            table_key = (role, event_type)
+            entries = list(self._iter_entries(router, (router,), role, event_type))
+            if any(router_.observers[event_type].outer_middleware
+                   for entry in entries for router_ in entry.chain):
+                # Router-level outer middlewares would be skipped by direct dispatch
+                logger.warning(f"Not compiling {event_type} handlers of role {role}: router outer middleware")
+                continue
+            exact: Dict[str, List[int]] = {}
+            prefixes: Dict[str, List[int]] = {}
+            dynamic: List[int] = []
+            for index, entry in enumerate(entries):
+                keys = _handler_keys(entry.handler, attribute)
+                if keys is None:
+                    dynamic.append(index)
+                    continue
+                for value in keys[0]:
+                    exact.setdefault(value, []).append(index)
+                for prefix in keys[1]:
+                    prefixes.setdefault(prefix, []).append(index)
+            self._entries[table_key] = entries
+            self._exact[table_key] = exact
+            self._prefixes[table_key] = prefixes
+            self._prefix_lengths[table_key] = tuple(sorted({len(prefix) for prefix in prefixes}, reverse=True))
+            self._dynamic[table_key] = dynamic
+            self.dynamic_handlers += len(dynamic)
+        self._candidates.clear()
+        logger.info(f"Compiled dispatch table for role: {role}")
+
+    def _iter_entries(self, router: Router, chain: Tuple[Router, ...], role: str,
+                      event_type: str) -> Iterable[DispatchEntry]:
+        # Same depth-first order as Router.propagate_event: own handlers, then sub-routers
+        observer = router.observers.get(event_type)
+        if observer:
+            for handler in observer.handlers:
+                yield DispatchEntry(chain, observer, handler)
+        for sub_router in router.sub_routers:
+            sub_role = get_router_role(sub_router)
+            if sub_role is not None and sub_role != role:
+                continue  # unreachable: the parent's RoleFilter already rejected other roles
+            yield from self._iter_entries(sub_router, chain + (sub_router,), role, event_type)
+
+    def lookup(self, role: str, event_type: str, key: Optional[str]) -> Optional[Tuple[DispatchEntry, ...]]:
+        """Get the handlers that may handle this text / callback data, in dispatch order"""
+        table_key = (role, event_type)
+        if not key or table_key not in self._entries:
+            return None
+        exact_key = key if key in self._exact[table_key] else None
+        prefixes = self._prefixes[table_key]
+        matched = tuple(
+            key[:length] for length in self._prefix_lengths[table_key]
+            if key[:length] in prefixes
+        )
+        if exact_key is None and not matched:
+            return None
+
+        cache_key = (role, event_type, exact_key, matched)
+        candidates = self._candidates.get(cache_key)
+        if candidates is None:
+            indexes = set(self._dynamic[table_key])
+            if exact_key is not None:
+                indexes.update(self._exact[table_key][exact_key])
+            for prefix in matched:
+                indexes.update(prefixes[prefix])
+            entries = self._entries[table_key]
+            candidates = self._candidates[cache_key] = tuple(entries[i] for i in sorted(indexes))
+        return candidates
+
+    async def dispatch(self, candidates: Tuple[DispatchEntry, ...], event: Any, data: Dict[str, Any]) -> Any:
+        """
+        Run the first matching candidate handler, like TelegramEventObserver.trigger.
+
+        Root filters of each router on the way are checked once per event;
+        inner middlewares are resolved from the router chain as usual.
+        Returns UNHANDLED when no candidate accepts the event.
+        """
+        checked: Dict[int, Tuple[bool, Dict[str, Any]]] = {}
+        for entry in candidates:
+            kwargs = data
+            passed = True
+            for router in entry.chain:
+                result = checked.get(id(router))
+                if result is None:
+                    router_kwargs = dict(kwargs, event_router=router)
+                    observer = router.observers[entry.observer.event_name]
+                    result = checked[id(router)] = await observer.check_root_filters(event, **router_kwargs)
+                passed, kwargs = result
+                if not passed:
+                    break
+            if not passed:
+                continue
+
+            kwargs = dict(kwargs, handler=entry.handler)
+            passed, kwargs = await entry.handler.check(event, **kwargs)
+            if not passed:
+                continue
+            wrapped_inner = entry.observer.outer_middleware.wrap_middlewares(
+                entry.observer._resolve_middlewares(),
+                entry.handler.call,
+            )
+            try:
+                return await wrapped_inner(event, kwargs)
+            except SkipHandler:
+                continue
+        return UNHANDLED
+
+    def keys(self, role: str, event_type: str) -> FrozenSet[str]:
+        """Get exact keys compiled for a role and event type (for diagnostics and tests)"""
+        return frozenset(self._exact.get((role, event_type), {}))
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys in self._exact.values()) + \
+            sum(len(prefixes) for prefixes in self._prefixes.values())
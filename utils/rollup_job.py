@@ -0,0 +1,97 @@
+"""
+Background refresh of the hourly application rollups.
+
+Every ``ROLLUP_INTERVAL_SECONDS`` the job calls
+``database.application_rollups.refresh`` for each source table, so report
+and alert readers see counts at most one interval plus the current hour's
+re-count behind the source tables. Several bot processes may run the job;
+the watermark row lock makes them take turns per table.
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from config import config
+from database import application_rollups
+from utils.logger import setup_module_logger
+
+logger = setup_module_logger("rollup_job")
+
+
+class ApplicationRollupJob:
+    """Periodic incremental refresh of application_rollup_hourly"""
+
+    def __init__(self, pool=None, interval_seconds: Optional[int] = None, settle_seconds: Optional[int] = None):
+        self.pool = pool
+        self.interval = interval_seconds or config.ROLLUP_INTERVAL_SECONDS
+        self.settle_seconds = settle_seconds or config.ROLLUP_SETTLE_SECONDS
+        self._task: Optional[asyncio.Task] = None
+
+        self.runs = 0
+        self.failed_runs = 0
+        self.buckets_written = 0
+        self.last_run_at: Optional[datetime] = None
+
+    def _get_pool(self):
+        """Get database pool"""
+        if self.pool:
+            return self.pool
+        try:
+            from loader import bot
+            return bot.db
+        except ImportError:
+            return None
+
+    def start(self) -> None:
+        """Start the refresh loop on the running loop"""
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Application rollup job started, every {self.interval}s")
+
+    async def stop(self) -> None:
+        """Stop the refresh loop; an interrupted refresh rolls back and is redone next start"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        logger.info(f"Application rollup job stopped: {self.get_stats()}")
+
+    async def _run(self) -> None:
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> int:
+        """Refresh every rollup kind; returns the number of buckets written"""
+        pool = self._get_pool()
+        if pool is None:
+            return 0
+
+        written = 0
+        for kind in application_rollups.ROLLUP_KINDS:
+            try:
+                async with pool.acquire() as conn:
+                    written += await application_rollups.refresh(conn, kind, self.settle_seconds)
+            except Exception as e:
+                self.failed_runs += 1
+                logger.error(f"Error refreshing {kind} rollups: {str(e)}", exc_info=True)
+        self.runs += 1
+        self.buckets_written += written
+        self.last_run_at = datetime.utcnow()
+        return written
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get job statistics"""
+        return {
+            'running': self._task is not None and not self._task.done(),
+            'runs': self.runs,
+            'failed_runs': self.failed_runs,
+            'buckets_written': self.buckets_written,
+            'last_run_at': self.last_run_at.isoformat() if self.last_run_at else None,
+        }
+
+
+# Global instance started in loader.on_startup
+application_rollup_job = ApplicationRollupJob()
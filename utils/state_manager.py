@@ -3,17 +3,122 @@ State Manager - Manages workflow request state and transitions
 Enhanced implementation with audit trail functionality and role-based filtering
 """
 
-import json
 import uuid
+from dataclasses import dataclass
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Dict, Any
 from abc import ABC, abstractmethod
 
+from database.jsonb import LazyJSONAttribute, dumps, load_json
+from database.pagination import Page, decode_cursor, decode_timestamp, encode_cursor, encode_timestamp
 from database.models import ServiceRequest, StateTransition, WorkflowType, RequestStatus, Priority
 from utils.logger import setup_module_logger
 
 logger = setup_module_logger("state_manager")
 
+REQUEST_COLUMNS = """
+    id, workflow_type, client_id, role_current, current_status,
+    created_at, updated_at, priority, description, location,
+    contact_info, {state_data}, equipment_used, inventory_updated,
+    completion_rating, feedback_comments, created_by_staff,
+    staff_creator_id, staff_creator_role, creation_source, client_notified_at, version
+"""
+# Single-request reads decode state_data right away; listings fetch it as text
+# and only decode it for the requests a handler actually opens
+DETAIL_COLUMNS = REQUEST_COLUMNS.format(state_data='state_data')
+LISTING_COLUMNS = REQUEST_COLUMNS.format(state_data='state_data::text AS state_data')
+
+# Role lists sort by service_requests.priority_rank (migration 020), then newest first;
+# id breaks ties so the order is total and usable as a keyset cursor
+ROLE_LIST_ORDER = "ORDER BY priority_rank DESC, created_at DESC, id DESC"
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 200
+
+
+class LazyServiceRequest(ServiceRequest):
+    """ServiceRequest whose state_data is decoded from JSON text on first access"""
+    state_data = LazyJSONAttribute(dict)
+
+
+def _row_to_request(row, lazy: bool = False) -> ServiceRequest:
+    """Build a ServiceRequest from a service_requests row"""
+    request_class = LazyServiceRequest if lazy else ServiceRequest
+    return request_class(
+        id=row['id'],
+        workflow_type=row['workflow_type'],
+        client_id=row['client_id'],
+        role_current=row['role_current'],
+        current_status=row['current_status'],
+        created_at=row['created_at'],
+        updated_at=row['updated_at'],
+        priority=row['priority'],
+        description=row['description'],
+        location=row['location'],
+        contact_info=load_json(row['contact_info'], {}),
+        state_data=row['state_data'] if lazy else load_json(row['state_data'], {}),
+        equipment_used=load_json(row['equipment_used'], []),
+        inventory_updated=row['inventory_updated'],
+        completion_rating=row['completion_rating'],
+        feedback_comments=row['feedback_comments'],
+        created_by_staff=row['created_by_staff'],
+        staff_creator_id=row['staff_creator_id'],
+        staff_creator_role=row['staff_creator_role'],
+        creation_source=row['creation_source'],
+        client_notified_at=row['client_notified_at'],
+        version=row['version']
+    )
+
+
+# One round trip: the versioned update and its audit row; the INSERT only
+# runs when the UPDATE matched, so a stale version writes nothing. state_data
+# is patched server-side (top-level keys of $5 replace existing ones)
+APPLY_TRANSITION_QUERY = """
+WITH updated AS (
+    UPDATE service_requests
+    SET role_current = $3, current_status = $4, state_data = COALESCE(state_data, '{}'::jsonb) || $5::jsonb,
+        version = version + 1, updated_at = NOW()
+    WHERE id = $1 AND version = $2
+    RETURNING id, version
+), recorded AS (
+    INSERT INTO state_transitions (
+        request_id, from_role, to_role, action, actor_id,
+        transition_data, comments, created_at
+    )
+    SELECT id, $6, $3, $7, $8, $9::jsonb, $10, NOW() FROM updated
+)
+SELECT version FROM updated
+"""
+
+
+@dataclass
+class TransitionResult:
+    """Outcome of a workflow transition; truthy only when it was applied"""
+    APPLIED = 'applied'
+    CONFLICT = 'conflict'        # another user changed the request first
+    NOT_FOUND = 'not_found'
+    REJECTED = 'rejected'        # invalid action, missing data or access denied
+    ERROR = 'error'
+    
+    status: str
+    version: Optional[int] = None
+    
+    def __bool__(self) -> bool:
+        return self.status == self.APPLIED
+    
+    @property
+    def conflict(self) -> bool:
+        return self.status == self.CONFLICT
+    
+    def error_text(self, lang: str = 'ru') -> str:
+        """Message a handler can show when the transition did not apply"""
+        if self.status == self.CONFLICT:
+            return ("⚠️ Ariza boshqa xodim tomonidan allaqachon o'zgartirildi. Ro'yxatni yangilang."
+                    if lang == 'uz' else
+                    "⚠️ Заявка уже изменена другим сотрудником. Обновите список.")
+        if self.status == self.NOT_FOUND:
+            return "❌ Ariza topilmadi." if lang == 'uz' else "❌ Заявка не найдена."
+        return "❌ Amalni bajarib bo'lmadi." if lang == 'uz' else "❌ Не удалось выполнить действие."
+
 
 class StateManagerInterface(ABC):
     """Abstract interface for state manager"""
@@ -93,7 +198,7 @@ class StateManager(StateManagerInterface):
                     # Create the service request with staff creation tracking
                     query = """
                     INSERT INTO service_requests (
-                        id, workflow_type, client_id, role_current , current_status,
+                        id, workflow_type, client_id, role_current, current_status,
                         created_at, updated_at, priority, description, location,
                         contact_info, state_data, equipment_used, inventory_updated,
                         completion_rating, feedback_comments, created_by_staff,
@@ -113,9 +218,9 @@ class StateManager(StateManagerInterface):
                         initial_data.get('priority', Priority.MEDIUM.value),
                         initial_data.get('description'),
                         initial_data.get('location'),
-                        json.dumps(initial_data.get('contact_info', {})),
-                        json.dumps(initial_data),
-                        json.dumps([]),
+                        dumps(initial_data.get('contact_info', {})),
+                        dumps(initial_data),
+                        dumps([]),
                         False,
                         None,
                         None,
@@ -158,12 +263,9 @@ class StateManager(StateManagerInterface):
                     
                     # Prepare update data
                     current_time = datetime.now()
-                    old_role = current_request.role_current 
+                    old_role = current_request.role_current
                     old_status = current_request.current_status
                     
-                    # Merge state data
-                    merged_state_data = {**current_request.state_data, **new_state.get('state_data', {})}
-                    
                     # Update the request
                     query = """
                     UPDATE service_requests SET
@@ -174,33 +276,34 @@ class StateManager(StateManagerInterface):
                         description = COALESCE($6, description),
                         location = COALESCE($7, location),
                         contact_info = $8,
-                        state_data = $9,
+                        state_data = COALESCE(state_data, '{}'::jsonb) || $9::jsonb,
                         equipment_used = $10,
                         inventory_updated = $11,
                         completion_rating = COALESCE($12, completion_rating),
-                        feedback_comments = COALESCE($13, feedback_comments)
+                        feedback_comments = COALESCE($13, feedback_comments),
+                        version = version + 1
                     WHERE id = $1
                     """
                     
                     result = await conn.execute(
                         query,
                         request_id,
-                        new_state.get('role_current ', current_request.role_current ),
+                        new_state.get('role_current', current_request.role_current),
                         new_state.get('current_status', current_request.current_status),
                         current_time,
                         new_state.get('priority', current_request.priority),
                         new_state.get('description'),
                         new_state.get('location'),
-                        json.dumps(new_state.get('contact_info', current_request.contact_info)),
-                        json.dumps(merged_state_data),
-                        json.dumps(new_state.get('equipment_used', current_request.equipment_used)),
+                        dumps(new_state.get('contact_info', current_request.contact_info)),
+                        dumps(new_state.get('state_data', {})),
+                        dumps(new_state.get('equipment_used', current_request.equipment_used)),
                         new_state.get('inventory_updated', current_request.inventory_updated),
                         new_state.get('completion_rating'),
                         new_state.get('feedback_comments')
                     )
                     
                     # Record state transition if role or status changed
-                    new_role = new_state.get('role_current ', current_request.role_current )
+                    new_role = new_state.get('role_current', current_request.role_current)
                     new_status = new_state.get('current_status', current_request.current_status)
                     
                     if old_role != new_role or old_status != new_status:
@@ -219,6 +322,55 @@ class StateManager(StateManagerInterface):
             logger.error(f"Error updating request state: {e}", exc_info=True)
             return False
     
+    async def apply_transition(self, request_id: str, expected_version: int, from_role: str, to_role: str,
+                               status: str, state_patch: Dict[str, Any], action: str, actor_id: Optional[int],
+                               transition_data: Dict[str, Any] = None, comments: str = None,
+                               in_transaction: Optional[Callable[[Any], Awaitable[Any]]] = None) -> TransitionResult:
+        """
+        Moves a request to ``to_role`` and records the transition atomically,
+        provided nobody changed it since ``expected_version`` was read.
+        ``state_patch`` is merged into state_data by the database, so only the
+        changed keys are sent.
+        
+        ``in_transaction(conn)`` runs inside the same transaction once the
+        transition has applied (e.g. to queue the notification for the next role).
+        """
+        pool = self._get_pool()
+        if not pool:
+            logger.error("No database pool available")
+            return TransitionResult(TransitionResult.ERROR)
+        
+        try:
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    new_version = await conn.fetchval(
+                        APPLY_TRANSITION_QUERY,
+                        request_id, expected_version, to_role, status, dumps(state_patch),
+                        from_role, action, actor_id, dumps(transition_data or {}), comments
+                    )
+                    if new_version is None:
+                        current_version = await conn.fetchval(
+                            "SELECT version FROM service_requests WHERE id = $1", request_id
+                        )
+                        if current_version is None:
+                            logger.error(f"Request {request_id} not found")
+                            return TransitionResult(TransitionResult.NOT_FOUND)
+                        logger.warning(
+                            f"Transition {action} on request {request_id} lost a race: "
+                            f"expected version {expected_version}, found {current_version}"
+                        )
+                        return TransitionResult(TransitionResult.CONFLICT, current_version)
+                    
+                    if in_transaction:
+                        await in_transaction(conn)
+            
+            logger.info(f"Request {request_id}: {from_role} -> {to_role} ({action}), version {new_version}")
+            return TransitionResult(TransitionResult.APPLIED, new_version)
+            
+        except Exception as e:
+            logger.error(f"Error applying transition: {e}", exc_info=True)
+            return TransitionResult(TransitionResult.ERROR)
+    
     def _get_initial_role(self, workflow_type: str, created_by_role: str = None) -> str:
         """Determine initial role based on workflow type and who created the request"""
         from database.models import UserRole
@@ -247,44 +399,14 @@ class StateManager(StateManagerInterface):
     
     async def _get_request_internal(self, conn, request_id: str) -> Optional[ServiceRequest]:
         """Internal method to get request using existing connection"""
-        query = """
-        SELECT id, workflow_type, client_id, role_current , current_status,
-               created_at, updated_at, priority, description, location,
-               contact_info, state_data, equipment_used, inventory_updated,
-               completion_rating, feedback_comments, created_by_staff,
-               staff_creator_id, staff_creator_role, creation_source, client_notified_at
+        query = f"""
+        SELECT {DETAIL_COLUMNS}
         FROM service_requests
         WHERE id = $1
         """
         
         row = await conn.fetchrow(query, request_id)
-        
-        if row:
-            return ServiceRequest(
-                id=row['id'],
-                workflow_type=row['workflow_type'],
-                client_id=row['client_id'],
-                role_current =row['role_current '],
-                current_status=row['current_status'],
-                created_at=row['created_at'],
-                updated_at=row['updated_at'],
-                priority=row['priority'],
-                description=row['description'],
-                location=row['location'],
-                contact_info=json.loads(row['contact_info']) if row['contact_info'] else {},
-                state_data=json.loads(row['state_data']) if row['state_data'] else {},
-                equipment_used=json.loads(row['equipment_used']) if row['equipment_used'] else [],
-                inventory_updated=row['inventory_updated'],
-                completion_rating=row['completion_rating'],
-                feedback_comments=row['feedback_comments'],
-                created_by_staff=row['created_by_staff'],
-                staff_creator_id=row['staff_creator_id'],
-                staff_creator_role=row['staff_creator_role'],
-                creation_source=row['creation_source'],
-                client_notified_at=row['client_notified_at']
-            )
-        
-        return None
+        return _row_to_request(row) if row else None
     
     async def _record_transition(self, conn, request_id: str, from_role: str, to_role: str,
                                action: str, actor_id: int, transition_data: Dict[str, Any] = None,
@@ -304,7 +426,7 @@ class StateManager(StateManagerInterface):
             to_role,
             action,
             actor_id,
-            json.dumps(transition_data or {}),
+            dumps(transition_data or {}),
             comments,
             datetime.now()
         )
@@ -324,8 +446,36 @@ class StateManager(StateManagerInterface):
             logger.error(f"Error getting request: {e}", exc_info=True)
             return None
     
+    async def _fetch_role_rows(self, conn, role: str, status_filter: Optional[str] = None,
+                               limit: Optional[int] = None, after: Optional[tuple] = None) -> list:
+        """Fetch request rows of a role in list order, optionally after a (rank, created_at, id) key"""
+        conditions = ["role_current = $1"]
+        params = [role]
+        
+        if status_filter:
+            params.append(status_filter)
+            conditions.append(f"current_status = ${len(params)}")
+        
+        if after:
+            params.extend(after)
+            n = len(params)
+            conditions.append(f"(priority_rank, created_at, id) < (${n - 2}, ${n - 1}, ${n})")
+        
+        query = f"""
+        SELECT {LISTING_COLUMNS}, priority_rank
+        FROM service_requests
+        WHERE {' AND '.join(conditions)}
+        {ROLE_LIST_ORDER}
+        """
+        
+        if limit:
+            params.append(limit)
+            query += f" LIMIT ${len(params)}"
+        
+        return await conn.fetch(query, *params)
+    
     async def get_requests_by_role(self, role: str, status_filter: str = None) -> List[ServiceRequest]:
-        """Returns requests assigned to specific role with role-based filtering"""
+        """Returns all requests assigned to specific role, most urgent first (see get_requests_page)"""
         pool = self._get_pool()
         if not pool:
             logger.error("No database pool available")
@@ -333,51 +483,9 @@ class StateManager(StateManagerInterface):
             
         try:
             async with pool.acquire() as conn:
-                base_query = """
-                SELECT id, workflow_type, client_id, role_current , current_status,
-                       created_at, updated_at, priority, description, location,
-                       contact_info, state_data, equipment_used, inventory_updated,
-                       completion_rating, feedback_comments, created_by_staff,
-                       staff_creator_id, staff_creator_role, creation_source, client_notified_at
-                FROM service_requests
-                WHERE role_current = $1
-                """
-                
-                params = [role]
-                
-                if status_filter:
-                    base_query += " AND current_status = $2"
-                    params.append(status_filter)
+                rows = await self._fetch_role_rows(conn, role, status_filter)
                 
-                base_query += " ORDER BY priority DESC, created_at DESC"
-                
-                rows = await conn.fetch(base_query, *params)
-                
-                requests = []
-                for row in rows:
-                    requests.append(ServiceRequest(
-                        id=row['id'],
-                        workflow_type=row['workflow_type'],
-                        client_id=row['client_id'],
-                        role_current =row['role_current '],
-                        current_status=row['current_status'],
-                        created_at=row['created_at'],
-                        updated_at=row['updated_at'],
-                        priority=row['priority'],
-                        description=row['description'],
-                        location=row['location'],
-                        contact_info=json.loads(row['contact_info']) if row['contact_info'] else {},
-                        state_data=json.loads(row['state_data']) if row['state_data'] else {},
-                        equipment_used=json.loads(row['equipment_used']) if row['equipment_used'] else [],
-                        inventory_updated=row['inventory_updated'],
-                        completion_rating=row['completion_rating'],
-                        feedback_comments=row['feedback_comments'],
-                        created_by_staff=row['created_by_staff'],
-                        staff_creator_id=row['staff_creator_id'],
-                        staff_creator_role=row['staff_creator_role'],
-                        creation_source=row['creation_source'],
-                        client_notified_at=row['client_notified_at']
-                    ))
+                requests = [_row_to_request(row, lazy=True) for row in rows]
                 
                 logger.info(f"Retrieved {len(requests)} requests for role {role}")
                 return requests
@@ -386,6 +494,67 @@ class StateManager(StateManagerInterface):
             logger.error(f"Error getting requests by role: {e}", exc_info=True)
             return []
     
+    async def fetch_requests_page(self, role: str, status_filter: str = None, limit: int = DEFAULT_PAGE_SIZE,
+                                  cursor: Optional[str] = None) -> Page[ServiceRequest]:
+        """
+        Returns one page of a role's requests, most urgent first.
+        
+        Pass the previous page's ``next_cursor`` to get the following page;
+        ``next_cursor`` is None on the last page. Raises ValueError for an
+        invalid cursor and lets database errors propagate.
+        """
+        pool = self._get_pool()
+        if not pool:
+            raise RuntimeError("No database pool available")
+        
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        after = None
+        if cursor:
+            rank, created_at, request_id = decode_cursor(cursor, 3)
+            after = (int(rank), decode_timestamp(created_at), request_id)
+        
+        async with pool.acquire() as conn:
+            # One extra row tells whether there is a next page
+            rows = await self._fetch_role_rows(conn, role, status_filter, limit + 1, after)
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(last['priority_rank'], encode_timestamp(last['created_at']), last['id'])
+        
+        return Page(items=[_row_to_request(row, lazy=True) for row in rows], next_cursor=next_cursor)
+    
+    async def get_requests_page(self, role: str, status_filter: str = None, limit: int = DEFAULT_PAGE_SIZE,
+                                cursor: Optional[str] = None) -> Page[ServiceRequest]:
+        """Page of a role's requests for the UI (see fetch_requests_page); empty on any error"""
+        try:
+            return await self.fetch_requests_page(role, status_filter, limit, cursor)
+        except ValueError:
+            logger.warning(f"Invalid request list cursor for role {role}: {cursor!r}")
+            return Page()
+        except Exception as e:
+            logger.error(f"Error getting requests page by role: {e}", exc_info=True)
+            return Page()
+    
+    async def iter_requests_by_role(self, role: str, status_filter: str = None,
+                                    batch_size: int = MAX_PAGE_SIZE) -> AsyncIterator[ServiceRequest]:
+        """
+        Yields all requests of a role page by page, for background jobs.
+        
+        No connection is held while the consumer processes a batch. A
+        database error raises out of the iteration instead of ending it
+        early, so the consumer never mistakes a partial pass for a full one.
+        """
+        cursor = None
+        while True:
+            page = await self.fetch_requests_page(role, status_filter, batch_size, cursor)
+            for request in page.items:
+                yield request
+            if not page.has_more:
+                return
+            cursor = page.next_cursor
+    
     async def record_state_transition(self, request_id: str, from_role: str, to_role: str, 
                                     action: str, actor_id: int, transition_data: Dict[str, Any] = None,
                                     comments: str = None) -> bool:
@@ -449,7 +618,7 @@ class StateManager(StateManagerInterface):
                         to_role=row['to_role'],
                         action=row['action'],
                         actor_id=row['actor_id'],
-                        transition_data=json.loads(row['transition_data']) if row['transition_data'] else {},
+                        transition_data=load_json(row['transition_data'], {}),
                         comments=row['comments'],
                         created_at=row['created_at']
                     ))
@@ -470,11 +639,8 @@ class StateManager(StateManagerInterface):
             
         try:
             async with pool.acquire() as conn:
-                query = """
-                SELECT id, workflow_type, client_id, role_current , current_status,
-                       created_at, updated_at, priority, description, location,
-                       contact_info, state_data, equipment_used, inventory_updated,
-                       completion_rating, feedback_comments
+                query = f"""
+                SELECT {LISTING_COLUMNS}
                 FROM service_requests
                 WHERE client_id = $1
                 ORDER BY created_at DESC
@@ -482,26 +648,7 @@ class StateManager(StateManagerInterface):
                 
                 rows = await conn.fetch(query, client_id)
                 
-                requests = []
-                for row in rows:
-                    requests.append(ServiceRequest(
-                        id=row['id'],
-                        workflow_type=row['workflow_type'],
-                        client_id=row['client_id'],
-                        role_current =row['role_current '],
-                        current_status=row['current_status'],
-                        created_at=row['created_at'],
-                        updated_at=row['updated_at'],
-                        priority=row['priority'],
-                        description=row['description'],
-                        location=row['location'],
-                        contact_info=json.loads(row['contact_info']) if row['contact_info'] else {},
-                        state_data=json.loads(row['state_data']) if row['state_data'] else {},
-                        equipment_used=json.loads(row['equipment_used']) if row['equipment_used'] else [],
-                        inventory_updated=row['inventory_updated'],
-                        completion_rating=row['completion_rating'],
-                        feedback_comments=row['feedback_comments']
-                    ))
+                requests = [_row_to_request(row, lazy=True) for row in rows]
                 
                 logger.info(f"Retrieved {len(requests)} requests for client {client_id}")
                 return requests
@@ -519,38 +666,16 @@ class StateManager(StateManagerInterface):
             
         try:
             async with pool.acquire() as conn:
-                query = """
-                SELECT id, workflow_type, client_id, role_current , current_status,
-                       created_at, updated_at, priority, description, location,
-                       contact_info, state_data, equipment_used, inventory_updated,
-                       completion_rating, feedback_comments
+                query = f"""
+                SELECT {LISTING_COLUMNS}
                 FROM service_requests
                 WHERE current_status = $1
-                ORDER BY priority DESC, created_at DESC
+                {ROLE_LIST_ORDER}
                 """
                 
                 rows = await conn.fetch(query, status)
                 
-                requests = []
-                for row in rows:
-                    requests.append(ServiceRequest(
-                        id=row['id'],
-                        workflow_type=row['workflow_type'],
-                        client_id=row['client_id'],
-                        role_current =row['role_current '],
-                        current_status=row['current_status'],
-                        created_at=row['created_at'],
-                        updated_at=row['updated_at'],
-                        priority=row['priority'],
-                        description=row['description'],
-                        location=row['location'],
-                        contact_info=json.loads(row['contact_info']) if row['contact_info'] else {},
-                        state_data=json.loads(row['state_data']) if row['state_data'] else {},
-                        equipment_used=json.loads(row['equipment_used']) if row['equipment_used'] else [],
-                        inventory_updated=row['inventory_updated'],
-                        completion_rating=row['completion_rating'],
-                        feedback_comments=row['feedback_comments']
-                    ))
+                requests = [_row_to_request(row, lazy=True) for row in rows]
                 
                 logger.info(f"Retrieved {len(requests)} requests with status {status}")
                 return requests
@@ -0,0 +1,155 @@
+"""
+Warehouse notifications for low-stock threshold crossings.
+
+Stock changes record crossings in ``material_stock_alerts`` (see
+``database.stock_alerts``). Every ``STOCK_ALERT_INTERVAL_SECONDS`` the
+notifier claims the crossings that have held for
+``STOCK_ALERT_DEBOUNCE_SECONDS`` and, in the same transaction, queues one
+digest per warehouse user in the notification outbox. A material that dips
+below its minimum and is restocked within the debounce period is never
+announced, and a claimed crossing is not sent again until the material
+recovers and crosses once more.
+"""
+
+import asyncio
+import html
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import config
+from database import stock_alerts
+from utils.logger import setup_module_logger
+from utils.notification_outbox import enqueue_for_role, notification_outbox
+
+logger = setup_module_logger("stock_alert_notifier")
+
+LEVEL_ICONS = {'low': '🟡', 'critical': '🟠', 'out_of_stock': '🔴'}
+
+TITLES = {
+    'uz': "⚠️ Ombor zaxirasi ogohlantirishi",
+    'ru': "⚠️ Предупреждение о запасах склада",
+}
+
+LEVEL_LABELS = {
+    'uz': {'low': "kam", 'critical': "juda kam", 'out_of_stock': "tugadi"},
+    'ru': {'low': "мало", 'critical': "критически мало", 'out_of_stock': "закончился"},
+}
+
+
+def render_crossings(crossings: List[Dict[str, Any]], lang: str) -> str:
+    """HTML digest of claimed crossings in the recipient's language"""
+    lang = lang if lang in TITLES else 'uz'
+    lines = [f"<b>{TITLES[lang]}</b>", ""]
+    for item in crossings:
+        level = item['stock_level']
+        lines.append(
+            f"{LEVEL_ICONS[level]} {html.escape(item['name'] or '')}: {item['quantity']} "
+            f"{html.escape(item.get('unit') or '')} (min: {item['min_quantity']}) — {LEVEL_LABELS[lang][level]}"
+        )
+    return "\n".join(lines)
+
+
+class StockAlertNotifier:
+    """Periodic, debounced warehouse notification of material_stock_alerts crossings"""
+
+    def __init__(self, pool=None, interval_seconds: Optional[int] = None,
+                 debounce_seconds: Optional[int] = None, batch_size: int = 20):
+        self.pool = pool
+        self.interval = interval_seconds or config.STOCK_ALERT_INTERVAL_SECONDS
+        self.debounce_seconds = config.STOCK_ALERT_DEBOUNCE_SECONDS if debounce_seconds is None else debounce_seconds
+        # One digest per batch keeps messages well under Telegram's length limit
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+
+        self.runs = 0
+        self.failed_runs = 0
+        self.crossings_sent = 0
+        self.messages_queued = 0
+        self.last_run_at: Optional[datetime] = None
+
+    def _get_pool(self):
+        """Get database pool"""
+        if self.pool:
+            return self.pool
+        try:
+            from loader import bot
+            return bot.db
+        except ImportError:
+            return None
+
+    def start(self) -> None:
+        """Start the notification loop on the running loop"""
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Stock alert notifier started, every {self.interval}s "
+                    f"with a {self.debounce_seconds}s debounce")
+
+    async def stop(self) -> None:
+        """Stop the notification loop; an interrupted batch rolls back and is claimed next time"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        logger.info(f"Stock alert notifier stopped: {self.get_stats()}")
+
+    async def _run(self) -> None:
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    async def _notify_batch(self, pool) -> Tuple[int, int]:
+        """Claim one batch and queue its digest; returns (crossings, messages)"""
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                crossings = await stock_alerts.claim_crossings(conn, self.debounce_seconds, self.batch_size)
+                if not crossings:
+                    return 0, 0
+                queued = await enqueue_for_role(
+                    conn, 'warehouse',
+                    lambda user: (render_crossings(crossings, user['language']), None),
+                    notification_type='stock_alert'
+                )
+        return len(crossings), len(queued)
+
+    async def run_once(self) -> int:
+        """Notify every due crossing; returns the number of crossings sent"""
+        pool = self._get_pool()
+        if pool is None:
+            return 0
+
+        sent = queued = 0
+        try:
+            while True:
+                crossings, messages = await self._notify_batch(pool)
+                sent += crossings
+                queued += messages
+                if crossings < self.batch_size:
+                    break
+        except Exception as e:
+            self.failed_runs += 1
+            logger.error(f"Error notifying stock alerts: {str(e)}", exc_info=True)
+        if queued:
+            notification_outbox.wake()
+            logger.info(f"Queued {queued} warehouse messages for {sent} stock level crossings")
+
+        self.runs += 1
+        self.crossings_sent += sent
+        self.messages_queued += queued
+        self.last_run_at = datetime.utcnow()
+        return sent
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get notifier statistics"""
+        return {
+            'running': self._task is not None and not self._task.done(),
+            'runs': self.runs,
+            'failed_runs': self.failed_runs,
+            'crossings_sent': self.crossings_sent,
+            'messages_queued': self.messages_queued,
+            'last_run_at': self.last_run_at.isoformat() if self.last_run_at else None,
+        }
+
+
+# Global instance started in loader.on_startup
+stock_alert_notifier = StockAlertNotifier()
@@ -0,0 +1,204 @@
+"""
+Rate-limited, concurrent Telegram message fan-out.
+
+Sends a batch of messages with bounded concurrency while staying inside the
+Bot API limits: a global token bucket (``TELEGRAM_GLOBAL_RATE`` messages per
+second) and a minimum interval between messages to the same chat
+(``TELEGRAM_PER_CHAT_INTERVAL``). A ``RetryAfter`` (flood control) pauses the
+whole bucket for the requested time and the message is retried; network and
+server errors are retried with backoff; permanent errors (bot blocked, chat
+not found) are reported without retrying. Every message gets a
+``DeliveryResult``.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+from aiogram.exceptions import (
+    TelegramBadRequest, TelegramForbiddenError, TelegramNetworkError,
+    TelegramRetryAfter, TelegramServerError
+)
+
+from config import config
+from utils.logger import setup_module_logger
+
+logger = setup_module_logger("telegram_fanout")
+
+MAX_BACKOFF_SECONDS = 10.0
+
+
+@dataclass
+class OutgoingMessage:
+    """A message to deliver; recipient_id is echoed back in the result (e.g. users.id)"""
+    chat_id: int
+    text: str
+    reply_markup: Any = None
+    parse_mode: Optional[str] = 'HTML'
+    recipient_id: Any = None
+
+
+@dataclass
+class DeliveryResult:
+    """Outcome of delivering one OutgoingMessage"""
+    chat_id: int
+    recipient_id: Any = None
+    ok: bool = False
+    message_id: Optional[int] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    retryable: bool = False  # failed, but a later attempt may succeed
+
+
+class TokenBucket:
+    """Token bucket shared by all senders; ``pause`` stops it for a flood-control wait"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+        # Refill from the end of the pause, not from the last send before it
+        self.updated = self.paused_until
+
+    async def acquire(self) -> None:
+        # Check-and-take never awaits, so it is atomic on the event loop
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class TelegramFanout:
+    """Delivers batches of messages under global and per-chat rate limits"""
+
+    def __init__(self, bot=None, rate: Optional[float] = None, per_chat_interval: Optional[float] = None,
+                 concurrency: Optional[int] = None, max_retries: Optional[int] = None,
+                 bucket: Optional[TokenBucket] = None):
+        self.bot = bot
+        # Senders of the same bot should share one bucket: the global limit is per bot
+        self.bucket = bucket or TokenBucket(rate or config.TELEGRAM_GLOBAL_RATE)
+        self.per_chat_interval = (
+            config.TELEGRAM_PER_CHAT_INTERVAL if per_chat_interval is None else per_chat_interval
+        )
+        self.concurrency = concurrency or config.TELEGRAM_FANOUT_CONCURRENCY
+        self.max_retries = config.TELEGRAM_SEND_RETRIES if max_retries is None else max_retries
+        self._chat_next_send: Dict[int, float] = {}
+
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.flood_waits = 0
+
+    def _get_bot(self):
+        """Get bot instance"""
+        if self.bot:
+            return self.bot
+        from loader import bot
+        return bot
+
+    async def _wait_for_chat(self, chat_id: int) -> None:
+        """Reserve the chat's next send slot and wait for it"""
+        now = time.monotonic()
+        slot = max(now, self._chat_next_send.get(chat_id, 0.0))
+        self._chat_next_send[chat_id] = slot + self.per_chat_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def send_many(self, messages: Iterable[OutgoingMessage]) -> List[DeliveryResult]:
+        """Deliver all messages concurrently; results are in the order of ``messages``"""
+        messages = list(messages)
+        if not messages:
+            return []
+
+        bot = self._get_bot()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def deliver(message: OutgoingMessage) -> DeliveryResult:
+            async with semaphore:
+                return await self._deliver(bot, message)
+
+        results = await asyncio.gather(*(deliver(message) for message in messages))
+        self._forget_idle_chats()
+        return list(results)
+
+    async def send(self, message: OutgoingMessage) -> DeliveryResult:
+        """Deliver a single message under the same limits"""
+        return (await self.send_many([message]))[0]
+
+    async def _deliver(self, bot, message: OutgoingMessage) -> DeliveryResult:
+        result = DeliveryResult(chat_id=message.chat_id, recipient_id=message.recipient_id)
+        while True:
+            result.attempts += 1
+            await self._wait_for_chat(message.chat_id)
+            await self.bucket.acquire()
+            try:
+                sent = await bot.send_message(
+                    chat_id=message.chat_id,
+                    text=message.text,
+                    reply_markup=message.reply_markup,
+                    parse_mode=message.parse_mode
+                )
+            except TelegramRetryAfter as e:
+                # Flood control applies to the bot, so everyone waits
+                self.flood_waits += 1
+                self.bucket.pause(e.retry_after)
+                logger.warning(f"Flood control: pausing sends for {e.retry_after}s (chat {message.chat_id})")
+                if result.attempts > self.max_retries:
+                    return self._failed(result, e, retryable=True)
+                self.retries += 1
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                # Bot blocked, chat not found, bad markup: retrying cannot help
+                return self._failed(result, e)
+            except (TelegramNetworkError, TelegramServerError, asyncio.TimeoutError) as e:
+                if result.attempts > self.max_retries:
+                    return self._failed(result, e, retryable=True)
+                self.retries += 1
+                await asyncio.sleep(min(0.5 * 2 ** result.attempts, MAX_BACKOFF_SECONDS))
+            except Exception as e:
+                return self._failed(result, e)
+            else:
+                self.sent += 1
+                result.ok = True
+                result.message_id = getattr(sent, 'message_id', None)
+                return result
+
+    def _failed(self, result: DeliveryResult, error: Exception, retryable: bool = False) -> DeliveryResult:
+        self.failed += 1
+        result.retryable = retryable
+        result.error = f"{type(error).__name__}: {error}"
+        logger.error(f"Failed to deliver message to chat {result.chat_id} after {result.attempts} attempts: {error}")
+        return result
+
+    def _forget_idle_chats(self) -> None:
+        now = time.monotonic()
+        for chat_id in [chat_id for chat_id, slot in self._chat_next_send.items() if slot <= now]:
+            del self._chat_next_send[chat_id]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get delivery statistics"""
+        return {
+            'sent': self.sent,
+            'failed': self.failed,
+            'retries': self.retries,
+            'flood_waits': self.flood_waits,
+            'rate': self.bucket.rate,
+            'concurrency': self.concurrency,
+        }
+
+
+# Global instance shared by notification senders
+telegram_fanout = TelegramFanout()
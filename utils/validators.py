@@ -571,6 +571,29 @@ VALID_ZAYAVKA_STATUSES = [
     'bekor_qilindi', 'kechiktirildi'
 ]
 
+def normalize_phone_e164(phone: Optional[str]) -> Optional[str]:
+    """
+    Canonical E.164 form of a phone number, as stored in users.phone_e164.
+
+    Numbers without a country code are taken as Uzbek, like
+    DataValidator.validate_phone. Returns None for values that are not a
+    possible phone number instead of raising.
+    """
+    if not phone or not isinstance(phone, str):
+        return None
+
+    phone = re.sub(r'[^\d+]', '', phone.strip())
+    if not phone.startswith('+'):
+        phone = ('+' if phone.startswith('998') else '+998') + phone
+
+    try:
+        parsed = phonenumbers.parse(phone, None)
+    except NumberParseException:
+        return None
+    if not phonenumbers.is_possible_number(parsed):
+        return None
+    return phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
+
 def validate_address(address: str) -> bool:
     """
     Validate if the address is properly formatted.
@@ -200,6 +200,12 @@ class WorkflowAccessControl(AccessControlInterface):
             }
         }
     
+        # Frozen action sets for O(1) checks in validate_workflow_action
+        self.role_workflow_actions = {
+            role: frozenset(perms.get('workflow_actions', ()))
+            for role, perms in self.role_permissions.items()
+        }
+    
     def _load_workflow_permissions(self):
         """Load workflow-specific permission requirements"""
         self.workflow_permissions = {
@@ -242,10 +248,7 @@ class WorkflowAccessControl(AccessControlInterface):
         """Validates if user can perform workflow action"""
         try:
             # Check if role has permission for this action
-            role_perms = self.role_permissions.get(user_role, {})
-            allowed_actions = role_perms.get('workflow_actions', [])
-            
-            if action not in allowed_actions:
+            if action not in self.role_workflow_actions.get(user_role, frozenset()):
                 reason = f"Role {user_role} not authorized for action {action}"
                 await self.log_access_attempt(user_id, action, f"workflow_action:{action}", False, reason)
                 return False, reason
@@ -592,7 +595,7 @@ class PermissionTransferManager:
                     # Update request current role
                     update_query = """
                     UPDATE service_requests 
-                    SET role_current = $1, updated_at = $2
+                    SET role_current = $1, updated_at = $2, version = version + 1
                     WHERE id = $3
                     """
                     
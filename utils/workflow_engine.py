@@ -11,6 +11,19 @@ from database.models import (
     ServiceRequest, StateTransition, WorkflowDefinition, WorkflowStep, 
     WorkflowStatus, WorkflowType, RequestStatus, WorkflowAction, UserRole
 )
+from utils.notification_outbox import notification_outbox
+from utils.state_manager import TransitionResult
+from utils.workflow_graph import CONSUME_INVENTORY, NOTIFY_NEXT_ROLE, WorkflowGraph, compile_workflows
+
+# Per-step payloads that only go to state_transitions.transition_data: free-text
+# notes nobody reads back from state_data, which would otherwise make the
+# request's state_data document grow with every step. Fields the role views
+# show from state_data (RoleBasedRequestFilter._filter_state_data), such as
+# call_notes, diagnostics_notes and inventory_updates, stay in state_data.
+TRANSITION_ONLY_FIELDS = frozenset({
+    'comments', 'additional_comments', 'installation_notes',
+    'resolution_comments', 'resolution_notes',
+})
 
 
 class WorkflowEngineInterface(ABC):
@@ -41,6 +54,8 @@ class WorkflowEngine(WorkflowEngineInterface):
         self.inventory_manager = inventory_manager
         self.access_control = access_control
         self.workflow_definitions = self._load_workflow_definitions()
+        # Validated (workflow_type, role, action) transition table; raises on broken definitions
+        self.workflow_graph = compile_workflows(self.workflow_definitions)
         
         # Initialize access control if not provided
         if not self.access_control:
@@ -295,18 +310,29 @@ class WorkflowEngine(WorkflowEngineInterface):
     
     async def transition_workflow(self, request_id: str, action: str, actor_role: str, data: dict) -> bool:
         """Processes workflow transitions between roles with access control validation"""
+        return bool(await self.execute_transition(request_id, action, actor_role, data))
+    
+    async def execute_transition(self, request_id: str, action: str, actor_role: str, data: dict) -> TransitionResult:
+        """
+        Like transition_workflow, but returns why a transition did not apply.
+        
+        The request moves with a single versioned UPDATE and its state_transitions
+        row in one transaction; ``result.conflict`` means another user changed the
+        request after it was loaded, and ``result.error_text(lang)`` says so.
+        """
+        # Reject actions that no workflow state accepts with this data before any database work
+        if not self.workflow_graph.accepts(action, data):
+            return TransitionResult(TransitionResult.REJECTED)
+        
         # Get current request state
         request = await self.state_manager.get_request(request_id)
         if not request:
-            return False
+            return TransitionResult(TransitionResult.NOT_FOUND)
         
-        workflow_def = self.workflow_definitions.get(request.workflow_type)
-        if not workflow_def:
-            return False
-        
-        current_step = workflow_def.steps.get(request.role_current)
-        if not current_step:
-            return False
+        # Validate action is allowed for current role and required data is present
+        transition = self.workflow_graph.get(request.workflow_type, request.role_current, action)
+        if not transition or transition.missing_fields(data):
+            return TransitionResult(TransitionResult.REJECTED)
         
         # Validate access control permissions
         if self.access_control:
@@ -329,99 +355,64 @@ class WorkflowEngine(WorkflowEngineInterface):
                         granted=False,
                         reason=f"Workflow transition denied: {reason}"
                     )
-                    return False
-        
-        # Validate action is allowed for current role
-        if action not in current_step.actions:
-            return False
-        
-        # Validate required data is present
-        for required_field in current_step.required_data:
-            if required_field not in data:
-                return False
+                    return TransitionResult(TransitionResult.REJECTED)
         
-        # Determine next role
-        next_role = current_step.next_steps.get(action)
-        if not next_role:
-            # Action doesn't transition to another role (e.g., intermediate actions)
-            next_role = request.role_current 
-        
-        # Update request state
-        updated_request = ServiceRequest(
-            id=request.id,
-            workflow_type=request.workflow_type,
-            client_id=request.client_id,
-            role_current =next_role,
-            current_status=RequestStatus.IN_PROGRESS.value,
-            created_at=request.created_at,
-            updated_at=datetime.now(),
-            priority=request.priority,
-            description=request.description,
-            location=request.location,
-            contact_info=request.contact_info,
-            state_data={**request.state_data, **data},
-            equipment_used=request.equipment_used,
-            inventory_updated=request.inventory_updated,
-            completion_rating=request.completion_rating,
-            feedback_comments=request.feedback_comments
-        )
+        next_role = transition.next_role
         
         # Enhance transition data with staff creation context
         enhanced_transition_data = self._enhance_transition_data_with_staff_context(request, data)
         
-        # Update request state
-        new_state = {
-            'role_current ': next_role,
-            'current_status': RequestStatus.IN_PROGRESS.value,
-            'state_data': {**request.state_data, **enhanced_transition_data},
-            'actor_id': data.get('actor_id'),
-            'action': action,
-            'comments': self._get_transition_comment(request, action, data)
-        }
-        
-        await self.state_manager.update_request_state(request_id, new_state, str(data.get('actor_id', 'system')))
+        # Client-created requests queue the next role's notification in the transition's transaction
+        is_staff_created = request.state_data.get('created_by_staff', False)
+        notify = NOTIFY_NEXT_ROLE in transition.side_effects and self.notification_system
+        enqueue_notification = None
+        if notify and not is_staff_created:
+            async def enqueue_notification(conn):
+                await self.notification_system.enqueue_assignment_notification(
+                    conn, next_role, request_id, request.workflow_type
+                )
         
-        # Create state transition record with enhanced context
-        transition = StateTransition(
-            request_id=request_id,
-            from_role=request.role_current ,
-            to_role=next_role,
-            action=action,
-            actor_id=data.get('actor_id'),
-            transition_data=enhanced_transition_data,
-            comments=self._get_transition_comment(request, action, data),
-            created_at=datetime.now()
+        # Versioned update and state transition record in one transaction
+        result = await self.state_manager.apply_transition(
+            request_id,
+            request.version,
+            request.role_current,
+            next_role,
+            RequestStatus.IN_PROGRESS.value,
+            self._state_patch(data),
+            action,
+            data.get('actor_id'),
+            enhanced_transition_data,
+            self._get_transition_comment(request, action, data),
+            in_transaction=enqueue_notification
         )
+        if not result:
+            return result
         
-        await self.state_manager.add_state_transition(transition)
-        
-        # Send notification to next role if role changed
-        if next_role != request.role_current and self.notification_system:
-            # Check if this is a staff-created application for enhanced notifications
-            is_staff_created = request.state_data.get('created_by_staff', False)
+        if enqueue_notification:
+            notification_outbox.wake()
+        elif notify:
+            # For staff-created applications, send enhanced workflow notifications
+            staff_creator_info = request.state_data.get('staff_creator_info', {})
+            creator_role = staff_creator_info.get('creator_role', 'unknown')
+            client_name = request.contact_info.get('full_name', 'Unknown Client')
             
-            if is_staff_created:
-                # For staff-created applications, send enhanced workflow notifications
-                staff_creator_info = request.state_data.get('staff_creator_info', {})
-                creator_role = staff_creator_info.get('creator_role', 'unknown')
-                client_name = request.contact_info.get('full_name', 'Unknown Client')
-                
-                await self.notification_system.send_staff_workflow_notification(
-                    next_role, request_id, request.workflow_type, creator_role,
-                    client_name, request.state_data
-                )
-            else:
-                # Regular client-created application notification
-                await self.notification_system.send_assignment_notification(
-                    next_role, request_id, request.workflow_type
-                )
+            await self.notification_system.send_staff_workflow_notification(
+                next_role, request_id, request.workflow_type, creator_role,
+                client_name, request.state_data
+            )
         
         # Handle inventory updates if needed
-        if action == WorkflowAction.UPDATE_INVENTORY.value and self.inventory_manager:
+        if CONSUME_INVENTORY in transition.side_effects and self.inventory_manager:
             equipment_used = data.get('equipment_used', [])
             await self.inventory_manager.consume_equipment(request_id, equipment_used)
         
-        return True
+        return result
+    
+    @staticmethod
+    def _state_patch(data: dict) -> dict:
+        """Keys a transition merges into state_data; the full data goes to the transition record"""
+        return {key: value for key, value in data.items() if key not in TRANSITION_ONLY_FIELDS}
     
     def _enhance_transition_data_with_staff_context(self, request: ServiceRequest, transition_data: dict) -> dict:
         """Enhance transition data with staff creation context information"""
@@ -517,7 +508,7 @@ class WorkflowEngine(WorkflowEngineInterface):
         # Update request to completed status
         completion_state = {
             'current_status': RequestStatus.COMPLETED.value,
-            'state_data': {**request.state_data, **completion_data},
+            'state_data': self._state_patch(completion_data),
             'completion_rating': completion_data.get('rating'),
             'feedback_comments': completion_data.get('feedback'),
             'actor_id': completion_data.get('actor_id'),
@@ -547,6 +538,10 @@ class WorkflowEngine(WorkflowEngineInterface):
         """Returns workflow definition for given type"""
         return self.workflow_definitions.get(workflow_type)
     
+    def get_workflow_graph(self) -> WorkflowGraph:
+        """Returns the compiled transition graph of all workflows"""
+        return self.workflow_graph
+    
     def get_available_workflows(self) -> List[str]:
         """Returns list of available workflow types"""
         return list(self.workflow_definitions.keys())
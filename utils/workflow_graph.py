@@ -0,0 +1,172 @@
+"""
+Compiled workflow state machine.
+
+``compile_workflows`` turns the WorkflowDefinition objects of the workflow
+engine into a flat transition table keyed by ``(workflow_type, role,
+action)``, validated once at startup, so a transition is a dictionary lookup
+and a frozenset subset test. States are the roles of a workflow; a target
+role without a step of its own (e.g. the client after remote resolution)
+is a terminal state.
+
+``WorkflowGraph.accepts`` checks an action and its data against every
+workflow before anything is loaded, which lets the engine reject invalid
+actions without touching the database.
+"""
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Mapping, Optional, Tuple
+
+from database.models import WorkflowAction, WorkflowDefinition
+
+# Side effects the engine runs after a transition is stored
+NOTIFY_NEXT_ROLE = 'notify_next_role'
+CONSUME_INVENTORY = 'consume_inventory'
+
+
+@dataclass(frozen=True)
+class Transition:
+    """One edge of the workflow graph"""
+    workflow_type: str
+    role: str
+    action: str
+    next_role: str
+    required_fields: FrozenSet[str]
+    side_effects: FrozenSet[str]
+
+    @property
+    def changes_role(self) -> bool:
+        return self.next_role != self.role
+
+    def missing_fields(self, data: Mapping) -> FrozenSet[str]:
+        return self.required_fields - data.keys()
+
+
+class WorkflowGraphError(ValueError):
+    """Workflow definitions contain unreachable or dead-end states"""
+
+    def __init__(self, problems: List[str]):
+        super().__init__("Invalid workflow definitions: " + "; ".join(problems))
+        self.problems = problems
+
+
+class WorkflowGraph:
+    """Transition table and adjacency of all workflows"""
+
+    def __init__(self, transitions: Dict[Tuple[str, str, str], Transition],
+                 initial_roles: Dict[str, str], actions: Dict[Tuple[str, str], Tuple[str, ...]]):
+        self.transitions = transitions
+        self.initial_roles = initial_roles
+        self._actions = actions
+        self._by_action: Dict[str, Tuple[Transition, ...]] = {}
+        self._next_roles: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+        self._previous_roles: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+        self._states: Dict[str, FrozenSet[str]] = {
+            workflow_type: frozenset(role for (wf, role) in actions if wf == workflow_type)
+            for workflow_type in initial_roles
+        }
+        for transition in transitions.values():
+            self._by_action[transition.action] = self._by_action.get(transition.action, ()) + (transition,)
+            if transition.changes_role:
+                self._add_edge(self._next_roles, (transition.workflow_type, transition.role), transition.next_role)
+                self._add_edge(self._previous_roles, (transition.workflow_type, transition.next_role), transition.role)
+
+    @staticmethod
+    def _add_edge(edges: Dict[Tuple[str, str], Tuple[str, ...]], key: Tuple[str, str], role: str) -> None:
+        if role not in edges.get(key, ()):
+            edges[key] = edges.get(key, ()) + (role,)
+
+    def get(self, workflow_type: str, role: str, action: str) -> Optional[Transition]:
+        return self.transitions.get((workflow_type, role, action))
+
+    def accepts(self, action: str, data: Mapping) -> bool:
+        """Whether the action with this data is valid in at least one workflow state"""
+        return any(
+            transition.required_fields <= data.keys() for transition in self._by_action.get(action, ())
+        )
+
+    def available_actions(self, workflow_type: str, role: str) -> Tuple[str, ...]:
+        return self._actions.get((workflow_type, role), ())
+
+    def next_roles(self, workflow_type: str, role: str) -> Tuple[str, ...]:
+        return self._next_roles.get((workflow_type, role), ())
+
+    def previous_roles(self, workflow_type: str, role: str) -> Tuple[str, ...]:
+        return self._previous_roles.get((workflow_type, role), ())
+
+    def states(self, workflow_type: str) -> FrozenSet[str]:
+        """Roles that have a step in the workflow"""
+        return self._states.get(workflow_type, frozenset())
+
+    def reachable_roles(self, workflow_type: str, start: Optional[str] = None) -> FrozenSet[str]:
+        """Roles reachable from ``start`` (the initial role by default), terminal states included"""
+        start = start or self.initial_roles[workflow_type]
+        seen = {start}
+        queue = deque([start])
+        while queue:
+            for role in self.next_roles(workflow_type, queue.popleft()):
+                if role not in seen:
+                    seen.add(role)
+                    queue.append(role)
+        return frozenset(seen)
+
+    def validate(self) -> List[str]:
+        """Describe unreachable states and dead ends (states that can never finish or return to the start)"""
+        problems = []
+        for workflow_type, initial_role in self.initial_roles.items():
+            states = self.states(workflow_type)
+            if initial_role not in states:
+                problems.append(f"{workflow_type}: initial role {initial_role} has no step")
+                continue
+            reachable = self.reachable_roles(workflow_type)
+            for role in sorted(states - reachable):
+                problems.append(f"{workflow_type}: state {role} is unreachable")
+            exits = (reachable - states) | {initial_role}
+            for role in sorted(states & reachable):
+                if role == initial_role:
+                    dead_end = not self.next_roles(workflow_type, role)
+                else:
+                    dead_end = not (self.reachable_roles(workflow_type, role) & exits)
+                if dead_end:
+                    problems.append(f"{workflow_type}: state {role} is a dead end")
+        return problems
+
+
+def compile_workflows(definitions: Dict[str, WorkflowDefinition], validate: bool = True) -> WorkflowGraph:
+    """Build and (by default) validate the transition table; raises WorkflowGraphError"""
+    transitions: Dict[Tuple[str, str, str], Transition] = {}
+    actions: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+    problems = []
+    for workflow_type, definition in definitions.items():
+        for role, step in definition.steps.items():
+            actions[(workflow_type, role)] = tuple(step.actions)
+            for action in step.next_steps:
+                if action not in step.actions:
+                    problems.append(f"{workflow_type}: {role} has a next step for undeclared action {action}")
+            required_fields = frozenset(step.required_data)
+            for action in step.actions:
+                # Actions without a next step keep the request with the same role
+                next_role = step.next_steps.get(action) or role
+                side_effects = set()
+                if next_role != role:
+                    side_effects.add(NOTIFY_NEXT_ROLE)
+                if action == WorkflowAction.UPDATE_INVENTORY.value:
+                    side_effects.add(CONSUME_INVENTORY)
+                transitions[(workflow_type, role, action)] = Transition(
+                    workflow_type, role, action, next_role, required_fields, frozenset(side_effects)
+                )
+
+    graph = WorkflowGraph(
+        transitions, {workflow_type: d.initial_role for workflow_type, d in definitions.items()}, actions
+    )
+    if validate:
+        problems.extend(graph.validate())
+        if problems:
+            raise WorkflowGraphError(problems)
+    return graph
+
+
+__all__ = [
+    'Transition', 'WorkflowGraph', 'WorkflowGraphError', 'compile_workflows',
+    'NOTIFY_NEXT_ROLE', 'CONSUME_INVENTORY'
+]